@@ -1,5 +1,5 @@
-from typing import Dict, Any
-from string import Template
+from typing import Dict, Any, List, Optional, Tuple
+from string import Formatter, Template
 
 
 class PromptTemplates:
@@ -211,6 +211,7 @@ class PromptTemplates:
 		2. 如果上下文中没有答案，诚实说明
 		3. 引用具体信息时保持准确
 		4. 不要编造上下文中没有的信息
+		5. 引用时在句末标注段落编号，如 [1]
 
 		你的回答：
 	"""
@@ -252,6 +253,30 @@ class PromptBuilder:
     
 	def __init__(self):
 		self.templates = PromptTemplates
+		# 模板名 -> 预解析的 (字面量, 变量名) 片段；None 表示含格式说明，回退到 str.format
+		self._compiled: Dict[str, Optional[List[Tuple[str, Optional[str]]]]] = {}
+
+	def compile(self) -> int:
+		"""
+        预解析所有模板（多进程部署时在主进程中调用，worker 共享解析结果）
+        
+        Returns:
+            解析的模板数
+        """
+		for name in dir(self.templates):
+			template = getattr(self.templates, name)
+			if name.isupper() and isinstance(template, str):
+				self._compiled[name] = self._parse(template)
+		return len(self._compiled)
+
+	@staticmethod
+	def _parse(template: str) -> Optional[List[Tuple[str, Optional[str]]]]:
+		segments = []
+		for literal, field, spec, conversion in Formatter().parse(template):
+			if field is not None and (spec or conversion or not field.isidentifier()):
+				return None
+			segments.append((literal, field))
+		return segments
 
 	def build(self, template_name: str, **kwargs) -> str:
 		"""
@@ -264,6 +289,17 @@ class PromptBuilder:
         Returns:
             填充后的提示词
         """
+		segments = self._compiled.get(template_name)
+		if segments is not None:
+			parts = []
+			for literal, field in segments:
+				parts.append(literal)
+				if field is not None:
+					if field not in kwargs:
+						raise ValueError(f"模板 {template_name} 中缺少必要的变量: {KeyError(field)}")
+					parts.append(format(kwargs[field]))
+			return "".join(parts)
+
 		template = getattr(self.templates, template_name, None)
 		if template is None:
 			raise ValueError(f"未找到模版: {template_name}")
@@ -44,6 +44,12 @@ class LLMSettings(BaseSettings):
     timeout: int = Field(default=60, gt=0, description="API 请求超时时间（秒）")
     max_retries: int = Field(default=3, ge=0, description="最大重试次数")
 
+    # 并发调度：后台任务（摘要等）只在没有交互请求排队时占用空闲并发
+    max_concurrency: int = Field(default=8, gt=0, description="同时进行的 LLM 调用数上限")
+    background_concurrency: int = Field(
+        default=1, ge=0, description="后台 LLM 任务最多占用的并发数"
+    )
+
     model_config = SettingsConfigDict(
         env_prefix="LLM_",
         env_file=".env",
@@ -147,6 +153,43 @@ class CheckpointerSettings(BaseSettings):
     # 检查点保存策略
     save_interval: int = Field(default=1, gt=0, description="检查点保存间隔（步数）")
     max_checkpoints: int = Field(default=10, gt=0, description="每个会话最大检查点数量")
+    base_interval: int = Field(
+        default=20, gt=0, description="增量检查点链长度上限（达到后写入完整快照）"
+    )
+
+    # 持久化模式：sync 每步同步写入；interval 累计 save_interval 步未落盘时同步一次；async 全部后台回写
+    durability_mode: Literal["async", "interval", "sync"] = Field(
+        default="sync", description="检查点持久化模式"
+    )
+    write_behind_max_pending: int = Field(
+        default=1000, gt=0, description="回写缓冲最多容纳的会话数"
+    )
+    write_behind_linger_ms: int = Field(
+        default=50, ge=0, description="回写聚合等待时间（毫秒）"
+    )
+
+    # 后台 GC：开启后写入路径不再裁剪，改由后台按 I/O 预算批量回收（仅 sqlite）
+    gc_enabled: bool = Field(default=False, description="是否启用后台检查点 GC")
+    gc_interval_seconds: float = Field(default=60.0, gt=0, description="GC 扫描间隔（秒）")
+    gc_batch_size: int = Field(default=100, gt=0, description="GC 每批处理的会话数 / 删除行数")
+    gc_max_rows_per_second: int = Field(
+        default=5000, gt=0, description="GC I/O 预算（每秒最多删除的行数）"
+    )
+    gc_vacuum_pages: int = Field(
+        default=256, ge=0, description="每轮 incremental_vacuum 最多归还的页数（0 表示关闭）"
+    )
+    gc_idle_ttl_seconds: Optional[int] = Field(
+        default=None, gt=0, description="会话闲置多久后由 GC 整体删除（秒），未设置时沿用 Redis session_ttl"
+    )
+
+    # 序列化配置
+    serializer: Literal["jsonplus", "compact"] = Field(
+        default="compact", description="检查点序列化器（compact 为 msgpack + zstd）"
+    )
+    compression_level: int = Field(default=3, ge=1, le=22, description="zstd 压缩级别")
+    zstd_dictionary_dir: Optional[str] = Field(
+        default=None, description="zstd 共享字典目录（*.zdict）"
+    )
 
     model_config = SettingsConfigDict(
         env_prefix="CHECKPOINT_",
@@ -161,7 +204,7 @@ class VectorStoreSettings(BaseSettings):
     """向量存储配置(用于 RAG)"""
 
     # 向量存储类型
-    vector_store_type: Literal["chroma", "faiss", "pinecone", "none"] = Field(
+    vector_store_type: Literal["chroma", "numpy", "faiss", "pinecone", "none"] = Field(
         default="chroma", description="向量存储类型"
     )
 
@@ -170,6 +213,19 @@ class VectorStoreSettings(BaseSettings):
         default="data/chroma", description="ChromaDB 持久化目录"
     )
 
+    # NumPy 向量索引配置（内存映射文件，适合中小规模语料）
+    numpy_persist_dir: str = Field(
+        default="data/vectors", description="NumPy 向量索引持久化目录"
+    )
+
+    # 向量量化：float16 / int8 扫描量化副本，再对候选做 float32 精确重排（仅 numpy）
+    quantization: Literal["none", "float16", "int8"] = Field(
+        default="none", description="向量扫描精度"
+    )
+    rerank_factor: int = Field(
+        default=4, ge=1, description="量化检索时参与精确重排的候选数（top_k 的倍数）"
+    )
+
     # Embedding 模型配置
     embedding_provider: Literal["openai", "huggingface"] = Field(
         default="openai", description="Embedding 提供商"
@@ -178,6 +234,36 @@ class VectorStoreSettings(BaseSettings):
         default="text-embedding-3-small", description="Embedding 模型名称"
     )
 
+    # Embedding 缓存：按 (模型, 文本) 内容哈希去重，并发未命中合并成批次调用
+    embedding_cache_enabled: bool = Field(default=True, description="是否启用 Embedding 缓存")
+    embedding_cache_path: Optional[str] = Field(
+        default="data/embeddings/cache.db", description="Embedding 持久化缓存（SQLite）路径"
+    )
+    embedding_cache_size: int = Field(default=10000, gt=0, description="内存 LRU 缓存的向量数")
+    embedding_batch_size: int = Field(default=256, gt=0, description="单次调用提供商的最大文本数")
+    embedding_batch_wait_ms: int = Field(default=5, ge=0, description="未命中合并等待时间（毫秒）")
+
+    # 文档导入：切分在进程池中执行，各阶段之间用有界队列连接
+    chunk_size: int = Field(default=800, gt=0, description="分块最大字符数")
+    chunk_overlap: int = Field(default=100, ge=0, description="相邻分块的重叠字符数")
+    ingest_workers: int = Field(default=4, ge=0, description="切分文档的进程数，0 表示不使用进程池")
+    ingest_queue_size: int = Field(default=8, gt=0, description="导入各阶段之间的队列容量")
+
+    # 混合检索：BM25 关键词检索与向量检索并行执行，RRF 融合
+    hybrid_search: bool = Field(default=False, description="是否启用 BM25 + 向量混合检索")
+    bm25_index_dir: str = Field(default="data/bm25", description="BM25 倒排索引目录")
+    bm25_k1: float = Field(default=1.2, gt=0.0, description="BM25 词频饱和参数 k1")
+    bm25_b: float = Field(default=0.75, ge=0.0, le=1.0, description="BM25 长度归一化参数 b")
+
+    # 上下文打包：token 预算为 LLM_MAX_TOKENS 的倍数，MMR 去冗余
+    context_budget_ratio: float = Field(
+        default=0.5, gt=0.0, description="RAG 上下文 token 预算占 LLM max_tokens 的比例"
+    )
+    mmr_lambda: float = Field(default=0.7, ge=0.0, le=1.0, description="MMR 中相关度的权重")
+    duplicate_threshold: float = Field(
+        default=0.95, gt=0.0, le=1.0, description="视为重复分块的余弦相似度"
+    )
+
     # 检索配置
     top_k: int = Field(default=5, gt=0, description="检索返回的 top-k 结果数")
     score_threshold: float = Field(
@@ -193,6 +279,58 @@ class VectorStoreSettings(BaseSettings):
     )
 
 
+class SummarySettings(BaseSettings):
+    """会话摘要配置（后台压缩历史对话）"""
+
+    enabled: bool = Field(default=True, description="是否启用后台会话摘要")
+    token_threshold: int = Field(
+        default=3000, gt=0, description="摘要与未摘要消息的 token 数超过该值时触发压缩"
+    )
+    keep_recent_tokens: int = Field(
+        default=1000, ge=0, description="压缩时原样保留的最近消息 token 数"
+    )
+    queue_size: int = Field(default=1000, gt=0, description="待摘要会话队列容量")
+
+    model_config = SettingsConfigDict(
+        env_prefix="SUMMARY_",
+        env_file=".env",
+        env_file_encoding="utf-8",
+        case_sensitive=False,
+        extra="ignore",
+    )
+
+
+class ToolSettings(BaseSettings):
+    """工具调用配置"""
+
+    default_timeout: float = Field(default=30.0, gt=0, description="单个工具调用的默认超时（秒）")
+    turn_timeout: float = Field(
+        default=60.0, gt=0, description="一轮工具调用的总截止时间（秒），超时后取消未完成的调用"
+    )
+    max_concurrency_per_tool: int = Field(
+        default=4, gt=0, description="同一工具同时执行的调用数上限（工具未单独声明时）"
+    )
+    thread_pool_size: int = Field(default=8, gt=0, description="执行同步（阻塞）工具的线程数")
+
+    # 结果缓存（CACHEABLE 工具的默认缓存时间为 RedisSettings.cache_ttl）
+    cache_max_entries: int = Field(default=10000, gt=0, description="进程内工具结果缓存的条目数")
+    cache_pure_ttl: int = Field(default=86400, gt=0, description="PURE 工具结果的缓存时间（秒）")
+    cache_bypass: bool = Field(default=False, description="跳过工具结果缓存（调试用）")
+
+    # CPU 密集工具的进程池沙箱
+    sandbox_workers: int = Field(default=2, gt=0, description="沙箱子进程数")
+    sandbox_cpu_time: float = Field(default=5.0, gt=0, description="单次沙箱调用的 CPU 时间限制（秒）")
+    sandbox_memory_mb: int = Field(default=512, gt=0, description="单次沙箱调用的内存增量限制（MB）")
+
+    model_config = SettingsConfigDict(
+        env_prefix="TOOL_",
+        env_file=".env",
+        env_file_encoding="utf-8",
+        case_sensitive=False,
+        extra="ignore",
+    )
+
+
 class APISettings(BaseSettings):
     """API 服务配置"""
 
@@ -200,6 +338,10 @@ class APISettings(BaseSettings):
     host: str = Field(default="0.0.0.0", description="服务监听地址")
     port: int = Field(default=8000, ge=1, le=65535, description="服务端口")
     workers: int = Field(default=1, gt=0, description="Worker 进程数")
+    preload: bool = Field(
+        default=True, description="多 worker 时在主进程中预加载资源后再 fork（写时复制共享）"
+    )
+    backlog: int = Field(default=2048, gt=0, description="监听队列长度")
 
     # 安全配置
     secret_key: str = Field(
@@ -219,6 +361,23 @@ class APISettings(BaseSettings):
     )
     request_timeout: int = Field(default=300, gt=0, description="请求超时时间（秒）")
 
+    # 准入控制
+    admission_control: bool = Field(default=True, description="是否启用准入控制")
+    max_concurrent_requests: int = Field(default=64, gt=0, description="每个 worker 同时处理的请求数")
+    max_queued_requests: int = Field(default=256, ge=0, description="每个 worker 的等待队列容量")
+
+    # 会话锁
+    session_lock_redis: bool = Field(
+        default=False, description="是否使用 Redis 租约锁在多个 worker 之间串行化同一会话"
+    )
+    session_lock_ttl: float = Field(default=30.0, gt=0, description="会话租约锁有效期（秒）")
+
+    # 流式输出
+    sse_coalesce_ms: float = Field(
+        default=10.0, ge=0, description="合并 token 事件的时间窗口（毫秒），0 表示逐 token 发送"
+    )
+    sse_max_chunk_chars: int = Field(default=256, gt=0, description="单个 token 事件最多合并的字符数")
+
     model_config = SettingsConfigDict(
         env_prefix="API_",
         env_file=".env",
@@ -251,6 +410,13 @@ class LogSettings(BaseSettings):
     rotation: str = Field(default="1 day", description="日志轮转周期")
     retention: str = Field(default="30 days", description="日志保留时间")
 
+    # 非阻塞写入
+    json_format: bool = Field(default=False, description="是否以 JSON 行格式输出")
+    queue_size: int = Field(default=10000, ge=1, description="日志队列容量，队列满时丢弃")
+    flush_interval_ms: int = Field(
+        default=500, ge=10, description="写线程空闲时检查轮转的间隔（毫秒）"
+    )
+
     model_config = SettingsConfigDict(
         env_prefix="LOG_",
         env_file=".env",
@@ -277,6 +443,21 @@ class MonitoringSettings(BaseSettings):
     prometheus_port: int = Field(
         default=9090, ge=1, le=65535, description="Prometheus 端口"
     )
+    prometheus_flush_interval: float = Field(
+        default=1.0, gt=0, description="多 worker 时各 worker 写指标快照的间隔（秒）"
+    )
+
+    # 单轮追踪 / 采样分析
+    trace_sample_rate: float = Field(
+        default=0.0, ge=0.0, le=1.0, description="追踪的轮次比例（0 表示只追踪请求强制开启的轮次）"
+    )
+    trace_profile_rate: float = Field(
+        default=0.0, ge=0.0, le=1.0, description="追踪的轮次中同时采样调用栈的比例"
+    )
+    trace_profile_interval_ms: float = Field(
+        default=5.0, gt=0, description="调用栈采样间隔（CPU 毫秒）"
+    )
+    trace_dir: str = Field(default="data/traces", description="Chrome trace 文件输出目录")
 
     model_config = SettingsConfigDict(
         env_prefix="MONITORING_",
@@ -304,6 +485,8 @@ class Settings(BaseSettings):
     database: DatabaseSettings = Field(default_factory=DatabaseSettings)
     checkpointer: CheckpointerSettings = Field(default_factory=CheckpointerSettings)
     vector_store: VectorStoreSettings = Field(default_factory=VectorStoreSettings)
+    summary: SummarySettings = Field(default_factory=SummarySettings)
+    tool: ToolSettings = Field(default_factory=ToolSettings)
     api: APISettings = Field(default_factory=APISettings)
     log: LogSettings = Field(default_factory=LogSettings)
     monitoring: MonitoringSettings = Field(default_factory=MonitoringSettings)
@@ -0,0 +1,117 @@
+"""
+BM25 倒排索引：建索引吞吐 / 磁盘占用 / 查询延迟
+
+合成语料：常用汉字按 Zipf 分布组成的句子，夹带英文单词和产品编号（如 SKU-3F21），
+模拟客服知识库的分块。分批写入 BM25Index（每 flush_every 条落一个段），报告：
+- 建索引吞吐（条/秒）、段数和索引目录大小
+- 重新打开索引的耗时（段文件 mmap 加载）
+- 中文短语查询与产品编号查询的 p50 / p99 延迟
+- 增量更新：在已有索引上追加 / 替换一批文档的耗时（不重建已有段）
+
+用法：
+    python scripts/benchmark_bm25.py --docs 100000
+    python scripts/benchmark_bm25.py --docs 1000000 --flush-every 50000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from src.memory import BM25Index  # noqa: E402
+
+# CJK 统一汉字中前 3000 个字作为字表，按 Zipf 分布抽样
+_CHARS = np.array([chr(0x4E00 + i) for i in range(3000)])
+_WORDS = np.array(["order", "refund", "account", "password", "invoice", "shipping", "login", "api"])
+
+
+def make_corpus(docs, length, seed):
+    rng = np.random.default_rng(seed)
+    ranks = np.minimum(rng.zipf(1.3, (docs, length)) - 1, len(_CHARS) - 1)
+    texts = []
+    for i, row in enumerate(_CHARS[ranks]):
+        text = "".join(row)
+        texts.append(f"{text} {_WORDS[i % len(_WORDS)]} SKU-{i % 9973:04X} {text[:8]}")
+    return texts
+
+
+def make_queries(count, seed):
+    rng = np.random.default_rng(seed + 1)
+    ranks = np.minimum(rng.zipf(1.3, (count, 4)) - 1, len(_CHARS) - 1)
+    phrases = ["".join(row) for row in _CHARS[ranks]]
+    codes = [f"SKU-{int(i):04X} 说明" for i in rng.integers(0, 9973, count)]
+    return phrases, codes
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def run_queries(label, index, queries, k):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, k)
+        latencies.append((time.perf_counter() - start) * 1e3)
+    print(f"{label:<10} | p50 {percentile(latencies, 0.5):7.2f} ms  p99 {percentile(latencies, 0.99):7.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="BM25 倒排索引基准测试")
+    parser.add_argument("--docs", type=int, default=100_000, help="语料分块数")
+    parser.add_argument("--length", type=int, default=120, help="每个分块的汉字数")
+    parser.add_argument("--flush-every", type=int, default=20_000, help="每个段的文档数")
+    parser.add_argument("--max-segments", type=int, default=8, help="段数上限")
+    parser.add_argument("--batch", type=int, default=5_000, help="每次 add 的文档数")
+    parser.add_argument("--queries", type=int, default=200, help="每类查询数")
+    parser.add_argument("--top-k", type=int, default=10, help="每次查询返回的结果数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.docs, args.length, args.seed)
+    phrases, codes = make_queries(args.queries, args.seed)
+    ids = [str(i) for i in range(args.docs)]
+    print(f"语料 {args.docs} 条 × {args.length} 字，段大小 {args.flush_every}，段数上限 {args.max_segments}\n")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "bm25")
+        index = BM25Index(path, flush_every=args.flush_every, max_segments=args.max_segments)
+        start = time.perf_counter()
+        for offset in range(0, args.docs, args.batch):
+            index.add(ids[offset:offset + args.batch], corpus[offset:offset + args.batch])
+        index.flush()
+        elapsed = time.perf_counter() - start
+        print(
+            f"建索引     | {args.docs / elapsed:9.0f} 条/秒  共 {elapsed:.1f} s"
+            f" | {index.segment_count} 段  {directory_size(path) / 2**20:.1f} MB"
+        )
+
+        start = time.perf_counter()
+        index = BM25Index(path, flush_every=args.flush_every, max_segments=args.max_segments)
+        print(f"重新打开   | {(time.perf_counter() - start) * 1e3:9.1f} ms")
+
+        run_queries("中文短语", index, phrases, args.top_k)
+        run_queries("产品编号", index, codes, args.top_k)
+
+        # 增量更新：一半替换已有文档，一半新增；替换只给旧段打删除标记
+        update = args.batch
+        update_ids = ids[:update // 2] + [f"new-{i}" for i in range(update - update // 2)]
+        start = time.perf_counter()
+        index.add(update_ids, corpus[-update:])
+        index.flush()
+        print(f"增量更新   | {update} 条 {(time.perf_counter() - start) * 1e3:9.1f} ms  共 {len(index)} 条")
+        run_queries("更新后", index, phrases, args.top_k)
+
+
+if __name__ == "__main__":
+    main()
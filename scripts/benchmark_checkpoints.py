@@ -0,0 +1,107 @@
+"""
+检查点存储基准测试：增量检查点 vs 完整快照
+
+模拟一段多轮对话（每轮 3 个图步骤，每步写一次检查点），对比：
+- 完整快照（base_interval=1，每步写完整状态）
+- 增量检查点（基线 + 增量）
+统计写入字节数、平均写入耗时和最新检查点的恢复延迟。
+
+用法：
+    python scripts/benchmark_checkpoints.py --turns 200
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+from langgraph.checkpoint.base import empty_checkpoint  # noqa: E402
+from langgraph.checkpoint.base.id import uuid6  # noqa: E402
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer  # noqa: E402
+
+from src.graph import DeltaSqliteSaver  # noqa: E402
+
+STEPS_PER_TURN = 3
+
+
+class CountingSerializer(JsonPlusSerializer):
+    """统计序列化输出字节数的序列化器"""
+
+    def __init__(self):
+        super().__init__()
+        self.bytes_written = 0
+
+    def dumps_typed(self, obj):
+        type_, data = super().dumps_typed(obj)
+        self.bytes_written += len(data)
+        return type_, data
+
+
+def run(label: str, turns: int, base_interval: int, max_checkpoints: int) -> None:
+    serde = CountingSerializer()
+    with tempfile.TemporaryDirectory() as tmp:
+        saver = DeltaSqliteSaver(
+            os.path.join(tmp, "cp.db"),
+            base_interval=base_interval,
+            max_checkpoints=max_checkpoints,
+            serde=serde,
+        )
+        config = {"configurable": {"thread_id": "bench", "checkpoint_ns": ""}}
+        messages = []
+        version = 0
+        put_times = []
+        for turn in range(turns):
+            for step in range(STEPS_PER_TURN):
+                version += 1
+                if step == 0:
+                    messages = messages + [HumanMessage(content=f"第 {turn} 轮用户提问：" + "请帮我查询一下明天北京的天气情况。" * 4)]
+                elif step == STEPS_PER_TURN - 1:
+                    messages = messages + [AIMessage(content=f"第 {turn} 轮回复：" + "明天北京多云转晴，气温 18 到 25 度。" * 8)]
+                checkpoint = empty_checkpoint()
+                checkpoint["id"] = str(uuid6())
+                checkpoint["channel_values"] = {"messages": messages, "intent": "query", "step": version}
+                checkpoint["channel_versions"] = {"messages": version, "intent": 1, "step": version}
+                start = time.perf_counter()
+                config = saver.put(
+                    config, checkpoint, {"step": version}, {"messages": version, "step": version}
+                )
+                put_times.append(time.perf_counter() - start)
+
+        restore = []
+        for _ in range(50):
+            start = time.perf_counter()
+            saver.get_tuple({"configurable": {"thread_id": "bench"}})
+            restore.append(time.perf_counter() - start)
+        file_size = sum(
+            os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp)
+        )
+        saver.close()
+
+    print(
+        f"{label:<22} | {serde.bytes_written / 1024 / 1024:>10.2f} MB | "
+        f"{statistics.mean(put_times) * 1e3:>8.3f} ms | "
+        f"{statistics.median(restore) * 1e3:>8.3f} ms | {file_size / 1024 / 1024:>8.2f} MB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="增量检查点基准测试")
+    parser.add_argument("--turns", type=int, default=200, help="对话轮数")
+    parser.add_argument("--max-checkpoints", type=int, default=10, help="每会话保留检查点数")
+    args = parser.parse_args()
+
+    print(f"对话轮数 {args.turns}，共 {args.turns * STEPS_PER_TURN} 个检查点\n")
+    print(f"{'模式':<20} | {'写入字节':>13} | {'平均写入':>11} | {'恢复延迟':>11} | {'文件大小':>8}")
+    print("-" * 82)
+    run("完整快照", args.turns, 1, args.max_checkpoints)
+    for interval in (10, 20, 50):
+        run(f"增量 base_interval={interval}", args.turns, interval, args.max_checkpoints)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+RAG 上下文打包：每次回答的上下文 token 数对比
+
+合成知识库：每篇文档按 split_text 切分（相邻分块有重叠），另有一部分文档存在
+只改动个别句子的近似副本（同一 FAQ 的多个版本）。Embedding 为本地的字符二元组
+哈希向量，近似重复的分块余弦相似度很高。对每个查询检索 top_k 个分块，比较：
+- 直接拼接：top_k 个分块原样拼成 {retrieved_context}
+- 打包：ContextPacker（预算 = max_tokens × context_budget_ratio，MMR 去冗余，相邻分块合并）
+输出每次回答的上下文 token 数（平均 / p95）、超出预算的比例、不同来源数和打包耗时。
+
+用法：
+    python scripts/benchmark_context_packing.py --docs 2000 --top-k 20 --max-tokens 4096
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+from src.memory import ContextPacker, NumpyVectorStore, estimate_tokens, split_text  # noqa: E402
+
+_CHARS = np.array([chr(0x4E00 + i) for i in range(3000)])
+
+
+class BigramEmbeddings(Embeddings):
+    """字符二元组哈希到固定维度的词袋向量"""
+
+    def __init__(self, dim=512):
+        self.dim = dim
+
+    def embed_query(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for i in range(len(text) - 1):
+            bucket = int.from_bytes(hashlib.md5(text[i:i + 2].encode("utf-8")).digest()[:4], "little")
+            vector[bucket % self.dim] += 1.0
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def make_corpus(docs, sentences, near_duplicates, seed):
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for i in range(docs):
+        ranks = np.minimum(rng.zipf(1.2, (sentences, 24)) - 1, len(_CHARS) - 1)
+        rows = ["".join(row) + "。" for row in _CHARS[ranks]]
+        corpus.append((f"doc-{i}.md", rows))
+        if rng.random() < near_duplicates:
+            variant = list(rows)
+            variant[int(rng.integers(0, sentences))] = "本条内容已更新。"
+            corpus.append((f"doc-{i}-v2.md", variant))
+    return corpus
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="上下文打包 token 数对比")
+    parser.add_argument("--docs", type=int, default=1000, help="文档数")
+    parser.add_argument("--sentences", type=int, default=30, help="每篇文档的句子数")
+    parser.add_argument("--near-duplicates", type=float, default=0.3, help="有近似副本的文档比例")
+    parser.add_argument("--chunk-size", type=int, default=300, help="分块字符数")
+    parser.add_argument("--chunk-overlap", type=int, default=50, help="分块重叠字符数")
+    parser.add_argument("--top-k", type=int, default=20, help="每次检索的分块数")
+    parser.add_argument("--max-tokens", type=int, default=4096, help="LLM max_tokens")
+    parser.add_argument("--budget-ratio", type=float, default=0.5, help="context_budget_ratio")
+    parser.add_argument("--queries", type=int, default=200, help="查询数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    store = NumpyVectorStore(BigramEmbeddings())
+    corpus = make_corpus(args.docs, args.sentences, args.near_duplicates, args.seed)
+    texts, metadatas = [], []
+    for source, rows in corpus:
+        for index, chunk in enumerate(split_text("".join(rows), args.chunk_size, args.chunk_overlap)):
+            texts.append(chunk)
+            metadatas.append({"source": source, "chunk": index})
+    ids = store.add_texts(texts, metadatas)
+    budget = int(args.max_tokens * args.budget_ratio)
+    packer = ContextPacker(budget)
+    print(f"语料 {len(corpus)} 篇 / {len(ids)} 个分块，top_k={args.top_k}，预算 {budget} tokens\n")
+
+    rng = np.random.default_rng(args.seed + 1)
+    naive, packed, over, sources, latencies = [], [], 0, [], []
+    for _ in range(args.queries):
+        _, rows = corpus[int(rng.integers(0, len(corpus)))]
+        query = "".join(rows[int(rng.integers(0, len(rows)))] for _ in range(2))
+        hits = store.similarity_search_with_score(query, k=args.top_k, score_threshold=-1.0)
+        documents = [doc for doc, _ in hits]
+        naive_tokens = estimate_tokens("\n\n".join(doc.page_content for doc in documents))
+        naive.append(naive_tokens)
+        over += naive_tokens > budget
+
+        start = time.perf_counter()
+        vectors = store.get_vectors([doc.id for doc in documents])
+        result = packer.pack(documents, [score for _, score in hits], vectors)
+        latencies.append((time.perf_counter() - start) * 1e3)
+        packed.append(result.tokens)
+        sources.append(len({c.source for c in result.citations}))
+
+    print(f"直接拼接 | 平均 {np.mean(naive):7.0f} tokens  p95 {percentile(naive, 0.95):6d} | 超出预算 {over / args.queries:.0%}")
+    packed_over = sum(tokens > budget for tokens in packed) / args.queries
+    print(f"打包     | 平均 {np.mean(packed):7.0f} tokens  p95 {percentile(packed, 0.95):6d} | 超出预算 {packed_over:.0%}")
+    print(f"打包后平均引用 {np.mean(sources):.1f} 个来源，打包耗时 p50 {percentile(latencies, 0.5):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
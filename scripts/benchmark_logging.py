@@ -0,0 +1,140 @@
+"""
+日志基准测试：单次日志调用在调用线程上的耗时
+
+对比三种配置下 logger.info("...", args) 的逐次耗时（p50 / p99 / 最大值）：
+- logging.FileHandler：调用线程格式化并写文件（每条 flush）
+- LogPipeline（文本格式）：调用线程只入队，后台线程批量写
+- LogPipeline（JSON 行格式）
+另外用 --slow-ms 模拟慢磁盘（每次 write 额外等待），对比同步写和队列写的调用耗时，
+以及队列写在 --queue-size 容量下丢弃的条数。
+
+用法：
+    python scripts/benchmark_logging.py
+    python scripts/benchmark_logging.py --count 200000 --slow-ms 5
+"""
+
+import argparse
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from src.utils import JsonFormatter, LogPipeline, RotatingFile  # noqa: E402
+
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class SlowFile(io.TextIOWrapper):
+    """每次 write 额外等待，模拟慢磁盘"""
+
+    delay = 0.0
+
+    def write(self, text):
+        time.sleep(self.delay)
+        return super().write(text)
+
+
+def slow_open(path, delay):
+    stream = SlowFile(open(path, "ab"), encoding="utf-8")
+    stream.delay = delay
+    return stream
+
+
+def measure(logger, count):
+    timings = np.empty(count)
+    clock = time.perf_counter_ns
+    for i in range(count):
+        start = clock()
+        logger.info("会话 %s 第 %d 轮完成，耗时 %.1f ms", "session-42", i, 12.5)
+        timings[i] = clock() - start
+    return timings / 1000
+
+
+def run(label, handler_or_pipeline, count, rows):
+    logger = logging.getLogger(f"bench.{len(rows)}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    pipeline = handler_or_pipeline if isinstance(handler_or_pipeline, LogPipeline) else None
+    logger.handlers = [pipeline.handler if pipeline else handler_or_pipeline]
+    if pipeline:
+        pipeline.start()
+    start = time.perf_counter()
+    timings = measure(logger, count)
+    elapsed = time.perf_counter() - start
+    if pipeline:
+        pipeline.stop()
+    else:
+        handler_or_pipeline.close()
+    dropped = pipeline.dropped if pipeline else 0
+    rows.append((label, timings, elapsed, dropped))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日志基准测试")
+    parser.add_argument("--count", type=int, default=50000, help="每种配置的日志条数")
+    parser.add_argument("--slow-ms", type=float, default=1.0, help="模拟慢磁盘时每次 write 的额外耗时（毫秒）")
+    parser.add_argument("--slow-count", type=int, default=2000, help="慢磁盘场景的日志条数")
+    parser.add_argument("--queue-size", type=int, default=10000, help="日志队列容量")
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = lambda name: os.path.join(tmp, name)  # noqa: E731
+
+        handler = logging.FileHandler(path("sync.log"), encoding="utf-8")
+        handler.setFormatter(logging.Formatter(FORMAT))
+        run("FileHandler", handler, args.count, rows)
+        run(
+            "队列（文本）",
+            LogPipeline(
+                logging.Formatter(FORMAT),
+                file=RotatingFile(path("queue.log"), "1 GB", "10 files"),
+                queue_size=args.queue_size,
+            ),
+            args.count,
+            rows,
+        )
+        run(
+            "队列（JSON）",
+            LogPipeline(
+                JsonFormatter(),
+                file=RotatingFile(path("json.log"), "1 GB", "10 files"),
+                queue_size=args.queue_size,
+            ),
+            args.count,
+            rows,
+        )
+
+        delay = args.slow_ms / 1000
+        handler = logging.StreamHandler(slow_open(path("slow-sync.log"), delay))
+        handler.setFormatter(logging.Formatter(FORMAT))
+        run("慢磁盘 FileHandler", handler, args.slow_count, rows)
+        run(
+            "慢磁盘 队列",
+            LogPipeline(
+                logging.Formatter(FORMAT),
+                stream=slow_open(path("slow-queue.log"), delay),
+                queue_size=args.queue_size,
+            ),
+            args.slow_count,
+            rows,
+        )
+
+    print(f"条数: {args.count}（慢磁盘 {args.slow_count}，每次 write +{args.slow_ms} ms）  队列容量: {args.queue_size}\n")
+    print(f"{'配置':<16} | {'p50':>8} | {'p99':>8} | {'最大':>9} | {'总耗时':>8} | {'丢弃':>5}")
+    print("-" * 72)
+    for label, timings, elapsed, dropped in rows:
+        print(
+            f"{label:<16} | {np.percentile(timings, 50):>5.2f} µs | {np.percentile(timings, 99):>5.2f} µs | "
+            f"{timings.max():>6.0f} µs | {elapsed:>6.2f} s | {dropped:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+消息历史查询基准测试
+
+向数据库写入约 100 万条消息，分布在历史长度不同的若干会话中，
+对比键集分页（keyset）与 OFFSET 分页在不同历史长度下的查询延迟。
+期望结果：keyset 查询延迟与历史长度无关，OFFSET 随历史长度线性增长。
+
+用法：
+    python scripts/benchmark_message_history.py
+    python scripts/benchmark_message_history.py --messages 100000 --db-url sqlite+aiosqlite:///data/bench.db
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, select  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from src.storage import (  # noqa: E402
+    ChatSession,
+    Message,
+    MessageRepository,
+    create_session_factory,
+    init_db,
+)
+
+# 各会话的历史长度，最后一个会话吸收剩余消息
+SESSION_LENGTHS = [100, 1_000, 10_000, 100_000]
+BATCH_SIZE = 10_000
+WINDOW = 20
+REPEAT = 50
+
+
+async def seed(engine, total: int) -> dict:
+    lengths = [n for n in SESSION_LENGTHS if n < total]
+    lengths.append(total - sum(lengths))
+    sessions = {f"bench-{n}": n for n in lengths}
+
+    async with engine.begin() as conn:
+        await conn.execute(insert(ChatSession), [{"id": sid} for sid in sessions])
+        for sid, n in sessions.items():
+            for start in range(1, n + 1, BATCH_SIZE):
+                end = min(start + BATCH_SIZE, n + 1)
+                await conn.execute(
+                    insert(Message),
+                    [
+                        {
+                            "session_id": sid,
+                            "seq": seq,
+                            "role": "user" if seq % 2 else "assistant",
+                            "content": f"message {seq} of {sid}",
+                            "token_count": 8,
+                        }
+                        for seq in range(start, end)
+                    ],
+                )
+    return sessions
+
+
+async def timed(coro_factory) -> float:
+    samples = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        await coro_factory()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(samples)
+
+
+async def run(total: int, db_url: str) -> None:
+    engine = create_async_engine(db_url)
+    await init_db(engine)
+    factory = create_session_factory(engine)
+    repo = MessageRepository(factory)
+
+    start = time.perf_counter()
+    sessions = await seed(engine, total)
+    print(f"写入 {total:,} 条消息耗时 {time.perf_counter() - start:.1f}s\n")
+
+    async def offset_last_window(sid: str, n: int):
+        stmt = (
+            select(Message)
+            .where(Message.session_id == sid)
+            .order_by(Message.seq.asc())
+            .offset(max(n - WINDOW, 0))
+            .limit(WINDOW)
+        )
+        async with factory() as db:
+            return list((await db.execute(stmt)).scalars())
+
+    header = f"{'历史长度':>10} | {'最近窗口 keyset':>16} | {'中部翻页 keyset':>16} | {'活动窗口':>10} | {'最近窗口 OFFSET':>16}"
+    print(header)
+    print("-" * len(header))
+    for sid, n in sessions.items():
+        recent = await timed(lambda: repo.get_recent(sid, WINDOW))
+        middle = await timed(lambda: repo.page_before(sid, n // 2, WINDOW))
+        window = await timed(
+            lambda: repo.get_active_window(sid, max_messages=WINDOW, max_tokens=120)
+        )
+        offset = await timed(lambda: offset_last_window(sid, n))
+        print(
+            f"{n:>12,} | {recent:>14.0f}µs | {middle:>14.0f}µs | {window:>8.0f}µs | {offset:>14.0f}µs"
+        )
+
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="消息历史查询基准测试")
+    parser.add_argument("--messages", type=int, default=1_000_000, help="写入的消息总数")
+    parser.add_argument(
+        "--db-url",
+        default="sqlite+aiosqlite:///data/bench_messages.db",
+        help="数据库连接 URL（需为空库）",
+    )
+    args = parser.parse_args()
+
+    if args.db_url.startswith("sqlite"):
+        path = args.db_url.split("///", 1)[1]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.exists(path):
+            os.remove(path)
+
+    asyncio.run(run(args.messages, args.db_url))
+
+
+if __name__ == "__main__":
+    main()
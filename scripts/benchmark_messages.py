@@ -0,0 +1,131 @@
+"""
+图状态消息表示基准测试
+
+模拟 --sessions 个并发会话、每个会话 --turns 条消息常驻内存，对比 LangChain
+BaseMessage 与 CompactMessage 的：
+- 每条消息的常驻内存（tracemalloc，不含消息文本本身）
+- 检查点序列化（JsonPlusSerializer / CompactSerializer）后每条消息的字节数
+- 每条消息的编码、解码耗时
+- 在 LLM 边界与 LangChain 消息互转的耗时
+
+用法：
+    python scripts/benchmark_messages.py
+    python scripts/benchmark_messages.py --sessions 10000 --turns 20
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer  # noqa: E402
+
+from src.graph import (  # noqa: E402
+    CompactSerializer,
+    from_langchain_messages,
+    to_langchain_messages,
+)
+
+QUESTIONS = [
+    "请帮我查询明天北京的天气，并推荐穿衣。",
+    "把这段话翻译成英文：今天的会议改到下午三点。",
+    "帮我算一下 1234 乘以 5678 等于多少？",
+]
+ANSWERS = [
+    "明天北京多云转晴，气温 18 到 25 度，建议穿薄外套。",
+    "The meeting today has been moved to 3 p.m.",
+    "1234 × 5678 = 7006652。",
+]
+
+
+def make_texts(sessions, turns):
+    """预先生成消息 ID 和文本，两种表示共享同一批字符串，内存对比只计消息对象本身"""
+    return [
+        [
+            (f"msg-{s}-{t}", f"[{s}-{t}] " + (QUESTIONS if t % 2 == 0 else ANSWERS)[(s + t) % 3])
+            for t in range(turns)
+        ]
+        for s in range(sessions)
+    ]
+
+
+def build_langchain(texts):
+    return [
+        [
+            (HumanMessage if t % 2 == 0 else AIMessage)(content=text, id=message_id)
+            for t, (message_id, text) in enumerate(session)
+        ]
+        for session in texts
+    ]
+
+
+def traced(build):
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def measure_serde(label, serde, states, count):
+    start = time.perf_counter()
+    encoded = [serde.dumps_typed(state) for state in states]
+    encode_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for blob in encoded:
+        serde.loads_typed(blob)
+    decode_time = time.perf_counter() - start
+    size = sum(len(data) for _, data in encoded)
+    print(
+        f"{label:<32} | {size / count:>8.1f} B | "
+        f"{encode_time / count * 1e6:>8.2f} µs | {decode_time / count * 1e6:>8.2f} µs"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图状态消息表示基准测试")
+    parser.add_argument("--sessions", type=int, default=10000, help="并发会话数")
+    parser.add_argument("--turns", type=int, default=20, help="每个会话的消息数")
+    parser.add_argument("--serde-sessions", type=int, default=1000, help="参与序列化测试的会话数")
+    args = parser.parse_args()
+
+    count = args.sessions * args.turns
+    texts = make_texts(args.sessions, args.turns)
+
+    print(f"会话数: {args.sessions}  每会话消息: {args.turns}  消息总数: {count}\n")
+    print(f"{'表示':<32} | {'常驻内存/条':>10} | {'总计':>10}")
+    print("-" * 60)
+    langchain, lc_bytes = traced(lambda: build_langchain(texts))
+    print(f"{'BaseMessage':<32} | {lc_bytes / count:>8.1f} B | {lc_bytes / 1e6:>7.1f} MB")
+    compact, compact_bytes = traced(lambda: [from_langchain_messages(s) for s in langchain])
+    print(f"{'CompactMessage':<32} | {compact_bytes / count:>8.1f} B | {compact_bytes / 1e6:>7.1f} MB")
+    print(f"节省: {(1 - compact_bytes / lc_bytes) * 100:.1f}%\n")
+
+    n = min(args.serde_sessions, args.sessions)
+    serde_count = n * args.turns
+    print(f"序列化（{n} 个会话状态）")
+    print(f"{'表示 / 序列化器':<32} | {'字节/条':>10} | {'编码/条':>11} | {'解码/条':>11}")
+    print("-" * 76)
+    for serde_label, serde in (("JsonPlus", JsonPlusSerializer()), ("Compact", CompactSerializer())):
+        for label, sessions in (("BaseMessage", langchain), ("CompactMessage", compact)):
+            states = [{"messages": messages, "intent": "query"} for messages in sessions[:n]]
+            measure_serde(f"{label} / {serde_label}", serde, states, serde_count)
+
+    print("\nLLM 边界转换")
+    start = time.perf_counter()
+    restored = [to_langchain_messages(messages) for messages in compact[:n]]
+    to_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for messages in restored:
+        from_langchain_messages(messages)
+    from_time = time.perf_counter() - start
+    print(f"CompactMessage → BaseMessage: {to_time / serde_count * 1e6:.2f} µs/条")
+    print(f"BaseMessage → CompactMessage: {from_time / serde_count * 1e6:.2f} µs/条")
+
+
+if __name__ == "__main__":
+    main()
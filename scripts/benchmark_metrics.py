@@ -0,0 +1,103 @@
+"""
+指标观测开销微基准
+
+对比每次观测在调用线程上的耗时（ns/次）：
+- prometheus_client：每次调用 labels(...) 查子指标 / 预绑定子指标
+- MetricsService：预绑定子指标（Histogram.observe、Counter.inc、LLMMetrics.observe）
+以及采集（生成 /metrics 文本）的耗时。--multiprocess 时再对比 prometheus_client
+多进程模式（PROMETHEUS_MULTIPROC_DIR，每次观测写 mmap 文件）的预绑定观测。
+
+用法：
+    python scripts/benchmark_metrics.py
+    python scripts/benchmark_metrics.py --number 1000000 --multiprocess
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prometheus_client  # noqa: E402
+from prometheus_client import CollectorRegistry, generate_latest  # noqa: E402
+
+from src.services import MetricsService  # noqa: E402
+
+# 多进程模式需要在导入 prometheus_client 之前设置环境变量，放到子进程中测
+_MULTIPROCESS_CODE = """
+import timeit
+from prometheus_client import CollectorRegistry, Counter, Histogram
+registry = CollectorRegistry()
+histogram = Histogram("node_seconds", "x", ["node"], registry=registry).labels("retrieve")
+counter = Counter("tokens", "x", ["provider", "direction"], registry=registry).labels("openai", "input")
+n = {number}
+baseline = timeit.timeit(lambda: None, number=n)
+print((timeit.timeit(lambda: histogram.observe(0.042), number=n) - baseline) / n * 1e9)
+print((timeit.timeit(lambda: counter.inc(12), number=n) - baseline) / n * 1e9)
+"""
+
+
+def per_call(func, number):
+    # 减去空 lambda 调用本身的开销
+    baseline = timeit.timeit(lambda: None, number=number)
+    return (timeit.timeit(func, number=number) - baseline) / number * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="指标观测开销微基准")
+    parser.add_argument("--number", type=int, default=300000, help="每项的观测次数")
+    parser.add_argument("--multiprocess", action="store_true", help="同时测 prometheus_client 多进程模式")
+    args = parser.parse_args()
+    n = args.number
+
+    registry = CollectorRegistry()
+    histogram = prometheus_client.Histogram("node_seconds", "x", ["node"], registry=registry)
+    counter = prometheus_client.Counter("tokens", "x", ["provider", "direction"], registry=registry)
+    bound_histogram = histogram.labels("retrieve")
+    bound_counter = counter.labels("openai", "input")
+
+    service = MetricsService()
+    node = service.node("retrieve")
+    llm = service.llm("openai")
+    tokens = service.llm_tokens.labels("openai", "input")
+    for i in range(20):
+        service.node(f"node{i}").observe(0.01)
+
+    rows = [
+        ("prometheus_client", "Histogram labels().observe", per_call(lambda: histogram.labels("retrieve").observe(0.042), n)),
+        ("prometheus_client", "Histogram 预绑定 observe", per_call(lambda: bound_histogram.observe(0.042), n)),
+        ("prometheus_client", "Counter 预绑定 inc", per_call(lambda: bound_counter.inc(12), n)),
+        ("MetricsService", "Histogram 预绑定 observe", per_call(lambda: node.observe(0.042), n)),
+        ("MetricsService", "Counter 预绑定 inc", per_call(lambda: tokens.inc(12), n)),
+        ("MetricsService", "LLMMetrics.observe（直方图+2 计数）", per_call(lambda: llm.observe(1.3, 800, 120), n)),
+    ]
+    if args.multiprocess:
+        with tempfile.TemporaryDirectory() as tmp:
+            output = subprocess.run(
+                [sys.executable, "-c", _MULTIPROCESS_CODE.format(number=n)],
+                env={**os.environ, "PROMETHEUS_MULTIPROC_DIR": tmp},
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.split()
+        rows.append(("prometheus_client 多进程", "Histogram 预绑定 observe", float(output[0])))
+        rows.append(("prometheus_client 多进程", "Counter 预绑定 inc", float(output[1])))
+
+    print(f"观测次数: {n}\n")
+    print(f"{'实现':<24} | {'操作':<34} | {'ns/次':>8}")
+    print("-" * 74)
+    for impl, op, ns in rows:
+        print(f"{impl:<24} | {op:<34} | {ns:>8.0f}")
+
+    collect_registry = CollectorRegistry(auto_describe=False)
+    collect_registry.register(service)
+    repeats = 200
+    elapsed = timeit.timeit(lambda: generate_latest(collect_registry), number=repeats) / repeats
+    print(f"\n采集 /metrics（{len(service.node_latency.children)} 个节点直方图）: {elapsed * 1000:.2f} ms/次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+多进程部署：主进程预加载后 fork 与每个 worker 自行加载对比
+
+在临时目录生成 NumPy 向量索引和 BM25 索引（合成中文文档，随机向量），分别以
+- 预加载：API_PRELOAD=true，主进程加载后 gc.freeze() 再 fork
+- 各自加载：API_PRELOAD=false，每个 worker 在 lifespan 中加载
+启动 python -m src.api，统计：
+- 首个请求成功的时间、所有 worker 都响应过的时间
+- 每个 worker 的 RSS、PSS（共享页按进程数分摊）和私有内存（/proc/<pid>/smaps_rollup）
+- 主进程 + 所有 worker 的 PSS 总和（即服务实际占用的物理内存）
+
+内存在每种模式收到 --requests 个请求后测量，此时 worker 中已经发生过垃圾回收。
+worker 会创建 Embedding 客户端（默认 OpenAI，只构造不请求，需要安装 langchain-openai）。
+
+用法：
+    python scripts/benchmark_prefork.py --docs 100000 --workers 4
+"""
+
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+from langchain_core.embeddings import DeterministicFakeEmbedding  # noqa: E402
+
+from src.memory import BM25Index, NumpyVectorStore  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_CHARS = np.array([chr(0x4E00 + i) for i in range(3000)])
+
+
+def build_indexes(root, docs, dim, seed):
+    rng = np.random.default_rng(seed)
+    store = NumpyVectorStore(DeterministicFakeEmbedding(size=dim), os.path.join(root, "vectors"))
+    bm25 = BM25Index(os.path.join(root, "bm25"))
+    batch = 10000
+    for start in range(0, docs, batch):
+        n = min(batch, docs - start)
+        ranks = np.minimum(rng.zipf(1.3, (n, 120)) - 1, len(_CHARS) - 1)
+        texts = ["".join(row) for row in _CHARS[ranks]]
+        ids = [f"doc-{start + i}" for i in range(n)]
+        metadatas = [{"source": f"file-{(start + i) // 20}.txt", "chunk": (start + i) % 20} for i in range(n)]
+        store.add_embeddings(texts, rng.standard_normal((n, dim), dtype=np.float32), metadatas, ids)
+        bm25.add(ids, texts)
+    bm25.flush()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def children_of(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def memory_of(pid):
+    """读取 smaps_rollup，返回 (RSS, PSS, 私有) MB"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":"):
+                values[parts[0][:-1]] = int(parts[1])
+    private = values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+    return values["Rss"] / 1024, values["Pss"] / 1024, private / 1024
+
+
+def run_mode(label, root, workers, preload, requests):
+    port = free_port()
+    env = dict(
+        os.environ,
+        API_HOST="127.0.0.1",
+        API_PORT=str(port),
+        API_WORKERS=str(workers),
+        API_PRELOAD="true" if preload else "false",
+        LOG_LEVEL="WARNING",
+        VECTOR_VECTOR_STORE_TYPE="numpy",
+        VECTOR_NUMPY_PERSIST_DIR=os.path.join(root, "vectors"),
+        VECTOR_HYBRID_SEARCH="true",
+        VECTOR_BM25_INDEX_DIR=os.path.join(root, "bm25"),
+        VECTOR_EMBEDDING_CACHE_PATH=os.path.join(root, "embedding_cache.db"),
+        DB_SQLITE_PATH=os.path.join(root, "chatbot.db"),
+    )
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    url = f"http://127.0.0.1:{port}/health"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "src.api"], cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        first = ready = None
+        pids = set()
+        deadline = time.monotonic() + 300
+        while len(pids) < workers and time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"服务启动失败 (code={proc.returncode})")
+            try:
+                response = httpx.get(url, headers={"Connection": "close"})
+            except httpx.TransportError:
+                time.sleep(0.02)
+                continue
+            pids.add(response.json()["pid"])
+            first = first or time.perf_counter() - start
+        ready = time.perf_counter() - start
+
+        with httpx.Client() as client:
+            for _ in range(requests):
+                client.get(url)
+
+        worker_pids = children_of(proc.pid)
+        stats = [memory_of(pid) for pid in worker_pids]
+        master = memory_of(proc.pid)
+        rss = sum(s[0] for s in stats) / len(stats)
+        pss = sum(s[1] for s in stats) / len(stats)
+        private = sum(s[2] for s in stats) / len(stats)
+        total = master[1] + sum(s[1] for s in stats)
+        print(
+            f"{label:<10} | {first:>7.2f} s | {ready:>7.2f} s | {rss:>8.1f} MB | "
+            f"{pss:>8.1f} MB | {private:>8.1f} MB | {total:>8.1f} MB"
+        )
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程预加载基准测试")
+    parser.add_argument("--docs", type=int, default=100000, help="索引文档数")
+    parser.add_argument("--dim", type=int, default=384, help="向量维度")
+    parser.add_argument("--workers", type=int, default=4, help="worker 进程数")
+    parser.add_argument("--requests", type=int, default=2000, help="测量内存前发送的请求数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        build_indexes(root, args.docs, args.dim, args.seed)
+        print(f"索引: {args.docs} 篇文档, dim={args.dim}，构建 {time.perf_counter() - start:.1f} 秒")
+        print(f"worker 数: {args.workers}  CPU: {os.cpu_count()}\n")
+        print(
+            f"{'模式':<8} | {'首个请求':>9} | {'全部就绪':>9} | {'RSS/worker':>11} | "
+            f"{'PSS/worker':>11} | {'私有/worker':>10} | {'PSS 总计':>9}"
+        )
+        print("-" * 92)
+        run_mode("预加载", root, args.workers, True, args.requests)
+        run_mode("各自加载", root, args.workers, False, args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+向量量化：recall@top_k / 内存 / 延迟报告
+
+在合成语料（带聚类结构，默认 1536 维，与 text-embedding-3-small 一致）上对比
+NumpyVectorStore 的 none / float16 / int8 存储：
+- 扫描内存：每次查询需要全量读取（即应常驻内存）的数据量
+- recall@top_k：以 float32 精确检索为基准
+- 单条查询 p50 / p99 延迟
+int8 / float16 额外给出不做精确重排（rerank_factor=1）时的召回率作为对照。
+
+用法：
+    python scripts/benchmark_quantization.py --docs 50000 --dim 1536
+    python scripts/benchmark_quantization.py --rerank-factor 8 --top-k 10
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+from src.memory import NumpyVectorStore  # noqa: E402
+
+
+class NoEmbeddings(Embeddings):
+    """基准测试直接使用向量检索，不调用 Embedding 模型"""
+
+    def embed_documents(self, texts):
+        raise NotImplementedError
+
+    def embed_query(self, text):
+        raise NotImplementedError
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def make_corpus(docs, dim, queries, clusters, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    corpus = centers[rng.integers(0, clusters, docs)]
+    corpus += 0.6 * rng.standard_normal((docs, dim)).astype(np.float32)
+    query_vectors = centers[rng.integers(0, clusters, queries)]
+    query_vectors += 0.6 * rng.standard_normal((queries, dim)).astype(np.float32)
+    return corpus, query_vectors
+
+
+def build(path, corpus, quantization, top_k, rerank_factor, batch):
+    store = NumpyVectorStore(
+        NoEmbeddings(), path, top_k=top_k, quantization=quantization, rerank_factor=rerank_factor
+    )
+    if not len(store):
+        texts = [str(i) for i in range(len(corpus))]
+        for start in range(0, len(corpus), batch):
+            store.add_embeddings(texts[start:start + batch], corpus[start:start + batch])
+    return store
+
+
+def run(label, store, queries, truth, top_k):
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = store.search_vectors(query)[0]
+        latencies.append((time.perf_counter() - start) * 1e3)
+        hits += len(expected & {i for i, _ in results})
+    print(
+        f"{label:<18} | {store.scan_bytes / 2**20:9.1f} MB | recall {hits / (top_k * len(queries)):.4f}"
+        f" | p50 {percentile(latencies, 0.5):7.2f} ms  p99 {percentile(latencies, 0.99):7.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="向量量化召回率 / 内存 / 延迟报告")
+    parser.add_argument("--docs", type=int, default=20_000, help="语料向量数")
+    parser.add_argument("--dim", type=int, default=1536, help="向量维度")
+    parser.add_argument("--queries", type=int, default=200, help="查询数")
+    parser.add_argument("--clusters", type=int, default=256, help="合成语料的簇数")
+    parser.add_argument("--top-k", type=int, default=5, help="每次查询返回的结果数")
+    parser.add_argument("--rerank-factor", type=int, default=4, help="精确重排候选倍数")
+    parser.add_argument("--batch", type=int, default=5_000, help="写入批大小")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    corpus, queries = make_corpus(args.docs, args.dim, args.queries, args.clusters, args.seed)
+    print(f"语料 {args.docs} 条 × {args.dim} 维，查询 {args.queries} 条，top_k={args.top_k}\n")
+    print(f"{'存储':<16} | {'扫描内存':>8} | {'召回率':>11} | 延迟")
+    print("-" * 74)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "index")
+        exact = build(path, corpus, "none", args.top_k, 1, args.batch)
+        truth = [{i for i, _ in hits} for hits in exact.search_vectors(queries)]
+        run("float32", exact, queries, truth, args.top_k)
+
+        # 同一份 float32 文件上启用量化，量化副本在首次打开时生成
+        for quantization in ("float16", "int8"):
+            store = build(path, corpus, quantization, args.top_k, args.rerank_factor, args.batch)
+            run(f"{quantization} + 重排", store, queries, truth, args.top_k)
+            store.rerank_factor = 1
+            run(f"{quantization} 无重排", store, queries, truth, args.top_k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Redis 与 SQLite 检查点存储延迟对比
+
+模拟多个会话的多轮对话，分别统计 put / get_tuple 的 p50 / p99 延迟。
+Redis 连接参数取自 RedisSettings（REDIS_HOST 等环境变量或 .env）。
+
+用法：
+    python scripts/benchmark_redis_checkpointer.py --threads 50 --steps 30
+    python scripts/benchmark_redis_checkpointer.py --fakeredis   # 无 Redis 时仅做冒烟测试
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+from langgraph.checkpoint.base import empty_checkpoint  # noqa: E402
+from langgraph.checkpoint.base.id import uuid6  # noqa: E402
+
+from config.settings import CheckpointerSettings, RedisSettings  # noqa: E402
+from src.graph import DeltaSqliteSaver, RedisSaver  # noqa: E402
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def run(label, saver, threads, steps):
+    put_times, get_times = [], []
+    for t in range(threads):
+        config = {"configurable": {"thread_id": f"bench-{t}", "checkpoint_ns": ""}}
+        messages = []
+        for step in range(steps):
+            cls = HumanMessage if step % 2 == 0 else AIMessage
+            messages = messages + [cls(content=f"第 {step} 条消息：" + "今天天气怎么样？" * 6)]
+            checkpoint = empty_checkpoint()
+            checkpoint["id"] = str(uuid6())
+            checkpoint["channel_values"] = {"messages": messages, "step": step}
+            checkpoint["channel_versions"] = {"messages": step + 1, "step": step + 1}
+
+            start = time.perf_counter()
+            config = saver.put(config, checkpoint, {"step": step}, {"messages": step + 1, "step": step + 1})
+            put_times.append((time.perf_counter() - start) * 1e3)
+
+            start = time.perf_counter()
+            saver.get_tuple({"configurable": {"thread_id": f"bench-{t}"}})
+            get_times.append((time.perf_counter() - start) * 1e3)
+
+    print(
+        f"{label:<10} | put p50 {percentile(put_times, 0.5):7.3f} ms  p99 {percentile(put_times, 0.99):7.3f} ms"
+        f" | get p50 {percentile(get_times, 0.5):7.3f} ms  p99 {percentile(get_times, 0.99):7.3f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Redis / SQLite 检查点延迟对比")
+    parser.add_argument("--threads", type=int, default=50, help="会话数")
+    parser.add_argument("--steps", type=int, default=30, help="每个会话的步骤数")
+    parser.add_argument("--fakeredis", action="store_true", help="使用进程内 fakeredis（仅冒烟测试）")
+    args = parser.parse_args()
+
+    cp_settings = CheckpointerSettings()
+    redis_settings = RedisSettings()
+    if args.fakeredis:
+        import fakeredis
+
+        redis_saver = RedisSaver(
+            fakeredis.FakeRedis(),
+            max_checkpoints=cp_settings.max_checkpoints,
+            ttl=redis_settings.session_ttl,
+            key_prefix="bench-checkpoint",
+        )
+    else:
+        redis_saver = RedisSaver.from_settings(redis_settings, cp_settings, key_prefix="bench-checkpoint")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_saver = DeltaSqliteSaver(
+            os.path.join(tmp, "cp.db"),
+            base_interval=cp_settings.base_interval,
+            max_checkpoints=cp_settings.max_checkpoints,
+        )
+        run("sqlite", sqlite_saver, args.threads, args.steps)
+        sqlite_saver.close()
+
+    run("redis", redis_saver, args.threads, args.steps)
+    for t in range(args.threads):
+        redis_saver.delete_thread(f"bench-{t}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+响应编码基准测试
+
+JSON：对聊天响应和会话列表两种负载，比较每个响应的序列化 CPU 时间：
+- FastAPI 默认：jsonable_encoder + 标准库 json（starlette JSONResponse）
+- orjson + jsonable_encoder：默认响应类换成 JSONResponse，路由返回普通对象
+- orjson 直接返回：路由直接返回 JSONResponse(...)，跳过 jsonable_encoder
+
+SSE：
+- 逐 token 编码：f-string + json.dumps 与预编码 token_event 的事件/秒
+- 端到端：通过 ASGI 流式读取 --tokens 个 token（模拟 LLM 每 --burst 个 token 一批、
+  批间隔 --gap-ms），比较不合并与合并窗口 --window-ms 下的帧数、CPU 时间和 token/秒
+
+用法：
+    python scripts/benchmark_responses.py
+    python scripts/benchmark_responses.py --tokens 50000 --window-ms 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from starlette.responses import JSONResponse as StdJSONResponse  # noqa: E402
+
+from src.api import JSONResponse, stream_tokens, token_event  # noqa: E402
+
+
+def chat_payload():
+    return {
+        "session_id": "3f2a9c1e-session",
+        "message": {
+            "role": "assistant",
+            "content": "明天北京多云转晴，气温 18 到 25 度，建议穿薄外套。" * 8,
+            "created_at": datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc),
+        },
+        "citations": [
+            {"index": i, "source": f"docs/weather-{i}.md", "chunks": [i, i + 1], "score": 0.9 - i * 0.1}
+            for i in range(5)
+        ],
+        "usage": {"prompt_tokens": 1824, "completion_tokens": 96},
+    }
+
+
+def listing_payload():
+    base = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    return {
+        "items": [
+            {
+                "id": f"session-{i:04d}",
+                "title": f"关于第 {i} 个问题的对话",
+                "user_id": "user-1",
+                "created_at": base + timedelta(minutes=i),
+                "updated_at": base + timedelta(minutes=i, seconds=30),
+                "message_count": i % 50,
+            }
+            for i in range(100)
+        ],
+        "next_cursor": "session-0100",
+    }
+
+
+def cpu_per_call(fn, iterations):
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def bench_json(iterations):
+    print(f"{'负载':<10} | {'FastAPI 默认':>12} | {'orjson+encoder':>14} | {'orjson 直接':>11}")
+    print("-" * 60)
+    for name, payload in (("聊天响应", chat_payload()), ("会话列表", listing_payload())):
+        default = cpu_per_call(lambda: StdJSONResponse(jsonable_encoder(payload)).body, iterations)
+        encoder = cpu_per_call(lambda: JSONResponse(jsonable_encoder(payload)).body, iterations)
+        direct = cpu_per_call(lambda: JSONResponse(payload).body, iterations)
+        print(f"{name:<10} | {default:>9.1f} µs | {encoder:>11.1f} µs | {direct:>8.1f} µs")
+
+
+def bench_sse_encoding(count):
+    tokens = [f"词{i % 100}" for i in range(count)]
+
+    def naive(text):
+        return f"data: {json.dumps({'type': 'token', 'content': text}, ensure_ascii=False)}\n\n".encode()
+
+    print()
+    for name, encode in (("f-string + json.dumps", naive), ("token_event", token_event)):
+        start = time.process_time()
+        for text in tokens:
+            encode(text)
+        elapsed = time.process_time() - start
+        print(f"{name:<22} | {count / elapsed:>12,.0f} 事件/秒")
+
+
+async def bench_sse_stream(total, burst, gap, window, max_chars):
+    async def tokens():
+        for i in range(total):
+            if i % burst == 0 and gap:
+                await asyncio.sleep(gap)
+            yield f"词{i % 100}"
+
+    app = FastAPI()
+
+    @app.get("/stream")
+    async def stream():
+        return stream_tokens(tokens(), window=window, max_chars=max_chars)
+
+    frames = 0
+    cpu = time.process_time()
+    start = time.perf_counter()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async with client.stream("GET", "/stream") as response:
+            async for chunk in response.aiter_bytes():
+                frames += chunk.count(b"\n\n")
+    elapsed = time.perf_counter() - start
+    return frames, time.process_time() - cpu, total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="响应编码基准测试")
+    parser.add_argument("--iterations", type=int, default=5000, help="每种 JSON 编码的重复次数")
+    parser.add_argument("--tokens", type=int, default=20000, help="SSE token 数")
+    parser.add_argument("--burst", type=int, default=8, help="模拟 LLM 每批输出的 token 数")
+    parser.add_argument("--gap-ms", type=float, default=2.0, help="模拟 LLM 批间隔（毫秒）")
+    parser.add_argument("--window-ms", type=float, default=10.0, help="合并窗口（毫秒）")
+    parser.add_argument("--max-chars", type=int, default=256, help="单个事件最多合并的字符数")
+    args = parser.parse_args()
+
+    bench_json(args.iterations)
+    bench_sse_encoding(args.tokens * 10)
+
+    print(f"\nSSE 端到端：{args.tokens} 个 token，每 {args.burst} 个一批，批间隔 {args.gap_ms} ms")
+    print(f"{'模式':<16} | {'帧数':>7} | {'CPU':>8} | {'token/秒':>10}")
+    print("-" * 52)
+    for label, window in (("逐 token", 0.0), (f"合并 {args.window_ms:g} ms", args.window_ms / 1000)):
+        frames, cpu, rate = asyncio.run(
+            bench_sse_stream(args.tokens, args.burst, args.gap_ms / 1000, window, args.max_chars)
+        )
+        print(f"{label:<16} | {frames:>7} | {cpu:>6.2f} s | {rate:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+多查询检索：顺序检索与并发融合检索的延迟对比
+
+模拟 RAG_QUERY_GENERATION 生成的 1-3 个查询：
+- 顺序：逐个 embed_query + 向量检索
+- 融合：FusionRetriever 一次批量 Embedding + 一次批量检索 + RRF
+Embedding 提供商用带固定网络延迟的本地假实现代替，语料为 NumpyVectorStore 合成数据。
+输出总延迟的 p50 / p99 和各阶段（embed / search / fuse）平均耗时。
+
+用法：
+    python scripts/benchmark_retrieval.py --docs 50000 --queries 3 --embed-latency-ms 40
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+from src.memory import FusionRetriever, NumpyVectorStore  # noqa: E402
+
+
+class LatencyEmbeddings(Embeddings):
+    """按文本哈希生成确定性向量，每次调用模拟一次网络往返"""
+
+    def __init__(self, dim, latency):
+        self.dim = dim
+        self.latency = latency
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        return np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32).tolist()
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def sequential(store, queries, top_k):
+    timings = {"embed": 0.0, "search": 0.0, "fuse": 0.0}
+    merged = {}
+    for query in queries:
+        start = time.perf_counter()
+        vector = store.embeddings.embed_query(query)
+        embedded = time.perf_counter()
+        hits = store.similarity_search_by_vector_with_score(vector, top_k)
+        searched = time.perf_counter()
+        for doc, score in hits:
+            merged[doc.id] = max(score, merged.get(doc.id, -1.0))
+        timings["embed"] += (embedded - start) * 1e3
+        timings["search"] += (searched - embedded) * 1e3
+        timings["fuse"] += (time.perf_counter() - searched) * 1e3
+    timings["total"] = sum(timings.values())
+    return timings
+
+
+def report(label, runs):
+    totals = [t["total"] for t in runs]
+    stages = "  ".join(
+        f"{stage} {sum(t[stage] for t in runs) / len(runs):7.2f}" for stage in ("embed", "search", "fuse")
+    )
+    print(
+        f"{label:<6} | p50 {percentile(totals, 0.5):7.2f} ms  p99 {percentile(totals, 0.99):7.2f} ms"
+        f" | 平均 {stages} (ms)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="顺序检索与并发融合检索对比")
+    parser.add_argument("--docs", type=int, default=50_000, help="语料向量数")
+    parser.add_argument("--dim", type=int, default=384, help="向量维度")
+    parser.add_argument("--queries", type=int, default=3, help="每个问题的检索查询数")
+    parser.add_argument("--rounds", type=int, default=50, help="重复次数")
+    parser.add_argument("--top-k", type=int, default=5, help="返回结果数")
+    parser.add_argument("--embed-latency-ms", type=float, default=40, help="每次 Embedding 调用的网络延迟")
+    args = parser.parse_args()
+
+    embedding = LatencyEmbeddings(args.dim, args.embed_latency_ms / 1000)
+    store = NumpyVectorStore(embedding, top_k=args.top_k)
+    rng = np.random.default_rng(0)
+    corpus = rng.standard_normal((args.docs, args.dim)).astype(np.float32)
+    store.add_embeddings([f"doc-{i}" for i in range(args.docs)], corpus, ids=[str(i) for i in range(args.docs)])
+    retriever = FusionRetriever(store, top_k=args.top_k)
+
+    print(
+        f"语料 {args.docs} 条 × {args.dim} 维，每轮 {args.queries} 个查询，"
+        f"Embedding 延迟 {args.embed_latency_ms} ms，{args.rounds} 轮\n"
+    )
+    seq_runs, fused_runs = [], []
+    for r in range(args.rounds):
+        queries = [f"问题 {r} 的检索查询 {i}" for i in range(args.queries)]
+        seq_runs.append(sequential(store, queries, args.top_k))
+        fused_runs.append(retriever.retrieve(queries).timings)
+    report("顺序", seq_runs)
+    report("融合", fused_runs)
+    retriever.close()
+
+
+if __name__ == "__main__":
+    main()
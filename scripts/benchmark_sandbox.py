@@ -0,0 +1,124 @@
+"""
+进程池沙箱基准测试：CPU 密集计算对事件循环延迟的影响
+
+事件循环上运行一个探针：每 --tick-ms 毫秒醒来一次，记录实际醒来时间比预期晚了多少
+（事件循环延迟）。同时按 --rate 次/秒提交计算器工具调用（默认 factorial(60000)，
+单次约数十毫秒的纯 CPU 计算），分别：
+- 直接在事件循环中执行
+- 在线程池中执行（asyncio.to_thread，仍然受 GIL 限制）
+- 在 ProcessSandbox 中执行
+统计事件循环延迟的 p50 / p99 / 最大值、计算调用的平均耗时，以及空载时的延迟作为基线。
+另外测量 --array-mb 大小的数组参数经 pickle 与经共享内存传给子进程的耗时。
+
+用法：
+    python scripts/benchmark_sandbox.py
+    python scripts/benchmark_sandbox.py --expression "factorial(100000)" --rate 2 --duration 10
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from src.tools import ProcessSandbox, calculate  # noqa: E402
+
+
+def checksum(values):
+    return float(values[::4096].sum())
+
+
+async def probe(tick, stop, lags):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + tick
+        await asyncio.sleep(tick)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def run_mode(mode, sandbox, args):
+    lags, durations = [], []
+    stop = asyncio.Event()
+    tick = args.tick_ms / 1000
+    probe_task = asyncio.create_task(probe(tick, stop, lags))
+
+    async def one():
+        start = time.perf_counter()
+        if mode == "inline":
+            calculate(args.expression)
+        elif mode == "thread":
+            await asyncio.to_thread(calculate, args.expression)
+        else:
+            await sandbox.run(calculate, args.expression)
+        durations.append(time.perf_counter() - start)
+
+    tasks = []
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() < deadline:
+        if mode != "idle":
+            tasks.append(asyncio.create_task(one()))
+        await asyncio.sleep(1 / args.rate)
+    await asyncio.gather(*tasks)
+    stop.set()
+    await probe_task
+    lag = np.array(lags) * 1000
+    mean = np.mean(durations) * 1000 if durations else 0.0
+    return np.percentile(lag, 50), np.percentile(lag, 99), lag.max(), mean, len(durations)
+
+
+async def main_async(args):
+    sandbox = ProcessSandbox(args.workers, cpu_time=30, memory_mb=1024)
+    start = time.perf_counter()
+    await sandbox.start()
+    print(f"沙箱预热: {args.workers} 个子进程 {time.perf_counter() - start:.2f} 秒  CPU: {os.cpu_count()}")
+    print(f"表达式: {args.expression}  速率: {args.rate} 次/秒  时长: {args.duration:.0f} 秒\n")
+    print(f"{'模式':<8} | {'延迟 p50':>9} | {'延迟 p99':>9} | {'最大延迟':>9} | {'计算耗时':>9} | {'调用数':>5}")
+    print("-" * 70)
+    labels = {"idle": "空载", "inline": "事件循环内", "thread": "线程池", "sandbox": "进程沙箱"}
+    try:
+        for mode in ("idle", "inline", "thread", "sandbox"):
+            p50, p99, worst, mean, calls = await run_mode(mode, sandbox, args)
+            print(
+                f"{labels[mode]:<8} | {p50:>6.2f} ms | {p99:>6.2f} ms | {worst:>6.1f} ms | "
+                f"{mean:>6.1f} ms | {calls:>7}"
+            )
+
+        values = np.random.default_rng(0).standard_normal(args.array_mb * 1024 * 1024 // 8)
+        print(f"\n数组参数 {args.array_mb} MB：")
+        for label, threshold in (("pickle", 1 << 62), ("共享内存", 1 << 16)):
+            sandbox.shm_threshold = threshold
+            await sandbox.run(checksum, values)
+            start = time.perf_counter()
+            for _ in range(args.array_repeats):
+                await sandbox.run(checksum, values)
+            elapsed = (time.perf_counter() - start) / args.array_repeats * 1000
+            print(f"  {label:<8} {elapsed:>8.1f} ms/次")
+        with sandbox.shared_array(values.shape, values.dtype) as shared:
+            shared.array[:] = values
+            start = time.perf_counter()
+            for _ in range(args.array_repeats):
+                await sandbox.run(checksum, shared)
+            elapsed = (time.perf_counter() - start) / args.array_repeats * 1000
+            print(f"  {'预分配共享内存':<6} {elapsed:>6.1f} ms/次")
+    finally:
+        await sandbox.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="进程池沙箱基准测试")
+    parser.add_argument("--expression", default="factorial(60000)", help="计算器表达式")
+    parser.add_argument("--rate", type=float, default=4.0, help="每秒提交的计算数")
+    parser.add_argument("--duration", type=float, default=5.0, help="每种模式的时长（秒）")
+    parser.add_argument("--workers", type=int, default=2, help="沙箱子进程数")
+    parser.add_argument("--tick-ms", type=float, default=5.0, help="事件循环探针间隔（毫秒）")
+    parser.add_argument("--array-mb", type=int, default=64, help="数组参数大小（MB）")
+    parser.add_argument("--array-repeats", type=int, default=10)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+检查点序列化基准测试
+
+用录制的会话（默认 tests/fixtures/sample_sessions.json）重放每一步的检查点状态，
+对比 JsonPlusSerializer 与 CompactSerializer（无字典 / 共享字典）的：
+- 编码、解码耗时
+- 序列化后字节数与压缩比
+
+共享字典在前一半会话上训练，在后一半会话上评估，避免过拟合。
+
+用法：
+    python scripts/benchmark_serde.py
+    python scripts/benchmark_serde.py --sessions path/to/sessions.json --level 6
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage  # noqa: E402
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer  # noqa: E402
+
+from src.graph import CompactSerializer, train_dictionary  # noqa: E402
+
+DEFAULT_SESSIONS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "tests",
+    "fixtures",
+    "sample_sessions.json",
+)
+
+
+def to_message(index: int, item: dict):
+    if item["role"] == "user":
+        return HumanMessage(content=item["content"])
+    if item["role"] == "tool":
+        return ToolMessage(content=item["content"], tool_call_id=f"call-{index}")
+    return AIMessage(content=item["content"])
+
+
+def replay_states(sessions):
+    """把每个会话展开为逐步增长的检查点状态"""
+    states = []
+    for session in sessions:
+        messages = []
+        for i, item in enumerate(session["messages"]):
+            messages.append(to_message(i, item))
+            states.append(
+                {
+                    "messages": list(messages),
+                    "user_input": session["messages"][i]["content"],
+                    "intent": "query",
+                    "metadata": {"session_id": session["session_id"], "step": i},
+                }
+            )
+    return states
+
+
+def measure(label, serde, states, baseline_bytes):
+    encoded = []
+    start = time.perf_counter()
+    for state in states:
+        encoded.append(serde.dumps_typed(state))
+    encode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for blob in encoded:
+        serde.loads_typed(blob)
+    decode_time = time.perf_counter() - start
+
+    size = sum(len(data) for _, data in encoded)
+    ratio = baseline_bytes / size if baseline_bytes else 1.0
+    print(
+        f"{label:<22} | {size / 1024:>10.1f} KB | {ratio:>6.2f}x | "
+        f"{encode_time / len(states) * 1e6:>8.1f} µs | {decode_time / len(states) * 1e6:>8.1f} µs"
+    )
+    return size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="检查点序列化基准测试")
+    parser.add_argument("--sessions", default=DEFAULT_SESSIONS, help="录制会话 JSON 文件")
+    parser.add_argument("--level", type=int, default=3, help="zstd 压缩级别")
+    parser.add_argument("--dict-size", type=int, default=32 * 1024, help="共享字典大小（字节）")
+    args = parser.parse_args()
+
+    with open(args.sessions, encoding="utf-8") as f:
+        sessions = json.load(f)
+    half = max(1, len(sessions) // 2)
+    train_states = replay_states(sessions[:half])
+    eval_states = replay_states(sessions[half:]) or train_states
+
+    jsonplus = JsonPlusSerializer()
+    dictionary = train_dictionary(
+        (jsonplus.dumps_typed(state)[1] for state in train_states), dict_size=args.dict_size
+    )
+
+    print(f"评估检查点 {len(eval_states)} 个（训练 {len(train_states)} 个）\n")
+    print(f"{'序列化器':<18} | {'总字节':>13} | {'压缩比':>5} | {'编码/个':>9} | {'解码/个':>9}")
+    print("-" * 74)
+    baseline = measure("jsonplus (msgpack)", jsonplus, eval_states, 0)
+    measure("compact", CompactSerializer(level=args.level), eval_states, baseline)
+    measure(
+        "compact + 字典",
+        CompactSerializer(level=args.level, dictionary=dictionary),
+        eval_states,
+        baseline,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+会话锁基准测试：全局锁与按会话加锁的吞吐对比
+
+每个请求在锁内读取会话计数、等待 --hold-ms（模拟读写检查点的 I/O）、写回 +1。
+分别用全局 asyncio.Lock、SessionLockManager（进程内）和 SessionLockManager
+（两个"worker"共享 Redis 租约，默认 fakeredis，可用 --redis-url 指定真实 Redis）
+在不同会话数下跑 --requests 个并发请求，统计吞吐和丢失的更新数。
+
+用法：
+    python scripts/benchmark_session_lock.py
+    python scripts/benchmark_session_lock.py --sessions 1,4,16,64 --hold-ms 5 --redis-url redis://localhost:6379/0
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.storage import SessionLockManager  # noqa: E402
+
+
+class GlobalLock:
+    """对照组：所有会话共用一把锁"""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def lock(self, session_id):
+        async with self._lock:
+            yield
+
+
+async def run(managers, sessions, requests, hold):
+    counters = {}
+
+    async def request(i):
+        session_id = f"s{i % sessions}"
+        async with managers[i % len(managers)].lock(session_id):
+            value = counters.get(session_id, 0)
+            await asyncio.sleep(hold)
+            counters[session_id] = value + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(request(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    return requests / elapsed, requests - sum(counters.values())
+
+
+def redis_clients(url):
+    if url:
+        import redis.asyncio as aioredis
+
+        return aioredis.from_url(url), aioredis.from_url(url)
+    import fakeredis
+
+    server = fakeredis.FakeServer()
+    return fakeredis.FakeAsyncRedis(server=server), fakeredis.FakeAsyncRedis(server=server)
+
+
+async def main_async(args):
+    session_counts = [int(s) for s in args.sessions.split(",")]
+    hold = args.hold_ms / 1000
+    first, second = redis_clients(args.redis_url)
+    modes = {
+        "全局锁": lambda: [GlobalLock()],
+        "会话锁": lambda: [SessionLockManager()],
+        "会话锁+Redis": lambda: [
+            SessionLockManager(first, poll_interval=0.001),
+            SessionLockManager(second, poll_interval=0.001),
+        ],
+    }
+    print(f"请求数: {args.requests}  锁内耗时: {args.hold_ms} ms  理论单会话上限: {1000 / args.hold_ms:.0f} 请求/秒\n")
+    header = " | ".join(f"{name:>16}" for name in modes)
+    print(f"{'会话数':>6} | {header}")
+    print("-" * (9 + 19 * len(modes)))
+    for sessions in session_counts:
+        cells = []
+        for factory in modes.values():
+            throughput, lost = await run(factory(), sessions, args.requests, hold)
+            cells.append(f"{throughput:>9.0f}/s 丢失{lost:<2d}")
+        print(f"{sessions:>6} | " + " | ".join(f"{c:>16}" for c in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="会话锁基准测试")
+    parser.add_argument("--sessions", default="1,2,4,8,16,32,64", help="会话数列表（逗号分隔）")
+    parser.add_argument("--requests", type=int, default=2000, help="每轮并发请求数")
+    parser.add_argument("--hold-ms", type=float, default=5.0, help="锁内耗时（毫秒）")
+    parser.add_argument("--redis-url", default=None, help="真实 Redis 地址，默认使用 fakeredis")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
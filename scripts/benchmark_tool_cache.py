@@ -0,0 +1,144 @@
+"""
+工具结果缓存基准测试：重复调用下的下游调用次数、延迟和命中率
+
+模拟 --sessions 个并发会话在 --duration 秒内不断调用三个工具：
+- weather（CACHEABLE）：城市按 Zipf 分布（少数热门城市），耗时 --io-ms
+- search（CACHEABLE）：查询词按 Zipf 分布，耗时 2 × --io-ms
+- create_order（SIDE_EFFECT）：每次都执行，耗时 --io-ms
+两个 "worker"（各自的 ToolExecutor 和进程内缓存）共享一个 Redis（默认 fakeredis，
+可用 --redis-url 指定真实 Redis），会话轮流发往两个 worker。分别在关闭缓存、
+只用进程内缓存、进程内 + Redis 三种模式下统计下游实际调用次数、单轮 p50 / p99
+和每个工具的命中率。
+
+用法：
+    python scripts/benchmark_tool_cache.py
+    python scripts/benchmark_tool_cache.py --sessions 64 --cities 200 --redis-url redis://localhost:6379/0
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from src.storage import TwoTierCache  # noqa: E402
+from src.tools import ToolCache, ToolEffect, ToolExecutor, ToolSpec  # noqa: E402
+
+
+def build_tools(io, upstream):
+    async def weather(city: str) -> str:
+        upstream["weather"] += 1
+        await asyncio.sleep(io)
+        return f"{city}：晴，18-25 度"
+
+    async def search(query: str) -> list:
+        upstream["search"] += 1
+        await asyncio.sleep(2 * io)
+        return [f"{query} 结果 {i}" for i in range(5)]
+
+    async def create_order(item: str) -> dict:
+        upstream["create_order"] += 1
+        await asyncio.sleep(io)
+        return {"item": item, "status": "created"}
+
+    return [
+        ToolSpec("weather", weather, effect=ToolEffect.CACHEABLE),
+        ToolSpec("search", search, effect=ToolEffect.CACHEABLE),
+        ToolSpec("create_order", create_order, effect=ToolEffect.SIDE_EFFECT),
+    ]
+
+
+def redis_client(url):
+    if url:
+        import redis.asyncio as aioredis
+
+        return aioredis.from_url(url)
+    import fakeredis
+
+    return fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
+
+
+async def run_mode(mode, args):
+    upstream = {"weather": 0, "search": 0, "create_order": 0}
+    tools = build_tools(args.io_ms / 1000, upstream)
+    redis = redis_client(args.redis_url) if mode == "redis" else None
+    if redis is not None:
+        await redis.flushdb()
+    workers = []
+    for _ in range(2):
+        cache = None
+        if mode != "off":
+            cache = ToolCache(TwoTierCache(redis, default_ttl=args.ttl, key_prefix="bench:tool:"))
+        workers.append(ToolExecutor(tools, max_concurrency_per_tool=64, cache=cache))
+
+    rng = random.Random(args.seed)
+    zipf = np.random.default_rng(args.seed)
+    latencies = []
+    deadline = time.perf_counter() + args.duration
+
+    async def session(i):
+        executor = workers[i % 2]
+        while time.perf_counter() < deadline:
+            city = int(min(zipf.zipf(1.2), args.cities))
+            query = int(min(zipf.zipf(1.2), args.cities * 5))
+            calls = [
+                {"name": "weather", "args": {"city": f"城市{city}"}, "id": "1"},
+                {"name": "search", "args": {"query": f"查询{query}"}, "id": "2"},
+            ]
+            if rng.random() < 0.1:
+                calls.append({"name": "create_order", "args": {"item": "x"}, "id": "3"})
+            start = time.perf_counter()
+            await executor.run(calls)
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(rng.expovariate(1 / args.think_ms * 1000))
+
+    await asyncio.gather(*(session(i) for i in range(args.sessions)))
+    lat = np.array(latencies) * 1000
+    hit_rates = {}
+    for executor in workers:
+        if executor.cache is not None:
+            for name, stats in executor.cache.stats().items():
+                hit_rates.setdefault(name, []).append(stats["hit_rate"])
+    return len(latencies), upstream, np.percentile(lat, 50), np.percentile(lat, 99), hit_rates
+
+
+async def main_async(args):
+    print(
+        f"会话数: {args.sessions}  时长: {args.duration:.0f} 秒  城市数: {args.cities}  "
+        f"I/O: {args.io_ms} ms  TTL: {args.ttl} 秒\n"
+    )
+    print(
+        f"{'模式':<10} | {'轮数':>6} | {'weather':>8} | {'search':>8} | {'order':>6} | "
+        f"{'p50':>8} | {'p99':>8} | 命中率"
+    )
+    print("-" * 96)
+    labels = {"off": "关闭缓存", "memory": "进程内", "redis": "进程内+Redis"}
+    for mode in ("off", "memory", "redis"):
+        turns, upstream, p50, p99, hit_rates = await run_mode(mode, args)
+        rates = "  ".join(f"{name} {np.mean(values):.0%}" for name, values in hit_rates.items())
+        print(
+            f"{labels[mode]:<10} | {turns:>8} | {upstream['weather']:>8} | {upstream['search']:>8} | "
+            f"{upstream['create_order']:>6} | {p50:>5.1f} ms | {p99:>5.1f} ms | {rates or '-'}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="工具结果缓存基准测试")
+    parser.add_argument("--sessions", type=int, default=32, help="并发会话数")
+    parser.add_argument("--duration", type=float, default=10.0, help="每种模式的时长（秒）")
+    parser.add_argument("--cities", type=int, default=100, help="城市数（查询词数为 5 倍）")
+    parser.add_argument("--io-ms", type=float, default=50, help="模拟工具的 I/O 耗时（毫秒）")
+    parser.add_argument("--think-ms", type=float, default=100, help="会话两轮之间的平均间隔（毫秒）")
+    parser.add_argument("--ttl", type=float, default=300, help="缓存 TTL（秒）")
+    parser.add_argument("--redis-url", default=None, help="真实 Redis 地址，默认使用 fakeredis")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+工具执行基准测试：依次执行与 ToolExecutor 并发执行的单轮延迟对比
+
+用模拟工具组成一轮工具调用：
+- weather：异步 I/O，耗时 --io-ms（±30% 抖动）
+- search：异步 I/O，耗时 2 × --io-ms
+- database：同步阻塞（time.sleep），耗时 --io-ms，在线程池中执行
+- flaky：异步 I/O，按 --failure-rate 概率抛出异常
+- hung：在 --hung-rate 概率下卡住 10 秒（单次超时 --tool-timeout-ms 后放弃）
+
+每轮从这些工具中选 --calls 个，分别依次执行（每个调用用同样的单次超时）和用
+ToolExecutor.run 并发执行，统计 --turns 轮的单轮延迟 p50 / p99 和失败调用数。
+另外用 --sessions 个会话同时执行，观察线程池和单工具并发上限下的延迟。
+
+用法：
+    python scripts/benchmark_tools.py
+    python scripts/benchmark_tools.py --calls 4 --io-ms 100 --sessions 16
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from src.tools import ToolExecutor, ToolSpec  # noqa: E402
+
+
+def build_tools(args, rng):
+    io = args.io_ms / 1000
+
+    async def weather(location: str) -> str:
+        await asyncio.sleep(io * rng.uniform(0.7, 1.3))
+        return f"{location}：晴，18-25 度"
+
+    async def search(query: str) -> list:
+        await asyncio.sleep(2 * io * rng.uniform(0.7, 1.3))
+        return [f"{query} 结果 {i}" for i in range(3)]
+
+    def database(sql: str) -> list:
+        time.sleep(io * rng.uniform(0.7, 1.3))
+        return [{"id": 1}]
+
+    async def flaky(x: int) -> int:
+        await asyncio.sleep(io * rng.uniform(0.7, 1.3))
+        if rng.random() < args.failure_rate:
+            raise ConnectionError("下游服务不可用")
+        return x
+
+    async def hung(x: int) -> int:
+        await asyncio.sleep(10 if rng.random() < args.hung_rate else io)
+        return x
+
+    timeout = args.tool_timeout_ms / 1000
+    return [
+        ToolSpec("weather", weather, timeout=timeout),
+        ToolSpec("search", search, timeout=timeout),
+        ToolSpec("database", database, timeout=timeout),
+        ToolSpec("flaky", flaky, timeout=timeout),
+        ToolSpec("hung", hung, timeout=timeout),
+    ]
+
+
+ARGS = {
+    "weather": {"location": "北京"},
+    "search": {"query": "LangGraph"},
+    "database": {"sql": "SELECT 1"},
+    "flaky": {"x": 1},
+    "hung": {"x": 1},
+}
+
+
+async def sequential(executor, calls):
+    # 对照组：一次只执行一个调用（仍使用相同的单次超时和失败隔离）
+    results = []
+    for call in calls:
+        results.extend(await executor.run([call]))
+    return results
+
+
+async def run_mode(runner, executor, turns, sessions, calls_per_turn, seed):
+    rng = random.Random(seed)
+    names = list(ARGS)
+    plans = [
+        [
+            {"name": name, "args": ARGS[name], "id": f"{t}-{i}"}
+            for i, name in enumerate(rng.sample(names, calls_per_turn))
+        ]
+        for t in range(turns)
+    ]
+    latencies, failures = [], 0
+    queue = list(plans)
+
+    async def session():
+        nonlocal failures
+        while queue:
+            calls = queue.pop()
+            start = time.perf_counter()
+            results = await runner(executor, calls)
+            latencies.append(time.perf_counter() - start)
+            failures += sum(1 for r in results if not r.ok)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session() for _ in range(sessions)))
+    elapsed = time.perf_counter() - start
+    lat = np.array(latencies) * 1000
+    return np.percentile(lat, 50), np.percentile(lat, 99), failures, turns / elapsed
+
+
+async def main_async(args):
+    rng = random.Random(args.seed)
+    executor = ToolExecutor(
+        build_tools(args, rng),
+        turn_timeout=args.turn_timeout_ms / 1000,
+        max_concurrency_per_tool=args.tool_concurrency,
+        thread_pool_size=args.threads,
+    )
+    print(
+        f"每轮 {args.calls} 个调用  I/O 耗时: {args.io_ms} ms  单次超时: {args.tool_timeout_ms} ms  "
+        f"整轮截止: {args.turn_timeout_ms} ms  轮数: {args.turns}\n"
+    )
+    print(f"{'模式':<6} | {'会话数':>4} | {'p50':>9} | {'p99':>9} | {'失败调用':>6} | {'轮/秒':>7}")
+    print("-" * 60)
+
+    async def concurrent(executor, calls):
+        return await executor.run(calls)
+
+    try:
+        for sessions in (1, args.sessions):
+            for label, runner in (("依次执行", sequential), ("并发执行", concurrent)):
+                p50, p99, failures, rate = await run_mode(
+                    runner, executor, args.turns, sessions, args.calls, args.seed
+                )
+                print(
+                    f"{label:<6} | {sessions:>7} | {p50:>6.1f} ms | {p99:>6.1f} ms | "
+                    f"{failures:>10} | {rate:>8.1f}"
+                )
+    finally:
+        executor.close()
+
+
+def main():
+    logging.getLogger("src.tools").setLevel(logging.ERROR)
+    parser = argparse.ArgumentParser(description="工具执行基准测试")
+    parser.add_argument("--calls", type=int, default=3, help="每轮工具调用数")
+    parser.add_argument("--turns", type=int, default=200, help="轮数")
+    parser.add_argument("--sessions", type=int, default=16, help="并发会话数")
+    parser.add_argument("--io-ms", type=float, default=50, help="模拟工具的 I/O 耗时（毫秒）")
+    parser.add_argument("--tool-timeout-ms", type=float, default=300, help="单次调用超时（毫秒）")
+    parser.add_argument("--turn-timeout-ms", type=float, default=1000, help="整轮截止时间（毫秒）")
+    parser.add_argument("--tool-concurrency", type=int, default=8, help="单个工具的并发上限")
+    parser.add_argument("--threads", type=int, default=8, help="阻塞工具线程数")
+    parser.add_argument("--failure-rate", type=float, default=0.1, help="flaky 工具的失败概率")
+    parser.add_argument("--hung-rate", type=float, default=0.02, help="hung 工具卡住的概率")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
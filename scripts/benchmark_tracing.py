@@ -0,0 +1,141 @@
+"""
+追踪开销基准测试
+
+1. 单次调用开销（ns/次）：未开启追踪时的 span() / traced 函数，与开启追踪时对比
+2. 模拟一轮对话：构建提示词（CPU）、检索、3 个并发工具调用、检查点写入，
+   每个阶段都有 span。分别在关闭追踪、追踪（不导出）、追踪 + 导出 Chrome trace、
+   追踪 + 调用栈采样四种模式下跑 --turns 轮，统计每轮平均耗时，并输出最后一轮的瀑布图。
+
+用法：
+    python scripts/benchmark_tracing.py
+    python scripts/benchmark_tracing.py --turns 500 --cpu-ms 5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils import Tracer, span, traced  # noqa: E402
+
+
+# 固定计算量（按 process_time 定时在开启 ITIMER_PROF 时不准），启动时校准每毫秒的循环次数
+_LOOPS_PER_MS = 1.0
+
+
+def spin(loops):
+    for _ in range(int(loops)):
+        sum(range(100))
+
+
+def calibrate():
+    global _LOOPS_PER_MS
+    start = time.perf_counter()
+    spin(20000)
+    _LOOPS_PER_MS = 20000 / ((time.perf_counter() - start) * 1000)
+
+
+def cpu(ms):
+    spin(ms * _LOOPS_PER_MS)
+
+
+@traced("build_prompt")
+def build_prompt(ms):
+    cpu(ms)
+
+
+@traced("retrieve")
+async def retrieve(io):
+    await asyncio.sleep(io)
+
+
+async def tool(name, io, ms):
+    with span(f"tool:{name}"):
+        await asyncio.sleep(io)
+        cpu(ms / 3)
+
+
+async def one_turn(tracer, mode, args):
+    io = args.io_ms / 1000
+    async with tracer.turn("chat", trace=mode != "off", profile=mode == "profile", session_id="s1") as trace:
+        build_prompt(args.cpu_ms)
+        await retrieve(io)
+        with span("tools"):
+            await asyncio.gather(*(tool(name, io, args.cpu_ms) for name in ("weather", "search", "calc")))
+        with span("checkpoint.put"):
+            await asyncio.sleep(io / 2)
+    return trace
+
+
+def per_call_overheads(number):
+    tracer = Tracer()
+
+    def bare():
+        return None
+
+    wrapped = traced("bare")(bare)
+
+    def with_span():
+        with span("x"):
+            pass
+
+    def measure(func):
+        return timeit.timeit(func, number=number) / number * 1e9
+
+    rows = [("空函数调用", measure(bare)), ("span() 未开启", measure(with_span)), ("traced 函数 未开启", measure(wrapped))]
+    with tracer.turn("bench", trace=True) as trace:
+        rows.append(("span() 开启", measure(with_span)))
+        trace.spans.clear()
+        rows.append(("traced 函数 开启", measure(wrapped)))
+    return rows
+
+
+async def main_async(args):
+    calibrate()
+    print(f"单次调用开销（{args.number} 次）：")
+    for label, ns in per_call_overheads(args.number):
+        print(f"  {label:<16} {ns:>8.0f} ns")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tracers = {
+            "off": Tracer(),
+            "trace": Tracer(),
+            "export": Tracer(tmp),
+            "profile": Tracer(tmp, profile_interval=args.profile_ms / 1000),
+        }
+        labels = {"off": "关闭", "trace": "追踪", "export": "追踪+导出", "profile": "追踪+采样+导出"}
+        print(f"\n模拟对话 {args.turns} 轮（CPU {args.cpu_ms} ms + I/O {args.io_ms} ms × 4 段）：")
+        print(f"{'模式':<14} | {'平均每轮':>10} | {'开销':>8}")
+        print("-" * 40)
+        baseline = None
+        last = None
+        for mode, tracer in tracers.items():
+            await one_turn(tracer, mode, args)
+            start = time.perf_counter()
+            for _ in range(args.turns):
+                trace = await one_turn(tracer, mode, args)
+            mean = (time.perf_counter() - start) / args.turns * 1000
+            baseline = baseline or mean
+            print(f"{labels[mode]:<14} | {mean:>7.2f} ms | {(mean - baseline) / baseline:>+7.1%}")
+            if trace is not None:
+                last = trace
+        print(f"\n最后一轮瀑布图：\n{last.waterfall()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="追踪开销基准测试")
+    parser.add_argument("--turns", type=int, default=200, help="每种模式的轮数")
+    parser.add_argument("--cpu-ms", type=float, default=2.0, help="每轮提示词构建和工具的 CPU 耗时（毫秒）")
+    parser.add_argument("--io-ms", type=float, default=1.0, help="每段 I/O 的耗时（毫秒）")
+    parser.add_argument("--profile-ms", type=float, default=1.0, help="调用栈采样间隔（毫秒）")
+    parser.add_argument("--number", type=int, default=500000, help="单次调用开销的测量次数")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+NumPy 向量索引与 ChromaDB 的延迟 / 召回率对比
+
+生成带聚类结构的合成语料（随机簇中心 + 高斯噪声），分别统计：
+- 打开已持久化索引的启动耗时
+- 单条查询的 p50 / p99 延迟
+- recall@k（以精确暴力检索为基准；NumPy 索引本身即为精确检索）
+
+未安装 chromadb 时只测试 NumPy 索引。
+
+用法：
+    python scripts/benchmark_vector_store.py --docs 100000 --dim 384
+    python scripts/benchmark_vector_store.py --docs 20000 --queries 500 --top-k 10
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+from src.memory import NumpyVectorStore  # noqa: E402
+from src.memory.vector_store import normalize, top_k_indices  # noqa: E402
+
+
+class NoEmbeddings(Embeddings):
+    """基准测试直接使用向量检索，不调用 Embedding 模型"""
+
+    def embed_documents(self, texts):
+        raise NotImplementedError
+
+    def embed_query(self, text):
+        raise NotImplementedError
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def make_corpus(docs, dim, queries, clusters, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, docs)
+    corpus = centers[labels] + 0.6 * rng.standard_normal((docs, dim)).astype(np.float32)
+    query_labels = rng.integers(0, clusters, queries)
+    query_vectors = centers[query_labels] + 0.6 * rng.standard_normal((queries, dim)).astype(np.float32)
+    return corpus, query_vectors
+
+
+def exact_top_k(corpus, queries, k):
+    scores = normalize(corpus) @ normalize(queries).T
+    return [set(top_k_indices(column, k).tolist()) for column in scores.T]
+
+
+def report(label, startup, latencies, recall):
+    print(
+        f"{label:<8} | 启动 {startup * 1e3:9.1f} ms | p50 {percentile(latencies, 0.5):7.3f} ms"
+        f"  p99 {percentile(latencies, 0.99):7.3f} ms | recall {recall:.4f}"
+    )
+
+
+def bench_numpy(workdir, corpus, queries, truth, k, batch):
+    path = os.path.join(workdir, "numpy")
+    store = NumpyVectorStore(NoEmbeddings(), path)
+    texts = [f"doc-{i}" for i in range(len(corpus))]
+    for start in range(0, len(corpus), batch):
+        store.add_embeddings(
+            texts[start:start + batch],
+            corpus[start:start + batch],
+            ids=texts[start:start + batch],
+        )
+
+    start = time.perf_counter()
+    store = NumpyVectorStore(NoEmbeddings(), path, top_k=k)
+    startup = time.perf_counter() - start
+
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = store.search_vectors(query, k)[0]
+        latencies.append((time.perf_counter() - start) * 1e3)
+        hits += len(expected & {i for i, _ in results})
+    report("numpy", startup, latencies, hits / (k * len(queries)))
+
+
+def bench_chroma(workdir, corpus, queries, truth, k, batch):
+    try:
+        import chromadb
+    except ImportError:
+        print("chroma   | 未安装 chromadb，跳过")
+        return
+
+    path = os.path.join(workdir, "chroma")
+    client = chromadb.PersistentClient(path=path)
+    collection = client.create_collection("bench", metadata={"hnsw:space": "cosine"})
+    for start in range(0, len(corpus), batch):
+        collection.add(
+            ids=[str(i) for i in range(start, min(start + batch, len(corpus)))],
+            embeddings=corpus[start:start + batch].tolist(),
+        )
+    del collection, client
+
+    start = time.perf_counter()
+    client = chromadb.PersistentClient(path=path)
+    collection = client.get_collection("bench")
+    collection.query(query_embeddings=[queries[0].tolist()], n_results=k)  # 首次查询加载 HNSW 索引
+    startup = time.perf_counter() - start
+
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k)
+        latencies.append((time.perf_counter() - start) * 1e3)
+        hits += len(expected & {int(i) for i in result["ids"][0]})
+    report("chroma", startup, latencies, hits / (k * len(queries)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="NumPy 向量索引与 ChromaDB 对比")
+    parser.add_argument("--docs", type=int, default=50_000, help="语料向量数")
+    parser.add_argument("--dim", type=int, default=384, help="向量维度")
+    parser.add_argument("--queries", type=int, default=200, help="查询数")
+    parser.add_argument("--clusters", type=int, default=256, help="合成语料的簇数")
+    parser.add_argument("--top-k", type=int, default=5, help="每次查询返回的结果数")
+    parser.add_argument("--batch", type=int, default=5_000, help="写入批大小")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    corpus, queries = make_corpus(args.docs, args.dim, args.queries, args.clusters, args.seed)
+    truth = exact_top_k(corpus, queries, args.top_k)
+    print(f"语料 {args.docs} 条 × {args.dim} 维，查询 {args.queries} 条，top_k={args.top_k}\n")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        bench_numpy(workdir, corpus, queries, truth, args.top_k, args.batch)
+        bench_chroma(workdir, corpus, queries, truth, args.top_k, args.batch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+过载压测：准入控制开启 / 关闭时的有效吞吐（goodput）
+
+在子进程中启动 create_app 创建的应用，挂载一个模拟 LLM 调用的接口：提供商同时只能
+处理 --capacity 个请求、每个耗时 --latency 秒（服务能力 capacity / latency 请求/秒）。
+客户端按泊松过程以 --rate 请求/秒发送请求（其中 --batch-ratio 比例走批处理接口），
+每个请求的客户端超时等于 API_REQUEST_TIMEOUT。分别在开启和关闭准入控制时统计：
+- goodput：在超时前成功返回的请求数 / 压测时长（交互与批处理分开统计）
+- 503 拒绝数、客户端超时数、成功请求的 p50 / p99 延迟
+- 服务进程的峰值内存（VmHWM）
+
+用法：
+    python scripts/load_test.py
+    python scripts/load_test.py --rate 40 --capacity 8 --latency 0.5 --timeout 5 --duration 30
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+import uvicorn  # noqa: E402
+
+from config.settings import (  # noqa: E402
+    APISettings,
+    DatabaseSettings,
+    Settings,
+    VectorStoreSettings,
+)
+from src.api import create_app  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_server(port, settings, capacity, latency):
+    app = create_app(settings)
+    provider = {}
+
+    async def call_provider():
+        # 模拟 LLM 提供商：并发能力有限，超出的调用排队
+        if "semaphore" not in provider:
+            provider["semaphore"] = asyncio.Semaphore(capacity)
+        async with provider["semaphore"]:
+            await asyncio.sleep(latency)
+        return {"ok": True}
+
+    app.add_api_route("/api/chat/simulated", call_provider, methods=["POST"])
+    app.add_api_route("/api/batch/simulated", call_provider, methods=["POST"])
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="error", backlog=4096)
+
+
+def peak_rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def drive(url, rate, duration, batch_ratio, timeout, seed):
+    rng = random.Random(seed)
+    results = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) as client:
+
+        async def one(kind):
+            path = "/api/batch/simulated" if kind == "batch" else "/api/chat/simulated"
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json={"message": "你好"})
+                status = response.status_code
+            except httpx.TimeoutException:
+                status = "timeout"
+            except httpx.TransportError:
+                status = "error"
+            results.append((kind, status, time.perf_counter() - start))
+
+        tasks = []
+        start = time.perf_counter()
+        next_at = start
+        while next_at - start < duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            kind = "batch" if rng.random() < batch_ratio else "interactive"
+            tasks.append(asyncio.create_task(one(kind)))
+            next_at += rng.expovariate(rate)
+        await asyncio.gather(*tasks)
+    return results
+
+
+def report(label, results, duration, peak):
+    ok = [r for r in results if r[1] == 200]
+    latencies = np.array([r[2] for r in ok]) if ok else np.zeros(1)
+    goodput = {
+        kind: sum(1 for r in ok if r[0] == kind) / duration for kind in ("interactive", "batch")
+    }
+    rejected = sum(1 for r in results if r[1] == 503)
+    timeouts = sum(1 for r in results if r[1] == "timeout")
+    print(
+        f"{label:<8} | {len(results):>6} | {goodput['interactive']:>8.1f} | {goodput['batch']:>8.1f} | "
+        f"{rejected:>6} | {timeouts:>6} | {np.percentile(latencies, 50):>6.2f} s | "
+        f"{np.percentile(latencies, 99):>6.2f} s | {peak:>7.1f} MB"
+    )
+
+
+def run_mode(label, admission, args, root):
+    settings = Settings(
+        api=APISettings(
+            request_timeout=args.timeout,
+            admission_control=admission,
+            max_concurrent_requests=args.capacity,
+            max_queued_requests=args.queue,
+        ),
+        vector_store=VectorStoreSettings(vector_store_type="none"),
+        database=DatabaseSettings(db_type="sqlite", sqlite_path=os.path.join(root, "chatbot.db")),
+    )
+    port = free_port()
+    ctx = multiprocessing.get_context("fork")
+    server = ctx.Process(target=run_server, args=(port, settings, args.capacity, args.latency), daemon=True)
+    server.start()
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(200):
+        try:
+            httpx.get(f"{url}/health")
+            break
+        except httpx.TransportError:
+            time.sleep(0.05)
+    try:
+        results = asyncio.run(
+            drive(url, args.rate, args.duration, args.batch_ratio, args.timeout, args.seed)
+        )
+        report(label, results, args.duration, peak_rss_mb(server.pid))
+    finally:
+        server.terminate()
+        server.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="过载压测")
+    parser.add_argument("--rate", type=float, default=40.0, help="到达速率（请求/秒）")
+    parser.add_argument("--duration", type=float, default=30.0, help="压测时长（秒）")
+    parser.add_argument("--capacity", type=int, default=8, help="模拟提供商的并发能力")
+    parser.add_argument("--latency", type=float, default=0.5, help="模拟提供商每次调用耗时（秒）")
+    parser.add_argument("--timeout", type=int, default=5, help="API_REQUEST_TIMEOUT 和客户端超时（秒）")
+    parser.add_argument("--queue", type=int, default=64, help="API_MAX_QUEUED_REQUESTS")
+    parser.add_argument("--batch-ratio", type=float, default=0.2, help="批处理请求比例")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    capacity = args.capacity / args.latency
+    print(
+        f"服务能力: {capacity:.1f} 请求/秒  到达速率: {args.rate:.1f} 请求/秒 "
+        f"（{args.rate / capacity:.1f}x）  超时: {args.timeout} 秒  时长: {args.duration:.0f} 秒\n"
+    )
+    print(
+        f"{'准入控制':<6} | {'请求数':>5} | {'交互 gp/s':>8} | {'批处理 gp/s':>8} | "
+        f"{'503':>6} | {'超时':>5} | {'p50':>8} | {'p99':>8} | {'峰值内存':>7}"
+    )
+    print("-" * 96)
+    with tempfile.TemporaryDirectory() as root:
+        run_mode("开启", True, args, root)
+        run_mode("关闭", False, args, root)
+
+
+if __name__ == "__main__":
+    main()
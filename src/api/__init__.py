@@ -0,0 +1,44 @@
+"""
+API 接口层
+
+提供 FastAPI 应用、多进程启动器、准入控制中间件和响应编码
+"""
+
+from .app import AppResources, create_app, load_resources, serve
+from .middleware import (
+    AdmissionControlMiddleware,
+    AdmissionController,
+    Rejected,
+    RequestPriority,
+    RequestTooLarge,
+)
+from .responses import (
+    JSONResponse,
+    SSEResponse,
+    coalesce_tokens,
+    sse_event,
+    stream_tokens,
+    token_event,
+)
+
+__all__ = [
+    # 应用
+    "create_app",
+    "serve",
+    # 共享资源
+    "AppResources",
+    "load_resources",
+    # 中间件
+    "AdmissionControlMiddleware",
+    "AdmissionController",
+    "RequestPriority",
+    "Rejected",
+    "RequestTooLarge",
+    # 响应编码
+    "JSONResponse",
+    "SSEResponse",
+    "coalesce_tokens",
+    "sse_event",
+    "stream_tokens",
+    "token_event",
+]
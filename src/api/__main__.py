@@ -0,0 +1,7 @@
+"""启动 API 服务：python -m src.api"""
+
+from .app import main
+
+# forkserver / spawn 子进程（如工具沙箱）会重新导入主模块，不能在导入时启动服务
+if __name__ == "__main__":
+    main()
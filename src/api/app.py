@@ -0,0 +1,453 @@
+"""
+FastAPI 应用主入口
+
+create_app 创建应用，serve 是多进程生产启动器：
+
+- 主进程加载配置、预解析提示词模板、加载 NumPy 向量索引和 BM25 索引
+  （AppResources），然后 gc.freeze() 并 fork 出 APISettings.workers 个 worker。
+  预加载的对象以写时复制方式共享；gc.freeze 把它们移入永久代，worker 中的垃圾
+  回收不再改写这些对象的 GC 头，共享内存页不会因此被复制
+- 监听套接字在主进程中创建，所有 worker 在同一个套接字上 accept
+- 不能跨 fork 共享的资源在每个 worker 的 lifespan 中创建：数据库连接池、Redis
+  连接池、会话锁、Embedding 客户端（CachedEmbeddings 持有后台线程和 SQLite 连接）、
+  chroma 等非 NumPy 向量存储，以及图（graph_factory）：检查点存储持有数据库连接、
+  回写线程和 GC 线程，线程不会随 fork 复制，连接也不能跨进程共享。worker 退出时
+  关闭图的检查点存储，回写缓冲全部落盘
+- 主进程把 SIGTERM / SIGINT 转发给 worker，并重启意外退出的 worker；启动后
+  很快退出的 worker 视为配置错误，主进程停止全部 worker 后退出
+- APISettings.preload 为 false 时每个 worker 在 lifespan 中自行加载（用于对比）
+
+用法：
+    python -m src.api
+"""
+
+import asyncio
+import functools
+import gc
+import importlib
+import logging
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from langchain_core.vectorstores import VectorStore
+
+from config.prompts import PromptBuilder, prompt_builder
+from config.settings import Settings
+from src.graph import CheckpointGC
+from src.memory import (
+    BM25Index,
+    CachedEmbeddings,
+    LLMScheduler,
+    NumpyVectorStore,
+    SummaryWorker,
+    create_embeddings,
+    create_vector_store,
+)
+from src.services import metrics
+from src.storage import (
+    MessageRepository,
+    SessionLockManager,
+    create_async_redis_client,
+    create_db_engine,
+    create_session_factory,
+)
+from src.tools import ToolExecutor
+from src.utils import Tracer, get_pipeline, setup_logging, shutdown_logging
+from .middleware import AdmissionControlMiddleware, AdmissionController
+from .responses import JSONResponse, stream_tokens
+
+logger = logging.getLogger(__name__)
+
+# worker 启动后在该时间（秒）内退出视为启动失败，不再重启
+_MIN_WORKER_UPTIME = 5.0
+# worker 启动失败（lifespan 出错）时的退出码
+_STARTUP_FAILURE = 3
+
+# Embedding 提供商的模块，预加载时在主进程中导入（导入本身可以共享，客户端不能）
+_EMBEDDING_MODULES = {
+    "openai": "langchain_openai",
+    "huggingface": "langchain_community.embeddings",
+}
+
+GraphFactory = Callable[["AppResources"], Any]
+
+
+@dataclass
+class AppResources:
+    """
+    只读共享资源，多 worker 时在主进程中加载一次
+
+    graph 以及 tools / summary_worker（可选，由 graph_factory 在构建图时填写）属于
+    worker：由每个 worker 的 lifespan 调用 graph_factory 构建，开启 Prometheus 时连同
+    图的检查点存储上挂载的 CheckpointGC 一起注册为监控指标。llm_scheduler 是 worker
+    的 LLM 并发名额（即 app.state.llm_scheduler），在调用 graph_factory 之前设置，
+    SummaryWorker 应使用它，后台摘要才会让路给交互请求。
+    """
+
+    settings: Settings
+    prompts: PromptBuilder
+    vector_store: Optional[VectorStore] = None
+    bm25: Optional[BM25Index] = None
+    graph: Any = None
+    tools: Optional[ToolExecutor] = None
+    summary_worker: Optional[SummaryWorker] = None
+    llm_scheduler: Optional[LLMScheduler] = None
+    load_seconds: float = 0.0
+
+
+def load_resources(settings: Settings, graph_factory: Optional[GraphFactory] = None) -> AppResources:
+    """
+    加载共享资源
+
+    NumPy 向量存储只加载索引数据，Embedding 由每个 worker 在 lifespan 中挂载
+    （这里只导入提供商模块）；其他类型的向量存储不能跨 fork 共享，留给 worker 创建。
+
+    Args:
+        settings: 全局配置
+        graph_factory: 构建图的函数，接收已加载的 AppResources（图持有线程和连接，
+            不能在 fork 之前构建，serve 预加载时不传，由 worker 的 lifespan 构建）
+    """
+    start = time.perf_counter()
+    prompt_builder.compile()
+    resources = AppResources(settings, prompt_builder)
+    vs_settings = settings.vector_store
+    if vs_settings.vector_store_type != "none":
+        try:
+            importlib.import_module(_EMBEDDING_MODULES[vs_settings.embedding_provider])
+        except ImportError:
+            # 缺少依赖时由 worker 中的 create_embeddings 报错
+            pass
+    if vs_settings.vector_store_type == "numpy":
+        resources.vector_store = NumpyVectorStore.from_settings(vs_settings, None)
+    if vs_settings.hybrid_search:
+        resources.bm25 = BM25Index.from_settings(vs_settings)
+    if graph_factory is not None:
+        resources.graph = graph_factory(resources)
+    resources.load_seconds = time.perf_counter() - start
+    logger.info("共享资源加载完成: %.2f 秒 (pid=%d)", resources.load_seconds, os.getpid())
+    return resources
+
+
+def _attach_embeddings(resources: AppResources) -> Optional[Any]:
+    """为当前 worker 创建 Embedding 并挂到向量存储上，返回需要在退出时关闭的对象"""
+    vs_settings = resources.settings.vector_store
+    if vs_settings.vector_store_type == "none":
+        return None
+    embedding = create_embeddings(vs_settings)
+    if isinstance(resources.vector_store, NumpyVectorStore):
+        resources.vector_store.embedding = embedding
+    else:
+        resources.vector_store = create_vector_store(vs_settings, embedding)
+    return embedding
+
+
+def _track_metrics(app: FastAPI, embedding: Optional[Any]) -> None:
+    """把当前 worker 的连接池、队列和缓存注册为采集时读取的指标"""
+    pool = app.state.db_engine.sync_engine.pool
+    if hasattr(pool, "checkedout"):
+        metrics.track_pool("db", in_use=pool.checkedout, idle=pool.checkedin)
+    admission = app.state.admission
+    if admission is not None:
+        metrics.track_pool("requests", in_use=lambda: admission.active)
+        metrics.track_queue("admission", lambda: admission.queued)
+    pipeline = get_pipeline()
+    if pipeline is not None:
+        metrics.track_queue("log", lambda: pipeline.queue.qsize())
+    if isinstance(embedding, CachedEmbeddings):
+        metrics.track_cache(
+            "embedding",
+            hits=lambda: embedding.hits + embedding.disk_hits,
+            misses=lambda: embedding.misses,
+        )
+    _track_components(app.state.resources)
+
+
+def _track_components(resources: AppResources) -> None:
+    """注册 graph_factory 构建的组件：工具缓存（按工具）、检查点 GC 和会话摘要"""
+    tools = resources.tools
+    if tools is not None and tools.cache is not None:
+        for name in tools.tools:
+            stats = tools.cache.tool_stats(name)
+            metrics.track_cache(
+                f"tool:{name}",
+                hits=lambda s=stats: s.memory_hits + s.redis_hits + s.coalesced,
+                misses=lambda s=stats: s.misses,
+            )
+    # WriteBehindSaver 包装时 GC 挂在内层存储上；只注册在当前进程中运行的 GC
+    saver = getattr(resources.graph, "checkpointer", None)
+    gc_ = getattr(getattr(saver, "inner", saver), "gc", None)
+    if isinstance(gc_, CheckpointGC) and gc_.running:
+        metrics.track_checkpoint_gc(
+            runs=lambda: gc_.runs,
+            rows_pruned=lambda: gc_.rows_pruned,
+            threads_expired=lambda: gc_.threads_expired,
+            bytes_reclaimed=lambda: gc_.bytes_reclaimed,
+        )
+    worker = resources.summary_worker
+    if worker is not None:
+        metrics.track_summaries(lambda: worker.tokens_saved)
+
+
+def _close_checkpointer(graph: Any) -> None:
+    """关闭图的检查点存储：先刷写回写缓冲，再关闭内层存储"""
+    saver = getattr(graph, "checkpointer", None)
+    while saver is not None:
+        close = getattr(saver, "close", None)
+        if close is not None:
+            close()
+        saver = getattr(saver, "inner", None)
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI) -> AsyncIterator[None]:
+    settings: Settings = app.state.settings
+    graph_factory = app.state.graph_factory
+    if app.state.resources is None:
+        app.state.resources = load_resources(settings)
+    resources: AppResources = app.state.resources
+    resources.llm_scheduler = app.state.llm_scheduler
+    own_graph = graph_factory is not None and resources.graph is None
+    if own_graph:
+        # 预加载的资源不含图：检查点存储的连接和线程在 worker 中创建
+        resources.graph = graph_factory(resources)
+    worker = resources.summary_worker
+    if worker is not None and worker.scheduler is not app.state.llm_scheduler:
+        logger.warning("SummaryWorker 未使用 app.state.llm_scheduler，后台摘要会与交互请求争抢 LLM 并发")
+    embedding = _attach_embeddings(app.state.resources)
+
+    # 每个 worker 独立的连接池
+    engine = create_db_engine(settings.database)
+    app.state.db_engine = engine
+    app.state.repository = MessageRepository(create_session_factory(engine))
+    app.state.redis = create_async_redis_client(settings.redis)
+    app.state.session_locks = SessionLockManager.from_settings(settings.api, app.state.redis)
+    flusher = None
+    if settings.monitoring.enable_prometheus:
+        _track_metrics(app, embedding)
+        if metrics.multiprocess_dir is not None:
+            flusher = asyncio.create_task(
+                metrics.flush_periodically(settings.monitoring.prometheus_flush_interval)
+            )
+    logger.info("worker 就绪 (pid=%d)", os.getpid())
+    try:
+        yield
+    finally:
+        if flusher is not None:
+            flusher.cancel()
+            metrics.write_snapshot()
+        await app.state.redis.aclose()
+        await engine.dispose()
+        close = getattr(embedding, "close", None)
+        if close is not None:
+            close()
+        if own_graph:
+            await asyncio.to_thread(_close_checkpointer, app.state.resources.graph)
+
+
+def create_app(
+    settings: Optional[Settings] = None,
+    resources: Optional[AppResources] = None,
+    *,
+    graph_factory: Optional[GraphFactory] = None,
+) -> FastAPI:
+    """
+    创建 FastAPI 应用
+
+    Args:
+        settings: 全局配置，默认使用 config.settings
+        resources: 预加载的共享资源，None 表示在 lifespan 中加载
+        graph_factory: 构建图的函数（resources 中没有图时在 lifespan 中调用）
+    """
+    if settings is None:
+        from config.settings import settings
+
+    app = FastAPI(
+        title=settings.app_name,
+        version=settings.app_version,
+        lifespan=_lifespan,
+        default_response_class=JSONResponse,
+    )
+    app.state.settings = settings
+    app.state.resources = resources
+    app.state.graph_factory = graph_factory
+    app.state.metrics = metrics
+    # 路由中用 async with request.app.state.tracer.turn("chat", ...) 追踪一轮对话
+    # 路由中用 async with request.app.state.llm_scheduler.slot() 包住交互的 LLM 调用，
+    # 后台摘要（background=True）只在没有交互请求等待时获得名额
+    app.state.llm_scheduler = LLMScheduler.from_settings(settings.llm)
+    app.state.tracer = Tracer.from_settings(settings.monitoring)
+    api = settings.api
+    # 路由中用 request.app.state.stream_tokens(tokens) 返回按配置合并的 SSE 响应
+    app.state.stream_tokens = functools.partial(
+        stream_tokens, window=api.sse_coalesce_ms / 1000, max_chars=api.sse_max_chunk_chars
+    )
+    app.state.admission = AdmissionController.from_settings(api) if api.admission_control else None
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        controller=app.state.admission,
+        request_timeout=api.request_timeout,
+        max_request_size=api.max_request_size,
+    )
+    # CORS 在外层，准入拒绝的响应同样带 CORS 头
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=api.cors_origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    @app.get("/health")
+    async def health() -> Dict[str, Any]:
+        return {"status": "ok", "pid": os.getpid()}
+
+    return app
+
+
+# ==================== 启动器 ====================
+
+
+def _bind(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(
+    settings: Settings,
+    resources: Optional[AppResources],
+    graph_factory: Optional[GraphFactory],
+    sock: socket.socket,
+) -> None:
+    app = create_app(settings, resources, graph_factory=graph_factory)
+    options: Dict[str, Any] = {}
+    if get_pipeline() is not None:
+        # uvicorn 的日志传播到根 logger，经日志队列写出
+        options["log_config"] = None
+    config = uvicorn.Config(
+        app,
+        lifespan="on",
+        log_level=settings.log.level.lower(),
+        backlog=settings.api.backlog,
+        **options,
+    )
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+    if not server.started:
+        raise SystemExit(_STARTUP_FAILURE)
+
+
+def serve(settings: Optional[Settings] = None, *, graph_factory: Optional[GraphFactory] = None) -> None:
+    """
+    启动 API 服务（阻塞直到收到 SIGTERM / SIGINT）
+
+    Args:
+        settings: 全局配置，默认使用 config.settings
+        graph_factory: 构建图的函数
+    """
+    if settings is None:
+        from config.settings import settings
+
+    api = settings.api
+    monitoring = settings.monitoring
+    sock = _bind(api.host, api.port, api.backlog)
+    # 图（检查点存储）持有连接和线程，由每个 worker 在 lifespan 中构建
+    resources = load_resources(settings) if api.preload else None
+    if api.workers == 1:
+        if monitoring.enable_prometheus:
+            metrics.start_server(monitoring.prometheus_port)
+        try:
+            _run_worker(settings, resources, graph_factory, sock)
+        finally:
+            sock.close()
+        return
+
+    # 此后创建的对象才会被 GC 跟踪；预加载的对象留在永久代，fork 后保持共享
+    gc.freeze()
+    children: Dict[int, tuple] = {}  # pid -> (序号, 启动时间)
+    stopping = False
+    failed = False
+
+    def spawn(slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                _run_worker(settings, resources, graph_factory, sock)
+                code = 0
+            except SystemExit as exc:
+                code = exc.code if isinstance(exc.code, int) else 1
+            except BaseException:
+                logger.exception("worker %d 异常退出", slot)
+            finally:
+                shutdown_logging()
+                os._exit(code)
+        children[pid] = (slot, time.monotonic())
+
+    def stop(signum: int, frame: Any) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    if monitoring.enable_prometheus:
+        # 各 worker 定期写快照，主进程的 /metrics 汇总
+        metrics.multiprocess_dir = tempfile.mkdtemp(prefix="chatbot-metrics-")
+    logger.info("启动 %d 个 worker: http://%s:%d", api.workers, api.host, api.port)
+    for slot in range(api.workers):
+        spawn(slot)
+    if monitoring.enable_prometheus:
+        metrics.start_server(monitoring.prometheus_port)
+
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            slot, started = children.pop(pid, (None, 0.0))
+            metrics.retire_worker(pid)
+            if slot is None or stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code == _STARTUP_FAILURE or time.monotonic() - started < _MIN_WORKER_UPTIME:
+                logger.error("worker %d 启动后立即退出 (code=%d)，停止服务", slot, code)
+                failed = True
+                stop(signal.SIGTERM, None)
+                continue
+            logger.warning("worker %d 退出 (code=%d)，重新启动", slot, code)
+            spawn(slot)
+    finally:
+        sock.close()
+        if metrics.multiprocess_dir is not None:
+            shutil.rmtree(metrics.multiprocess_dir, ignore_errors=True)
+    if failed:
+        raise SystemExit(_STARTUP_FAILURE)
+
+
+def main() -> None:
+    from config.settings import settings
+
+    setup_logging(settings.log)
+    serve(settings)
@@ -0,0 +1,341 @@
+"""
+中间件：准入控制与请求体大小限制
+
+LLM 提供商变慢时，不加限制的服务会把请求一直堆积到 request_timeout，内存上涨后
+所有用户一起超时。AdmissionControlMiddleware 在进入应用之前做准入：
+
+- 同时处理的请求数不超过 max_concurrency，其余进入有界等待队列
+- 队列按优先级出队：交互对话（INTERACTIVE）先于批处理（BATCH）和管理接口（ADMIN），
+  同一优先级先到先出；队列已满时挤掉优先级更低的最新请求，没有可挤的则拒绝
+- 截止时间感知：每个请求的截止时间为到达时间 + request_timeout，按最近请求耗时的
+  指数移动平均估算排队时间，预计无法在截止时间前完成的请求立即拒绝；已在队列中的
+  请求等到剩余时间不足一次平均处理耗时时也被拒绝
+- 拒绝返回 503 并带 Retry-After（按预计排队时间取整，至少 1 秒）
+
+请求体大小限制与准入无关：Content-Length 超过 max_request_size 时直接返回 413，
+分块上传的请求在读取过程中累计字节数，超出时中止读取并返回 413，不会先把整个
+请求体缓存下来。
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.settings import APISettings
+from .responses import JSONResponse
+
+
+class RequestPriority(IntEnum):
+    """请求优先级（数值越小越优先）"""
+
+    INTERACTIVE = 0
+    BATCH = 1
+    ADMIN = 2
+
+
+# 路径前缀 -> 优先级，未匹配的请求视为交互请求
+DEFAULT_PRIORITY_RULES: Tuple[Tuple[str, RequestPriority], ...] = (
+    ("/admin", RequestPriority.ADMIN),
+    ("/api/admin", RequestPriority.ADMIN),
+    ("/batch", RequestPriority.BATCH),
+    ("/api/batch", RequestPriority.BATCH),
+)
+# 不经过准入控制的路径
+DEFAULT_EXEMPT_PATHS: Tuple[str, ...] = ("/health",)
+
+
+class Rejected(Exception):
+    """请求未被准入"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RequestTooLarge(HTTPException):
+    """请求体超过 max_request_size"""
+
+    def __init__(self, limit: int):
+        super().__init__(413, f"请求体超过 {limit} 字节")
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    future: asyncio.Future = field(compare=False)
+    timer: Optional[asyncio.TimerHandle] = field(default=None, compare=False)
+
+
+class AdmissionController:
+    """
+    带优先级和截止时间的并发准入
+
+    Args:
+        max_concurrency: 同时处理的请求数上限
+        queue_size: 等待队列容量
+        initial_service_time: 还没有完成的请求时使用的平均处理耗时（秒）
+        ewma_alpha: 处理耗时指数移动平均的权重
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 64,
+        queue_size: int = 256,
+        *,
+        initial_service_time: float = 1.0,
+        ewma_alpha: float = 0.2,
+    ):
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.ewma_alpha = ewma_alpha
+        self.service_time = initial_service_time
+
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._active = 0
+
+        # 指标
+        self.admitted = 0
+        self.completed = 0
+        self.rejected: Dict[str, int] = {}
+
+    @classmethod
+    def from_settings(cls, api_settings: APISettings) -> "AdmissionController":
+        """根据 APISettings 创建实例"""
+        return cls(api_settings.max_concurrent_requests, api_settings.max_queued_requests)
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def estimated_wait(self, priority: int) -> float:
+        """优先级为 priority 的新请求预计的排队时间（秒）"""
+        if self._active < self.max_concurrency and not self._queue:
+            return 0.0
+        ahead = sum(1 for waiter in self._queue if waiter.priority <= priority)
+        return (ahead // self.max_concurrency + 1) * self.service_time
+
+    def _reject(self, reason: str, wait: float) -> Rejected:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        return Rejected(reason, wait)
+
+    def _remove(self, waiter: _Waiter) -> None:
+        try:
+            self._queue.remove(waiter)
+        except ValueError:
+            return
+        heapq.heapify(self._queue)
+        if waiter.timer is not None:
+            waiter.timer.cancel()
+
+    def _expire(self, waiter: _Waiter) -> None:
+        if not waiter.future.done():
+            self._remove(waiter)
+            waiter.future.set_exception(self._reject("deadline", self.estimated_wait(waiter.priority)))
+
+    async def acquire(self, priority: int, deadline: float) -> None:
+        """
+        等待处理名额
+
+        Args:
+            priority: 请求优先级
+            deadline: 截止时间（事件循环时钟）
+
+        Raises:
+            Rejected: 队列已满、被更高优先级挤出或预计无法在截止时间前完成
+        """
+        loop = asyncio.get_running_loop()
+        if self._active < self.max_concurrency and not self._queue:
+            self._active += 1
+            self.admitted += 1
+            return
+
+        now = loop.time()
+        wait = self.estimated_wait(priority)
+        if now + wait + self.service_time > deadline:
+            raise self._reject("deadline", wait)
+        if len(self._queue) >= self.queue_size:
+            victim = max(self._queue) if self._queue else None
+            if victim is None or victim.priority <= priority:
+                raise self._reject("queue_full", wait)
+            self._remove(victim)
+            victim.future.set_exception(self._reject("shed", self.estimated_wait(victim.priority)))
+
+        waiter = _Waiter(priority, next(self._seq), loop.create_future())
+        # 剩余时间不足一次平均处理耗时时放弃等待
+        waiter.timer = loop.call_at(deadline - self.service_time, self._expire, waiter)
+        heapq.heappush(self._queue, waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            self._remove(waiter)
+            # 名额已经分配给这个请求，但调用方被取消
+            future = waiter.future
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()
+            raise
+        self.admitted += 1
+
+    def release(self, duration: Optional[float] = None) -> None:
+        """
+        归还名额
+
+        Args:
+            duration: 请求的处理耗时（秒），用于更新平均处理耗时
+        """
+        if duration is not None:
+            self.completed += 1
+            self.service_time += self.ewma_alpha * (duration - self.service_time)
+        self._active -= 1
+        while self._queue and self._active < self.max_concurrency:
+            waiter = heapq.heappop(self._queue)
+            if waiter.future.done():
+                continue
+            if waiter.timer is not None:
+                waiter.timer.cancel()
+            self._active += 1
+            waiter.future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        """当前状态和累计指标"""
+        return {
+            "active": self._active,
+            "queued": len(self._queue),
+            "service_time": round(self.service_time, 4),
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "rejected": dict(self.rejected),
+        }
+
+
+class AdmissionControlMiddleware:
+    """
+    准入控制与请求体大小限制（ASGI 中间件）
+
+    Args:
+        app: 下游 ASGI 应用
+        controller: 准入控制器，None 表示只限制请求体大小
+        request_timeout: 请求截止时间（秒）
+        max_request_size: 请求体大小上限（字节），None 表示不限制
+        priority_rules: (路径前缀, 优先级) 列表，按顺序匹配
+        exempt_paths: 不经过准入控制的路径
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        controller: Optional[AdmissionController],
+        *,
+        request_timeout: float,
+        max_request_size: Optional[int] = None,
+        priority_rules: Sequence[Tuple[str, RequestPriority]] = DEFAULT_PRIORITY_RULES,
+        exempt_paths: Sequence[str] = DEFAULT_EXEMPT_PATHS,
+    ):
+        self.app = app
+        self.controller = controller
+        self.request_timeout = request_timeout
+        self.max_request_size = max_request_size
+        self.priority_rules = tuple(priority_rules)
+        self.exempt_paths = frozenset(exempt_paths)
+
+    def classify(self, path: str) -> RequestPriority:
+        """按路径前缀确定优先级"""
+        for prefix, priority in self.priority_rules:
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                return priority
+        return RequestPriority.INTERACTIVE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.max_request_size is not None:
+            length = _content_length(scope)
+            if length is not None and length > self.max_request_size:
+                await _error(scope, receive, send, RequestTooLarge(self.max_request_size))
+                return
+
+        controller = self.controller
+        if controller is None or scope["path"] in self.exempt_paths:
+            await self._call_limited(scope, receive, send)
+            return
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.request_timeout
+        try:
+            await controller.acquire(self.classify(scope["path"]), deadline)
+        except Rejected as exc:
+            retry_after = str(max(1, math.ceil(exc.retry_after)))
+            response = JSONResponse(
+                {"detail": "服务繁忙，请稍后重试", "reason": exc.reason},
+                status_code=503,
+                headers={"Retry-After": retry_after},
+            )
+            await response(scope, receive, send)
+            return
+
+        start = loop.time()
+        try:
+            await self._call_limited(scope, receive, send)
+        finally:
+            controller.release(loop.time() - start)
+
+    async def _call_limited(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limit = self.max_request_size
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        received = 0
+        started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise RequestTooLarge(limit)
+            return message
+
+        async def tracked_send(message: Message) -> None:
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except RequestTooLarge as exc:
+            if started:
+                raise
+            await _error(scope, receive, send, exc)
+
+
+def _content_length(scope: Scope) -> Optional[int]:
+    for name, value in scope["headers"]:
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+async def _error(scope: Scope, receive: Receive, send: Send, exc: HTTPException) -> None:
+    response = JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
+    await response(scope, receive, send)
@@ -0,0 +1,199 @@
+"""
+响应编码：orjson JSON 响应与 SSE 流式输出
+
+JSON：
+- JSONResponse 用 orjson 编码（datetime、dataclass、NumPy 数组原生支持，pydantic
+  模型经 model_dump 转换），create_app 把它设为默认响应类
+- FastAPI 对路由返回的普通对象会先走 jsonable_encoder 逐层转换再交给响应类；
+  高频接口直接返回 JSONResponse(...) 可以跳过这一步
+
+SSE：
+- 帧的固定部分（"event: ..."、"data: "、结尾空行）预先编码为 bytes，每个事件只对
+  数据做一次 orjson 编码后拼接；orjson 输出不含换行，data 始终是单行
+- token 事件的 JSON 前后缀也预先编码，只转义 token 文本本身
+- coalesce_tokens 把合并窗口内陆续到达的小 token 合并为一个事件，减少帧数和
+  flush 次数；窗口从首个 token 到达时开始计时，累计达到 max_chars 时提前发送，
+  每个 token 最多被推迟一个窗口
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Union
+
+import orjson
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.responses import JSONResponse as _StarletteJSONResponse
+from starlette.responses import StreamingResponse
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+_DATA = b"data: "
+_EVENT = b"event: "
+_ID = b"id: "
+_END = b"\n\n"
+_NEWLINE = b"\n"
+_TOKEN_PREFIX = b'data: {"type":"token","content":'
+_TOKEN_SUFFIX = b"}\n\n"
+# 只含注释的 SSE 帧，用于保持连接
+KEEPALIVE = b": keepalive\n\n"
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"无法序列化类型: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """orjson 编码（与 JSONResponse 使用相同的选项）"""
+    return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+
+
+class JSONResponse(_StarletteJSONResponse):
+    """orjson 编码的 JSON 响应"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def sse_event(
+    data: Union[bytes, str, Any], event: Optional[str] = None, id: Optional[str] = None
+) -> bytes:
+    """
+    编码一个 SSE 事件
+
+    Args:
+        data: 已编码的单行 bytes / str 原样写入，其他对象按 JSON 编码
+        event: 事件类型
+        id: 事件 ID
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    elif not isinstance(data, bytes):
+        data = dumps(data)
+    parts = []
+    if event is not None:
+        parts += (_EVENT, event.encode("utf-8"), _NEWLINE)
+    if id is not None:
+        parts += (_ID, id.encode("utf-8"), _NEWLINE)
+    parts += (_DATA, data, _END)
+    return b"".join(parts)
+
+
+def token_event(text: str) -> bytes:
+    """编码 token 事件：data: {"type":"token","content":"..."}"""
+    return _TOKEN_PREFIX + orjson.dumps(text) + _TOKEN_SUFFIX
+
+
+async def coalesce_tokens(
+    tokens: AsyncIterator[str], window: float = 0.01, max_chars: int = 256
+) -> AsyncIterator[str]:
+    """
+    合并短时间内到达的 token
+
+    第一个 token 到达后等待 window 秒（累计达到 max_chars 时提前结束），把期间
+    到达的 token 合并输出。每个输出只设置一次定时器，而不是每个 token 一次。
+
+    Args:
+        tokens: token 流
+        window: 合并窗口（秒），0 表示不合并
+        max_chars: 累计达到该字符数时立即输出
+    """
+    if window <= 0:
+        async for token in tokens:
+            yield token
+        return
+
+    buffer: List[str] = []
+    size = 0
+    finished = False
+    ready = asyncio.Event()  # 缓冲区非空
+    full = asyncio.Event()  # 达到 max_chars 或 token 流结束
+
+    async def produce() -> None:
+        nonlocal size, finished
+        try:
+            async for token in tokens:
+                buffer.append(token)
+                size += len(token)
+                ready.set()
+                if size >= max_chars:
+                    full.set()
+        finally:
+            finished = True
+            ready.set()
+            full.set()
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            await ready.wait()
+            if not full.is_set():
+                try:
+                    await asyncio.wait_for(full.wait(), window)
+                except asyncio.TimeoutError:
+                    pass
+            if not buffer:
+                break
+            chunk = "".join(buffer)
+            buffer.clear()
+            size = 0
+            if not finished:
+                ready.clear()
+                full.clear()
+            yield chunk
+        # 生产者的异常（如 LLM 调用失败）传给调用方
+        await producer
+    finally:
+        if not producer.done():
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+
+class SSEResponse(StreamingResponse):
+    """
+    text/event-stream 响应
+
+    Args:
+        content: 已编码的 SSE 帧（bytes）流
+    """
+
+    media_type = "text/event-stream"
+
+    def __init__(
+        self,
+        content: AsyncIterator[bytes],
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        background: Optional[BackgroundTask] = None,
+    ):
+        merged: Dict[str, str] = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        merged.update(headers or {})
+        super().__init__(content, status_code, merged, background=background)
+
+
+def stream_tokens(
+    tokens: AsyncIterator[str],
+    *,
+    window: float = 0.01,
+    max_chars: int = 256,
+    done: Optional[Any] = None,
+) -> SSEResponse:
+    """
+    把 token 流包装为 SSE 响应：合并后的 token 事件，结束时发送 event: done
+
+    Args:
+        tokens: token 流
+        window: 合并窗口（秒）
+        max_chars: 单个事件最多合并的字符数
+        done: done 事件的数据，默认 {}
+    """
+
+    async def frames() -> AsyncIterator[bytes]:
+        async for text in coalesce_tokens(tokens, window, max_chars):
+            yield token_event(text)
+        yield sse_event({} if done is None else done, event="done")
+
+    return SSEResponse(frames())
@@ -0,0 +1,40 @@
+"""
+LangGraph 核心模块
+
+提供状态定义、图构建和检查点持久化
+"""
+
+from .checkpoint_gc import CheckpointGC
+from .checkpointer import create_checkpointer
+from .redis_saver import RedisSaver
+from .serde import CompactSerializer, create_serializer, train_dictionary
+from .sqlite_saver import DeltaSqliteSaver
+from .state import (
+    ChatbotState,
+    CompactMessage,
+    Role,
+    add_compact_messages,
+    from_langchain_messages,
+    to_langchain_messages,
+)
+from .write_behind import WriteBehindSaver
+
+__all__ = [
+    # 状态
+    "ChatbotState",
+    "CompactMessage",
+    "Role",
+    "add_compact_messages",
+    "from_langchain_messages",
+    "to_langchain_messages",
+    # 检查点
+    "DeltaSqliteSaver",
+    "RedisSaver",
+    "WriteBehindSaver",
+    "create_checkpointer",
+    "CheckpointGC",
+    # 序列化
+    "CompactSerializer",
+    "create_serializer",
+    "train_dictionary",
+]
@@ -0,0 +1,297 @@
+"""
+检查点后台垃圾回收（GC）
+
+写入路径上按 max_checkpoints 裁剪会拖慢每一次 put。CheckpointGC 在后台线程中
+周期性扫描 DeltaSqliteSaver（此时应关闭 auto_compact）：
+- 超过 max_checkpoints 的会话调用 compact() 裁剪历史
+- 最新检查点早于 idle_ttl 的会话整体过期：先对读取隐藏，再按批删除
+- 数据库处于 auto_vacuum=INCREMENTAL 时用 incremental_vacuum 分批归还空闲页
+
+I/O 预算（令牌桶，按行 / 页计费）限制 GC 的吞吐；拿不到存储锁时让路，
+保证前台读写不会被 GC 饿死。会话的最后活跃时间取自最新检查点 ID
+（uuid6 内含时间戳），无需额外维护时间列。
+"""
+
+import atexit
+import logging
+import threading
+import time
+from typing import Iterator, Optional, Tuple
+
+from langgraph.checkpoint.base.id import UUID
+
+from config.settings import CheckpointerSettings, RedisSettings
+from .sqlite_saver import DeltaSqliteSaver
+
+logger = logging.getLogger(__name__)
+
+# uuid1 / uuid6 纪元（1582-10-15）到 Unix 纪元的 100 纳秒间隔数
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+def checkpoint_timestamp(checkpoint_id: str) -> Optional[float]:
+    """从 uuid6 检查点 ID 中取出创建时间（Unix 秒），无法解析时返回 None"""
+    try:
+        uid = UUID(checkpoint_id)
+    except ValueError:
+        return None
+    if uid.version != 6:
+        return None
+    return (uid.time - _UUID_EPOCH_OFFSET) / 10_000_000
+
+
+class _IOBudget:
+    """令牌桶：每秒补充 rate 个单位，透支时等待（可被 stop 事件打断）"""
+
+    def __init__(self, rate: float, stop: threading.Event):
+        self.rate = rate
+        self.stop = stop
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def consume(self, amount: int) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        if self.tokens < 0:
+            self.stop.wait(-self.tokens / self.rate)
+
+
+class CheckpointGC:
+    """
+    DeltaSqliteSaver 的后台检查点回收
+
+    Args:
+        saver: 需要回收的检查点存储
+        interval: 两轮扫描之间的间隔（秒）
+        idle_ttl: 会话闲置多久后整体过期（秒），None 表示不过期
+        batch_size: 每批扫描的会话数，也是过期删除时每批删除的行数
+        max_rows_per_second: I/O 预算，每秒最多删除的行数（incremental_vacuum 按页计入）
+        vacuum_pages: 每轮最多归还的空闲页数，0 表示不做 incremental_vacuum
+    """
+
+    def __init__(
+        self,
+        saver: DeltaSqliteSaver,
+        *,
+        interval: float = 60.0,
+        idle_ttl: Optional[float] = None,
+        batch_size: int = 100,
+        max_rows_per_second: float = 5000,
+        vacuum_pages: int = 256,
+    ):
+        self.saver = saver
+        self.interval = interval
+        self.idle_ttl = idle_ttl
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+
+        self._stop = threading.Event()
+        self._budget = _IOBudget(max_rows_per_second, self._stop)
+        self._worker: Optional[threading.Thread] = None
+
+        # 指标
+        self.runs = 0
+        self.rows_pruned = 0
+        self.threads_expired = 0
+        self.bytes_reclaimed = 0
+
+    @classmethod
+    def from_settings(
+        cls,
+        saver: DeltaSqliteSaver,
+        cp_settings: CheckpointerSettings,
+        redis_settings: Optional[RedisSettings] = None,
+    ) -> "CheckpointGC":
+        """
+        根据 CheckpointerSettings 创建实例
+
+        会话过期时间取 gc_idle_ttl_seconds；未设置时沿用 RedisSettings.session_ttl，
+        两者都没有则不过期。
+        """
+        idle_ttl = cp_settings.gc_idle_ttl_seconds
+        if idle_ttl is None and redis_settings is not None:
+            idle_ttl = redis_settings.session_ttl
+        return cls(
+            saver,
+            interval=cp_settings.gc_interval_seconds,
+            idle_ttl=idle_ttl,
+            batch_size=cp_settings.gc_batch_size,
+            max_rows_per_second=cp_settings.gc_max_rows_per_second,
+            vacuum_pages=cp_settings.gc_vacuum_pages,
+        )
+
+    # ==================== 生命周期 ====================
+
+    def start(self) -> None:
+        """启动后台线程"""
+        if self._worker is not None:
+            return
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._run, name="checkpoint-gc", daemon=True)
+        self._worker.start()
+        atexit.register(self.stop)
+
+    @property
+    def running(self) -> bool:
+        """后台线程是否在当前进程中运行（fork 出的子进程不继承线程，为 False）"""
+        return self._worker is not None and self._worker.is_alive()
+
+    def stop(self) -> None:
+        """停止后台线程（正在进行的批次完成后退出）"""
+        if self._worker is None:
+            return
+        self._stop.set()
+        self._worker.join()
+        self._worker = None
+        atexit.unregister(self.stop)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:  # noqa: BLE001 - 单轮失败不能终止后台线程
+                logger.exception("检查点 GC 失败")
+            self._stop.wait(self.interval)
+
+    # ==================== 回收 ====================
+
+    def _acquire(self) -> bool:
+        """获取存储锁；前台持有锁时短暂让路，停止时返回 False"""
+        while not self.saver.lock.acquire(blocking=False):
+            if self._stop.wait(0.01):
+                return False
+        return True
+
+    def _scan(self) -> Iterator[Tuple[str, str, int, str]]:
+        """按 (thread_id, checkpoint_ns) 键集分页，逐批产出 (thread, ns, 检查点数, 最新 ID)"""
+        cursor: Optional[Tuple[str, str]] = None
+        while not self._stop.is_set():
+            where, params = "", ()
+            if cursor is not None:
+                where, params = "WHERE (thread_id, checkpoint_ns) > (?, ?) ", cursor
+            if not self._acquire():
+                return
+            try:
+                rows = self.saver.conn.execute(
+                    "SELECT thread_id, checkpoint_ns, COUNT(*), MAX(checkpoint_id) FROM checkpoints "
+                    f"{where}GROUP BY thread_id, checkpoint_ns "
+                    "ORDER BY thread_id, checkpoint_ns LIMIT ?",
+                    (*params, self.batch_size),
+                ).fetchall()
+            finally:
+                self.saver.lock.release()
+            yield from rows
+            if len(rows) < self.batch_size:
+                return
+            cursor = (rows[-1][0], rows[-1][1])
+
+    def run_once(self, now: Optional[float] = None) -> int:
+        """
+        执行一轮完整扫描
+
+        Args:
+            now: 判断闲置的当前时间（Unix 秒），默认 time.time()
+
+        Returns:
+            本轮删除的检查点行数
+        """
+        now = time.time() if now is None else now
+        pruned = 0
+        for thread_id, checkpoint_ns, count, latest_id in self._scan():
+            if self._stop.is_set():
+                break
+            created = checkpoint_timestamp(latest_id)
+            if self.idle_ttl is not None and created is not None and now - created > self.idle_ttl:
+                pruned += self._expire(thread_id, checkpoint_ns, latest_id)
+            elif count > self.saver.max_checkpoints:
+                pruned += self._prune(thread_id, checkpoint_ns)
+        if self.vacuum_pages:
+            self._vacuum()
+        self.runs += 1
+        return pruned
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> int:
+        if not self._acquire():
+            return 0
+        try:
+            deleted = self.saver.compact(thread_id, checkpoint_ns)
+        finally:
+            self.saver.lock.release()
+        self.rows_pruned += deleted
+        self._budget.consume(deleted)
+        return deleted
+
+    def _expire(self, thread_id: str, checkpoint_ns: str, latest_id: str) -> int:
+        """
+        按批删除闲置会话
+
+        第一批在存储锁内检查会话仍然闲置，并登记过期水位：此后不晚于 latest_id 的
+        检查点对读取不可见，批次之间的读取看到空会话，不会回退到更旧的检查点；
+        期间的新写入不以它们为父检查点，也不会被删除。
+        """
+        key = (thread_id, checkpoint_ns)
+        if not self._acquire():
+            return 0
+        try:
+            newest = self.saver.conn.execute(
+                "SELECT MAX(checkpoint_id) FROM checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ?",
+                (thread_id, checkpoint_ns),
+            ).fetchone()[0]
+            if newest is not None and newest > latest_id:
+                return 0
+            self.saver._expiring[key] = latest_id
+            self.saver._latest.pop(key, None)
+            self.saver._puts_since_compact.pop(key, None)
+        finally:
+            self.saver.lock.release()
+
+        deleted = 0
+        for table in ("checkpoints", "writes"):
+            while True:
+                # 中途停止时保留水位，未删完的检查点继续对读取不可见
+                if not self._acquire():
+                    return deleted
+                try:
+                    # 从旧到新删除：进程中途退出（水位丢失）时，最新检查点要么完整保留，
+                    # 要么因基线已删除而无法恢复，同样不会回退
+                    rows = self.saver.conn.execute(
+                        f"DELETE FROM {table} WHERE rowid IN ("
+                        f"SELECT rowid FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? "
+                        "AND checkpoint_id <= ? ORDER BY checkpoint_id LIMIT ?)",
+                        (thread_id, checkpoint_ns, latest_id, self.batch_size),
+                    ).rowcount
+                    if table == "writes" and rows < self.batch_size:
+                        self.saver._expiring.pop(key, None)
+                finally:
+                    self.saver.lock.release()
+                if table == "checkpoints":
+                    deleted += rows
+                    self.rows_pruned += rows
+                self._budget.consume(rows)
+                if rows < self.batch_size:
+                    break
+        self.threads_expired += 1
+        return deleted
+
+    def _vacuum(self) -> None:
+        """归还空闲页，数据库未启用 auto_vacuum=INCREMENTAL 时跳过"""
+        if not self._acquire():
+            return
+        try:
+            conn = self.saver.conn
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                return
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not before:
+                return
+            # execute() 只单步执行该 PRAGMA（每步释放一页），executescript 才会执行到底
+            conn.executescript(f"PRAGMA incremental_vacuum({min(before, self.vacuum_pages)});")
+            after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        finally:
+            self.saver.lock.release()
+        self.bytes_reclaimed += (before - after) * page_size
+        self._budget.consume(before - after)
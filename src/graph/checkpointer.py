@@ -0,0 +1,86 @@
+"""
+检查点持久化管理
+
+根据 CheckpointerSettings 创建 LangGraph checkpointer
+"""
+
+from typing import Any, Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+
+from config.settings import CheckpointerSettings, DatabaseSettings, RedisSettings
+from .checkpoint_gc import CheckpointGC
+from .redis_saver import RedisSaver
+from .serde import create_serializer
+from .sqlite_saver import DeltaSqliteSaver
+from .write_behind import WriteBehindSaver
+
+
+def _create_postgres_saver(db_settings: DatabaseSettings, **kwargs: Any) -> BaseCheckpointSaver:
+    try:
+        from langgraph.checkpoint.postgres import PostgresSaver
+        from psycopg import Connection
+        from psycopg.rows import dict_row
+    except ImportError:
+        raise ImportError(
+            "postgresql 检查点存储需要安装 langgraph-checkpoint-postgres"
+        ) from None
+
+    conn_string = (
+        f"postgresql://{db_settings.username}:{db_settings.password}"
+        f"@{db_settings.host}:{db_settings.port}/{db_settings.database}"
+    )
+    conn = Connection.connect(conn_string, autocommit=True, prepare_threshold=0, row_factory=dict_row)
+    saver = PostgresSaver(conn, **kwargs)
+    saver.setup()
+    return saver
+
+
+def create_checkpointer(
+    cp_settings: CheckpointerSettings,
+    redis_settings: Optional[RedisSettings] = None,
+    db_settings: Optional[DatabaseSettings] = None,
+    **kwargs: Any,
+) -> BaseCheckpointSaver:
+    """
+    创建检查点存储
+
+    Args:
+        cp_settings: 检查点配置
+        redis_settings: Redis 配置（checkpointer_type 为 redis 时必需；sqlite 后台 GC
+            未设置 gc_idle_ttl_seconds 时以 session_ttl 作为会话闲置过期时间）
+        db_settings: 数据库配置（checkpointer_type 为 postgresql 时必需）
+        **kwargs: 透传给具体实现的参数；未指定 serde 时按 cp_settings.serializer 创建
+
+    Returns:
+        BaseCheckpointSaver 实例；durability_mode 不是 sync 时外层包装 WriteBehindSaver；
+        sqlite 且 gc_enabled 时关闭写入路径裁剪，并启动挂载在 saver.gc 上的 CheckpointGC
+    """
+    if "serde" not in kwargs:
+        kwargs["serde"] = create_serializer(cp_settings)
+
+    saver: BaseCheckpointSaver
+    if cp_settings.checkpointer_type == "memory":
+        saver = InMemorySaver(**kwargs)
+    elif cp_settings.checkpointer_type == "sqlite":
+        if cp_settings.gc_enabled:
+            kwargs.setdefault("auto_compact", False)
+        saver = DeltaSqliteSaver.from_settings(cp_settings, **kwargs)
+        if cp_settings.gc_enabled:
+            saver.gc = CheckpointGC.from_settings(saver, cp_settings, redis_settings)
+            saver.gc.start()
+    elif cp_settings.checkpointer_type == "redis":
+        if redis_settings is None:
+            raise ValueError("redis 检查点存储需要提供 RedisSettings")
+        saver = RedisSaver.from_settings(redis_settings, cp_settings, **kwargs)
+    elif cp_settings.checkpointer_type == "postgresql":
+        if db_settings is None:
+            raise ValueError("postgresql 检查点存储需要提供 DatabaseSettings")
+        saver = _create_postgres_saver(db_settings, **kwargs)
+    else:
+        raise ValueError(f"不支持的检查点存储类型: {cp_settings.checkpointer_type}")
+
+    if cp_settings.durability_mode != "sync":
+        saver = WriteBehindSaver.from_settings(saver, cp_settings)
+    return saver
@@ -0,0 +1,509 @@
+"""
+Redis 检查点存储
+
+数据布局（同一会话的键共享 {thread_id} hash tag，集群下落在同一 slot）：
+- {prefix}:{thread}:{ns}:index         有序集合，成员为 checkpoint_id（分数均为 0，按字典序排序）
+- {prefix}:{thread}:{ns}:cp:{id}       哈希，保存检查点、元数据和父检查点 ID
+- {prefix}:{thread}:{ns}:writes:{id}   哈希，保存该检查点的 pending writes
+- {prefix}:{thread}:namespaces         集合，记录会话用到的命名空间
+
+每次 put 的全部命令（含裁剪脚本）在一个 pipeline 中一次往返完成，
+超过 max_checkpoints 的旧检查点由 Lua 脚本在服务端删除；所有键按
+session_ttl 续期，闲置会话整体过期。
+
+单 slot 约定：裁剪和读取最新检查点时，要访问的检查点 ID 只能在服务端得到，
+脚本用 ARGV 传入的键前缀拼出这些键。前缀与 KEYS[1] 共享同一个 {thread_id}
+hash tag，拼出的键必然与 KEYS[1] 落在同一 slot，集群下脚本仍只访问一个 slot。
+因此 key_prefix 不能包含花括号（否则 hash tag 取自前缀）。
+"""
+
+import json
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import ormsgpack
+import redis
+import redis.asyncio as aioredis
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from config.settings import CheckpointerSettings, RedisSettings
+from src.storage.redis_client import create_async_redis_client, create_redis_client
+from src.utils import traced
+
+# 裁剪到 max_checkpoints：KEYS[1]=index，ARGV=[max, cp 键前缀, writes 键前缀]
+# （前缀与 KEYS[1] 共享 hash tag，见模块说明中的单 slot 约定）
+_TRIM_SCRIPT = """
+local excess = redis.call('ZCARD', KEYS[1]) - tonumber(ARGV[1])
+if excess <= 0 then
+    return 0
+end
+local ids = redis.call('ZRANGE', KEYS[1], 0, excess - 1)
+for _, id in ipairs(ids) do
+    redis.call('DEL', ARGV[2] .. id, ARGV[3] .. id)
+end
+redis.call('ZREMRANGEBYRANK', KEYS[1], 0, excess - 1)
+return excess
+"""
+
+# 一次往返读取检查点及其 writes：
+# - 指定 ID：KEYS=[index, cp 键, writes 键]，ARGV=[checkpoint_id]
+# - 最新：KEYS=[index]，ARGV=['', cp 键前缀, writes 键前缀]（单 slot 约定）
+_GET_SCRIPT = """
+local id = ARGV[1]
+if id ~= '' then
+    return {id, redis.call('HGETALL', KEYS[2]), redis.call('HGETALL', KEYS[3])}
+end
+local ids = redis.call('ZREVRANGE', KEYS[1], 0, 0)
+if #ids == 0 then
+    return nil
+end
+id = ids[1]
+return {id, redis.call('HGETALL', ARGV[2] .. id), redis.call('HGETALL', ARGV[3] .. id)}
+"""
+
+
+def _pairs_to_dict(items: Sequence[Any]) -> Dict[bytes, bytes]:
+    return {items[i]: items[i + 1] for i in range(0, len(items), 2)}
+
+
+def _decode(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class RedisSaver(BaseCheckpointSaver[int]):
+    """
+    基于 Redis 的检查点存储（LangGraph BaseCheckpointSaver 实现）
+
+    Args:
+        client: 同步客户端（供 get_tuple / put 等同步接口使用）
+        aclient: 异步客户端（供 aget_tuple / aput 等异步接口使用）
+        max_checkpoints: 每个会话保留的检查点数量，None 表示不裁剪
+        ttl: 键的过期时间（秒），None 表示不过期
+        key_prefix: 键前缀（不能包含花括号，见单 slot 约定）
+        serde: 序列化器
+    """
+
+    def __init__(
+        self,
+        client: Optional[redis.Redis] = None,
+        aclient: Optional[aioredis.Redis] = None,
+        *,
+        max_checkpoints: Optional[int] = None,
+        ttl: Optional[int] = None,
+        key_prefix: str = "checkpoint",
+        serde: Optional[SerializerProtocol] = None,
+    ):
+        super().__init__(serde=serde)
+        if client is None and aclient is None:
+            raise ValueError("client 和 aclient 至少需要提供一个")
+        if "{" in key_prefix or "}" in key_prefix:
+            raise ValueError("key_prefix 不能包含花括号，会话键依赖 {thread_id} hash tag")
+        self.client = client
+        self.aclient = aclient
+        self.max_checkpoints = max_checkpoints
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        if client is not None:
+            self._trim = client.register_script(_TRIM_SCRIPT)
+            self._get = client.register_script(_GET_SCRIPT)
+        if aclient is not None:
+            self._atrim = aclient.register_script(_TRIM_SCRIPT)
+            self._aget = aclient.register_script(_GET_SCRIPT)
+
+    @classmethod
+    def from_settings(
+        cls,
+        redis_settings: RedisSettings,
+        cp_settings: CheckpointerSettings,
+        **kwargs: Any,
+    ) -> "RedisSaver":
+        """根据 RedisSettings（连接池、TTL）和 CheckpointerSettings 创建实例"""
+        return cls(
+            create_redis_client(redis_settings),
+            create_async_redis_client(redis_settings),
+            max_checkpoints=cp_settings.max_checkpoints,
+            ttl=redis_settings.session_ttl,
+            **kwargs,
+        )
+
+    # ==================== 键 ====================
+
+    def _ns_prefix(self, thread_id: str, checkpoint_ns: str) -> str:
+        return f"{self.key_prefix}:{{{thread_id}}}:{checkpoint_ns}"
+
+    def _index_key(self, thread_id: str, checkpoint_ns: str) -> str:
+        return f"{self._ns_prefix(thread_id, checkpoint_ns)}:index"
+
+    def _cp_prefix(self, thread_id: str, checkpoint_ns: str) -> str:
+        return f"{self._ns_prefix(thread_id, checkpoint_ns)}:cp:"
+
+    def _writes_prefix(self, thread_id: str, checkpoint_ns: str) -> str:
+        return f"{self._ns_prefix(thread_id, checkpoint_ns)}:writes:"
+
+    def _namespaces_key(self, thread_id: str) -> str:
+        return f"{self.key_prefix}:{{{thread_id}}}:namespaces"
+
+    def _get_script_args(self, config: RunnableConfig) -> Tuple[List[str], List[str]]:
+        """读取脚本的 (keys, args)：指定 ID 时全部键都在 KEYS 中声明"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        index_key = self._index_key(thread_id, checkpoint_ns)
+        cp_prefix = self._cp_prefix(thread_id, checkpoint_ns)
+        writes_prefix = self._writes_prefix(thread_id, checkpoint_ns)
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id:
+            return [index_key, cp_prefix + checkpoint_id, writes_prefix + checkpoint_id], [checkpoint_id]
+        return [index_key], ["", cp_prefix, writes_prefix]
+
+    # ==================== 编解码 ====================
+
+    def _queue_put(
+        self,
+        pipe: Any,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+    ) -> Tuple[RunnableConfig, List[str], List[Any]]:
+        """把一次 put 的命令加入 pipeline，返回 (新 config, 裁剪脚本 keys, args)"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_id = config["configurable"].get("checkpoint_id") or ""
+        type_, blob = self.serde.dumps_typed(checkpoint)
+        cp_key = self._cp_prefix(thread_id, checkpoint_ns) + checkpoint["id"]
+        index_key = self._index_key(thread_id, checkpoint_ns)
+        namespaces_key = self._namespaces_key(thread_id)
+
+        pipe.hset(
+            cp_key,
+            mapping={
+                "type": type_,
+                "checkpoint": blob,
+                "metadata": json.dumps(get_checkpoint_metadata(config, metadata), ensure_ascii=False),
+                "parent": parent_id,
+            },
+        )
+        pipe.zadd(index_key, {checkpoint["id"]: 0})
+        pipe.sadd(namespaces_key, checkpoint_ns)
+        if self.ttl:
+            for key in (cp_key, index_key, namespaces_key):
+                pipe.expire(key, self.ttl)
+
+        new_config = {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+        trim_args = [
+            self.max_checkpoints,
+            self._cp_prefix(thread_id, checkpoint_ns),
+            self._writes_prefix(thread_id, checkpoint_ns),
+        ]
+        return new_config, [index_key], trim_args
+
+    def _queue_put_writes(
+        self,
+        pipe: Any,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str,
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        key = self._writes_prefix(thread_id, checkpoint_ns) + config["configurable"]["checkpoint_id"]
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            type_, blob = self.serde.dumps_typed(value)
+            field = f"{task_id}:{write_idx}"
+            packed = ormsgpack.packb([task_id, write_idx, channel, type_, blob, task_path])
+            # 特殊写入（错误、中断等）允许覆盖，普通写入已存在则跳过
+            if write_idx < 0:
+                pipe.hset(key, field, packed)
+            else:
+                pipe.hsetnx(key, field, packed)
+        if self.ttl:
+            pipe.expire(key, self.ttl)
+
+    def _parse(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        data: Dict[bytes, bytes],
+        writes: Dict[bytes, bytes],
+    ) -> CheckpointTuple:
+        parent_id = _decode(data.get(b"parent", b""))
+        unpacked = sorted(ormsgpack.unpackb(v) for v in writes.values())
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((_decode(data[b"type"]), data[b"checkpoint"])),
+            metadata=json.loads(data[b"metadata"]),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task, channel, self.serde.loads_typed((type_, blob)))
+                for task, _, channel, type_, blob, _ in unpacked
+            ],
+        )
+
+    def _parse_get(
+        self, thread_id: str, checkpoint_ns: str, result: Any
+    ) -> Optional[CheckpointTuple]:
+        if not result:
+            return None
+        checkpoint_id, data, writes = result
+        data = _pairs_to_dict(data)
+        if not data:
+            return None
+        return self._parse(
+            thread_id, checkpoint_ns, _decode(checkpoint_id), data, _pairs_to_dict(writes)
+        )
+
+    @staticmethod
+    def _upper_bound(before: Optional[RunnableConfig]) -> str:
+        """ZREVRANGEBYLEX 的上界：before 之前（不含）或最新"""
+        before_id = get_checkpoint_id(before) if before else None
+        return f"({before_id}" if before_id else "+"
+
+    @staticmethod
+    def _matches(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+        return not filter or all(metadata.get(k) == v for k, v in filter.items())
+
+    # ==================== 同步接口 ====================
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """获取指定（或最新）检查点，一次往返"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        keys, args = self._get_script_args(config)
+        result = self._get(keys=keys, args=args)
+        return self._parse_get(thread_id, checkpoint_ns, result)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """按 checkpoint_id 倒序列出某会话的检查点"""
+        if config is None:
+            raise ValueError("RedisSaver.list 需要指定 thread_id")
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        if get_checkpoint_id(config):
+            item = self.get_tuple(config)
+            if item is not None and self._matches(item.metadata, filter):
+                yield item
+            return
+
+        page = None if filter else limit
+        ids = self.client.zrevrangebylex(
+            self._index_key(thread_id, checkpoint_ns),
+            self._upper_bound(before),
+            "-",
+            *((0, page) if page is not None else ()),
+        )
+        with self.client.pipeline(transaction=False) as pipe:
+            for cid in ids:
+                pipe.hgetall(self._cp_prefix(thread_id, checkpoint_ns) + _decode(cid))
+                pipe.hgetall(self._writes_prefix(thread_id, checkpoint_ns) + _decode(cid))
+            results = pipe.execute()
+
+        remaining = limit
+        for i, cid in enumerate(ids):
+            data, writes = results[2 * i], results[2 * i + 1]
+            if not data:
+                continue
+            if remaining is not None and remaining <= 0:
+                break
+            item = self._parse(thread_id, checkpoint_ns, _decode(cid), data, writes)
+            if not self._matches(item.metadata, filter):
+                continue
+            if remaining is not None:
+                remaining -= 1
+            yield item
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """保存检查点并在服务端裁剪，一次往返"""
+        for attempt in range(2):
+            try:
+                with self.client.pipeline(transaction=True) as pipe:
+                    new_config, keys, args = self._queue_put(pipe, config, checkpoint, metadata)
+                    if self.max_checkpoints:
+                        pipe.evalsha(self._trim.sha, len(keys), *keys, *args)
+                    pipe.execute()
+                return new_config
+            except redis.exceptions.NoScriptError:
+                # 服务端脚本缓存被清空（重启 / SCRIPT FLUSH）：加载后重试，命令均为幂等
+                if attempt:
+                    raise
+                self.client.script_load(_TRIM_SCRIPT)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """保存 pending writes，一次往返"""
+        with self.client.pipeline(transaction=True) as pipe:
+            self._queue_put_writes(pipe, config, writes, task_id, task_path)
+            pipe.execute()
+
+    def delete_thread(self, thread_id: str) -> None:
+        """删除会话的全部检查点和 pending writes"""
+        namespaces_key = self._namespaces_key(thread_id)
+        namespaces = [_decode(ns) for ns in self.client.smembers(namespaces_key)]
+        with self.client.pipeline(transaction=False) as pipe:
+            for ns in namespaces:
+                pipe.zrange(self._index_key(thread_id, ns), 0, -1)
+            id_lists = pipe.execute()
+        with self.client.pipeline(transaction=True) as pipe:
+            for ns, ids in zip(namespaces, id_lists):
+                keys = [self._index_key(thread_id, ns)]
+                for cid in ids:
+                    keys.append(self._cp_prefix(thread_id, ns) + _decode(cid))
+                    keys.append(self._writes_prefix(thread_id, ns) + _decode(cid))
+                pipe.delete(*keys)
+            pipe.delete(namespaces_key)
+            pipe.execute()
+
+    # ==================== 异步接口 ====================
+
+    @traced("checkpoint.get")
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        keys, args = self._get_script_args(config)
+        result = await self._aget(keys=keys, args=args)
+        return self._parse_get(thread_id, checkpoint_ns, result)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        if config is None:
+            raise ValueError("RedisSaver.alist 需要指定 thread_id")
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        if get_checkpoint_id(config):
+            item = await self.aget_tuple(config)
+            if item is not None and self._matches(item.metadata, filter):
+                yield item
+            return
+
+        page = None if filter else limit
+        ids = await self.aclient.zrevrangebylex(
+            self._index_key(thread_id, checkpoint_ns),
+            self._upper_bound(before),
+            "-",
+            *((0, page) if page is not None else ()),
+        )
+        async with self.aclient.pipeline(transaction=False) as pipe:
+            for cid in ids:
+                pipe.hgetall(self._cp_prefix(thread_id, checkpoint_ns) + _decode(cid))
+                pipe.hgetall(self._writes_prefix(thread_id, checkpoint_ns) + _decode(cid))
+            results = await pipe.execute()
+
+        remaining = limit
+        for i, cid in enumerate(ids):
+            data, writes = results[2 * i], results[2 * i + 1]
+            if not data:
+                continue
+            if remaining is not None and remaining <= 0:
+                break
+            item = self._parse(thread_id, checkpoint_ns, _decode(cid), data, writes)
+            if not self._matches(item.metadata, filter):
+                continue
+            if remaining is not None:
+                remaining -= 1
+            yield item
+
+    @traced("checkpoint.put")
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        for attempt in range(2):
+            try:
+                async with self.aclient.pipeline(transaction=True) as pipe:
+                    new_config, keys, args = self._queue_put(pipe, config, checkpoint, metadata)
+                    if self.max_checkpoints:
+                        pipe.evalsha(self._atrim.sha, len(keys), *keys, *args)
+                    await pipe.execute()
+                return new_config
+            except redis.exceptions.NoScriptError:
+                if attempt:
+                    raise
+                await self.aclient.script_load(_TRIM_SCRIPT)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        async with self.aclient.pipeline(transaction=True) as pipe:
+            self._queue_put_writes(pipe, config, writes, task_id, task_path)
+            await pipe.execute()
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        namespaces_key = self._namespaces_key(thread_id)
+        namespaces = [_decode(ns) for ns in await self.aclient.smembers(namespaces_key)]
+        async with self.aclient.pipeline(transaction=False) as pipe:
+            for ns in namespaces:
+                pipe.zrange(self._index_key(thread_id, ns), 0, -1)
+            id_lists = await pipe.execute()
+        async with self.aclient.pipeline(transaction=True) as pipe:
+            for ns, ids in zip(namespaces, id_lists):
+                keys = [self._index_key(thread_id, ns)]
+                for cid in ids:
+                    keys.append(self._cp_prefix(thread_id, ns) + _decode(cid))
+                    keys.append(self._writes_prefix(thread_id, ns) + _decode(cid))
+                pipe.delete(*keys)
+            pipe.delete(namespaces_key)
+            await pipe.execute()
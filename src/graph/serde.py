@@ -0,0 +1,159 @@
+"""
+紧凑检查点序列化：msgpack + zstd
+
+在 LangGraph JsonPlusSerializer（msgpack 编码）之上做 zstd 压缩，可选使用
+在检查点语料上训练的共享字典（消息文本高度重复，字典对小对象提升明显）。
+
+压缩后的类型标记为 "<原类型>+zstd"，数据带版本头：
+
+    magic(2 字节 b"CZ") | version(1) | dict_id(4, 大端，0 表示无字典) | zstd 帧
+
+没有 "+zstd" 后缀的旧数据（msgpack / json / pickle 等）直接交给内层序列化器，
+因此切换序列化器后历史检查点仍然可读。
+"""
+
+import glob
+import os
+import struct
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import zstandard
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from config.settings import CheckpointerSettings
+
+MAGIC = b"CZ"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct(">2sBI")
+_SUFFIX = "+zstd"
+
+
+def train_dictionary(samples: Iterable[bytes], dict_size: int = 112 * 1024) -> bytes:
+    """
+    在检查点样本上训练 zstd 字典
+
+    Args:
+        samples: 内层序列化器输出的原始字节（未压缩）
+        dict_size: 字典大小（字节）
+
+    Returns:
+        字典内容，可写入 <dictionary_dir>/<任意名>.zdict
+    """
+    return zstandard.train_dictionary(dict_size, list(samples)).as_bytes()
+
+
+class CompactSerializer(SerializerProtocol):
+    """
+    msgpack + zstd 检查点序列化器
+
+    Args:
+        serde: 内层序列化器，默认 JsonPlusSerializer
+        level: zstd 压缩级别
+        dictionary: 编码使用的字典内容，None 表示不使用字典
+        extra_dictionaries: 仅用于解码旧数据的历史字典
+        min_size: 小于该字节数的数据不压缩
+    """
+
+    def __init__(
+        self,
+        serde: Optional[SerializerProtocol] = None,
+        *,
+        level: int = 3,
+        dictionary: Optional[bytes] = None,
+        extra_dictionaries: Iterable[bytes] = (),
+        min_size: int = 64,
+    ):
+        self.serde = serde or JsonPlusSerializer()
+        self.level = level
+        self.min_size = min_size
+
+        self._dictionaries: Dict[int, zstandard.ZstdCompressionDict] = {}
+        for data in extra_dictionaries:
+            self._register(data)
+        self._dict_id = self._register(dictionary) if dictionary else 0
+        self._local = threading.local()
+
+    @classmethod
+    def from_settings(cls, cp_settings: CheckpointerSettings) -> "CompactSerializer":
+        """
+        根据 CheckpointerSettings 创建实例
+
+        zstd_dictionary_dir 下按文件名排序的最后一个 *.zdict 作为编码字典，
+        其余字典只用于解码旧数据。
+        """
+        dictionaries = []
+        if cp_settings.zstd_dictionary_dir:
+            for path in sorted(glob.glob(os.path.join(cp_settings.zstd_dictionary_dir, "*.zdict"))):
+                with open(path, "rb") as f:
+                    dictionaries.append(f.read())
+        return cls(
+            level=cp_settings.compression_level,
+            dictionary=dictionaries[-1] if dictionaries else None,
+            extra_dictionaries=dictionaries[:-1],
+        )
+
+    def _register(self, data: bytes) -> int:
+        zdict = zstandard.ZstdCompressionDict(data)
+        dict_id = zdict.dict_id()
+        self._dictionaries[dict_id] = zdict
+        return dict_id
+
+    # 压缩器 / 解压器不是线程安全的，按线程缓存（创建带字典的实例开销较大）
+
+    def _compressor(self) -> zstandard.ZstdCompressor:
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = zstandard.ZstdCompressor(
+                level=self.level,
+                dict_data=self._dictionaries.get(self._dict_id),
+                write_content_size=True,
+                write_dict_id=False,
+            )
+            self._local.compressor = compressor
+        return compressor
+
+    def _decompressor(self, dict_id: int) -> zstandard.ZstdDecompressor:
+        cache = getattr(self._local, "decompressors", None)
+        if cache is None:
+            cache = self._local.decompressors = {}
+        decompressor = cache.get(dict_id)
+        if decompressor is None:
+            if dict_id and dict_id not in self._dictionaries:
+                raise ValueError(f"缺少解码所需的 zstd 字典: dict_id={dict_id}")
+            decompressor = zstandard.ZstdDecompressor(dict_data=self._dictionaries.get(dict_id))
+            cache[dict_id] = decompressor
+        return decompressor
+
+    # ==================== SerializerProtocol ====================
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.serde.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self.serde.loads(data)
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) < self.min_size:
+            return type_, data
+        header = _HEADER.pack(MAGIC, FORMAT_VERSION, self._dict_id)
+        return type_ + _SUFFIX, header + self._compressor().compress(data)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if not type_.endswith(_SUFFIX):
+            return self.serde.loads_typed((type_, payload))
+        magic, version, dict_id = _HEADER.unpack_from(payload)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"无法识别的检查点数据头: magic={magic!r}, version={version}")
+        raw = self._decompressor(dict_id).decompress(payload[_HEADER.size:])
+        return self.serde.loads_typed((type_[: -len(_SUFFIX)], raw))
+
+
+def create_serializer(cp_settings: CheckpointerSettings) -> Optional[SerializerProtocol]:
+    """根据配置创建检查点序列化器，jsonplus 返回 None（使用存储默认序列化器）"""
+    if cp_settings.serializer == "compact":
+        return CompactSerializer.from_settings(cp_settings)
+    return None
@@ -0,0 +1,612 @@
+"""
+SQLite 增量检查点存储
+
+每个检查点只保存相对父检查点发生变化的状态键（增量），每隔
+base_interval 个增量写一次完整快照（基线）：
+- 追加型列表（如 messages）只保存新追加的元素
+- 其他发生变化的键保存新值，被删除的键记录删除标记
+- 恢复时用一条递归 CTE 取出 "基线 + 增量链" 并按顺序重放
+
+压缩（compact）把保留窗口中最旧的、依赖已删除检查点的增量折叠为新基线，
+然后按范围删除超出 max_checkpoints 的旧检查点及其 pending writes。
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from config.settings import CheckpointerSettings
+from src.utils import traced
+
+# 检查点记录类型
+KIND_BASE = 0
+KIND_DELTA = 1
+
+_MISSING = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    kind INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    type TEXT,
+    checkpoint BLOB NOT NULL,
+    metadata TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+# 从目标检查点沿 parent 指针回溯到最近的基线
+_CHAIN_SQL = """
+WITH RECURSIVE chain(checkpoint_id, parent_checkpoint_id, kind, type, checkpoint, lvl) AS (
+    SELECT checkpoint_id, parent_checkpoint_id, kind, type, checkpoint, 0
+    FROM checkpoints
+    WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?
+    UNION ALL
+    SELECT c.checkpoint_id, c.parent_checkpoint_id, c.kind, c.type, c.checkpoint, chain.lvl + 1
+    FROM checkpoints c JOIN chain ON c.checkpoint_id = chain.parent_checkpoint_id
+    WHERE c.thread_id = ? AND c.checkpoint_ns = ? AND chain.kind = 1
+)
+SELECT kind, type, checkpoint FROM chain ORDER BY lvl DESC
+"""
+
+
+def _is_prefix(old: list, new: list) -> bool:
+    """old 是否为 new 的前缀（先比较对象身份，避免逐个 __eq__）"""
+    if len(old) > len(new):
+        return False
+    for a, b in zip(old, new):
+        if a is not b and a != b:
+            return False
+    return True
+
+
+def _snapshot(values: Dict[str, Any]) -> Dict[str, Any]:
+    """缓存父状态时复制列表本身，防止调用方原地修改后影响前缀判断"""
+    return {k: list(v) if isinstance(v, list) else v for k, v in values.items()}
+
+
+def diff_channel_values(
+    parent: Dict[str, Any], values: Dict[str, Any], new_versions: ChannelVersions
+) -> Tuple[Dict[str, Any], Dict[str, list], List[str]]:
+    """
+    计算相对父状态的增量
+
+    Args:
+        parent: 父检查点的 channel_values
+        values: 当前检查点的 channel_values
+        new_versions: 本步版本号发生变化的 channel
+
+    Returns:
+        (set, append, delete)：整体替换的键、追加元素的列表键、被删除的键
+    """
+    set_: Dict[str, Any] = {}
+    append: Dict[str, list] = {}
+    for key, value in values.items():
+        old = parent.get(key, _MISSING)
+        if old is not _MISSING and key not in new_versions:
+            continue
+        if isinstance(value, list) and isinstance(old, list) and _is_prefix(old, value):
+            if len(value) > len(old):
+                append[key] = value[len(old):]
+        else:
+            set_[key] = value
+    delete = [key for key in parent if key not in values]
+    return set_, append, delete
+
+
+def apply_delta(values: Dict[str, Any], delta: Dict[str, Any]) -> None:
+    """把一条增量原地应用到 values 上"""
+    values.update(delta["set"])
+    for key, tail in delta["append"].items():
+        values[key] = values.get(key, []) + tail
+    for key in delta["delete"]:
+        values.pop(key, None)
+
+
+class DeltaSqliteSaver(BaseCheckpointSaver[int]):
+    """
+    基于 SQLite 的增量检查点存储（LangGraph BaseCheckpointSaver 实现）
+
+    Args:
+        path: SQLite 文件路径，":memory:" 表示内存数据库
+        base_interval: 增量链长度上限，达到后写入完整基线；1 表示每步都写完整快照
+        max_checkpoints: 每个会话保留的检查点数量
+        auto_compact: 是否在写入路径上按需触发压缩
+        cache_size: 缓存最新状态（用于计算增量）的会话数量
+        serde: 序列化器
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        *,
+        base_interval: int = 20,
+        max_checkpoints: int = 10,
+        auto_compact: bool = True,
+        cache_size: int = 1024,
+        serde: Optional[SerializerProtocol] = None,
+    ):
+        super().__init__(serde=serde)
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.base_interval = base_interval
+        self.max_checkpoints = max_checkpoints
+        self.auto_compact = auto_compact
+        self.cache_size = cache_size
+
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # 仅对新建的数据库生效：删除后的空闲页可由 CheckpointGC 分批归还
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.lock = threading.RLock()
+
+        # (thread_id, checkpoint_ns) -> (checkpoint_id, depth, channel_values)
+        self._latest: "OrderedDict[Tuple[str, str], Tuple[str, int, Dict[str, Any]]]" = OrderedDict()
+        # (thread_id, checkpoint_ns) -> 上次压缩后写入的检查点数；压缩后删除，
+        # 与 _latest 一样最多保留 cache_size 个（被淘汰的会话只是推迟压缩）
+        self._puts_since_compact: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        # (thread_id, checkpoint_ns) -> 过期水位：CheckpointGC 正在分批删除不晚于该 ID 的
+        # 检查点，这些检查点对读取不可见（会话表现为空，而不是回退到更旧的检查点）
+        self._expiring: Dict[Tuple[str, str], str] = {}
+        # 后台 GC（CheckpointGC），由 create_checkpointer 挂载，close 时一并停止
+        self.gc: Optional[Any] = None
+
+    @classmethod
+    def from_settings(
+        cls, cp_settings: CheckpointerSettings, **kwargs: Any
+    ) -> "DeltaSqliteSaver":
+        """根据 CheckpointerSettings 创建实例"""
+        return cls(
+            cp_settings.sqlite_path,
+            base_interval=cp_settings.base_interval,
+            max_checkpoints=cp_settings.max_checkpoints,
+            **kwargs,
+        )
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        if self.gc is not None:
+            self.gc.stop()
+        with self.lock:
+            self.conn.close()
+
+    # ==================== 读取 ====================
+
+    def _materialize(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> Optional[Tuple[Checkpoint, Dict[str, Any]]]:
+        """重放基线 + 增量链，返回 (checkpoint 骨架, channel_values)"""
+        rows = self.conn.execute(
+            _CHAIN_SQL,
+            (thread_id, checkpoint_ns, checkpoint_id, thread_id, checkpoint_ns),
+        ).fetchall()
+        if not rows or rows[0][0] != KIND_BASE:
+            return None
+        values: Dict[str, Any] = {}
+        payload: Dict[str, Any] = {}
+        for _, type_, blob in rows:
+            payload = self.serde.loads_typed((type_, blob))
+            apply_delta(values, payload)
+        return payload["checkpoint"], values
+
+    def _load_writes(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> List[Tuple[str, str, Any]]:
+        rows = self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+            "ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [
+            (task_id, channel, self.serde.loads_typed((type_, value)))
+            for task_id, channel, type_, value in rows
+        ]
+
+    def _build_tuple(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        parent_checkpoint_id: Optional[str],
+        metadata: CheckpointMetadata,
+    ) -> Optional[CheckpointTuple]:
+        restored = self._materialize(thread_id, checkpoint_ns, checkpoint_id)
+        if restored is None:
+            return None
+        skeleton, values = restored
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={**skeleton, "channel_values": values},
+            metadata=metadata,
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=self._load_writes(thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """获取指定（或最新）检查点"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with self.lock:
+            floor = self._expiring.get((thread_id, checkpoint_ns), "")
+            if checkpoint_id:
+                row = self.conn.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, metadata FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+                    "AND checkpoint_id > ?",
+                    (thread_id, checkpoint_ns, checkpoint_id, floor),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, metadata FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id > ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns, floor),
+                ).fetchone()
+            if row is None:
+                return None
+            return self._build_tuple(
+                thread_id, checkpoint_ns, row[0], row[1], json.loads(row[2])
+            )
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """按 checkpoint_id 倒序列出检查点"""
+        where, params = [], []
+        if config is not None:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before is not None and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            params.append(before_id)
+        sql = "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, metadata FROM checkpoints"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY checkpoint_id DESC"
+
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+
+        remaining = limit
+        for thread_id, checkpoint_ns, checkpoint_id, parent_id, metadata_b in rows:
+            if remaining is not None and remaining <= 0:
+                break
+            metadata = json.loads(metadata_b)
+            if filter and not all(metadata.get(k) == v for k, v in filter.items()):
+                continue
+            with self.lock:
+                if checkpoint_id <= self._expiring.get((thread_id, checkpoint_ns), ""):
+                    continue
+                item = self._build_tuple(
+                    thread_id, checkpoint_ns, checkpoint_id, parent_id, metadata
+                )
+            if item is None:
+                continue
+            if remaining is not None:
+                remaining -= 1
+            yield item
+
+    # ==================== 写入 ====================
+
+    def _parent_state(
+        self, thread_id: str, checkpoint_ns: str, parent_id: Optional[str]
+    ) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """返回父检查点的 (depth, channel_values)，优先使用缓存"""
+        if parent_id is None or parent_id <= self._expiring.get((thread_id, checkpoint_ns), ""):
+            return None
+        cached = self._latest.get((thread_id, checkpoint_ns))
+        if cached is not None and cached[0] == parent_id:
+            return cached[1], cached[2]
+        row = self.conn.execute(
+            "SELECT depth FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, parent_id),
+        ).fetchone()
+        if row is None:
+            return None
+        restored = self._materialize(thread_id, checkpoint_ns, parent_id)
+        if restored is None:
+            return None
+        return row[0], restored[1]
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """保存检查点（增量或基线）"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_id = config["configurable"].get("checkpoint_id")
+        skeleton = {k: v for k, v in checkpoint.items() if k != "channel_values"}
+        values = checkpoint["channel_values"]
+        key = (thread_id, checkpoint_ns)
+
+        with self.lock:
+            parent = self._parent_state(thread_id, checkpoint_ns, parent_id)
+            if parent is None or parent[0] + 1 >= self.base_interval:
+                kind, depth = KIND_BASE, 0
+                payload = {"checkpoint": skeleton, "set": values, "append": {}, "delete": []}
+            else:
+                kind, depth = KIND_DELTA, parent[0] + 1
+                set_, append, delete = diff_channel_values(parent[1], values, new_versions)
+                payload = {"checkpoint": skeleton, "set": set_, "append": append, "delete": delete}
+
+            type_, blob = self.serde.dumps_typed(payload)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints "
+                "(thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, kind, depth, type, checkpoint, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    parent_id,
+                    kind,
+                    depth,
+                    type_,
+                    blob,
+                    json.dumps(get_checkpoint_metadata(config, metadata), ensure_ascii=False),
+                ),
+            )
+
+            self._latest[key] = (checkpoint["id"], depth, _snapshot(values))
+            self._latest.move_to_end(key)
+            while len(self._latest) > self.cache_size:
+                self._latest.popitem(last=False)
+
+            if self.auto_compact:
+                count = self._puts_since_compact.pop(key, 0) + 1
+                if count >= self.max_checkpoints:
+                    self.compact(thread_id, checkpoint_ns)
+                else:
+                    self._puts_since_compact[key] = count
+                    while len(self._puts_since_compact) > self.cache_size:
+                        self._puts_since_compact.popitem(last=False)
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """保存某个任务产生的 pending writes"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # 特殊写入（错误、中断等）使用负数下标，允许覆盖；普通写入已存在则跳过
+        replace = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, blob = self.serde.dumps_typed(value)
+            rows.append(
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint_id,
+                    task_id,
+                    WRITES_IDX_MAP.get(channel, idx),
+                    channel,
+                    type_,
+                    blob,
+                    task_path,
+                )
+            )
+        with self.lock:
+            self.conn.executemany(
+                f"{verb} INTO writes "
+                "(thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        """删除会话的全部检查点和 pending writes"""
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            self.conn.execute("COMMIT")
+            for key in [k for k in self._latest if k[0] == thread_id]:
+                del self._latest[key]
+            for key in [k for k in self._puts_since_compact if k[0] == thread_id]:
+                del self._puts_since_compact[key]
+            for key in [k for k in self._expiring if k[0] == thread_id]:
+                del self._expiring[key]
+
+    # ==================== 压缩 ====================
+
+    def compact(self, thread_id: str, checkpoint_ns: str = "") -> int:
+        """
+        压缩会话的检查点历史
+
+        保留最新的 max_checkpoints 个检查点：增量链会经过被删除检查点的
+        保留项先折叠为新基线，然后一次性按范围删除更旧的检查点和 writes。
+
+        Args:
+            thread_id: 会话 ID
+            checkpoint_ns: 检查点命名空间
+
+        Returns:
+            删除的检查点数量
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT checkpoint_id, parent_checkpoint_id, kind FROM checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC",
+                (thread_id, checkpoint_ns),
+            ).fetchall()
+            if len(rows) <= self.max_checkpoints:
+                return 0
+
+            kept = {cid: (parent, kind) for cid, parent, kind in rows[: self.max_checkpoints]}
+            oldest_kept = rows[self.max_checkpoints - 1][0]
+
+            # 从旧到新检查：增量链在到达基线（或已决定折叠的检查点）前
+            # 经过了将被删除的检查点，则需要折叠
+            rebase: List[str] = []
+            for cid in sorted(kept):
+                node = cid
+                while kept[node][1] == KIND_DELTA:
+                    node = kept[node][0]
+                    if node not in kept:
+                        rebase.append(cid)
+                        kept[cid] = (kept[cid][0], KIND_BASE)
+                        break
+
+            # 先在删除前物化需要折叠的检查点
+            rebased = []
+            for cid in rebase:
+                restored = self._materialize(thread_id, checkpoint_ns, cid)
+                if restored is None:
+                    continue
+                skeleton, values = restored
+                rebased.append(
+                    self.serde.dumps_typed(
+                        {"checkpoint": skeleton, "set": values, "append": {}, "delete": []}
+                    )
+                    + (cid,)
+                )
+
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "UPDATE checkpoints SET kind = 0, depth = 0, type = ?, checkpoint = ? "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                [(t, b, thread_id, checkpoint_ns, cid) for t, b, cid in rebased],
+            )
+            deleted = self.conn.execute(
+                "DELETE FROM checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                (thread_id, checkpoint_ns, oldest_kept),
+            ).rowcount
+            self.conn.execute(
+                "DELETE FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                (thread_id, checkpoint_ns, oldest_kept),
+            )
+            self.conn.execute("COMMIT")
+
+            cached = self._latest.get((thread_id, checkpoint_ns))
+            if cached is not None and cached[0] in rebase:
+                self._latest[(thread_id, checkpoint_ns)] = (cached[0], 0, cached[2])
+            return deleted
+
+    # ==================== 异步接口 ====================
+
+    @traced("checkpoint.get")
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    @traced("checkpoint.put")
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
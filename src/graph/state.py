@@ -0,0 +1,199 @@
+"""
+图状态定义与紧凑消息表示
+
+ChatbotState.messages 不直接保存 LangChain BaseMessage（pydantic 模型，每条消息带
+additional_kwargs / response_metadata 等字典，常驻内存约 900 字节，序列化时每条都要
+写出完整的构造参数），而是保存 CompactMessage：
+
+- CompactMessage 是 NamedTuple（__slots__ = ()，无实例字典），只有 role、content、
+  id、name、tool_call_id、tool_calls 六个字段，空字段为 None
+- role 存为 Role 对应的小整数（CPython 缓存的整数对象，所有消息共享），不存字符串
+- 检查点序列化走 msgpack 的位置参数扩展，不重复写字段名
+- 只在调用 LLM 时通过 to_langchain_messages / from_langchain_messages 与
+  BaseMessage 互转；additional_kwargs、response_metadata、usage_metadata 不保留
+
+ChatbotState.messages 的 reducer 为 add_compact_messages：追加新消息，id 相同的
+消息原位替换；传入的 BaseMessage 会先转换为 CompactMessage。
+"""
+
+import sys
+from enum import IntEnum
+from typing import Annotated, Any, Dict, Iterable, List, NamedTuple, Optional, TypedDict, Union
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolCall,
+    ToolMessage,
+)
+
+
+class Role(IntEnum):
+    """消息角色"""
+
+    SYSTEM = 0
+    HUMAN = 1
+    AI = 2
+    TOOL = 3
+
+    @classmethod
+    def parse(cls, value: Union[int, str]) -> "Role":
+        """解析角色：接受整数、LangChain 消息类型（human/ai）或 OpenAI 风格角色（user/assistant）"""
+        if isinstance(value, int):
+            return cls(value)
+        try:
+            return _ROLE_NAMES[value]
+        except KeyError:
+            raise ValueError(f"未知的消息角色: {value!r}") from None
+
+
+_ROLE_NAMES = {
+    "system": Role.SYSTEM,
+    "human": Role.HUMAN,
+    "user": Role.HUMAN,
+    "ai": Role.AI,
+    "assistant": Role.AI,
+    "tool": Role.TOOL,
+}
+
+# Role 取值对应的 LangChain 消息类型
+_LC_TYPES = ("system", "human", "ai", "tool")
+
+
+class CompactMessage(NamedTuple):
+    """
+    紧凑消息
+
+    Attributes:
+        role: Role 取值（int）
+        content: 消息内容（字符串，或多模态内容块列表）
+        id: 消息 ID
+        name: 发送者名称
+        tool_call_id: 工具消息对应的调用 ID
+        tool_calls: AI 消息发起的工具调用（{"name", "args", "id"} 字典列表）
+    """
+
+    role: int
+    content: Union[str, List[Any]]
+    id: Optional[str] = None
+    name: Optional[str] = None
+    tool_call_id: Optional[str] = None
+    tool_calls: Optional[List[Dict[str, Any]]] = None
+
+    @property
+    def type(self) -> str:
+        """LangChain 消息类型（system / human / ai / tool）"""
+        return _LC_TYPES[self.role]
+
+    @classmethod
+    def from_langchain(cls, message: BaseMessage) -> "CompactMessage":
+        """从 LangChain 消息转换"""
+        if isinstance(message, HumanMessage):
+            role = Role.HUMAN
+        elif isinstance(message, AIMessage):
+            role = Role.AI
+        elif isinstance(message, ToolMessage):
+            return cls(
+                int(Role.TOOL),
+                message.content,
+                message.id,
+                _intern(message.name),
+                message.tool_call_id,
+            )
+        elif isinstance(message, SystemMessage):
+            role = Role.SYSTEM
+        else:
+            role = Role.parse(message.type)
+        tool_calls = None
+        if role == Role.AI and message.tool_calls:
+            tool_calls = [
+                {"name": _intern(call["name"]), "args": call["args"], "id": call.get("id")}
+                for call in message.tool_calls
+            ]
+        return cls(int(role), message.content, message.id, _intern(message.name), None, tool_calls)
+
+    def to_langchain(self) -> BaseMessage:
+        """转换为 LangChain 消息"""
+        kwargs: Dict[str, Any] = {"content": self.content}
+        if self.id is not None:
+            kwargs["id"] = self.id
+        if self.name is not None:
+            kwargs["name"] = self.name
+        role = self.role
+        if role == Role.HUMAN:
+            return HumanMessage(**kwargs)
+        if role == Role.AI:
+            if self.tool_calls:
+                kwargs["tool_calls"] = [ToolCall(**call) for call in self.tool_calls]
+            return AIMessage(**kwargs)
+        if role == Role.TOOL:
+            return ToolMessage(tool_call_id=self.tool_call_id, **kwargs)
+        return SystemMessage(**kwargs)
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value is not None else None
+
+
+AnyMessage = Union[CompactMessage, BaseMessage]
+
+
+def to_compact(message: AnyMessage) -> CompactMessage:
+    """把 BaseMessage 转为 CompactMessage，已是 CompactMessage 时原样返回"""
+    if isinstance(message, CompactMessage):
+        return message
+    return CompactMessage.from_langchain(message)
+
+
+def from_langchain_messages(messages: Iterable[AnyMessage]) -> List[CompactMessage]:
+    """批量转换为 CompactMessage"""
+    return [to_compact(message) for message in messages]
+
+
+def to_langchain_messages(messages: Iterable[AnyMessage]) -> List[BaseMessage]:
+    """批量转换为 LangChain 消息（在调用 LLM 前使用）"""
+    return [
+        message.to_langchain() if isinstance(message, CompactMessage) else message
+        for message in messages
+    ]
+
+
+def add_compact_messages(
+    left: Optional[List[CompactMessage]], right: Union[AnyMessage, Iterable[AnyMessage], None]
+) -> List[CompactMessage]:
+    """
+    ChatbotState.messages 的 reducer
+
+    追加 right 中的消息；与已有消息 id 相同的原位替换。
+    """
+    merged = list(left or [])
+    if right is None:
+        return merged
+    if isinstance(right, (CompactMessage, BaseMessage)):
+        right = [right]
+    incoming = from_langchain_messages(right)
+    positions = {message.id: i for i, message in enumerate(merged) if message.id is not None}
+    for message in incoming:
+        index = positions.get(message.id) if message.id is not None else None
+        if index is None:
+            if message.id is not None:
+                positions[message.id] = len(merged)
+            merged.append(message)
+        else:
+            merged[index] = message
+    return merged
+
+
+class ChatbotState(TypedDict):
+    """对话图状态"""
+
+    messages: Annotated[List[CompactMessage], add_compact_messages]  # 消息历史
+    user_input: str  # 当前用户输入
+    intent: Optional[str]  # 识别的意图
+    entities: Dict[str, Any]  # 提取的实体
+    tool_calls: List[ToolCall]  # 需要调用的工具
+    tool_results: List[Any]  # 工具执行结果
+    response: str  # 最终响应
+    metadata: Dict[str, Any]  # 元数据
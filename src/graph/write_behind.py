@@ -0,0 +1,466 @@
+"""
+异步回写（write-behind）检查点存储
+
+包装任意 BaseCheckpointSaver：put / put_writes 先写入有界的内存缓冲并立即返回，
+由后台线程批量刷写到底层存储。同一会话在刷写前的多次 put 会被合并，
+只持久化最新状态（中间步骤的检查点不会出现在历史中）。
+
+持久化模式（durability）：
+- "sync"：直接透传，put 返回时已持久化
+- "interval"：会话累计 save_interval 步未落盘时同步刷写一次，其余步骤异步
+- "async"：全部异步，仅在 flush() / close() 时等待
+"""
+
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Literal, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    copy_checkpoint,
+    get_checkpoint_id,
+)
+
+from config.settings import CheckpointerSettings
+from src.utils import traced
+
+logger = logging.getLogger(__name__)
+
+DurabilityMode = Literal["async", "interval", "sync"]
+
+
+class _Pending:
+    """某个会话尚未刷写的状态"""
+
+    __slots__ = (
+        "config", "checkpoint", "metadata", "new_versions", "writes",
+        "parent_id", "replaced", "steps", "generation", "created",
+    )
+
+    def __init__(self) -> None:
+        self.created = time.monotonic()
+        self.config: Optional[RunnableConfig] = None
+        self.checkpoint: Optional[Checkpoint] = None
+        self.metadata: Optional[CheckpointMetadata] = None
+        self.new_versions: ChannelVersions = {}
+        # (config, writes, task_id, task_path)
+        self.writes: List[Tuple[RunnableConfig, Sequence[Tuple[str, Any]], str, str]] = []
+        # 落盘时使用的父检查点 ID：取自检查点自己的 config，父检查点被合并掉时换成它的父检查点
+        self.parent_id: Optional[str] = None
+        # 被合并掉（不会落盘）的检查点 ID -> 它的父检查点 ID
+        self.replaced: Dict[str, Optional[str]] = {}
+        self.steps = 0
+        self.generation = 0
+
+
+class WriteBehindSaver(BaseCheckpointSaver):
+    """
+    异步回写检查点存储
+
+    Args:
+        inner: 实际负责持久化的检查点存储（使用其同步接口刷写）
+        durability: 持久化模式，"async" / "interval" / "sync"
+        sync_every: "interval" 模式下每多少步同步刷写一次
+        max_pending: 缓冲中最多容纳的会话数，满时 put 阻塞等待（背压）
+        linger: 刷写前的聚合等待时间（秒），用于合并同一会话的连续步骤
+    """
+
+    def __init__(
+        self,
+        inner: BaseCheckpointSaver,
+        *,
+        durability: DurabilityMode = "async",
+        sync_every: int = 1,
+        max_pending: int = 1000,
+        linger: float = 0.05,
+    ):
+        super().__init__(serde=inner.serde)
+        self.inner = inner
+        self.durability = durability
+        self.sync_every = sync_every
+        self.max_pending = max_pending
+        self.linger = linger
+
+        self._cond = threading.Condition()
+        # (thread_id, checkpoint_ns) -> 待刷写状态，按首次变脏的顺序刷写
+        self._pending: "OrderedDict[Tuple[str, str], _Pending]" = OrderedDict()
+        # 正在刷写的状态，刷写期间仍需对读可见
+        self._inflight: Dict[Tuple[str, str], _Pending] = {}
+        # 缓冲代数（全局递增），会话全部落盘后删除，不随会话数增长
+        self._sequence = 0
+        self._generation: Dict[Tuple[str, str], int] = {}
+        self._flushed_generation: Dict[Tuple[str, str], int] = {}
+        self._errors: Dict[Tuple[str, str], BaseException] = {}
+        self._urgent = 0
+        self._closed = False
+
+        self.coalesced = 0
+        self.flushed = 0
+
+        self._worker: Optional[threading.Thread] = None
+        if durability != "sync":
+            self._worker = threading.Thread(
+                target=self._run, name="checkpoint-write-behind", daemon=True
+            )
+            self._worker.start()
+            atexit.register(self.close)
+
+    @classmethod
+    def from_settings(
+        cls, inner: BaseCheckpointSaver, cp_settings: CheckpointerSettings
+    ) -> "WriteBehindSaver":
+        """根据 CheckpointerSettings 创建实例，interval 模式的步长取 save_interval"""
+        return cls(
+            inner,
+            durability=cp_settings.durability_mode,
+            sync_every=cp_settings.save_interval,
+            max_pending=cp_settings.write_behind_max_pending,
+            linger=cp_settings.write_behind_linger_ms / 1000,
+        )
+
+    @staticmethod
+    def _key(config: RunnableConfig) -> Tuple[str, str]:
+        return (
+            config["configurable"]["thread_id"],
+            config["configurable"].get("checkpoint_ns", ""),
+        )
+
+    # ==================== 后台刷写 ====================
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                # 聚合窗口：最旧的脏会话至少等待 linger，让后续步骤合并进来；
+                # 有同步等待者或正在关闭时立即刷写
+                deadline = next(iter(self._pending.values())).created + self.linger
+                while not self._urgent and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                key, item = self._pending.popitem(last=False)
+                self._inflight[key] = item
+                self._cond.notify_all()
+
+            error = None
+            try:
+                self._flush_item(item)
+            except BaseException as exc:  # noqa: BLE001 - 刷写失败不能终止后台线程
+                logger.exception("检查点回写失败: thread_id=%s", key[0])
+                error = exc
+
+            with self._cond:
+                del self._inflight[key]
+                self._flushed_generation[key] = item.generation
+                if error is not None:
+                    self._errors[key] = error
+                self._forget(key)
+                self.flushed += 1
+                self._cond.notify_all()
+
+    def _flush_item(self, item: _Pending) -> None:
+        if item.checkpoint is not None:
+            config = item.config
+            if item.parent_id != get_checkpoint_id(config):
+                # 父检查点被合并掉、不会落盘，改为指向它最近一个真正写入的祖先
+                configurable = {
+                    k: v for k, v in config["configurable"].items() if k != "checkpoint_id"
+                }
+                if item.parent_id is not None:
+                    configurable["checkpoint_id"] = item.parent_id
+                config = {**config, "configurable": configurable}
+            self.inner.put(config, item.checkpoint, item.metadata, item.new_versions)
+        for config, writes, task_id, task_path in item.writes:
+            self.inner.put_writes(config, writes, task_id, task_path)
+
+    def _forget(self, key: Tuple[str, str]) -> None:
+        """会话的缓冲全部落盘后删除其代数记录（调用方需持有 _cond）"""
+        if key in self._pending or key in self._inflight:
+            return
+        self._generation.pop(key, None)
+        self._flushed_generation.pop(key, None)
+
+    def _wait_flushed(self, key: Tuple[str, str]) -> None:
+        """阻塞直到 key 当前的缓冲状态全部落盘（调用方需持有 _cond）"""
+        target = self._generation.get(key, 0)
+        self._urgent += 1
+        self._cond.notify_all()
+        try:
+            # 代数记录被删除说明会话已全部落盘
+            while (
+                key in self._generation
+                and self._flushed_generation.get(key, 0) < target
+                and self._worker_alive()
+            ):
+                self._cond.wait()
+        finally:
+            self._urgent -= 1
+        error = self._errors.pop(key, None)
+        if error is not None:
+            raise error
+
+    def _worker_alive(self) -> bool:
+        return self._worker is not None and self._worker.is_alive()
+
+    def _enqueue(self, key: Tuple[str, str]) -> _Pending:
+        """取得 key 的缓冲项，缓冲已满时阻塞（调用方需持有 _cond）"""
+        item = self._pending.get(key)
+        if item is None:
+            while len(self._pending) >= self.max_pending and self._worker_alive():
+                self._urgent += 1
+                self._cond.notify_all()
+                try:
+                    self._cond.wait()
+                finally:
+                    self._urgent -= 1
+            item = self._pending[key] = _Pending()
+        self._sequence += 1
+        self._generation[key] = item.generation = self._sequence
+        self._cond.notify_all()
+        return item
+
+    def flush(self, thread_id: Optional[str] = None) -> None:
+        """等待缓冲刷写完成；指定 thread_id 时只等待该会话"""
+        if self._worker is None:
+            return
+        with self._cond:
+            keys = set(self._pending) | set(self._inflight)
+            for key in keys:
+                if thread_id is None or key[0] == thread_id:
+                    self._wait_flushed(key)
+
+    def close(self) -> None:
+        """刷写全部缓冲并停止后台线程"""
+        if self._worker is None or self._closed:
+            return
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join()
+        atexit.unregister(self.close)
+
+    # ==================== 读取 ====================
+
+    def _buffered_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """同进程读己之写：命中缓冲中的最新检查点时直接返回（调用方需持有 _cond）"""
+        key = self._key(config)
+        items = [i for i in (self._inflight.get(key), self._pending.get(key)) if i is not None]
+        latest = next((i for i in reversed(items) if i.checkpoint is not None), None)
+        if latest is None:
+            return None
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id and checkpoint_id != latest.checkpoint["id"]:
+            return None
+        pending_writes = [
+            (task_id, channel, value)
+            for item in items
+            for cfg, writes, task_id, _ in item.writes
+            if cfg["configurable"]["checkpoint_id"] == latest.checkpoint["id"]
+            for channel, value in writes
+        ]
+        parent_id = latest.parent_id
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": key[0],
+                    "checkpoint_ns": key[1],
+                    "checkpoint_id": latest.checkpoint["id"],
+                }
+            },
+            checkpoint=copy_checkpoint(latest.checkpoint),
+            metadata=dict(latest.metadata),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": key[0],
+                        "checkpoint_ns": key[1],
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=pending_writes,
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        if self._worker is not None:
+            with self._cond:
+                buffered = self._buffered_tuple(config)
+            if buffered is not None:
+                return buffered
+            # 缓冲中的是更新的检查点，按 ID 读取更早的检查点前先落盘
+            self.flush(config["configurable"]["thread_id"])
+        return self.inner.get_tuple(config)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        self.flush(config["configurable"]["thread_id"] if config else None)
+        return self.inner.list(config, filter=filter, before=before, limit=limit)
+
+    # ==================== 写入 ====================
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        if self._worker is None:
+            return self.inner.put(config, checkpoint, metadata, new_versions)
+
+        key = self._key(config)
+        parent_id = get_checkpoint_id(config)
+        with self._cond:
+            item = self._enqueue(key)
+            if item.checkpoint is not None:
+                # 合并：丢弃被覆盖的中间检查点及其 writes，版本变化取并集
+                self.coalesced += 1
+                item.replaced[item.checkpoint["id"]] = item.parent_id
+                item.new_versions = {**item.new_versions, **new_versions}
+                item.writes.clear()
+            else:
+                item.new_versions = dict(new_versions)
+            # 父检查点一般是刚被合并掉的上一步；fork / update_state 时是更早的检查点，保持不变
+            item.parent_id = item.replaced.get(parent_id, parent_id)
+            item.config = config
+            item.checkpoint = copy_checkpoint(checkpoint)
+            item.metadata = metadata
+
+            item.steps += 1
+            if self.durability == "interval" and item.steps >= self.sync_every:
+                self._wait_flushed(key)
+
+        return {
+            "configurable": {
+                "thread_id": key[0],
+                "checkpoint_ns": key[1],
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        if self._worker is None:
+            return self.inner.put_writes(config, writes, task_id, task_path)
+        with self._cond:
+            item = self._enqueue(self._key(config))
+            item.writes.append((config, list(writes), task_id, task_path))
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._cond:
+            for key in [k for k in self._pending if k[0] == thread_id]:
+                del self._pending[key]
+                self._flushed_generation[key] = self._generation.get(key, 0)
+                self._forget(key)
+            self._cond.notify_all()
+        self.flush(thread_id)
+        self.inner.delete_thread(thread_id)
+
+    def get_next_version(self, current: Any, channel: None) -> Any:
+        return self.inner.get_next_version(current, channel)
+
+    # ==================== 异步接口 ====================
+    # 缓冲操作只持有锁很短时间；可能阻塞（背压 / 同步刷写 / 读底层存储）时放到线程中执行
+
+    @traced("checkpoint.get")
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        if self._worker is None:
+            return await self.inner.aget_tuple(config)
+        with self._cond:
+            buffered = self._buffered_tuple(config)
+        if buffered is not None:
+            return buffered
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        if self._worker is None:
+            async for item in self.inner.alist(config, filter=filter, before=before, limit=limit):
+                yield item
+            return
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    def _can_ack_immediately(self, config: RunnableConfig, is_put: bool) -> bool:
+        key = self._key(config)
+        if key not in self._pending and len(self._pending) >= self.max_pending:
+            return False
+        if is_put and self.durability == "interval":
+            item = self._pending.get(key)
+            return (item.steps if item is not None else 0) + 1 < self.sync_every
+        return True
+
+    @traced("checkpoint.put")
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        if self._worker is None:
+            return await self.inner.aput(config, checkpoint, metadata, new_versions)
+        with self._cond:
+            fast = self._can_ack_immediately(config, is_put=True)
+        if fast:
+            return self.put(config, checkpoint, metadata, new_versions)
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        if self._worker is None:
+            return await self.inner.aput_writes(config, writes, task_id, task_path)
+        with self._cond:
+            fast = self._can_ack_immediately(config, is_put=False)
+        if fast:
+            return self.put_writes(config, writes, task_id, task_path)
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        if self._worker is None:
+            return await self.inner.adelete_thread(thread_id)
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aflush(self, thread_id: Optional[str] = None) -> None:
+        """flush 的异步版本"""
+        await asyncio.to_thread(self.flush, thread_id)
@@ -0,0 +1,57 @@
+"""
+记忆管理模块
+
+提供向量存储（RAG）、带缓存的 Embedding 服务、文档导入流水线、BM25 倒排索引、
+多查询融合检索、上下文打包和后台会话摘要
+"""
+
+from .bm25 import BM25Index, tokenize
+from .context_packer import Citation, ContextPacker, PackedContext, estimate_tokens
+from .embedding_cache import CachedEmbeddings
+from .ingestion import IngestionPipeline, IngestionStats, split_text
+from .retriever import (
+    FusedHit,
+    FusionRetriever,
+    HybridRetriever,
+    RetrievalResult,
+    parse_queries,
+    reciprocal_rank_fusion,
+)
+from .summarizer import ConversationContext, LLMScheduler, SummaryWorker
+from .vector_store import (
+    NumpyVectorStore,
+    create_embeddings,
+    create_vector_store,
+)
+
+__all__ = [
+    # 向量存储
+    "NumpyVectorStore",
+    "create_embeddings",
+    "create_vector_store",
+    # Embedding
+    "CachedEmbeddings",
+    # 文档导入
+    "IngestionPipeline",
+    "IngestionStats",
+    "split_text",
+    # 关键词索引
+    "BM25Index",
+    "tokenize",
+    # 检索
+    "FusionRetriever",
+    "HybridRetriever",
+    "FusedHit",
+    "RetrievalResult",
+    "parse_queries",
+    "reciprocal_rank_fusion",
+    # 上下文打包
+    "ContextPacker",
+    "PackedContext",
+    "Citation",
+    "estimate_tokens",
+    # 会话摘要
+    "SummaryWorker",
+    "LLMScheduler",
+    "ConversationContext",
+]
@@ -0,0 +1,474 @@
+"""
+BM25 倒排索引
+
+- 分词：英文 / 数字按词切分（产品编号等带 - _ . / 的标识符同时保留整体和各部分），
+  中日韩汉字连续段切成字符二元组（bigram），单字段保留单字
+- 词项用 blake2b 取 64 位整数 ID，倒排表按段（segment）存储，每段由几个
+  .npy 文件组成，以 mmap 只读加载：
+  terms(uint64，有序) / offsets(int64) / docs(uint32，段内文档号) / tfs(uint16) / lengths(uint32)
+- 增量更新：新文档先进入内存缓冲，达到 flush_every 或调用 flush() 时写成新段，
+  已有段不改写；相同 ID 的旧版本打删除标记。段数超过 max_segments 时合并相邻的
+  小段，合并时清除已删除的文档
+- 查询：每个词在各段中二分查找倒排表，向量化累加 BM25 分数后 argpartition 取 top-k
+"""
+
+import bisect
+import hashlib
+import json
+import operator
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from config.settings import VectorStoreSettings
+from .vector_store import top_k_indices
+
+MANIFEST_VERSION = 1
+_MANIFEST_FILE = "manifest.json"
+_ARRAYS = ("terms", "offsets", "docs", "tfs", "lengths")
+
+_TOKEN_RE = re.compile(
+    r"[a-z0-9]+(?:[-_./][a-z0-9]+)*|[㐀-䶿一-鿿豈-﫿]+"
+)
+_SEPARATOR_RE = re.compile(r"[-_./]")
+
+
+def tokenize(text: str) -> List[str]:
+    """中文字符二元组 + 英文 / 数字词的分词"""
+    tokens: List[str] = []
+    for match in _TOKEN_RE.findall(text.lower()):
+        if match[0] >= "㐀":
+            if len(match) == 1:
+                tokens.append(match)
+            else:
+                tokens.extend(map(operator.add, match, match[1:]))
+        else:
+            tokens.append(match)
+            if _SEPARATOR_RE.search(match):
+                tokens.extend(_SEPARATOR_RE.split(match))
+    return tokens
+
+
+def term_id(term: str) -> int:
+    """稳定的 64 位词项 ID（跨进程一致）"""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class _Segment:
+    """不可变的倒排表段"""
+
+    def __init__(
+        self,
+        name: str,
+        arrays: Dict[str, np.ndarray],
+        ids: List[str],
+        deleted: Optional[Set[int]] = None,
+    ):
+        self.name = name
+        self.terms = arrays["terms"]
+        self.offsets = arrays["offsets"]
+        self.docs = arrays["docs"]
+        self.tfs = arrays["tfs"]
+        self.lengths = arrays["lengths"]
+        self.ids = ids
+        self.deleted: Set[int] = deleted or set()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(
+        cls,
+        name: str,
+        postings: Tuple[List[str], List[int], List[int]],
+        lengths: List[int],
+        ids: List[str],
+    ) -> "_Segment":
+        """由 (词, 段内文档号, 词频) 三元组列表构建"""
+        terms, docs, tfs = postings
+        ids_of = {term: term_id(term) for term in set(terms)}
+        return cls.from_arrays(
+            name,
+            np.fromiter(map(ids_of.__getitem__, terms), dtype=np.uint64, count=len(terms)),
+            np.asarray(docs, dtype=np.uint32),
+            np.minimum(np.asarray(tfs, dtype=np.int64), 65535).astype(np.uint16),
+            np.asarray(lengths, dtype=np.uint32),
+            ids,
+        )
+
+    @classmethod
+    def from_arrays(
+        cls,
+        name: str,
+        posting_terms: np.ndarray,
+        posting_docs: np.ndarray,
+        posting_tfs: np.ndarray,
+        lengths: np.ndarray,
+        ids: List[str],
+    ) -> "_Segment":
+        order = np.lexsort((posting_docs, posting_terms))
+        posting_terms = posting_terms[order]
+        terms, starts = np.unique(posting_terms, return_index=True)
+        arrays = {
+            "terms": terms,
+            "offsets": np.append(starts, len(posting_terms)).astype(np.int64),
+            "docs": posting_docs[order],
+            "tfs": posting_tfs[order],
+            "lengths": lengths,
+        }
+        return cls(name, arrays, ids)
+
+    def postings(self, tid: int) -> Tuple[np.ndarray, np.ndarray]:
+        """返回词项的 (段内文档号, 词频)，不存在时为空数组"""
+        i = int(np.searchsorted(self.terms, np.uint64(tid)))
+        if i >= len(self.terms) or self.terms[i] != np.uint64(tid):
+            return self.docs[:0], self.tfs[:0]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.docs[start:end], self.tfs[start:end]
+
+    def expand(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """展开为逐条倒排记录的 (词项 ID, 段内文档号, 词频)"""
+        return np.repeat(self.terms, np.diff(self.offsets)), np.asarray(self.docs), np.asarray(self.tfs)
+
+    # ==================== 持久化 ====================
+
+    def save(self, directory: str) -> None:
+        for key in _ARRAYS:
+            np.save(os.path.join(directory, f"{self.name}.{key}.npy"), getattr(self, key))
+        with open(os.path.join(directory, f"{self.name}.ids.json"), "w", encoding="utf-8") as f:
+            json.dump(self.ids, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: str, name: str, deleted: Iterable[int]) -> "_Segment":
+        arrays = {
+            key: np.load(os.path.join(directory, f"{name}.{key}.npy"), mmap_mode="r")
+            for key in _ARRAYS
+        }
+        with open(os.path.join(directory, f"{name}.ids.json"), encoding="utf-8") as f:
+            ids = json.load(f)
+        return cls(name, arrays, ids, set(deleted))
+
+    def remove_files(self, directory: str) -> None:
+        for suffix in [f"{key}.npy" for key in _ARRAYS] + ["ids.json"]:
+            path = os.path.join(directory, f"{self.name}.{suffix}")
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _merge(name: str, segments: List[_Segment]) -> _Segment:
+    """合并相邻段，去掉已删除的文档并重新编号"""
+    terms, docs, tfs, lengths, ids = [], [], [], [], []
+    base = 0
+    for segment in segments:
+        keep = np.ones(len(segment), dtype=bool)
+        if segment.deleted:
+            keep[list(segment.deleted)] = False
+        # 旧段内文档号 -> 合并后的文档号
+        renumber = np.cumsum(keep, dtype=np.int64) - 1 + base
+        seg_terms, seg_docs, seg_tfs = segment.expand()
+        alive = keep[seg_docs]
+        terms.append(seg_terms[alive])
+        docs.append(renumber[seg_docs[alive]].astype(np.uint32))
+        tfs.append(seg_tfs[alive])
+        lengths.append(np.asarray(segment.lengths)[keep])
+        ids.extend(doc_id for doc_id, k in zip(segment.ids, keep) if k)
+        base += int(keep.sum())
+    return _Segment.from_arrays(
+        name,
+        np.concatenate(terms),
+        np.concatenate(docs),
+        np.concatenate(tfs),
+        np.concatenate(lengths),
+        ids,
+    )
+
+
+class BM25Index:
+    """
+    分段存储、可增量更新的 BM25 倒排索引
+
+    Args:
+        path: 索引目录，None 表示只在内存中保存
+        k1: BM25 词频饱和参数
+        b: BM25 文档长度归一化参数
+        flush_every: 缓冲中累计多少篇文档后写成新段
+        max_segments: 段数上限，超过时合并相邻的小段
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        *,
+        k1: float = 1.2,
+        b: float = 0.75,
+        flush_every: int = 10000,
+        max_segments: int = 8,
+    ):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.flush_every = flush_every
+        self.max_segments = max_segments
+
+        self._segments: List[_Segment] = []
+        self._next_segment = 0
+        self._lock = threading.RLock()
+        # 缓冲中的文档：逐条倒排记录 (词, 缓冲内文档号, 词频)
+        self._buf_terms: List[str] = []
+        self._buf_docs: List[int] = []
+        self._buf_tfs: List[int] = []
+        self._buf_lengths: List[int] = []
+        self._buf_ids: List[str] = []
+        self._buf_segment: Optional[_Segment] = None
+        # 文档 ID -> (段, 段内文档号)，首次写入时才建立
+        self._locations: Optional[Dict[str, Tuple[Optional[_Segment], int]]] = None
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+
+    @classmethod
+    def from_settings(cls, vs_settings: VectorStoreSettings) -> "BM25Index":
+        """根据 VectorStoreSettings 创建实例"""
+        return cls(vs_settings.bm25_index_dir, k1=vs_settings.bm25_k1, b=vs_settings.bm25_b)
+
+    def __len__(self) -> int:
+        """有效（未删除）文档数"""
+        with self._lock:
+            return sum(len(s) - len(s.deleted) for s in self._segments) + len(self._buf_ids) - len(
+                self._buf_deleted()
+            )
+
+    def __contains__(self, doc_id: object) -> bool:
+        """文档 ID 是否存在（未删除）"""
+        with self._lock:
+            return doc_id in self._ensure_locations()
+
+    @property
+    def segment_count(self) -> int:
+        return len(self._segments)
+
+    # ==================== 持久化 ====================
+
+    def _load(self) -> None:
+        manifest_path = os.path.join(self.path, _MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["version"] != MANIFEST_VERSION:
+            raise ValueError(f"不支持的 BM25 索引版本: {manifest['version']}")
+        self._next_segment = manifest["next_segment"]
+        self._segments = [
+            _Segment.load(self.path, item["name"], item["deleted"]) for item in manifest["segments"]
+        ]
+
+    def _save_manifest(self) -> None:
+        if self.path is None:
+            return
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "next_segment": self._next_segment,
+            "segments": [
+                {"name": s.name, "docs": len(s), "deleted": sorted(s.deleted)} for s in self._segments
+            ],
+        }
+        tmp = os.path.join(self.path, _MANIFEST_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, _MANIFEST_FILE))
+
+    def _new_name(self) -> str:
+        name = f"seg-{self._next_segment:06d}"
+        self._next_segment += 1
+        return name
+
+    # ==================== 写入 ====================
+
+    def _ensure_locations(self) -> Dict[str, Tuple[Optional[_Segment], int]]:
+        if self._locations is None:
+            locations: Dict[str, Tuple[Optional[_Segment], int]] = {}
+            for segment in self._segments:
+                for local, doc_id in enumerate(segment.ids):
+                    if local not in segment.deleted:
+                        locations[doc_id] = (segment, local)
+            for local, doc_id in enumerate(self._buf_ids):
+                locations[doc_id] = (None, local)
+            self._locations = locations
+        return self._locations
+
+    def _buf_deleted(self) -> Set[int]:
+        if self._locations is None:
+            return set()
+        alive = {local for seg, local in self._locations.values() if seg is None}
+        return set(range(len(self._buf_ids))) - alive
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        """
+        添加文档；ID 已存在时旧版本被删除（更新）
+
+        Args:
+            ids: 文档 ID
+            texts: 文档文本
+        """
+        with self._lock:
+            locations = self._ensure_locations()
+            dirty = False
+            for doc_id, text in zip(ids, texts):
+                previous = locations.get(doc_id)
+                if previous is not None and previous[0] is not None:
+                    previous[0].deleted.add(previous[1])
+                    dirty = True
+                counts = Counter(tokenize(text))
+                local = len(self._buf_ids)
+                self._buf_terms.extend(counts)
+                self._buf_tfs.extend(counts.values())
+                self._buf_docs.extend([local] * len(counts))
+                self._buf_lengths.append(sum(counts.values()))
+                self._buf_ids.append(doc_id)
+                locations[doc_id] = (None, local)
+            self._buf_segment = None
+            if len(self._buf_ids) >= self.flush_every:
+                self.flush()
+            elif dirty:
+                self._save_manifest()
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """删除文档，返回实际删除的数量"""
+        with self._lock:
+            locations = self._ensure_locations()
+            removed = 0
+            for doc_id in ids:
+                location = locations.pop(doc_id, None)
+                if location is None:
+                    continue
+                if location[0] is not None:
+                    location[0].deleted.add(location[1])
+                removed += 1
+            self._buf_segment = None
+            self._save_manifest()
+            return removed
+
+    def _buffer_segment(self) -> Optional[_Segment]:
+        """缓冲中的文档构成的临时段（写入后首次查询时构建）"""
+        if not self._buf_ids:
+            return None
+        if self._buf_segment is None:
+            segment = _Segment.build(
+                "buffer",
+                (self._buf_terms, self._buf_docs, self._buf_tfs),
+                self._buf_lengths,
+                list(self._buf_ids),
+            )
+            segment.deleted = self._buf_deleted()
+            self._buf_segment = segment
+        return self._buf_segment
+
+    def flush(self) -> None:
+        """把缓冲写成新段（已有段不改写），必要时合并小段"""
+        with self._lock:
+            segment = self._buffer_segment()
+            if segment is None:
+                return
+            segment.name = self._new_name()
+            if self.path is not None:
+                segment.save(self.path)
+            self._segments.append(segment)
+            self._buf_terms, self._buf_docs, self._buf_tfs = [], [], []
+            self._buf_lengths, self._buf_ids = [], []
+            self._buf_segment = None
+            if self._locations is not None:
+                for local, doc_id in enumerate(segment.ids):
+                    if self._locations.get(doc_id) == (None, local):
+                        self._locations[doc_id] = (segment, local)
+            if len(self._segments) > self.max_segments:
+                self._merge_smallest()
+                # 合并后段内文档号改变，下次写入时重建
+                self._locations = None
+            self._save_manifest()
+
+    def _merge_smallest(self) -> None:
+        while len(self._segments) > self.max_segments:
+            sizes = [len(s) for s in self._segments]
+            i = min(range(len(sizes) - 1), key=lambda j: sizes[j] + sizes[j + 1])
+            self._replace(i, i + 2)
+
+    def optimize(self) -> None:
+        """把全部段合并为一段（清除已删除文档）"""
+        with self._lock:
+            self.flush()
+            if len(self._segments) > 1 or any(s.deleted for s in self._segments):
+                self._replace(0, len(self._segments))
+                self._locations = None
+                self._save_manifest()
+
+    def _replace(self, start: int, end: int) -> None:
+        old = self._segments[start:end]
+        merged = _merge(self._new_name(), old)
+        if self.path is not None:
+            merged.save(self.path)
+        self._segments[start:end] = [merged]
+        self._save_manifest()
+        if self.path is not None:
+            for segment in old:
+                segment.remove_files(self.path)
+
+    # ==================== 查询 ====================
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """
+        BM25 检索
+
+        Returns:
+            [(文档 ID, BM25 分数)]，按分数降序，只包含至少命中一个词的文档
+        """
+        tids = [term_id(term) for term in dict.fromkeys(tokenize(query))]
+        # 写入会原地修改 deleted、合并会替换段列表，在锁内取快照（含各段起始下标），之后只读快照
+        with self._lock:
+            segments = list(self._segments)
+            buffer = self._buffer_segment()
+            if buffer is not None:
+                segments.append(buffer)
+            bases = []
+            base = 0
+            for segment in segments:
+                bases.append(base)
+                base += len(segment)
+            deleted = [frozenset(segment.deleted) for segment in segments]
+        total = base
+        live = total - sum(len(d) for d in deleted)
+        if not tids or not live:
+            return []
+
+        avgdl = sum(float(np.sum(s.lengths, dtype=np.float64)) for s in segments) / total
+        postings = [[segment.postings(tid) for segment in segments] for tid in tids]
+        scores = np.zeros(total, dtype=np.float32)
+        for per_segment in postings:
+            df = sum(len(docs) for docs, _ in per_segment)
+            if not df:
+                continue
+            idf = np.log1p((live - df + 0.5) / (df + 0.5))
+            for segment, segment_base, (docs, tfs) in zip(segments, bases, per_segment):
+                if not len(docs):
+                    continue
+                tf = tfs.astype(np.float32)
+                norm = self.k1 * (1 - self.b + self.b * segment.lengths[docs] / avgdl)
+                # 同一词项的倒排表内文档号不重复，可以直接按下标累加
+                scores[docs.astype(np.int64) + segment_base] += idf * tf * (self.k1 + 1) / (tf + norm)
+        for segment_base, segment_deleted in zip(bases, deleted):
+            if segment_deleted:
+                scores[np.fromiter(segment_deleted, dtype=np.int64) + segment_base] = 0
+
+        results = []
+        for index in top_k_indices(scores, k):
+            if scores[index] <= 0:
+                break
+            i = bisect.bisect_right(bases, index) - 1
+            results.append((segments[i].ids[index - bases[i]], float(scores[index])))
+        return results
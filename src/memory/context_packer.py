@@ -0,0 +1,220 @@
+"""
+RAG 上下文打包
+
+ContextPacker 把检索结果装进 RAG_ANSWER_WITH_CONTEXT 的 {retrieved_context}：
+- token 预算 = LLMSettings.max_tokens × context_budget_ratio
+- 按 MMR（λ·相关度 − (1−λ)·与已选分块的最大相似度）贪心选择分块，冗余惩罚
+  在检索得到的向量上一次矩阵乘算出；与已选分块相似度超过 duplicate_threshold
+  的近似重复分块直接跳过；放不进剩余预算的分块跳过，继续尝试更短的分块
+- 同一文档中相邻的分块（metadata 的 source + chunk 连续）合并为一段，去掉
+  切分时的重叠部分
+- 每段前标注引用编号 [n]，返回打包后的文本和引用列表
+
+token 数默认用 estimate_tokens 估算（汉字按 1 个、其他字符约 4 个 1 个），可传入
+模型对应的分词器计数函数。
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from config.settings import LLMSettings, VectorStoreSettings
+from .vector_store import normalize
+
+_CJK_RE = re.compile(r"[　-〿㐀-䶿一-鿿豈-﫿＀-￯]")
+# 合并相邻分块时查找重叠的最大长度
+_MAX_OVERLAP = 1000
+
+
+def estimate_tokens(text: str) -> int:
+    """估算 token 数：汉字和全角标点各 1 个，其余非空白字符每 4 个 1 个"""
+    cjk = len(_CJK_RE.findall(text))
+    other = len(text) - cjk - text.count(" ") - text.count("\n")
+    return cjk + (max(other, 0) + 3) // 4
+
+
+def _join_overlap(left: str, right: str) -> str:
+    """拼接相邻分块，去掉 right 开头与 left 结尾重复的部分"""
+    for size in range(min(len(left), len(right), _MAX_OVERLAP), 0, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return left + "\n" + right
+
+
+@dataclass
+class Citation:
+    """引用：上下文中编号为 index 的段落来自哪些分块"""
+
+    index: int
+    source: str
+    chunks: List[int] = field(default_factory=list)
+    document_ids: List[str] = field(default_factory=list)
+
+
+@dataclass
+class PackedContext:
+    """打包结果"""
+
+    text: str
+    citations: List[Citation]
+    tokens: int
+    dropped: int = 0  # 因冗余或超出预算未选入的分块数
+
+
+class ContextPacker:
+    """
+    按 token 预算和 MMR 冗余惩罚选择分块并打包成上下文
+
+    Args:
+        token_budget: 上下文 token 预算
+        mmr_lambda: MMR 中相关度的权重，1.0 表示不考虑冗余
+        duplicate_threshold: 与已选分块的余弦相似度达到该值时视为重复直接跳过
+        token_counter: token 计数函数
+    """
+
+    def __init__(
+        self,
+        token_budget: int,
+        *,
+        mmr_lambda: float = 0.7,
+        duplicate_threshold: float = 0.95,
+        token_counter: Callable[[str], int] = estimate_tokens,
+    ):
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+        self.token_counter = token_counter
+
+    @classmethod
+    def from_settings(
+        cls, vs_settings: VectorStoreSettings, llm_settings: LLMSettings, **kwargs
+    ) -> "ContextPacker":
+        """根据配置创建实例，预算为 max_tokens × context_budget_ratio"""
+        return cls(
+            int(llm_settings.max_tokens * vs_settings.context_budget_ratio),
+            mmr_lambda=vs_settings.mmr_lambda,
+            duplicate_threshold=vs_settings.duplicate_threshold,
+            **kwargs,
+        )
+
+    # ==================== 选择 ====================
+
+    def select(
+        self,
+        costs: Sequence[int],
+        scores: Sequence[float],
+        vectors: Optional[np.ndarray] = None,
+    ) -> List[int]:
+        """
+        MMR 贪心选择
+
+        Args:
+            costs: 每个分块的 token 数
+            scores: 相关度（任意尺度，内部按最大值归一化），按检索排名给出
+            vectors: 分块向量，None 表示不做冗余惩罚
+
+        Returns:
+            选中分块的下标，按选中顺序
+        """
+        n = len(costs)
+        if not n:
+            return []
+        relevance = np.asarray(scores, dtype=np.float32)
+        top = float(relevance.max())
+        relevance = relevance / top if top > 0 else np.ones(n, dtype=np.float32)
+        cost = np.asarray(costs, dtype=np.int64)
+        similarity = None
+        if vectors is not None:
+            unit = normalize(np.asarray(vectors, dtype=np.float32).reshape(n, -1))
+            similarity = unit @ unit.T
+
+        lam = self.mmr_lambda
+        available = np.ones(n, dtype=bool)
+        redundancy = np.zeros(n, dtype=np.float32)
+        remaining = self.token_budget
+        selected: List[int] = []
+        while True:
+            # 放不进剩余预算的分块不再参与
+            available &= cost <= remaining
+            if similarity is not None:
+                available &= redundancy < self.duplicate_threshold
+            if not available.any():
+                break
+            mmr = np.where(available, lam * relevance - (1 - lam) * redundancy, -np.inf)
+            best = int(np.argmax(mmr))
+            selected.append(best)
+            available[best] = False
+            remaining -= int(cost[best])
+            if similarity is not None:
+                np.maximum(redundancy, similarity[best], out=redundancy)
+        return selected
+
+    # ==================== 打包 ====================
+
+    def _merge(self, documents: Sequence[Document], selected: List[int]) -> List[Tuple[str, Citation]]:
+        """把同一文档中相邻的分块合并为一段，段落按其中最早被选中的分块排序"""
+        groups: Dict[str, List[Tuple[int, int]]] = {}
+        for order, index in enumerate(selected):
+            metadata = documents[index].metadata
+            source = str(metadata.get("source") or documents[index].id or index)
+            groups.setdefault(source, []).append((order, index))
+
+        passages: List[Tuple[int, str, Citation]] = []
+        for source, members in groups.items():
+            members.sort(key=lambda m: (documents[m[1]].metadata.get("chunk", -1), m[0]))
+            run: List[Tuple[int, int]] = []
+            for member in members + [(-1, -1)]:
+                if run and member[1] >= 0:
+                    previous = documents[run[-1][1]].metadata.get("chunk")
+                    current = documents[member[1]].metadata.get("chunk")
+                    if previous is not None and current == previous + 1:
+                        run.append(member)
+                        continue
+                if run:
+                    text = documents[run[0][1]].page_content
+                    for _, index in run[1:]:
+                        text = _join_overlap(text, documents[index].page_content)
+                    citation = Citation(
+                        0,
+                        source,
+                        [documents[i].metadata["chunk"] for _, i in run if "chunk" in documents[i].metadata],
+                        [documents[i].id for _, i in run if documents[i].id],
+                    )
+                    passages.append((min(order for order, _ in run), text, citation))
+                run = [member]
+        passages.sort(key=lambda p: p[0])
+        return [(text, citation) for _, text, citation in passages]
+
+    def pack(
+        self,
+        documents: Sequence[Document],
+        scores: Sequence[float],
+        vectors: Optional[np.ndarray] = None,
+    ) -> PackedContext:
+        """
+        选择并打包分块
+
+        Args:
+            documents: 检索到的分块
+            scores: 每个分块的相关度（如相似度或 RRF 分数）
+            vectors: 每个分块的向量（如 NumpyVectorStore.get_vectors），None 表示不做冗余惩罚
+        """
+        costs = [self.token_counter(self._format(0, doc.metadata.get("source"), doc.page_content))
+                 for doc in documents]
+        selected = self.select(costs, scores, vectors)
+        parts = []
+        citations = []
+        for number, (text, citation) in enumerate(self._merge(documents, selected), 1):
+            citation.index = number
+            citations.append(citation)
+            parts.append(self._format(number, citation.source, text))
+        text = "\n\n".join(parts)
+        return PackedContext(text, citations, self.token_counter(text), len(documents) - len(selected))
+
+    @staticmethod
+    def _format(number: int, source: Optional[str], text: str) -> str:
+        header = f"[{number}]" if not source else f"[{number}] 来源：{source}"
+        return f"{header}\n{text}"
@@ -0,0 +1,290 @@
+"""
+带内容哈希缓存的 Embedding 服务
+
+CachedEmbeddings 包装任意 LangChain Embeddings：
+- 以 sha256(模型名 + 文本) 为键去重，两级缓存：进程内 LRU + SQLite 持久化
+- 未命中的文本交给后台线程，在 batch_wait 窗口内把并发调用方的请求合并成
+  不超过 batch_size 的批次调用 embed_documents；同一文本的并发未命中只计算一次
+- hits / disk_hits / misses 计数，hit_rate 为两级缓存的总命中率
+"""
+
+import asyncio
+import atexit
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config.settings import VectorStoreSettings
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key BLOB PRIMARY KEY,
+    vector BLOB NOT NULL
+) WITHOUT ROWID
+"""
+# SQLite 单条语句的参数个数上限（保守取值）
+_MAX_SQL_PARAMS = 500
+
+
+def content_key(model: str, text: str) -> bytes:
+    """缓存键：模型名和文本的 sha256"""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    内容哈希去重 + 批量合并的 Embedding 服务
+
+    Args:
+        inner: 实际调用提供商的 Embedding 模型
+        model: 模型名（参与缓存键，切换模型不会命中旧向量）
+        path: SQLite 缓存文件路径，None 表示只使用内存 LRU
+        cache_size: 内存 LRU 容纳的向量数
+        batch_size: 单次调用提供商的最大文本数
+        batch_wait: 合并等待时间（秒），窗口内到达的未命中合并为一批
+    """
+
+    def __init__(
+        self,
+        inner: Embeddings,
+        model: str,
+        path: Optional[str] = None,
+        *,
+        cache_size: int = 10000,
+        batch_size: int = 256,
+        batch_wait: float = 0.005,
+    ):
+        self.inner = inner
+        self.model = model
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+
+        self._lru: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lru_lock = threading.Lock()
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if path is not None:
+            if path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(_SCHEMA)
+
+        self._cond = threading.Condition()
+        # 等待计算的文本（按到达顺序），以及每个键对应的 Future（合并同一文本的并发请求）
+        self._queue: "OrderedDict[bytes, str]" = OrderedDict()
+        self._futures: Dict[bytes, Future] = {}
+        self._first_queued = 0.0
+        self._closed = False
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.batches = 0
+
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def from_settings(
+        cls, vs_settings: VectorStoreSettings, inner: Embeddings
+    ) -> "CachedEmbeddings":
+        """根据 VectorStoreSettings 创建实例"""
+        return cls(
+            inner,
+            f"{vs_settings.embedding_provider}:{vs_settings.embedding_model}",
+            vs_settings.embedding_cache_path,
+            cache_size=vs_settings.embedding_cache_size,
+            batch_size=vs_settings.embedding_batch_size,
+            batch_wait=vs_settings.embedding_batch_wait_ms / 1000,
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        """两级缓存的总命中率"""
+        total = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / total if total else 0.0
+
+    def close(self) -> None:
+        """处理完排队的请求后停止后台线程并关闭缓存数据库"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join()
+        if self._conn is not None:
+            with self._db_lock:
+                self._conn.close()
+        atexit.unregister(self.close)
+
+    # ==================== 缓存 ====================
+
+    def _lru_get(self, key: bytes) -> Optional[np.ndarray]:
+        with self._lru_lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+            return vector
+
+    def _lru_put(self, items: Sequence[Tuple[bytes, np.ndarray]]) -> None:
+        with self._lru_lock:
+            for key, vector in items:
+                self._lru[key] = vector
+                self._lru.move_to_end(key)
+            while len(self._lru) > self.cache_size:
+                self._lru.popitem(last=False)
+
+    def _disk_get(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        if self._conn is None or not keys:
+            return {}
+        found: Dict[bytes, np.ndarray] = {}
+        with self._db_lock:
+            for start in range(0, len(keys), _MAX_SQL_PARAMS):
+                chunk = keys[start:start + _MAX_SQL_PARAMS]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def _disk_put(self, items: Sequence[Tuple[bytes, np.ndarray]]) -> None:
+        if self._conn is None:
+            return
+        with self._db_lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, vector.astype(np.float32).tobytes()) for key, vector in items],
+            )
+            self._conn.execute("COMMIT")
+
+    # ==================== 批量合并 ====================
+
+    def _submit(self, misses: Dict[bytes, str]) -> Dict[bytes, Future]:
+        """把未命中的文本加入队列，已在排队 / 计算中的文本复用同一个 Future"""
+        futures = {}
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("CachedEmbeddings 已关闭")
+            for key, text in misses.items():
+                future = self._futures.get(key)
+                if future is None:
+                    future = self._futures[key] = Future()
+                    if not self._queue:
+                        self._first_queued = time.monotonic()
+                    self._queue[key] = text
+                futures[key] = future
+            self._cond.notify_all()
+        return futures
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                # 批次未满时等待合并窗口，让并发调用方的请求进入同一批
+                deadline = self._first_queued + self.batch_wait
+                while len(self._queue) < self.batch_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = []
+                while self._queue and len(batch) < self.batch_size:
+                    batch.append(self._queue.popitem(last=False))
+                # 剩余的请求已经等过合并窗口，下一轮立即处理
+                self._first_queued = 0.0
+
+            self._embed_batch(batch)
+
+    def _embed_batch(self, batch: List[Tuple[bytes, str]]) -> None:
+        try:
+            vectors = self.inner.embed_documents([text for _, text in batch])
+            items = [(key, np.asarray(v, dtype=np.float32)) for (key, _), v in zip(batch, vectors)]
+            self._lru_put(items)
+            self._disk_put(items)
+            error = None
+        except BaseException as exc:  # noqa: BLE001 - 异常交给等待的调用方
+            logger.exception("Embedding 批量计算失败: %d 条", len(batch))
+            error, items = exc, []
+
+        with self._cond:
+            self.batches += 1
+            futures = [self._futures.pop(key) for key, _ in batch]
+        if error is not None:
+            for future in futures:
+                future.set_exception(error)
+        else:
+            for future, (_, vector) in zip(futures, items):
+                future.set_result(vector)
+
+    # ==================== Embeddings 接口 ====================
+
+    def _lookup(self, texts: List[str]) -> Tuple[List[bytes], Dict[bytes, np.ndarray], Dict[bytes, str]]:
+        """返回 (每个文本的键, 已命中的向量, 未命中的 {键: 文本})"""
+        keys = [content_key(self.model, text) for text in texts]
+        found: Dict[bytes, np.ndarray] = {}
+        pending: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key in found or key in pending:
+                continue
+            vector = self._lru_get(key)
+            if vector is not None:
+                found[key] = vector
+            else:
+                pending[key] = text
+        hits = len(found)
+
+        disk = self._disk_get(list(pending))
+        if disk:
+            self._lru_put(list(disk.items()))
+            found.update(disk)
+            for key in disk:
+                del pending[key]
+
+        with self._cond:
+            self.hits += hits
+            self.disk_hits += len(disk)
+            self.misses += len(pending)
+        return keys, found, pending
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, pending = self._lookup(list(texts))
+        if pending:
+            for key, future in self._submit(pending).items():
+                found[key] = future.result()
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, pending = await asyncio.to_thread(self._lookup, list(texts))
+        if pending:
+            futures = self._submit(pending)
+            results = await asyncio.gather(*(asyncio.wrap_future(f) for f in futures.values()))
+            found.update(zip(futures, results))
+        return [found[key].tolist() for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
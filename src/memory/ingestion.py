@@ -0,0 +1,486 @@
+"""
+流式并行文档导入
+
+IngestionPipeline 把知识库文件导入向量存储（以及可选的 BM25 索引），各阶段之间
+用有界队列连接，内存占用与语料大小无关：
+
+    读取 + 切分（进程池）→ 去重 → 批量 Embedding（线程）→ 批量写入
+
+- 切分是 CPU 密集的纯 Python 计算，在进程池中执行，按文件顺序取回结果
+- 分块 ID 为内容哈希，同一内容只写入一次；写入前按 ID 跳过向量存储（和 BM25
+  索引）中已有的分块，重复导入同一目录是幂等的
+- 进度检查点：文件的全部分块写入后才记录到进度文件（JSON Lines），每隔
+  checkpoint_interval 秒（以及结束时）先 flush BM25 再追加记录。进程崩溃后重新
+  运行会跳过已完成且未修改的文件，未完成的文件重新导入，已写入的分块按 ID 跳过
+"""
+
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import resource
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from fnmatch import fnmatch
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.vectorstores import VectorStore
+
+from config.settings import VectorStoreSettings
+from .bm25 import BM25Index
+from .vector_store import NumpyVectorStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATTERNS = ("*.txt", "*.md")
+# 句子边界：中文标点 / 换行之后，或英文标点后跟空白
+_SENTENCE_RE = re.compile(r"(?<=[。！？；\n])|(?<=[.!?;])(?=\s)")
+# 队列结束标记
+_DONE = object()
+
+
+def split_text(text: str, chunk_size: int = 800, chunk_overlap: int = 100) -> List[str]:
+    """
+    按句子边界切分文本
+
+    句子依次装入分块，超过 chunk_size 时开始新块，新块以上一块末尾不超过
+    chunk_overlap 个字符的完整句子开头；单个句子超过 chunk_size 时按字符硬切。
+    """
+    units: List[str] = []
+    step = max(1, chunk_size - chunk_overlap)
+    for sentence in _SENTENCE_RE.split(text):
+        if len(sentence) <= chunk_size:
+            if sentence:
+                units.append(sentence)
+        else:
+            units.extend(sentence[i:i + chunk_size] for i in range(0, len(sentence), step))
+
+    chunks: List[str] = []
+    current: List[str] = []
+    length = 0
+    for unit in units:
+        if current and length + len(unit) > chunk_size:
+            chunks.append("".join(current).strip())
+            # 保留末尾的句子作为重叠部分
+            overlap: List[str] = []
+            size = 0
+            for previous in reversed(current):
+                if size + len(previous) > chunk_overlap or size + len(previous) + len(unit) > chunk_size:
+                    break
+                overlap.append(previous)
+                size += len(previous)
+            current, length = overlap[::-1], size
+        current.append(unit)
+        length += len(unit)
+    if current:
+        chunks.append("".join(current).strip())
+    return [chunk for chunk in chunks if chunk]
+
+
+def chunk_id(text: str) -> str:
+    """分块 ID：内容的 sha256（前 32 位十六进制）"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def _read_and_split(path: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    """进程池任务：读取文件并切分"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return split_text(f.read(), chunk_size, chunk_overlap)
+
+
+def iter_files(paths: Iterable[str], patterns: Sequence[str] = DEFAULT_PATTERNS) -> Iterator[str]:
+    """遍历路径下匹配 patterns 的文件（按路径排序，保证进度可复现；重复路径只返回一次）"""
+
+    def walk(path: str) -> Iterator[str]:
+        if os.path.isfile(path):
+            yield path
+            return
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if any(fnmatch(name, pattern) for pattern in patterns):
+                    yield os.path.join(root, name)
+
+    seen = set()
+    for path in paths:
+        for candidate in walk(path):
+            key = os.path.abspath(candidate)
+            if key not in seen:
+                seen.add(key)
+                yield candidate
+
+
+@dataclass
+class IngestionStats:
+    """导入统计"""
+
+    files: int = 0  # 本次处理的文件数
+    skipped_files: int = 0  # 根据进度检查点跳过的文件数
+    chunks: int = 0  # 切分出的分块数
+    duplicates: int = 0  # 内容重复而跳过的分块数
+    upserted: int = 0  # 写入向量存储的分块数
+    elapsed: float = 0.0  # 耗时（秒）
+    peak_rss_mb: float = 0.0  # 本进程与切分子进程的峰值常驻内存（MB）
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.elapsed if self.elapsed else 0.0
+
+
+def peak_rss_mb() -> float:
+    """本进程与已结束子进程中较大的峰值常驻内存（Linux 下 ru_maxrss 单位为 KB）"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+class _Aborted(Exception):
+    """其他阶段失败，当前阶段退出"""
+
+
+class IngestionPipeline:
+    """
+    流式并行文档导入
+
+    Args:
+        vector_store: 目标向量存储
+        bm25: 同时写入的 BM25 索引（可选），分块 ID 与向量存储一致
+        progress_path: 进度检查点文件，None 表示不记录进度
+        chunk_size: 分块最大字符数
+        chunk_overlap: 相邻分块的重叠字符数
+        workers: 切分进程数，0 表示在读取线程中切分
+        embed_workers: 并发调用 Embedding 的线程数
+        batch_size: 每批 Embedding / 写入的分块数
+        queue_size: 阶段之间队列的容量（批次 / 文件数）
+        checkpoint_interval: 写入进度检查点的间隔（秒）
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        *,
+        bm25: Optional[BM25Index] = None,
+        progress_path: Optional[str] = None,
+        chunk_size: int = 800,
+        chunk_overlap: int = 100,
+        workers: int = 4,
+        embed_workers: int = 2,
+        batch_size: int = 256,
+        queue_size: int = 8,
+        checkpoint_interval: float = 10.0,
+    ):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap 必须小于 chunk_size")
+        self.vector_store = vector_store
+        self.bm25 = bm25
+        self.progress_path = progress_path
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.workers = workers
+        self.embed_workers = embed_workers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.checkpoint_interval = checkpoint_interval
+
+        self._abort = threading.Event()
+        self._errors: List[BaseException] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(
+        cls, vs_settings: VectorStoreSettings, vector_store: VectorStore, **kwargs
+    ) -> "IngestionPipeline":
+        """根据 VectorStoreSettings 创建实例"""
+        kwargs.setdefault("chunk_size", vs_settings.chunk_size)
+        kwargs.setdefault("chunk_overlap", vs_settings.chunk_overlap)
+        kwargs.setdefault("workers", vs_settings.ingest_workers)
+        kwargs.setdefault("batch_size", vs_settings.embedding_batch_size)
+        kwargs.setdefault("queue_size", vs_settings.ingest_queue_size)
+        return cls(vector_store, **kwargs)
+
+    # ==================== 进度检查点 ====================
+
+    def _load_progress(self) -> Dict[str, Tuple[int, int]]:
+        """读取已完成的文件：{路径: (大小, mtime_ns)}，跳过崩溃时写了一半的行"""
+        done: Dict[str, Tuple[int, int]] = {}
+        if self.progress_path is None or not os.path.exists(self.progress_path):
+            return done
+        with open(self.progress_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                done[record["path"]] = (record["size"], record["mtime_ns"])
+        return done
+
+    def _write_progress(self, records: List[Dict[str, Any]]) -> None:
+        if self.bm25 is not None:
+            # BM25 缓冲落盘后才能把文件记为完成
+            self.bm25.flush()
+        if self.progress_path is None or not records:
+            return
+        with open(self.progress_path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+    # ==================== 队列 ====================
+
+    def _fail(self, exc: BaseException) -> None:
+        with self._lock:
+            self._errors.append(exc)
+        self._abort.set()
+
+    def _put(self, q: "queue.Queue", item: Any) -> None:
+        while True:
+            if self._abort.is_set():
+                raise _Aborted
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: "queue.Queue") -> Any:
+        while True:
+            if self._abort.is_set():
+                raise _Aborted
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def _stage(self, target, *args) -> threading.Thread:
+        def run():
+            try:
+                target(*args)
+            except _Aborted:
+                pass
+            except BaseException as exc:  # noqa: BLE001 - 异常交给 run() 抛出
+                logger.exception("导入阶段 %s 失败", target.__name__)
+                self._fail(exc)
+
+        thread = threading.Thread(target=run, name=f"ingest{target.__name__}", daemon=True)
+        thread.start()
+        return thread
+
+    # ==================== 各阶段 ====================
+
+    def _read(
+        self,
+        files: Iterable[str],
+        out: "queue.Queue",
+        stats: IngestionStats,
+        executor: Optional[Executor],
+    ) -> None:
+        """读取 + 切分：提交到进程池，按文件顺序取回，在途任务数受 queue_size 限制"""
+        done = self._load_progress()
+        pending: deque = deque()
+        try:
+            for path in files:
+                st = os.stat(path)
+                if done.get(path) == (st.st_size, st.st_mtime_ns):
+                    stats.skipped_files += 1
+                    continue
+                record = {"path": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+                if executor is None:
+                    self._put(out, (record, _read_and_split(path, self.chunk_size, self.chunk_overlap)))
+                    continue
+                pending.append(
+                    (record, executor.submit(_read_and_split, path, self.chunk_size, self.chunk_overlap))
+                )
+                if len(pending) >= self.queue_size * max(1, self.workers):
+                    record, future = pending.popleft()
+                    self._put(out, (record, future.result()))
+            while pending:
+                record, future = pending.popleft()
+                self._put(out, (record, future.result()))
+        finally:
+            for _, future in pending:
+                future.cancel()
+        self._put(out, _DONE)
+
+    def _dedup(self, inp: "queue.Queue", out: "queue.Queue", stats: IngestionStats) -> None:
+        """按内容哈希去重，组成批次；记录每个文件还有多少分块未写入"""
+        seen = set()
+        batch: List[Tuple[str, str, Dict[str, Any], str]] = []
+        while True:
+            item = self._get(inp)
+            if item is _DONE:
+                break
+            record, chunks = item
+            path = record["path"]
+            stats.files += 1
+            stats.chunks += len(chunks)
+            fresh = []
+            for index, text in enumerate(chunks):
+                cid = chunk_id(text)
+                if cid in seen:
+                    stats.duplicates += 1
+                    continue
+                seen.add(cid)
+                fresh.append((cid, text, {"source": path, "chunk": index}, path))
+            record["chunks"] = len(fresh)
+            with self._lock:
+                self._remaining[path] = [len(fresh), record]
+                if not fresh:
+                    del self._remaining[path]
+                    self._completed.append(record)
+            for entry in fresh:
+                batch.append(entry)
+                if len(batch) >= self.batch_size:
+                    self._put(out, batch)
+                    batch = []
+        if batch:
+            self._put(out, batch)
+        for _ in range(self.embed_workers):
+            self._put(out, _DONE)
+
+    def _embed(self, inp: "queue.Queue", out: "queue.Queue") -> None:
+        """批量调用 Embedding，跳过向量存储中已有的分块；向量存储不接受预计算向量时直接透传"""
+        embedding = self.vector_store.embeddings if self._accepts_vectors() else None
+        while True:
+            batch = self._get(inp)
+            if batch is _DONE:
+                break
+            # 之前的导入（或崩溃前的本次导入）可能已经写入了一部分分块
+            existing = self._existing([cid for cid, _, _, _ in batch])
+            vectors = None
+            if embedding is not None:
+                texts = [text for cid, text, _, _ in batch if cid not in existing]
+                computed = iter(embedding.embed_documents(texts) if texts else [])
+                vectors = [None if cid in existing else next(computed) for cid, _, _, _ in batch]
+            self._put(out, (batch, vectors, existing))
+        self._put(out, _DONE)
+
+    # ==================== 写入 ====================
+
+    def _accepts_vectors(self) -> bool:
+        store = self.vector_store
+        return isinstance(store, NumpyVectorStore) or hasattr(store, "_collection")
+
+    def _existing(self, ids: List[str]) -> set:
+        try:
+            return {doc.id for doc in self.vector_store.get_by_ids(ids)}
+        except NotImplementedError:
+            return set()
+
+    def _upsert(
+        self,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        vectors: Optional[List[List[float]]],
+    ) -> None:
+        store = self.vector_store
+        if isinstance(store, NumpyVectorStore):
+            store.add_embeddings(texts, vectors, metadatas, ids)
+        elif vectors is not None:
+            # Chroma：直接 upsert 预计算的向量，避免 add_texts 再算一遍
+            store._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+        else:
+            store.add_texts(texts, metadatas, ids=ids)
+
+    def _write(self, inp: "queue.Queue", stats: IngestionStats) -> None:
+        finished = 0
+        last_checkpoint = time.monotonic()
+        while finished < self.embed_workers:
+            item = self._get(inp)
+            if item is _DONE:
+                finished += 1
+                continue
+            batch, vectors, existing = item
+            ids = [cid for cid, _, _, _ in batch]
+            texts = [text for _, text, _, _ in batch]
+            if self.bm25 is not None:
+                # BM25 缓冲在崩溃时会丢失，按索引自身的内容判断是否已写入
+                missing = [i for i, cid in enumerate(ids) if cid not in self.bm25]
+                if missing:
+                    self.bm25.add([ids[i] for i in missing], [texts[i] for i in missing])
+
+            keep = [i for i in range(len(batch)) if ids[i] not in existing]
+            if len(keep) == len(batch):
+                self._upsert(ids, texts, [meta for _, _, meta, _ in batch], vectors)
+            elif keep:
+                self._upsert(
+                    [ids[i] for i in keep],
+                    [texts[i] for i in keep],
+                    [batch[i][2] for i in keep],
+                    None if vectors is None else [vectors[i] for i in keep],
+                )
+            stats.upserted += len(keep)
+
+            with self._lock:
+                for _, _, _, path in batch:
+                    entry = self._remaining[path]
+                    entry[0] -= 1
+                    if not entry[0]:
+                        del self._remaining[path]
+                        self._completed.append(entry[1])
+            if time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+                self._checkpoint()
+                last_checkpoint = time.monotonic()
+
+    def _checkpoint(self) -> None:
+        with self._lock:
+            records, self._completed = self._completed, []
+        self._write_progress(records)
+
+    # ==================== 入口 ====================
+
+    def run(self, paths: Iterable[str], patterns: Sequence[str] = DEFAULT_PATTERNS) -> IngestionStats:
+        """
+        导入 paths（文件或目录）下匹配 patterns 的文件
+
+        Returns:
+            导入统计；任一阶段失败时在已完成的文件写入检查点后抛出该异常
+        """
+        stats = IngestionStats()
+        start = time.perf_counter()
+        self._abort.clear()
+        self._errors = []
+        self._remaining: Dict[str, List] = {}
+        self._completed: List[Dict[str, Any]] = []
+
+        executor: Optional[Executor] = None
+        if self.workers > 0:
+            executor = ProcessPoolExecutor(self.workers)
+            # 在启动各阶段线程之前创建全部子进程（fork 时进程内只有当前线程）
+            executor.submit(int).result()
+
+        chunked: "queue.Queue" = queue.Queue(self.queue_size)
+        batches: "queue.Queue" = queue.Queue(self.queue_size)
+        embedded: "queue.Queue" = queue.Queue(self.queue_size)
+        threads = [
+            self._stage(self._read, iter_files(paths, patterns), chunked, stats, executor),
+            self._stage(self._dedup, chunked, batches, stats),
+        ]
+        threads += [self._stage(self._embed, batches, embedded) for _ in range(self.embed_workers)]
+        try:
+            self._write(embedded, stats)
+        except _Aborted:
+            pass
+        except BaseException as exc:
+            self._fail(exc)
+        finally:
+            for thread in threads:
+                thread.join()
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+            self._checkpoint()
+
+        stats.elapsed = time.perf_counter() - start
+        stats.peak_rss_mb = peak_rss_mb()
+        if self._errors:
+            raise self._errors[0]
+        return stats
@@ -0,0 +1,366 @@
+"""
+多查询检索与倒数排名融合（RRF）
+
+RAG_QUERY_GENERATION 为一个问题生成 1-3 个检索查询。FusionRetriever：
+1. 一次批量调用 Embedding 计算全部查询向量
+2. 并发检索：NumpyVectorStore 用一次矩阵乘完成全部查询，其他向量存储用线程池并发；
+   其他存储返回的分数按存储自己的换算函数（_select_relevance_score_fn）统一为相关度，
+   例如 Chroma 返回的是距离（越小越相关）。存储没有声明换算方式时只按排名融合
+3. 按 RRF（score = Σ 1 / (rrf_k + rank)）融合各查询的结果，按文档去重
+4. 用每个文档在各查询中的最高相似度过滤 score_threshold，最后截取 top_k
+
+HybridRetriever 在此基础上与向量检索并行执行 BM25 关键词检索，把每个查询的 BM25
+排名作为额外的排名列表参与 RRF；被 BM25 命中的文档不受 score_threshold 过滤。
+
+每个阶段的耗时（毫秒）记录在 RetrievalResult.timings 中。
+"""
+
+import asyncio
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from config.settings import VectorStoreSettings
+from src.utils import traced
+from .bm25 import BM25Index
+from .vector_store import NumpyVectorStore
+
+
+@dataclass
+class FusedHit:
+    """融合后的检索结果"""
+
+    document: Document
+    score: float  # RRF 分数
+    similarity: Optional[float]  # 各查询中的最高相似度，只被关键词检索命中时为 None
+    queries: List[int] = field(default_factory=list)  # 命中该文档的查询下标
+
+
+@dataclass
+class RetrievalResult:
+    """检索结果和各阶段耗时（毫秒）"""
+
+    hits: List[FusedHit]
+    timings: Dict[str, float]
+
+    @property
+    def documents(self) -> List[Document]:
+        return [hit.document for hit in self.hits]
+
+
+def parse_queries(text: str, max_queries: int = 3) -> List[str]:
+    """
+    解析 RAG_QUERY_GENERATION 的输出
+
+    优先解析 JSON 数组；解析失败时按行拆分（去掉列表符号），空结果时返回原文。
+    """
+    match = re.search(r"\[.*\]", text, re.S)
+    queries: List[str] = []
+    if match:
+        try:
+            queries = [str(q).strip() for q in json.loads(match.group(0))]
+        except json.JSONDecodeError:
+            queries = []
+    if not queries:
+        queries = [re.sub(r"^\s*(?:[-*•]|\d+[.)、])\s*", "", line).strip() for line in text.splitlines()]
+    queries = list(dict.fromkeys(q for q in queries if q))
+    return queries[:max_queries] or [text.strip()]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Tuple[str, Optional[float]]]], rrf_k: int = 60
+) -> List[Tuple[str, float, Optional[float], List[int]]]:
+    """
+    倒数排名融合
+
+    Args:
+        rankings: 每个排名列表的 [(文档键, 相似度)]，按排名先后排列；
+            相似度为 None 表示该列表不提供相似度（如 BM25）
+        rrf_k: RRF 平滑常数
+
+    Returns:
+        [(文档键, RRF 分数, 最高相似度, 命中的排名列表下标)]，按 RRF 分数降序
+    """
+    fused: Dict[str, List] = {}
+    for ranking_index, ranking in enumerate(rankings):
+        for rank, (key, similarity) in enumerate(ranking):
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = [0.0, None, []]
+            entry[0] += 1.0 / (rrf_k + rank + 1)
+            if similarity is not None and (entry[1] is None or similarity > entry[1]):
+                entry[1] = similarity
+            entry[2].append(ranking_index)
+    items = [(key, score, similarity, indices) for key, (score, similarity, indices) in fused.items()]
+    items.sort(key=lambda item: (-item[1], -item[2] if item[2] is not None else 1.0))
+    return items
+
+
+def _doc_key(document: Document) -> str:
+    return document.id or document.page_content
+
+
+class FusionRetriever:
+    """
+    并发多查询检索 + RRF 融合
+
+    Args:
+        vector_store: 向量存储
+        top_k: 融合后返回的结果数
+        score_threshold: 相似度阈值（作用于文档在各查询中的最高相似度），None 表示不过滤
+        fetch_k: 每个查询检索的候选数，默认 top_k 的 2 倍
+        rrf_k: RRF 平滑常数
+        max_workers: 非 NumpyVectorStore 时并发检索的线程数
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        *,
+        top_k: int = 5,
+        score_threshold: Optional[float] = None,
+        fetch_k: Optional[int] = None,
+        rrf_k: int = 60,
+        max_workers: int = 4,
+    ):
+        self.vector_store = vector_store
+        self.top_k = top_k
+        self.score_threshold = score_threshold
+        self.fetch_k = fetch_k or top_k * 2
+        self.rrf_k = rrf_k
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="retriever")
+
+    @classmethod
+    def from_settings(
+        cls, vs_settings: VectorStoreSettings, vector_store: VectorStore, **kwargs
+    ) -> "FusionRetriever":
+        """根据 VectorStoreSettings 创建实例"""
+        return cls(
+            vector_store,
+            top_k=vs_settings.top_k,
+            score_threshold=vs_settings.score_threshold,
+            **kwargs,
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    # ==================== 检索 ====================
+
+    def _search(self, vectors: List[List[float]]) -> List[List[Tuple[Document, Optional[float]]]]:
+        store = self.vector_store
+        if isinstance(store, NumpyVectorStore):
+            # 一次矩阵乘完成全部查询；阈值在融合后统一过滤
+            batches = store.search_vectors(np.asarray(vectors, dtype=np.float32), self.fetch_k, -1.0)
+            return [[(store.get_document(i), score) for i, score in hits] for hits in batches]
+        search = getattr(store, "similarity_search_by_vector_with_relevance_scores", None)
+        if search is None:
+            raise TypeError(f"{type(store).__name__} 不支持按向量检索并返回分数")
+        try:
+            relevance = store._select_relevance_score_fn()
+        except NotImplementedError:
+            relevance = None
+
+        def run(vector: List[float]) -> List[Tuple[Document, Optional[float]]]:
+            hits = search(vector, k=self.fetch_k)
+            # 无法换算为相关度时不提供相似度，score_threshold 不过滤这些结果
+            return [(doc, relevance(score) if relevance else None) for doc, score in hits]
+
+        return list(self._executor.map(run, vectors))
+
+    def _fuse(
+        self,
+        rankings: List[List[Tuple[Document, Optional[float]]]],
+        extra: Sequence[List[str]] = (),
+    ) -> List[FusedHit]:
+        """
+        融合各查询的向量检索结果
+
+        Args:
+            rankings: 每个查询的 [(文档, 相似度)]，相似度越大越相关，None 表示未知
+            extra: 每个查询的附加排名（只有文档键，如 BM25），第 i 个对应第 i 个查询
+        """
+        documents: Dict[str, Document] = {}
+        keyed: List[List[Tuple[str, Optional[float]]]] = []
+        for ranking in rankings:
+            row = []
+            for document, similarity in ranking:
+                key = _doc_key(document)
+                documents.setdefault(key, document)
+                row.append((key, similarity))
+            keyed.append(row)
+        keyed.extend([(key, None) for key in keys] for keys in extra)
+        # 排名列表下标 -> 查询下标
+        query_of = list(range(len(rankings))) + list(range(len(extra)))
+
+        fused = reciprocal_rank_fusion(keyed, self.rrf_k)
+        missing = [item[0] for item in fused if item[0] not in documents]
+        if missing:
+            documents.update((_doc_key(doc), doc) for doc in self._load_documents(missing))
+
+        hits = []
+        for key, score, similarity, indices in fused:
+            if key not in documents:
+                continue
+            # 被关键词检索命中的文档已有相关性依据，相似度阈值只过滤纯向量命中
+            keyword_hit = indices[-1] >= len(rankings)
+            if (
+                self.score_threshold is not None
+                and not keyword_hit
+                and similarity is not None
+                and similarity < self.score_threshold
+            ):
+                continue
+            queries = sorted({query_of[i] for i in indices})
+            hits.append(FusedHit(documents[key], score, similarity, queries))
+            if len(hits) >= self.top_k:
+                break
+        return hits
+
+    def _load_documents(self, keys: List[str]) -> List[Document]:
+        """按文档 ID 从向量存储取回只被附加排名命中的文档"""
+        return self.vector_store.get_by_ids(keys)
+
+    @traced("retrieve")
+    def retrieve(self, queries: Sequence[str]) -> RetrievalResult:
+        """检索多个查询并融合结果"""
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+
+        vectors = self.vector_store.embeddings.embed_documents(list(queries))
+        embedded = time.perf_counter()
+        timings["embed"] = (embedded - start) * 1e3
+
+        rankings = self._search(vectors)
+        searched = time.perf_counter()
+        timings["search"] = (searched - embedded) * 1e3
+
+        hits = self._fuse(rankings)
+        done = time.perf_counter()
+        timings["fuse"] = (done - searched) * 1e3
+        timings["total"] = (done - start) * 1e3
+        return RetrievalResult(hits, timings)
+
+    @traced("retrieve")
+    async def aretrieve(self, queries: Sequence[str]) -> RetrievalResult:
+        """异步检索：Embedding 使用异步接口，检索在线程中执行"""
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+
+        vectors = await self.vector_store.embeddings.aembed_documents(list(queries))
+        embedded = time.perf_counter()
+        timings["embed"] = (embedded - start) * 1e3
+
+        rankings = await asyncio.to_thread(self._search, vectors)
+        searched = time.perf_counter()
+        timings["search"] = (searched - embedded) * 1e3
+
+        hits = self._fuse(rankings)
+        done = time.perf_counter()
+        timings["fuse"] = (done - searched) * 1e3
+        timings["total"] = (done - start) * 1e3
+        return RetrievalResult(hits, timings)
+
+
+class HybridRetriever(FusionRetriever):
+    """
+    BM25 + 向量混合检索
+
+    BM25 检索在线程池中与 Embedding、向量检索并行执行，每个查询的 BM25 排名作为
+    额外的排名列表参与 RRF 融合。BM25 索引中的文档 ID 需要与向量存储中的一致，
+    只被 BM25 命中的文档通过 vector_store.get_by_ids 取回。
+
+    Args:
+        vector_store: 向量存储
+        bm25: BM25 倒排索引
+        bm25_k: 每个查询取的 BM25 候选数，默认与 fetch_k 相同
+        其余参数同 FusionRetriever
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        bm25: BM25Index,
+        *,
+        bm25_k: Optional[int] = None,
+        **kwargs,
+    ):
+        super().__init__(vector_store, **kwargs)
+        self.bm25 = bm25
+        self.bm25_k = bm25_k or self.fetch_k
+
+    @classmethod
+    def from_settings(
+        cls,
+        vs_settings: VectorStoreSettings,
+        vector_store: VectorStore,
+        bm25: Optional[BM25Index] = None,
+        **kwargs,
+    ) -> "HybridRetriever":
+        """根据 VectorStoreSettings 创建实例，默认按配置打开 BM25 索引"""
+        return cls(
+            vector_store,
+            bm25 or BM25Index.from_settings(vs_settings),
+            top_k=vs_settings.top_k,
+            score_threshold=vs_settings.score_threshold,
+            **kwargs,
+        )
+
+    def _keyword_search(self, queries: Sequence[str]) -> Tuple[List[List[str]], float]:
+        """返回每个查询的 BM25 命中文档 ID 和耗时（毫秒）"""
+        start = time.perf_counter()
+        rankings = [[doc_id for doc_id, _ in self.bm25.search(query, self.bm25_k)] for query in queries]
+        return rankings, (time.perf_counter() - start) * 1e3
+
+    @traced("retrieve")
+    def retrieve(self, queries: Sequence[str]) -> RetrievalResult:
+        """向量检索与 BM25 检索并行执行后融合"""
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        keyword = self._executor.submit(self._keyword_search, list(queries))
+
+        vectors = self.vector_store.embeddings.embed_documents(list(queries))
+        embedded = time.perf_counter()
+        timings["embed"] = (embedded - start) * 1e3
+
+        rankings = self._search(vectors)
+        searched = time.perf_counter()
+        timings["search"] = (searched - embedded) * 1e3
+
+        keyword_rankings, timings["bm25"] = keyword.result()
+        merged = time.perf_counter()
+        hits = self._fuse(rankings, keyword_rankings)
+        done = time.perf_counter()
+        timings["fuse"] = (done - merged) * 1e3
+        timings["total"] = (done - start) * 1e3
+        return RetrievalResult(hits, timings)
+
+    @traced("retrieve")
+    async def aretrieve(self, queries: Sequence[str]) -> RetrievalResult:
+        """异步混合检索：BM25 在线程中与 Embedding、向量检索并行"""
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        keyword = asyncio.wrap_future(self._executor.submit(self._keyword_search, list(queries)))
+
+        vectors = await self.vector_store.embeddings.aembed_documents(list(queries))
+        embedded = time.perf_counter()
+        timings["embed"] = (embedded - start) * 1e3
+
+        rankings = await asyncio.to_thread(self._search, vectors)
+        searched = time.perf_counter()
+        timings["search"] = (searched - embedded) * 1e3
+
+        keyword_rankings, timings["bm25"] = await keyword
+        merged = time.perf_counter()
+        hits = self._fuse(rankings, keyword_rankings)
+        done = time.perf_counter()
+        timings["fuse"] = (done - merged) * 1e3
+        timings["total"] = (done - start) * 1e3
+        return RetrievalResult(hits, timings)
@@ -0,0 +1,313 @@
+"""
+后台会话摘要
+
+对话历史变长后，用 CONVERSATION_SUMMARY / CONTEXT_COMPRESSION 把较早的消息压缩成
+滚动摘要。压缩不在用户的回合内执行：
+
+- 每轮对话写入消息后调用 SummaryWorker.notify(session_id)（非阻塞，同一会话在队列中
+  只排一次），后台任务检查 "摘要 + 未摘要消息" 的 token 数是否超过 token_threshold
+- 超过时保留最近 keep_recent_tokens 的消息，把更早的消息连同已有摘要压缩为新摘要，
+  通过 MessageRepository.save_summary 单条语句替换（covered_seq 只增不减）
+- 下一轮构建提示词时 load_context 读取摘要和 covered_seq 之后的活动窗口；摘要和
+  窗口使用同一个 covered_seq，替换前后读到的都是完整且不重叠的上下文
+- 摘要的 LLM 调用通过 LLMScheduler 的后台优先级执行：只有在没有交互请求排队、
+  且后台占用未达上限时才获得并发名额。交互的 LLM 调用必须使用同一个调度器
+  （应用中为 app.state.llm_scheduler，graph_factory 从 AppResources.llm_scheduler 取得）
+
+tokens_saved 累计提示词节省量：每个会话为被摘要替换的消息 token 数减去摘要本身的
+token 数，同一会话再次压缩时只计增量，不按会话保存。
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, List, Optional, Set
+
+from config.prompts import prompt_builder
+from config.settings import LLMSettings, SummarySettings
+from src.storage import Message, MessageRepository
+from src.utils import span
+from .context_packer import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class LLMScheduler:
+    """
+    带优先级的 LLM 并发名额
+
+    交互请求在名额未满时立即执行；后台请求只有在没有交互请求等待、
+    后台占用少于 background_concurrency 且仍有空闲名额时才执行。
+
+    Args:
+        max_concurrency: 同时进行的 LLM 调用数上限
+        background_concurrency: 后台调用最多占用的名额
+    """
+
+    def __init__(self, max_concurrency: int = 8, background_concurrency: int = 1):
+        self.max_concurrency = max_concurrency
+        self.background_concurrency = background_concurrency
+        self._cond: Optional[asyncio.Condition] = None
+        self._active = 0
+        self._active_background = 0
+        self._waiting_interactive = 0
+
+    @classmethod
+    def from_settings(cls, llm_settings: LLMSettings) -> "LLMScheduler":
+        """根据 LLMSettings 创建实例"""
+        return cls(llm_settings.max_concurrency, llm_settings.background_concurrency)
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def _condition(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def _can_run(self, background: bool) -> bool:
+        if self._active >= self.max_concurrency:
+            return False
+        if background:
+            return (
+                self._waiting_interactive == 0
+                and self._active_background < self.background_concurrency
+            )
+        return True
+
+    @asynccontextmanager
+    async def slot(self, background: bool = False) -> AsyncIterator[None]:
+        """获取一个并发名额"""
+        cond = self._condition()
+        async with cond:
+            if not background:
+                self._waiting_interactive += 1
+            try:
+                await cond.wait_for(lambda: self._can_run(background))
+            finally:
+                if not background:
+                    self._waiting_interactive -= 1
+            self._active += 1
+            if background:
+                self._active_background += 1
+        try:
+            yield
+        finally:
+            async with cond:
+                self._active -= 1
+                if background:
+                    self._active_background -= 1
+                cond.notify_all()
+
+
+@dataclass
+class ConversationContext:
+    """构建提示词所需的对话上下文"""
+
+    summary: Optional[str]
+    covered_seq: int
+    messages: List[Message] = field(default_factory=list)
+
+
+class SummaryWorker:
+    """
+    后台会话摘要任务
+
+    Args:
+        repository: 消息仓储
+        llm: 生成摘要的模型（LangChain Runnable，ainvoke 返回消息或字符串）
+        scheduler: LLM 并发调度器，摘要调用使用后台优先级
+        token_threshold: 触发压缩的 token 数
+        keep_recent_tokens: 压缩时原样保留的最近消息 token 数
+        queue_size: 待摘要会话队列容量，满时 notify 丢弃请求
+        page_size: 读取历史消息的分页大小
+        token_counter: 消息未记录 token_count 时使用的计数函数
+    """
+
+    def __init__(
+        self,
+        repository: MessageRepository,
+        llm: Any,
+        *,
+        scheduler: Optional[LLMScheduler] = None,
+        token_threshold: int = 3000,
+        keep_recent_tokens: int = 1000,
+        queue_size: int = 1000,
+        page_size: int = 200,
+        token_counter: Callable[[str], int] = estimate_tokens,
+    ):
+        self.repository = repository
+        self.llm = llm
+        self.scheduler = scheduler or LLMScheduler()
+        self.token_threshold = token_threshold
+        self.keep_recent_tokens = keep_recent_tokens
+        self.queue_size = queue_size
+        self.page_size = page_size
+        self.token_counter = token_counter
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+        # 指标
+        self.runs = 0
+        self.summaries = 0
+        self.failures = 0
+        self.dropped = 0
+        self.tokens_saved = 0
+
+    @classmethod
+    def from_settings(
+        cls,
+        summary_settings: SummarySettings,
+        repository: MessageRepository,
+        llm: Any,
+        **kwargs,
+    ) -> "SummaryWorker":
+        """根据 SummarySettings 创建实例"""
+        return cls(
+            repository,
+            llm,
+            token_threshold=summary_settings.token_threshold,
+            keep_recent_tokens=summary_settings.keep_recent_tokens,
+            queue_size=summary_settings.queue_size,
+            **kwargs,
+        )
+
+    # ==================== 生命周期 ====================
+
+    def start(self) -> None:
+        """在当前事件循环中启动后台任务"""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(self.queue_size)
+        self._task = asyncio.create_task(self._run(), name="summary-worker")
+
+    async def stop(self) -> None:
+        """停止后台任务（正在进行的摘要被取消，下次触发时重做）"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._queue = None
+        self._pending.clear()
+
+    def notify(self, session_id: str) -> bool:
+        """
+        通知会话有新消息（非阻塞）
+
+        Returns:
+            是否进入队列；已在队列中视为成功，队列已满或未启动时返回 False
+        """
+        if self._queue is None:
+            return False
+        if session_id in self._pending:
+            return True
+        try:
+            self._queue.put_nowait(session_id)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self._pending.add(session_id)
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            session_id = await self._queue.get()
+            # 出队后再有新消息可以重新排队
+            self._pending.discard(session_id)
+            try:
+                await self.summarize(session_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failures += 1
+                logger.exception("会话摘要失败: %s", session_id)
+
+    # ==================== 摘要 ====================
+
+    def _tokens(self, message: Message) -> int:
+        return message.token_count or self.token_counter(message.content)
+
+    async def _unsummarized(self, session_id: str, covered_seq: int) -> List[Message]:
+        messages: List[Message] = []
+        cursor = covered_seq
+        while True:
+            page = await self.repository.page_after(session_id, cursor, self.page_size)
+            messages.extend(page.items)
+            if page.next_cursor is None:
+                return messages
+            cursor = page.next_cursor
+
+    async def summarize(self, session_id: str) -> bool:
+        """
+        检查并压缩一个会话
+
+        Returns:
+            是否生成了新摘要
+        """
+        self.runs += 1
+        current = await self.repository.get_summary(session_id)
+        covered_seq = current.covered_seq if current else 0
+        messages = await self._unsummarized(session_id, covered_seq)
+        tokens = [self._tokens(message) for message in messages]
+        summary_tokens = current.token_count if current else 0
+        if summary_tokens + sum(tokens) <= self.token_threshold:
+            return False
+
+        # 从最新一条向前保留 keep_recent_tokens，其余压缩
+        split, kept = len(messages), 0
+        while split > 0 and kept + tokens[split - 1] <= self.keep_recent_tokens:
+            split -= 1
+            kept += tokens[split]
+        if split == 0:
+            return False
+
+        conversation = "\n".join(f"{m.role}: {m.content}" for m in messages[:split])
+        if current is None:
+            prompt = prompt_builder.build("CONVERSATION_SUMMARY", conversation=conversation)
+        else:
+            prompt = prompt_builder.build(
+                "CONTEXT_COMPRESSION",
+                full_conversation=f"已有摘要：\n{current.summary}\n\n后续对话：\n{conversation}",
+                turn_count=messages[split - 1].seq,
+            )
+        async with self.scheduler.slot(background=True):
+            with span("llm:summary", session_id=session_id):
+                result = await self.llm.ainvoke(prompt)
+        summary = str(getattr(result, "content", result)).strip()
+
+        new_tokens = self.token_counter(summary)
+        source_tokens = (current.source_tokens if current else 0) + sum(tokens[:split])
+        saved = await self.repository.save_summary(
+            session_id, summary, messages[split - 1].seq, new_tokens, source_tokens
+        )
+        if saved:
+            self.summaries += 1
+            previous = current.source_tokens - current.token_count if current else 0
+            self.tokens_saved += source_tokens - new_tokens - previous
+            logger.info(
+                "会话 %s 摘要更新: 覆盖到 seq=%d，节省 %d tokens",
+                session_id, messages[split - 1].seq, source_tokens - new_tokens,
+            )
+        return saved
+
+    async def load_context(
+        self, session_id: str, max_messages: int, max_tokens: Optional[int] = None
+    ) -> ConversationContext:
+        """读取摘要和摘要之后的活动窗口，用于构建下一轮提示词"""
+        current = await self.repository.get_summary(session_id)
+        covered_seq = current.covered_seq if current else 0
+        window_tokens = max_tokens
+        if max_tokens is not None and current is not None:
+            window_tokens = max(max_tokens - current.token_count, 0)
+        messages = await self.repository.get_active_window(
+            session_id, max_messages, window_tokens, after_seq=covered_seq
+        )
+        return ConversationContext(current.summary if current else None, covered_seq, messages)
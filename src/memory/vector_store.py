@@ -0,0 +1,585 @@
+"""
+向量存储（RAG）
+
+NumpyVectorStore：进程内的精确余弦检索，适合中小规模语料。
+- 向量在写入时归一化，以 float32 原始矩阵追加写入 <persist_dir>/vectors.f32，
+  查询时通过 np.memmap 只读映射；多个 fork 出的 worker 共享同一份页缓存
+- 文本和元数据逐行追加到 docs.jsonl
+- manifest.json 记录已提交的行数和文件偏移，追加时先写数据再原子替换
+  manifest，崩溃残留的半截数据会在下次追加时被截断覆盖
+- 多个进程（prefork worker、导入脚本）共用同一目录时，追加在 write.lock 文件锁内
+  进行，加锁后先 refresh 再从最新提交的偏移处写入，不会覆盖其他进程提交的行
+- 每次检索前 stat 一次 manifest，有变化时映射其他进程追加的数据
+- 相同 ID 再次写入视为覆盖：旧行仍留在文件中，检索、计数和按 ID 读取时跳过
+- top-k 用一次矩阵向量乘 + argpartition 完成，无需构建索引
+
+量化（quantization）：
+- "float16" / "int8" 额外维护一份量化副本（vectors.f16 / vectors.i8 + 每行缩放
+  系数 scales.f32），全量扫描只读量化副本，常驻内存约为 float32 的 1/2 或 1/4
+- 量化分数取前 top_k × rerank_factor 个候选，再从 float32 文件中只读取这些行
+  做精确重排，返回的分数仍是精确的余弦相似度
+- 量化副本缺行时（已有索引首次启用量化）在 write.lock 内从 float32 文件补齐，
+  不会与其他进程的追加交错写入
+
+create_vector_store 根据 VectorStoreSettings 选择 numpy / chroma 实现。
+"""
+
+import fcntl
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Literal, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from config.settings import VectorStoreSettings
+from .embedding_cache import CachedEmbeddings
+
+MANIFEST_VERSION = 1
+_VECTORS_FILE = "vectors.f32"
+_DOCS_FILE = "docs.jsonl"
+_MANIFEST_FILE = "manifest.json"
+_LOCK_FILE = "write.lock"
+_SCALES_FILE = "scales.f32"
+_CODE_FILES = {"float16": ("vectors.f16", np.float16), "int8": ("vectors.i8", np.int8)}
+# 量化副本按块（约 4MB float32）转换后计算，临时数组留在 CPU 缓存内
+_BLOCK_ELEMENTS = 1 << 20
+
+Quantization = Literal["none", "float16", "int8"]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """按行 L2 归一化（零向量保持为零）"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """返回 scores 中最大的 k 个下标（按分数降序）"""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def quantize(vectors: np.ndarray, quantization: Quantization) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    量化归一化后的向量
+
+    Returns:
+        (量化后的矩阵, 每行缩放系数)；int8 使用逐行对称缩放，float16 无缩放系数
+    """
+    if quantization == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).clip(-127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    基于 NumPy 内存映射文件的向量存储（LangChain VectorStore 实现）
+
+    Args:
+        embedding: Embedding 模型
+        persist_dir: 持久化目录，None 表示仅在内存中保存
+        top_k: 默认返回的结果数
+        score_threshold: 默认相似度阈值（余弦相似度），低于阈值的结果被过滤
+        quantization: 扫描使用的存储精度，"none" / "float16" / "int8"
+        rerank_factor: 量化时参与 float32 精确重排的候选数为 top_k 的倍数
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        persist_dir: Optional[str] = None,
+        *,
+        top_k: int = 5,
+        score_threshold: Optional[float] = None,
+        quantization: Quantization = "none",
+        rerank_factor: int = 4,
+    ):
+        self.embedding = embedding
+        self.persist_dir = persist_dir
+        self.top_k = top_k
+        self.score_threshold = score_threshold
+        self.quantization = quantization
+        self.rerank_factor = rerank_factor
+
+        self.dim: Optional[int] = None
+        self._count = 0
+        self._vectors_bytes = 0
+        self._docs_bytes = 0
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        # (id, text, metadata)，检索命中时才构造 Document，避免启动时创建大量对象
+        self._docs: List[Tuple[str, str, Dict[str, Any]]] = []
+        # 文档 ID -> 行号，按 ID 取文档或检索时增量建立
+        self._rows: Dict[str, int] = {}
+        self._rows_indexed = 0
+        # 被相同 ID 的新行覆盖的旧行号（升序），检索时跳过
+        self._stale: List[int] = []
+        self._stale_rows = np.empty(0, dtype=np.int64)
+        # manifest 的 (inode, mtime)：追加时原子替换，inode 总会变化
+        self._manifest_stat: Optional[Tuple[int, int]] = None
+        # 当前实例是否已持有 write.lock（flock 对同一进程的不同打开也互斥，不可重入）
+        self._file_locked = False
+        self._lock = threading.RLock()
+
+        if persist_dir is not None:
+            os.makedirs(persist_dir, exist_ok=True)
+            self.refresh()
+
+    @classmethod
+    def from_settings(
+        cls, vs_settings: VectorStoreSettings, embedding: Embeddings
+    ) -> "NumpyVectorStore":
+        """根据 VectorStoreSettings 创建实例"""
+        return cls(
+            embedding,
+            vs_settings.numpy_persist_dir,
+            top_k=vs_settings.top_k,
+            score_threshold=vs_settings.score_threshold,
+            quantization=vs_settings.quantization,
+            rerank_factor=vs_settings.rerank_factor,
+        )
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def __len__(self) -> int:
+        """文档数（不含被覆盖的旧行）"""
+        with self._lock:
+            self._index_rows()
+            return self._count - len(self._stale)
+
+    @property
+    def scan_bytes(self) -> int:
+        """每次查询全量扫描的数据量（字节），即需要常驻内存的部分"""
+        if self._codes is None:
+            return self._vectors.nbytes
+        return self._codes.nbytes + (self._scales.nbytes if self._scales is not None else 0)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.persist_dir, name)
+
+    # ==================== 加载 ====================
+
+    def refresh(self) -> bool:
+        """
+        重新读取 manifest，映射其他进程追加的数据
+
+        Returns:
+            是否有新数据
+        """
+        path = self._path(_MANIFEST_FILE)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return False
+        key = (st.st_ino, st.st_mtime_ns)
+        # 检索路径上的常见情况：manifest 未变化，只有一次 stat，不加锁
+        if key == self._manifest_stat:
+            return False
+        with self._lock:
+            if key == self._manifest_stat:
+                return False
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest["version"] != MANIFEST_VERSION:
+                raise ValueError(f"不支持的向量索引版本: {manifest['version']}")
+            if manifest["count"] == self._count:
+                self._manifest_stat = key
+                return False
+
+            with open(self._path(_DOCS_FILE), "rb") as f:
+                f.seek(self._docs_bytes)
+                data = f.read(manifest["docs_bytes"] - self._docs_bytes)
+            # 拼成一个 JSON 数组一次解析，比逐行 json.loads 快数倍
+            items = json.loads(b"[" + b",".join(data.splitlines()) + b"]")
+            self._docs.extend((item["id"], item["text"], item["metadata"]) for item in items)
+
+            self.dim = manifest["dim"]
+            self._count = manifest["count"]
+            self._vectors_bytes = manifest["vectors_bytes"]
+            self._docs_bytes = manifest["docs_bytes"]
+            self._manifest_stat = key
+            self._remap()
+            return True
+
+    def _remap(self) -> None:
+        if self.persist_dir is None or not self._count:
+            return
+        self._vectors = np.memmap(
+            self._path(_VECTORS_FILE), dtype=np.float32, mode="r", shape=(self._count, self.dim)
+        )
+        if self.quantization == "none":
+            return
+        self._sync_codes()
+        name, dtype = _CODE_FILES[self.quantization]
+        self._codes = np.memmap(self._path(name), dtype=dtype, mode="r", shape=(self._count, self.dim))
+        if self.quantization == "int8":
+            self._scales = np.memmap(self._path(_SCALES_FILE), dtype=np.float32, mode="r", shape=(self._count,))
+
+    def _code_rows(self) -> int:
+        name, dtype = _CODE_FILES[self.quantization]
+        paths = [(self._path(name), self.dim * np.dtype(dtype).itemsize)]
+        if self.quantization == "int8":
+            paths.append((self._path(_SCALES_FILE), 4))
+        return min(os.path.getsize(p) // size if os.path.exists(p) else 0 for p, size in paths)
+
+    def _sync_codes(self) -> None:
+        """
+        量化副本缺少的行（旧索引首次启用量化、写入中断等）从 float32 文件补齐
+
+        只在 write.lock 内写入，加锁后重新检查：其他进程可能已经补齐或正在追加
+        """
+        if self._code_rows() >= self._count:
+            return
+        with self._file_lock():
+            start, step = self._code_rows(), max(1, _BLOCK_ELEMENTS // self.dim)
+            for offset in range(start, self._count, step):
+                self._write_codes(offset, np.asarray(self._vectors[offset:offset + step]))
+
+    def _write_codes(self, offset: int, vectors: np.ndarray) -> None:
+        codes, scales = quantize(vectors, self.quantization)
+        name, _ = _CODE_FILES[self.quantization]
+        self._write_at(self._path(name), offset * codes.itemsize * self.dim, codes.tobytes())
+        if scales is not None:
+            self._write_at(self._path(_SCALES_FILE), offset * 4, scales.tobytes())
+
+    # ==================== 写入 ====================
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """跨进程写锁（flock），进程退出时由内核释放；实例内可重入（调用方需持有 _lock）"""
+        if self._file_locked:
+            yield
+            return
+        with open(self._path(_LOCK_FILE), "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            self._file_locked = True
+            try:
+                yield
+            finally:
+                self._file_locked = False
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def add_embeddings(
+        self,
+        texts: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+        ids: Optional[Sequence[str]] = None,
+    ) -> List[str]:
+        """追加已经计算好的向量（写入前归一化），已存在的 ID 被新行覆盖"""
+        vectors = normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1))
+        metadatas = metadatas or [{} for _ in texts]
+        ids = list(ids) if ids is not None else [uuid.uuid4().hex for _ in texts]
+        docs = [(doc_id, text, dict(meta)) for text, meta, doc_id in zip(texts, metadatas, ids)]
+
+        persisted = self.persist_dir is not None
+        with self._lock, self._file_lock() if persisted else nullcontext():
+            if persisted:
+                # 其他进程可能已经追加，先映射它们提交的数据，再从最新的偏移处追加
+                self.refresh()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"向量维度不一致: 期望 {self.dim}，实际 {vectors.shape[1]}")
+            if not len(docs):
+                return []
+
+            if not persisted:
+                self._vectors = (
+                    np.concatenate([self._vectors, vectors]) if self._count else vectors
+                )
+                if self.quantization != "none":
+                    codes, scales = quantize(vectors, self.quantization)
+                    self._codes = codes if self._codes is None else np.concatenate([self._codes, codes])
+                    if scales is not None:
+                        self._scales = (
+                            scales if self._scales is None else np.concatenate([self._scales, scales])
+                        )
+            else:
+                self._append_files(vectors, docs)
+            self._docs.extend(docs)
+            self._count += len(docs)
+            self._remap()
+        return ids
+
+    def _append_files(self, vectors: np.ndarray, docs: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+        # 从已提交的偏移处写入并截断，覆盖崩溃残留的半截数据；已有数据不重写
+        vectors_bytes = self._write_at(self._path(_VECTORS_FILE), self._vectors_bytes, vectors.tobytes())
+        if self.quantization != "none":
+            self._write_codes(self._count, vectors)
+        lines = "".join(
+            json.dumps({"id": doc_id, "text": text, "metadata": meta}, ensure_ascii=False) + "\n"
+            for doc_id, text, meta in docs
+        ).encode("utf-8")
+        docs_bytes = self._write_at(self._path(_DOCS_FILE), self._docs_bytes, lines)
+
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "dim": self.dim,
+            "count": self._count + len(docs),
+            "vectors_bytes": vectors_bytes,
+            "docs_bytes": docs_bytes,
+        }
+        tmp = self._path(_MANIFEST_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path(_MANIFEST_FILE))
+
+        self._vectors_bytes = vectors_bytes
+        self._docs_bytes = docs_bytes
+        st = os.stat(self._path(_MANIFEST_FILE))
+        self._manifest_stat = (st.st_ino, st.st_mtime_ns)
+
+    @staticmethod
+    def _write_at(path: str, offset: int, data: bytes) -> int:
+        with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+            f.seek(offset)
+            f.write(data)
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+        return offset + len(data)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """计算 Embedding 并追加"""
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_embeddings(texts, self.embedding.embed_documents(texts), metadatas, ids)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        persist_dir: Optional[str] = None,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        store = cls(embedding, persist_dir, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+    # ==================== 检索 ====================
+
+    def search_vectors(
+        self,
+        queries: np.ndarray,
+        k: Optional[int] = None,
+        score_threshold: Optional[float] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        批量向量检索
+
+        Args:
+            queries: (n, dim) 或 (dim,) 查询向量，无需预先归一化
+            k: 返回的结果数，默认 top_k
+            score_threshold: 相似度阈值，默认使用实例配置
+
+        Returns:
+            每个查询的 [(行号, 余弦相似度)]，按相似度降序
+        """
+        k = self.top_k if k is None else k
+        threshold = self.score_threshold if score_threshold is None else score_threshold
+        queries = normalize(np.atleast_2d(queries))
+        if self.persist_dir is not None:
+            self.refresh()
+        with self._lock:
+            self._index_rows()
+            vectors, codes, scales, count = self._vectors, self._codes, self._scales, self._count
+            stale = self._stale_rows
+        if not count:
+            return [[] for _ in range(len(queries))]
+
+        scores = self._scan(vectors, codes, scales, queries)  # (count, n)
+        if stale.size:
+            scores[stale[stale < count]] = -np.inf
+        results = []
+        for query, column in zip(queries, scores.T):
+            if codes is None:
+                indices = top_k_indices(column, k)
+                exact = column[indices]
+            else:
+                # 量化分数只用于选候选；候选按行号排序后从 float32 文件读取，做精确重排
+                candidates = np.sort(top_k_indices(column, k * self.rerank_factor))
+                rescored = vectors[candidates] @ query
+                # 存活行不足候选数时被覆盖的旧行也会入选，重排前排除，否则会挤掉存活行
+                rescored[~np.isfinite(column[candidates])] = -np.inf
+                order = top_k_indices(rescored, k)
+                indices, exact = candidates[order], rescored[order]
+            live = np.isfinite(column[indices])
+            hits = [(int(i), float(s)) for i, s in zip(indices[live], exact[live])]
+            if threshold is not None:
+                hits = [(i, s) for i, s in hits if s >= threshold]
+            results.append(hits)
+        return results
+
+    @staticmethod
+    def _scan(
+        vectors: np.ndarray,
+        codes: Optional[np.ndarray],
+        scales: Optional[np.ndarray],
+        queries: np.ndarray,
+    ) -> np.ndarray:
+        """计算全部行对每个查询的（近似）分数"""
+        if codes is None:
+            return vectors @ queries.T
+        scores = np.empty((len(codes), len(queries)), dtype=np.float32)
+        step = max(1, _BLOCK_ELEMENTS // codes.shape[1])
+        for start in range(0, len(codes), step):
+            block = codes[start:start + step].astype(np.float32)
+            scores[start:start + len(block)] = block @ queries.T
+        if scales is not None:
+            scores *= scales[:, None]
+        return scores
+
+    def get_document(self, index: int) -> Document:
+        """按行号取出文档"""
+        doc_id, text, metadata = self._docs[index]
+        return Document(page_content=text, metadata=dict(metadata), id=doc_id)
+
+    def _index_rows(self) -> None:
+        """为上次建立索引之后追加的行补充 ID 映射，记录被覆盖的旧行（调用方需持有 _lock）"""
+        start = self._rows_indexed
+        for i in range(start, len(self._docs)):
+            doc_id = self._docs[i][0]
+            previous = self._rows.get(doc_id)
+            if previous is not None:
+                self._stale.append(previous)
+            self._rows[doc_id] = i
+        self._rows_indexed = len(self._docs)
+        if len(self._stale) != len(self._stale_rows):
+            self._stale_rows = np.array(sorted(self._stale), dtype=np.int64)
+
+    def _lookup_rows(self, ids: Sequence[str]) -> List[int]:
+        """文档 ID -> 行号（ID 重复时取最后写入的一条），不存在的 ID 被忽略"""
+        with self._lock:
+            self._index_rows()
+            return [self._rows[doc_id] for doc_id in ids if doc_id in self._rows]
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        """按文档 ID 取出文档（ID 重复时取最后写入的一条），不存在的 ID 被忽略"""
+        return [self.get_document(i) for i in self._lookup_rows(ids)]
+
+    def get_vectors(self, ids: Sequence[str]) -> np.ndarray:
+        """按文档 ID 取出归一化后的 float32 向量，不存在的 ID 被忽略"""
+        rows = self._lookup_rows(ids)
+        with self._lock:
+            return np.array(self._vectors[rows], dtype=np.float32)
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: Sequence[float],
+        k: Optional[int] = None,
+        score_threshold: Optional[float] = None,
+    ) -> List[Tuple[Document, float]]:
+        hits = self.search_vectors(np.asarray(embedding, dtype=np.float32), k, score_threshold)[0]
+        return [(self.get_document(i), score) for i, score in hits]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        score_threshold: Optional[float] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        """检索并返回 (文档, 余弦相似度)"""
+        return self.similarity_search_by_vector_with_score(
+            self.embedding.embed_query(query), k, score_threshold
+        )
+
+    def similarity_search(
+        self, query: str, k: Optional[int] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: Optional[int] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, **kwargs)
+        ]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # 分数本身就是余弦相似度
+        return lambda score: score
+
+
+def create_embeddings(vs_settings: VectorStoreSettings) -> Embeddings:
+    """根据 VectorStoreSettings 创建 Embedding 模型，启用缓存时外层包装 CachedEmbeddings"""
+    embedding: Embeddings
+    if vs_settings.embedding_provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+
+        embedding = OpenAIEmbeddings(model=vs_settings.embedding_model)
+    elif vs_settings.embedding_provider == "huggingface":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        embedding = HuggingFaceEmbeddings(model_name=vs_settings.embedding_model)
+    else:
+        raise ValueError(f"不支持的 Embedding 提供商: {vs_settings.embedding_provider}")
+
+    if vs_settings.embedding_cache_enabled:
+        embedding = CachedEmbeddings.from_settings(vs_settings, embedding)
+    return embedding
+
+
+def create_vector_store(
+    vs_settings: VectorStoreSettings, embedding: Optional[Embeddings] = None
+) -> Optional[VectorStore]:
+    """
+    创建向量存储
+
+    Args:
+        vs_settings: 向量存储配置
+        embedding: Embedding 模型，默认按配置创建
+
+    Returns:
+        VectorStore 实例；vector_store_type 为 none 时返回 None
+    """
+    if vs_settings.vector_store_type == "none":
+        return None
+    embedding = embedding or create_embeddings(vs_settings)
+    if vs_settings.vector_store_type == "numpy":
+        return NumpyVectorStore.from_settings(vs_settings, embedding)
+    if vs_settings.vector_store_type == "chroma":
+        try:
+            from langchain_community.vectorstores import Chroma
+        except ImportError:
+            raise ImportError("chroma 向量存储需要安装 chromadb 和 langchain-community") from None
+        return Chroma(
+            persist_directory=vs_settings.chroma_persist_dir,
+            embedding_function=embedding,
+            collection_metadata={"hnsw:space": "cosine"},
+        )
+    raise ValueError(f"不支持的向量存储类型: {vs_settings.vector_store_type}")
@@ -0,0 +1,33 @@
+"""
+业务服务模块
+
+提供以下功能：
+- 监控指标：图节点 / LLM 调用耗时直方图、token 用量、缓存命中、连接池和队列深度，
+  预绑定标签的低开销观测，多 worker 快照汇总后以 Prometheus 格式导出
+"""
+
+# 监控指标
+from .metrics_service import (
+    DEFAULT_BUCKETS,
+    Counter,
+    Gauge,
+    Histogram,
+    LLMMetrics,
+    MetricsCallbackHandler,
+    MetricsService,
+    metrics,
+    token_usage,
+)
+
+__all__ = [
+    # 监控指标
+    "DEFAULT_BUCKETS",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "LLMMetrics",
+    "MetricsCallbackHandler",
+    "MetricsService",
+    "metrics",
+    "token_usage",
+]
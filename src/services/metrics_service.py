@@ -0,0 +1,497 @@
+"""
+监控指标服务
+
+prometheus_client 的 Histogram.observe 每次都要加锁、逐个比较桶边界（约 2 µs），
+多进程模式下还要写 mmap 文件。这里的指标在热路径上只做普通的 Python 运算：
+
+- 指标的 labels(...) 返回子指标，调用方在初始化时取一次并保存（预绑定标签），
+  之后每次观测不再构造标签元组或查字典
+- Histogram 子指标用 bisect 找桶并累加，Counter / Gauge 子指标直接累加属性，
+  单次观测约 0.3 µs。观测不加锁，依赖 GIL；多个线程同时累加同一子指标时极少数
+  增量可能丢失，对监控可以接受
+- Counter / Gauge 子指标也可以 set_function，在采集时读取组件已有的计数
+  （缓存命中数、连接池占用、队列长度），热路径没有任何额外开销
+
+导出：MetricsService 实现 prometheus_client 的 Collector 接口，start_server 在
+prometheus_port 上提供 /metrics。多 worker 时主进程设置 multiprocess_dir，
+每个 worker 定期把快照写到 <dir>/<pid>-<worker_id>.json（worker_id 每个进程随机
+生成，pid 被复用时不会覆盖已退出 worker 的快照），主进程采集时汇总所有快照：
+Counter / Histogram 累加所有文件（包括已退出的 worker，保证单调递增），
+Gauge 只累加仍在运行的 worker。主进程回收 worker 后调用 retire_worker 把它的
+快照改名为 .dead，之后即使 pid 被复用也不会再当作存活。
+"""
+
+import asyncio
+import functools
+import glob
+import logging
+import os
+import time
+import uuid
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import orjson
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import CollectorRegistry, start_http_server
+from prometheus_client.core import (
+    CounterMetricFamily,
+    GaugeMetricFamily,
+    HistogramMetricFamily,
+    Metric,
+)
+from prometheus_client.utils import floatToGoString
+
+from src.utils import span
+
+logger = logging.getLogger(__name__)
+
+# 覆盖毫秒级节点到分钟级 LLM 调用
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf")
+)
+
+
+class CounterChild:
+    """Counter 的子指标（一组标签值）"""
+
+    __slots__ = ("value", "_function")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """采集时调用 function 读取累计值（函数返回值必须单调递增）"""
+        self._function = function
+
+    def get(self) -> float:
+        return self._function() if self._function is not None else self.value
+
+
+class GaugeChild:
+    """Gauge 的子指标"""
+
+    __slots__ = ("value", "_function")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """采集时调用 function 读取当前值"""
+        self._function = function
+
+    def get(self) -> float:
+        return self._function() if self._function is not None else self.value
+
+
+class HistogramChild:
+    """Histogram 的子指标，counts[i] 为落在第 i 个桶（非累计）的观测数"""
+
+    __slots__ = ("_bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self._bounds, value)] += 1
+        self.sum += value
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[Tuple[str, ...], Any] = {}
+
+    def labels(self, *values: str) -> Any:
+        """
+        返回一组标签值对应的子指标（不存在时创建）
+
+        热路径上应在初始化时调用一次并保存返回值。
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，实际传入 {values}")
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self._new_child()
+        return child
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增计数"""
+
+    kind = "counter"
+
+    def _new_child(self) -> CounterChild:
+        return CounterChild()
+
+
+class Gauge(_Metric):
+    """可增可减的当前值"""
+
+    kind = "gauge"
+
+    def _new_child(self) -> GaugeChild:
+        return GaugeChild()
+
+
+class Histogram(_Metric):
+    """分桶统计"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        bounds = tuple(sorted(float(bound) for bound in buckets))
+        if bounds[-1] != float("inf"):
+            bounds += (float("inf"),)
+        self.buckets = bounds
+
+    def _new_child(self) -> HistogramChild:
+        return HistogramChild(self.buckets)
+
+
+class LLMMetrics:
+    """预绑定到一个 LLM 提供商的指标"""
+
+    __slots__ = ("latency", "input_tokens", "output_tokens")
+
+    def __init__(self, latency: HistogramChild, input_tokens: CounterChild, output_tokens: CounterChild):
+        self.latency = latency
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+    def observe(self, seconds: float, input_tokens: int = 0, output_tokens: int = 0) -> None:
+        self.latency.observe(seconds)
+        self.input_tokens.inc(input_tokens)
+        self.output_tokens.inc(output_tokens)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    记录 LLM 调用耗时和 token 用量的 LangChain 回调
+
+    用法：llm.with_config(callbacks=[metrics.llm_callback("openai")])
+    """
+
+    def __init__(self, bound: LLMMetrics):
+        self.bound = bound
+        self._started: Dict[UUID, float] = {}
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        started = self._started.pop(run_id, None)
+        elapsed = time.perf_counter() - started if started is not None else 0.0
+        self.bound.observe(elapsed, *token_usage(response))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            self.bound.latency.observe(time.perf_counter() - started)
+
+
+def token_usage(response: LLMResult) -> Tuple[int, int]:
+    """从 LLMResult 中读取（输入 token 数，输出 token 数）"""
+    input_tokens = output_tokens = 0
+    found = False
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                found = True
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+    if not found:
+        # 旧版集成只在 llm_output 中返回 OpenAI 格式的用量
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        input_tokens = usage.get("prompt_tokens", 0)
+        output_tokens = usage.get("completion_tokens", 0)
+    return input_tokens, output_tokens
+
+
+class MetricsService:
+    """
+    应用的监控指标
+
+    Args:
+        namespace: 指标名前缀
+        multiprocess_dir: 多 worker 时存放各 worker 快照的目录，None 表示单进程
+    """
+
+    def __init__(self, namespace: str = "chatbot", *, multiprocess_dir: Optional[str] = None):
+        self.namespace = namespace
+        self.multiprocess_dir = multiprocess_dir
+        self.metrics: Dict[str, _Metric] = {}
+        # (pid, 快照文件名)：fork 出的进程 pid 不同，首次写快照时重新生成
+        self._snapshot_file: Optional[Tuple[int, str]] = None
+
+        self.node_latency = self.histogram(
+            "graph_node_duration_seconds", "图节点执行耗时（秒）", ["node"]
+        )
+        self.llm_latency = self.histogram(
+            "llm_request_duration_seconds", "LLM 调用耗时（秒）", ["provider"]
+        )
+        self.llm_tokens = self.counter(
+            "llm_tokens_total", "LLM token 用量", ["provider", "direction"]
+        )
+        self.cache_requests = self.counter(
+            "cache_requests_total", "缓存查询次数", ["cache", "result"]
+        )
+        self.pool_connections = self.gauge(
+            "pool_connections", "连接池 / 进程池的占用情况", ["pool", "state"]
+        )
+        self.queue_depth = self.gauge("queue_depth", "队列中等待的任务数", ["queue"])
+        self.checkpoint_gc = self.counter(
+            "checkpoint_gc_total", "检查点 GC 的累计计数（轮次、删除行数、过期会话数、回收字节数）", ["item"]
+        )
+        self.summary_tokens_saved = self.gauge("summary_tokens_saved", "会话摘要节省的提示词 token 数")
+
+    # ==================== 定义指标 ====================
+
+    def _add(self, metric: _Metric) -> Any:
+        if metric.name in self.metrics:
+            raise ValueError(f"指标 {metric.name} 已存在")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(f"{self.namespace}_{name}", documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(f"{self.namespace}_{name}", documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._add(Histogram(f"{self.namespace}_{name}", documentation, labelnames, buckets))
+
+    # ==================== 预绑定的观测入口 ====================
+
+    def node(self, name: str) -> HistogramChild:
+        """图节点 name 的耗时子指标"""
+        return self.node_latency.labels(name)
+
+    def time_node(self, name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """装饰图节点函数（同步或异步），记录每次执行的耗时（开启追踪时同时记录 span）"""
+        child = self.node(name)
+
+        def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+            if asyncio.iscoroutinefunction(func):
+
+                @functools.wraps(func)
+                async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                    start = time.perf_counter()
+                    try:
+                        with span(name):
+                            return await func(*args, **kwargs)
+                    finally:
+                        child.observe(time.perf_counter() - start)
+
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                start = time.perf_counter()
+                try:
+                    with span(name):
+                        return func(*args, **kwargs)
+                finally:
+                    child.observe(time.perf_counter() - start)
+
+            return wrapper
+
+        return decorator
+
+    def llm(self, provider: str) -> LLMMetrics:
+        """LLM 提供商 provider 的预绑定指标"""
+        return LLMMetrics(
+            self.llm_latency.labels(provider),
+            self.llm_tokens.labels(provider, "input"),
+            self.llm_tokens.labels(provider, "output"),
+        )
+
+    def llm_callback(self, provider: str) -> MetricsCallbackHandler:
+        """记录 provider 调用耗时和 token 用量的 LangChain 回调"""
+        return MetricsCallbackHandler(self.llm(provider))
+
+    def track_cache(self, name: str, hits: Callable[[], float], misses: Callable[[], float]) -> None:
+        """采集时从缓存自身的计数读取命中 / 未命中次数"""
+        self.cache_requests.labels(name, "hit").set_function(hits)
+        self.cache_requests.labels(name, "miss").set_function(misses)
+
+    def track_pool(self, name: str, **states: Callable[[], float]) -> None:
+        """采集时读取连接池各状态的数量，如 track_pool("db", in_use=..., idle=...)"""
+        for state, function in states.items():
+            self.pool_connections.labels(name, state).set_function(function)
+
+    def track_queue(self, name: str, depth: Callable[[], float]) -> None:
+        """采集时读取队列长度"""
+        self.queue_depth.labels(name).set_function(depth)
+
+    def track_checkpoint_gc(self, **counts: Callable[[], float]) -> None:
+        """采集时读取检查点 GC 的计数，如 track_checkpoint_gc(runs=..., rows_pruned=...)"""
+        for item, function in counts.items():
+            self.checkpoint_gc.labels(item).set_function(function)
+
+    def track_summaries(self, tokens_saved: Callable[[], float]) -> None:
+        """采集时读取会话摘要节省的 token 数"""
+        self.summary_tokens_saved.labels().set_function(tokens_saved)
+
+    # ==================== 快照与多进程汇总 ====================
+
+    def snapshot(self) -> Dict[str, List[Any]]:
+        """当前进程的所有样本：{指标名: [[标签值, 值]] 或 [[标签值, 分桶计数, 总和]]}"""
+        samples: Dict[str, List[Any]] = {}
+        for name, metric in self.metrics.items():
+            rows: List[Any] = []
+            for labels, child in list(metric.children.items()):
+                try:
+                    if isinstance(child, HistogramChild):
+                        rows.append([list(labels), list(child.counts), child.sum])
+                    else:
+                        rows.append([list(labels), float(child.get())])
+                except Exception:
+                    logger.warning("读取指标 %s%s 失败", name, labels, exc_info=True)
+            samples[name] = rows
+        return samples
+
+    def write_snapshot(self, snapshot: Optional[Dict[str, List[Any]]] = None) -> None:
+        """把当前进程的快照写到 multiprocess_dir（先写临时文件再替换）"""
+        if self.multiprocess_dir is None:
+            return
+        pid = os.getpid()
+        if self._snapshot_file is None or self._snapshot_file[0] != pid:
+            self._snapshot_file = (pid, f"{pid}-{uuid.uuid4().hex}.json")
+        path = os.path.join(self.multiprocess_dir, self._snapshot_file[1])
+        with open(path + ".tmp", "wb") as file:
+            file.write(orjson.dumps(snapshot if snapshot is not None else self.snapshot()))
+        os.replace(path + ".tmp", path)
+
+    async def flush_periodically(self, interval: float) -> None:
+        """worker 中定期写快照（在事件循环中取快照，在线程中写文件）"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.write_snapshot, self.snapshot())
+            except OSError:
+                logger.warning("写指标快照失败", exc_info=True)
+
+    def retire_worker(self, pid: int) -> None:
+        """主进程回收 worker 后调用：把它的快照标记为已退出"""
+        if self.multiprocess_dir is None:
+            return
+        for path in glob.glob(os.path.join(self.multiprocess_dir, f"{pid}-*.json")):
+            os.replace(path, path[: -len(".json")] + ".dead")
+
+    def _load_snapshots(self) -> List[Tuple[bool, Dict[str, List[Any]]]]:
+        """读取所有 worker 的快照，返回 [(进程是否存活, 快照)]"""
+        snapshots = []
+        for path in glob.glob(os.path.join(self.multiprocess_dir, "*.json")) + glob.glob(
+            os.path.join(self.multiprocess_dir, "*.dead")
+        ):
+            name, ext = os.path.splitext(os.path.basename(path))
+            try:
+                with open(path, "rb") as file:
+                    data = orjson.loads(file.read())
+            except (OSError, orjson.JSONDecodeError):
+                continue
+            alive = False
+            if ext == ".json":
+                try:
+                    os.kill(int(name.split("-", 1)[0]), 0)
+                    alive = True
+                except ProcessLookupError:
+                    pass
+                except PermissionError:
+                    alive = True
+            snapshots.append((alive, data))
+        return snapshots
+
+    def collect(self) -> Iterator[Metric]:
+        """prometheus_client Collector 接口"""
+        if self.multiprocess_dir is None:
+            snapshots = [(True, self.snapshot())]
+        else:
+            snapshots = self._load_snapshots()
+
+        for name, metric in self.metrics.items():
+            totals: Dict[Tuple[str, ...], Any] = {}
+            for alive, data in snapshots:
+                if metric.kind == "gauge" and not alive:
+                    continue
+                for row in data.get(name, ()):
+                    labels = tuple(row[0])
+                    if metric.kind == "histogram":
+                        counts, total = totals.get(labels, ([0] * len(row[1]), 0.0))
+                        totals[labels] = ([a + b for a, b in zip(counts, row[1])], total + row[2])
+                    else:
+                        totals[labels] = totals.get(labels, 0.0) + row[1]
+
+            family: Metric
+            if metric.kind == "counter":
+                family = CounterMetricFamily(name, metric.documentation, labels=metric.labelnames)
+                for labels, value in totals.items():
+                    family.add_metric(labels, value)
+            elif metric.kind == "gauge":
+                family = GaugeMetricFamily(name, metric.documentation, labels=metric.labelnames)
+                for labels, value in totals.items():
+                    family.add_metric(labels, value)
+            else:
+                family = HistogramMetricFamily(name, metric.documentation, labels=metric.labelnames)
+                bounds = [floatToGoString(bound) for bound in metric.buckets]  # type: ignore[attr-defined]
+                for labels, (counts, total) in totals.items():
+                    cumulative, running = [], 0
+                    for bound, count in zip(bounds, counts):
+                        running += count
+                        cumulative.append((bound, running))
+                    family.add_metric(labels, cumulative, total)
+            yield family
+
+    def start_server(self, port: int, addr: str = "0.0.0.0") -> Any:
+        """在后台线程中提供 /metrics，返回 (server, thread)"""
+        registry = CollectorRegistry(auto_describe=False)
+        registry.register(self)  # type: ignore[arg-type]
+        return start_http_server(port, addr, registry=registry)
+
+
+# 全局实例
+metrics = MetricsService()
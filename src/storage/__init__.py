@@ -0,0 +1,37 @@
+"""
+存储层模块
+
+提供数据库模型、异步数据库访问、消息历史查询、会话锁和两级缓存
+"""
+
+from .models import Base, ChatSession, Message, SessionSummary
+from .database import (
+    MessageRepository,
+    create_db_engine,
+    create_session_factory,
+    init_db,
+)
+from .redis_client import create_async_redis_client, create_redis_client
+from .session_lock import LockTimeout, SessionLockManager
+from .cache import TwoTierCache
+
+__all__ = [
+    # ORM 模型
+    "Base",
+    "ChatSession",
+    "Message",
+    "SessionSummary",
+    # 数据库访问
+    "MessageRepository",
+    "create_db_engine",
+    "create_session_factory",
+    "init_db",
+    # Redis
+    "create_redis_client",
+    "create_async_redis_client",
+    # 会话锁
+    "SessionLockManager",
+    "LockTimeout",
+    # 缓存
+    "TwoTierCache",
+]
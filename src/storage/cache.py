@@ -0,0 +1,147 @@
+"""
+两级缓存：进程内 LRU + Redis
+
+- 第一级：每个 worker 的进程内 LRU（OrderedDict），命中时不访问网络
+- 第二级：Redis（可选），worker 之间共享；命中后按剩余 TTL 回填第一级
+- 值用 orjson 编码后存储，两级都保存 bytes：命中时返回新解码的对象，调用方修改
+  返回值不会影响缓存；值必须可以 JSON 序列化（与 API 响应相同的编码规则）
+- Redis 出错时记录警告并按未命中处理，缓存故障不影响调用方
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+import orjson
+import redis.asyncio as aioredis
+
+from config.settings import RedisSettings
+
+logger = logging.getLogger(__name__)
+
+MEMORY = "memory"
+REDIS = "redis"
+# set 未指定 ttl 时使用 default_ttl
+_DEFAULT_TTL: Any = object()
+
+
+def _dumps(value: Any) -> bytes:
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+class TwoTierCache:
+    """
+    进程内 LRU + Redis 两级缓存
+
+    Args:
+        redis: 异步 Redis 客户端，None 表示只使用进程内缓存
+        max_entries: 进程内缓存的条目数上限
+        default_ttl: 默认过期时间（秒），None 表示不过期
+        key_prefix: Redis 键前缀
+    """
+
+    def __init__(
+        self,
+        redis: Optional[aioredis.Redis] = None,
+        *,
+        max_entries: int = 10000,
+        default_ttl: Optional[float] = 300.0,
+        key_prefix: str = "cache:",
+    ):
+        self.redis = redis
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.key_prefix = key_prefix
+        # 键 -> (过期时间（monotonic），None 表示不过期；编码后的值)
+        self._memory: "OrderedDict[str, Tuple[Optional[float], bytes]]" = OrderedDict()
+
+        # 指标
+        self.redis_errors = 0
+
+    @classmethod
+    def from_settings(
+        cls, redis_settings: RedisSettings, redis: Optional[aioredis.Redis] = None, **kwargs
+    ) -> "TwoTierCache":
+        """根据 RedisSettings 创建实例（cache_ttl 作为默认过期时间）"""
+        return cls(redis, default_ttl=redis_settings.cache_ttl, **kwargs)
+
+    def __len__(self) -> int:
+        """进程内缓存的条目数（可能包含尚未清理的过期条目）"""
+        return len(self._memory)
+
+    async def get(self, key: str) -> Tuple[Any, Optional[str]]:
+        """
+        读取缓存
+
+        Returns:
+            (值, 命中层级)，层级为 "memory" / "redis"，未命中时为 (None, None)
+        """
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires, data = entry
+            if expires is None or expires > time.monotonic():
+                self._memory.move_to_end(key)
+                return orjson.loads(data), MEMORY
+            del self._memory[key]
+
+        if self.redis is None:
+            return None, None
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.get(self.key_prefix + key)
+                pipe.pttl(self.key_prefix + key)
+                data, pttl = await pipe.execute()
+        except Exception:
+            self.redis_errors += 1
+            logger.warning("读取 Redis 缓存失败: %s", key, exc_info=True)
+            return None, None
+        if data is None:
+            return None, None
+        # PTTL 为 -1 表示没有过期时间
+        self._remember(key, data, pttl / 1000 if pttl > 0 else None)
+        return orjson.loads(data), REDIS
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = _DEFAULT_TTL) -> None:
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            value: 可 JSON 序列化的值
+            ttl: 过期时间（秒），None 表示不过期，默认使用 default_ttl
+        """
+        if ttl is _DEFAULT_TTL:
+            ttl = self.default_ttl
+        try:
+            data = _dumps(value)
+        except TypeError:
+            logger.warning("缓存值无法序列化，跳过写入: %s", key, exc_info=True)
+            return
+        self._remember(key, data, ttl)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(
+                self.key_prefix + key, data, px=None if ttl is None else max(1, int(ttl * 1000))
+            )
+        except Exception:
+            self.redis_errors += 1
+            logger.warning("写入 Redis 缓存失败: %s", key, exc_info=True)
+
+    async def delete(self, key: str) -> None:
+        """删除两级缓存中的键"""
+        self._memory.pop(key, None)
+        if self.redis is not None:
+            try:
+                await self.redis.delete(self.key_prefix + key)
+            except Exception:
+                self.redis_errors += 1
+                logger.warning("删除 Redis 缓存失败: %s", key, exc_info=True)
+
+    def _remember(self, key: str, data: bytes, ttl: Optional[float]) -> None:
+        expires = None if ttl is None else time.monotonic() + ttl
+        self._memory[key] = (expires, data)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
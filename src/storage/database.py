@@ -0,0 +1,309 @@
+"""
+数据库操作（异步）
+
+消息历史一律使用基于 (session_id, seq) 的键集分页（keyset pagination），
+不使用 OFFSET：查询代价只与返回行数有关，与会话历史长度无关。
+SQL 仅使用 sqlite / postgresql / mysql 都支持的语法。
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from config.settings import DatabaseSettings
+from .models import Base, ChatSession, Message, SessionSummary
+
+
+def create_db_engine(db_settings: DatabaseSettings) -> AsyncEngine:
+    """
+    根据 DatabaseSettings 创建异步引擎
+
+    Args:
+        db_settings: 数据库配置
+
+    Returns:
+        AsyncEngine 实例
+    """
+    kwargs: Dict[str, Any] = {"echo": db_settings.echo}
+    if db_settings.db_type != "sqlite":
+        kwargs.update(
+            pool_size=db_settings.pool_size,
+            max_overflow=db_settings.max_overflow,
+            pool_timeout=db_settings.pool_timeout,
+            pool_recycle=db_settings.pool_recycle,
+            pool_pre_ping=True,
+        )
+    engine = create_async_engine(db_settings.database_url, **kwargs)
+
+    if db_settings.db_type == "sqlite":
+        @event.listens_for(engine.sync_engine, "connect")
+        def _set_sqlite_pragma(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+
+    return engine
+
+
+def create_session_factory(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    """创建 AsyncSession 工厂"""
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def init_db(engine: AsyncEngine) -> None:
+    """创建所有表和索引（已存在则跳过）"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+@dataclass
+class MessagePage:
+    """一页消息"""
+
+    # 按 seq 升序排列的消息
+    items: List[Message] = field(default_factory=list)
+    # 下一页游标（向更早方向翻页时为本页最小 seq），没有更多数据时为 None
+    next_cursor: Optional[int] = None
+
+
+class MessageRepository:
+    """
+    消息历史仓储
+
+    所有读取都落在 (session_id, seq) 主键索引的一个连续范围内：
+    WHERE session_id = :sid AND seq < :cursor ORDER BY seq DESC LIMIT :n
+
+    同一会话的并发追加需要调用方串行化，序号冲突会以主键冲突
+    （IntegrityError）的形式暴露出来，而不会静默覆盖。
+    """
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession]):
+        self.session_factory = session_factory
+
+    async def create_session(
+        self,
+        session_id: str,
+        user_id: Optional[str] = None,
+        title: Optional[str] = None,
+    ) -> ChatSession:
+        """创建会话"""
+        async with self.session_factory() as db:
+            chat_session = ChatSession(id=session_id, user_id=user_id, title=title)
+            db.add(chat_session)
+            await db.commit()
+            return chat_session
+
+    async def last_seq(self, session_id: str) -> int:
+        """会话当前最大序号（无消息时为 0），由索引尾部直接得到"""
+        async with self.session_factory() as db:
+            return await self._last_seq(db, session_id)
+
+    @staticmethod
+    async def _last_seq(db: AsyncSession, session_id: str) -> int:
+        stmt = select(func.max(Message.seq)).where(Message.session_id == session_id)
+        return (await db.execute(stmt)).scalar() or 0
+
+    async def append_messages(
+        self, session_id: str, messages: Sequence[Dict[str, Any]]
+    ) -> List[int]:
+        """
+        追加消息
+
+        Args:
+            session_id: 会话 ID
+            messages: 消息列表，每项包含 role、content，可选 token_count
+
+        Returns:
+            分配给各条消息的序号
+        """
+        if not messages:
+            return []
+        async with self.session_factory() as db:
+            start = await self._last_seq(db, session_id) + 1
+            seqs = list(range(start, start + len(messages)))
+            db.add_all(
+                Message(
+                    session_id=session_id,
+                    seq=seq,
+                    role=msg["role"],
+                    content=msg["content"],
+                    token_count=msg.get("token_count", 0),
+                )
+                for seq, msg in zip(seqs, messages)
+            )
+            await db.commit()
+            return seqs
+
+    async def get_recent(self, session_id: str, limit: int) -> List[Message]:
+        """获取会话最近 limit 条消息（按 seq 升序返回）"""
+        page = await self.page_before(session_id, None, limit)
+        return page.items
+
+    async def page_before(
+        self, session_id: str, before_seq: Optional[int], limit: int
+    ) -> MessagePage:
+        """
+        向更早方向翻页
+
+        Args:
+            session_id: 会话 ID
+            before_seq: 游标，返回 seq 严格小于它的消息；None 表示从最新开始
+            limit: 每页条数
+
+        Returns:
+            MessagePage，items 按 seq 升序
+        """
+        stmt = select(Message).where(Message.session_id == session_id)
+        if before_seq is not None:
+            stmt = stmt.where(Message.seq < before_seq)
+        # 多取一条用于判断是否还有下一页
+        stmt = stmt.order_by(Message.seq.desc()).limit(limit + 1)
+        async with self.session_factory() as db:
+            rows = list((await db.execute(stmt)).scalars())
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
+        return MessagePage(
+            items=rows,
+            next_cursor=rows[0].seq if has_more and rows else None,
+        )
+
+    async def page_after(
+        self, session_id: str, after_seq: int, limit: int
+    ) -> MessagePage:
+        """
+        向更新方向翻页
+
+        Args:
+            session_id: 会话 ID
+            after_seq: 游标，返回 seq 严格大于它的消息（0 表示从头开始）
+            limit: 每页条数
+
+        Returns:
+            MessagePage，items 按 seq 升序，next_cursor 为本页最大 seq
+        """
+        stmt = (
+            select(Message)
+            .where(Message.session_id == session_id, Message.seq > after_seq)
+            .order_by(Message.seq.asc())
+            .limit(limit + 1)
+        )
+        async with self.session_factory() as db:
+            rows = list((await db.execute(stmt)).scalars())
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return MessagePage(
+            items=rows,
+            next_cursor=rows[-1].seq if has_more and rows else None,
+        )
+
+    async def get_active_window(
+        self,
+        session_id: str,
+        max_messages: int,
+        max_tokens: Optional[int] = None,
+        after_seq: int = 0,
+    ) -> List[Message]:
+        """
+        获取构建上下文所需的活动窗口
+
+        只读取最近 max_messages 条、且 seq 大于 after_seq（例如已被摘要覆盖的
+        位置）的消息，再从最新一条向前按 token_count 累加截断到 max_tokens。
+
+        Args:
+            session_id: 会话 ID
+            max_messages: 最多读取的消息条数
+            max_tokens: token 预算，None 表示不限制
+            after_seq: 只返回 seq 大于该值的消息
+
+        Returns:
+            按 seq 升序排列的消息
+        """
+        stmt = (
+            select(Message)
+            .where(Message.session_id == session_id, Message.seq > after_seq)
+            .order_by(Message.seq.desc())
+            .limit(max_messages)
+        )
+        async with self.session_factory() as db:
+            rows = list((await db.execute(stmt)).scalars())
+
+        if max_tokens is not None:
+            used = 0
+            for i, row in enumerate(rows):
+                used += row.token_count
+                if used > max_tokens:
+                    rows = rows[:i]
+                    break
+        rows.reverse()
+        return rows
+
+    # ==================== 滚动摘要 ====================
+
+    async def get_summary(self, session_id: str) -> Optional[SessionSummary]:
+        """获取会话的滚动摘要，没有时返回 None"""
+        async with self.session_factory() as db:
+            return await db.get(SessionSummary, session_id)
+
+    async def save_summary(
+        self,
+        session_id: str,
+        summary: str,
+        covered_seq: int,
+        token_count: int = 0,
+        source_tokens: int = 0,
+    ) -> bool:
+        """
+        保存滚动摘要
+
+        单条语句完成替换：只有 covered_seq 比已保存的更大时才覆盖，
+        并发或过期的摘要任务不会把摘要回退到更早的位置。
+
+        Returns:
+            是否写入
+        """
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(SessionSummary)
+                .where(
+                    SessionSummary.session_id == session_id,
+                    SessionSummary.covered_seq < covered_seq,
+                )
+                .values(
+                    summary=summary,
+                    covered_seq=covered_seq,
+                    token_count=token_count,
+                    source_tokens=source_tokens,
+                )
+            )
+            if result.rowcount:
+                await db.commit()
+                return True
+            db.add(
+                SessionSummary(
+                    session_id=session_id,
+                    summary=summary,
+                    covered_seq=covered_seq,
+                    token_count=token_count,
+                    source_tokens=source_tokens,
+                )
+            )
+            try:
+                await db.commit()
+            except IntegrityError:
+                # 已有覆盖到相同或更新位置的摘要
+                await db.rollback()
+                return False
+            return True
@@ -0,0 +1,103 @@
+"""
+ORM 数据模型（SQLAlchemy）
+
+消息表以 (session_id, seq) 作为复合主键：
+- seq 是会话内单调递增的消息序号
+- 复合主键本身就是 (session_id, seq) 上的 B-Tree 索引，
+  "某会话最近 N 条"、"seq 之前/之后的一页" 都只需一次索引范围扫描
+- MySQL(InnoDB) 下主键即聚簇索引，同一会话的消息在磁盘上物理相邻
+
+会话摘要表每个会话一行，记录滚动摘要覆盖到的消息序号 covered_seq，
+构建上下文时只读取 seq > covered_seq 的消息。
+"""
+
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    PrimaryKeyConstraint,
+    String,
+    Text,
+)
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class Base(DeclarativeBase):
+    """所有 ORM 模型的基类"""
+
+
+class ChatSession(Base):
+    """会话表"""
+
+    __tablename__ = "chat_sessions"
+
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    user_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    title: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=_utcnow
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=_utcnow, onupdate=_utcnow
+    )
+
+    __table_args__ = (
+        # 按用户列出会话（最近更新优先）
+        Index("ix_chat_sessions_user_updated", "user_id", "updated_at"),
+    )
+
+
+class Message(Base):
+    """消息表"""
+
+    __tablename__ = "messages"
+
+    session_id: Mapped[str] = mapped_column(
+        String(64), ForeignKey("chat_sessions.id", ondelete="CASCADE")
+    )
+    seq: Mapped[int] = mapped_column(BigInteger, autoincrement=False)
+    role: Mapped[str] = mapped_column(String(16))
+    content: Mapped[str] = mapped_column(Text)
+    token_count: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=_utcnow
+    )
+
+    __table_args__ = (
+        # 复合主键即 (session_id, seq) 索引，所有历史查询都走它
+        PrimaryKeyConstraint("session_id", "seq", name="pk_messages_session_seq"),
+    )
+
+    def __repr__(self) -> str:
+        return f"Message(session_id={self.session_id!r}, seq={self.seq}, role={self.role!r})"
+
+
+class SessionSummary(Base):
+    """会话滚动摘要表"""
+
+    __tablename__ = "session_summaries"
+
+    session_id: Mapped[str] = mapped_column(
+        String(64), ForeignKey("chat_sessions.id", ondelete="CASCADE"), primary_key=True
+    )
+    summary: Mapped[str] = mapped_column(Text)
+    # 摘要覆盖的最大消息序号（含）
+    covered_seq: Mapped[int] = mapped_column(BigInteger)
+    token_count: Mapped[int] = mapped_column(Integer, default=0)
+    # 被摘要替换的消息原始 token 数（累计）
+    source_tokens: Mapped[int] = mapped_column(BigInteger, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=_utcnow, onupdate=_utcnow
+    )
+
+    def __repr__(self) -> str:
+        return f"SessionSummary(session_id={self.session_id!r}, covered_seq={self.covered_seq})"
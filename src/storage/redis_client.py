@@ -0,0 +1,37 @@
+"""
+Redis 客户端封装
+
+根据 RedisSettings 创建带连接池的同步 / 异步客户端。
+同一进程内应复用返回的客户端（它们内部持有连接池），不要按请求创建。
+"""
+
+from typing import Any, Dict
+
+import redis
+import redis.asyncio as aioredis
+
+from config.settings import RedisSettings
+
+
+def _pool_kwargs(redis_settings: RedisSettings) -> Dict[str, Any]:
+    return {
+        "host": redis_settings.host,
+        "port": redis_settings.port,
+        "db": redis_settings.db,
+        "password": redis_settings.password,
+        "max_connections": redis_settings.max_connections,
+        "socket_timeout": redis_settings.socket_timeout,
+        "socket_connect_timeout": redis_settings.socket_connect_timeout,
+    }
+
+
+def create_redis_client(redis_settings: RedisSettings) -> redis.Redis:
+    """创建同步 Redis 客户端（自带连接池）"""
+    pool = redis.ConnectionPool(**_pool_kwargs(redis_settings))
+    return redis.Redis(connection_pool=pool)
+
+
+def create_async_redis_client(redis_settings: RedisSettings) -> aioredis.Redis:
+    """创建异步 Redis 客户端（自带连接池）"""
+    pool = aioredis.ConnectionPool(**_pool_kwargs(redis_settings))
+    return aioredis.Redis(connection_pool=pool)
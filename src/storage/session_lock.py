@@ -0,0 +1,189 @@
+"""
+按会话加锁：同一会话串行，不同会话并行
+
+同一会话的两个并发请求会交错写入检查点、弄乱消息序号；全局锁又会让所有会话排队。
+SessionLockManager 为每个会话维护一把锁：
+
+- 进程内：每个会话一个 FIFO 等待队列，按到达顺序依次执行；不同会话互不影响。
+  锁项按引用计数管理，最后一个持有者 / 等待者离开时立即删除，空闲会话不占内存
+- 跨 worker（可选）：拿到进程内的锁之后再获取 Redis 租约锁
+  （SET key token NX PX ttl），持有期间后台任务每 ttl/3 续约一次，释放时只删除
+  自己的 token。多个 worker 之间按轮询先后获得租约，不保证 FIFO；进程内排队
+  保证同一 worker 上每个会话同时只有一个请求在竞争 Redis 租约
+- 续约失败（租约过期被其他 worker 取得）时记录错误并计入 lost_leases
+
+用法：
+    async with locks.lock(session_id):
+        ...  # 读取并写入该会话的检查点 / 消息
+"""
+
+import asyncio
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import redis.asyncio as aioredis
+
+from config.settings import APISettings
+
+logger = logging.getLogger(__name__)
+
+# 只有 token 匹配时才续约 / 删除：KEYS[1]=锁键，ARGV=[token, ttl 毫秒]
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class LockTimeout(TimeoutError):
+    """在超时时间内未获得会话锁"""
+
+
+class _Entry:
+    __slots__ = ("lock", "refs")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()  # asyncio.Lock 按等待顺序唤醒，不会插队
+        self.refs = 0
+
+
+class SessionLockManager:
+    """
+    会话锁管理器
+
+    Args:
+        redis: 异步 Redis 客户端，None 表示只在进程内加锁
+        lease_ttl: Redis 租约有效期（秒）
+        key_prefix: Redis 锁键前缀
+        poll_interval: 租约被占用时的初始轮询间隔（秒），之后指数退避到 lease_ttl/10
+    """
+
+    def __init__(
+        self,
+        redis: Optional[aioredis.Redis] = None,
+        *,
+        lease_ttl: float = 30.0,
+        key_prefix: str = "lock:session:",
+        poll_interval: float = 0.01,
+    ):
+        self.redis = redis
+        self.lease_ttl = lease_ttl
+        self.key_prefix = key_prefix
+        self.poll_interval = poll_interval
+        self._entries: Dict[str, _Entry] = {}
+        if redis is not None:
+            self._renew = redis.register_script(_RENEW_SCRIPT)
+            self._release = redis.register_script(_RELEASE_SCRIPT)
+
+        # 指标
+        self.acquired = 0
+        self.contended = 0
+        self.timeouts = 0
+        self.lost_leases = 0
+
+    @classmethod
+    def from_settings(
+        cls, api_settings: APISettings, redis: Optional[aioredis.Redis] = None
+    ) -> "SessionLockManager":
+        """根据 APISettings 创建实例，未启用跨 worker 锁时忽略 redis"""
+        return cls(
+            redis if api_settings.session_lock_redis else None,
+            lease_ttl=api_settings.session_lock_ttl,
+        )
+
+    def __len__(self) -> int:
+        """当前有持有者或等待者的会话数"""
+        return len(self._entries)
+
+    def locked(self, session_id: str) -> bool:
+        """会话锁是否被当前进程持有"""
+        entry = self._entries.get(session_id)
+        return entry is not None and entry.lock.locked()
+
+    @asynccontextmanager
+    async def lock(self, session_id: str, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """
+        获取会话锁
+
+        Args:
+            session_id: 会话 ID
+            timeout: 等待上限（秒，包括进程内排队和 Redis 租约），None 表示一直等待
+
+        Raises:
+            LockTimeout: 超时未获得锁
+        """
+        entry = self._entries.get(session_id)
+        if entry is None:
+            entry = self._entries[session_id] = _Entry()
+        entry.refs += 1
+        try:
+            if entry.lock.locked():
+                self.contended += 1
+            loop = asyncio.get_running_loop()
+            deadline = None if timeout is None else loop.time() + timeout
+            try:
+                # asyncio.timeout 取消的是 acquire 本身，Lock 会把名额转给下一个等待者
+                async with asyncio.timeout(timeout):
+                    await entry.lock.acquire()
+            except TimeoutError:
+                self.timeouts += 1
+                raise LockTimeout(f"等待会话锁超时: {session_id}") from None
+            try:
+                if self.redis is None:
+                    self.acquired += 1
+                    yield
+                    return
+                token = await self._acquire_lease(session_id, deadline)
+                renewer = asyncio.create_task(self._keep_alive(session_id, token))
+                self.acquired += 1
+                try:
+                    yield
+                finally:
+                    renewer.cancel()
+                    await asyncio.gather(renewer, return_exceptions=True)
+                    await self._release(keys=[self.key_prefix + session_id], args=[token])
+            finally:
+                entry.lock.release()
+        finally:
+            entry.refs -= 1
+            if entry.refs == 0:
+                del self._entries[session_id]
+
+    async def _acquire_lease(self, session_id: str, deadline: Optional[float]) -> str:
+        key = self.key_prefix + session_id
+        token = uuid.uuid4().hex
+        ttl_ms = int(self.lease_ttl * 1000)
+        loop = asyncio.get_running_loop()
+        delay = self.poll_interval
+        while not await self.redis.set(key, token, nx=True, px=ttl_ms):
+            if deadline is not None and loop.time() + delay > deadline:
+                self.timeouts += 1
+                raise LockTimeout(f"等待会话租约超时: {session_id}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.lease_ttl / 10)
+        return token
+
+    async def _keep_alive(self, session_id: str, token: str) -> None:
+        key = self.key_prefix + session_id
+        ttl_ms = int(self.lease_ttl * 1000)
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            try:
+                renewed = await self._renew(keys=[key], args=[token, ttl_ms])
+            except Exception:
+                logger.warning("会话租约续约失败，稍后重试: %s", session_id, exc_info=True)
+                continue
+            if not renewed:
+                self.lost_leases += 1
+                logger.error("会话租约已丢失（已过期或被其他 worker 取得）: %s", session_id)
+                return
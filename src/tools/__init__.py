@@ -0,0 +1,46 @@
+"""
+工具模块
+
+提供工具声明、并发工具执行器、工具结果缓存、CPU 密集工具的进程池沙箱和计算器工具
+"""
+
+from .base import ToolEffect, ToolSpec, tool
+from .cache import ToolCache, ToolCacheStats, canonical_args
+from .executor import ToolExecutor, ToolResult, error_prompts
+from .sandbox import (
+    CPUTimeExceeded,
+    MemoryLimitExceeded,
+    ProcessSandbox,
+    SandboxCrashed,
+    SandboxError,
+    SandboxTimeout,
+    SharedArray,
+)
+from .calculator_tool import calculate, create_calculator_tool, evaluate
+
+__all__ = [
+    # 工具声明
+    "ToolSpec",
+    "ToolEffect",
+    "tool",
+    # 执行
+    "ToolExecutor",
+    "ToolResult",
+    "error_prompts",
+    # 结果缓存
+    "ToolCache",
+    "ToolCacheStats",
+    "canonical_args",
+    # 进程池沙箱
+    "ProcessSandbox",
+    "SharedArray",
+    "SandboxError",
+    "CPUTimeExceeded",
+    "MemoryLimitExceeded",
+    "SandboxCrashed",
+    "SandboxTimeout",
+    # 内置工具
+    "create_calculator_tool",
+    "calculate",
+    "evaluate",
+]
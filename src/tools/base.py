@@ -0,0 +1,114 @@
+"""
+工具声明
+
+ToolSpec 描述一个可被 Agent 调用的工具：名称、实现函数、执行约束（超时、并发上限、
+是否阻塞）和副作用类别（决定结果能否缓存）。实现函数以关键字参数接收工具调用的 args，可以是协程函数，也可以是普通
+函数；普通函数视为阻塞调用，由 ToolExecutor 放到线程池执行，不占用事件循环。
+
+LangChain 的 BaseTool 通过 ToolSpec.from_langchain 转换，也可以用 @tool 装饰器
+直接声明：
+
+    @tool(timeout=5, max_concurrency=2, effect=ToolEffect.CACHEABLE)
+    async def weather_tool(location: str) -> str:
+        ...
+"""
+
+import inspect
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Optional, Union
+
+from langchain_core.tools import BaseTool
+
+
+class ToolEffect(str, Enum):
+    """工具的副作用类别"""
+
+    # 结果只由参数决定（如单位换算），长期缓存
+    PURE = "pure"
+    # 只读但结果会随时间变化（天气、搜索、只读数据库查询），按 TTL 缓存
+    CACHEABLE = "cacheable"
+    # 有副作用（写数据库、发消息），从不缓存
+    SIDE_EFFECT = "side_effect"
+
+
+@dataclass
+class ToolSpec:
+    """
+    工具声明
+
+    Args:
+        name: 工具名称（与工具调用中的 name 对应）
+        func: 实现函数，以关键字参数接收 args
+        description: 工具说明（用于 tools_description）
+        timeout: 单次调用超时（秒），None 表示使用执行器默认值
+        max_concurrency: 同时执行的调用数上限，None 表示使用执行器默认值
+        blocking: 是否在线程池中执行，None 表示普通函数阻塞、协程函数不阻塞
+        effect: 副作用类别，默认视为有副作用（不缓存）
+        cache_ttl: 结果缓存时间（秒），None 表示使用缓存的默认值
+    """
+
+    name: str
+    func: Callable[..., Any]
+    description: str = ""
+    timeout: Optional[float] = None
+    max_concurrency: Optional[int] = None
+    blocking: Optional[bool] = None
+    effect: ToolEffect = ToolEffect.SIDE_EFFECT
+    cache_ttl: Optional[float] = None
+
+    def __post_init__(self):
+        if self.blocking is None:
+            self.blocking = not inspect.iscoroutinefunction(self.func)
+
+    @classmethod
+    def from_langchain(cls, tool: BaseTool, **kwargs) -> "ToolSpec":
+        """
+        从 LangChain 工具创建声明
+
+        有异步实现（StructuredTool.coroutine 或重写了 _arun）的工具直接 await ainvoke；
+        否则在线程池中调用 invoke，而不是交给 LangChain 默认的执行器。
+        """
+        if hasattr(tool, "coroutine"):
+            # StructuredTool / Tool：同步实现也重写了 _arun（转到执行器），只看 coroutine
+            has_async = tool.coroutine is not None
+        else:
+            has_async = type(tool)._arun is not BaseTool._arun
+        if has_async:
+
+            async def func(**args: Any) -> Any:
+                return await tool.ainvoke(args)
+
+        else:
+
+            def func(**args: Any) -> Any:
+                return tool.invoke(args)
+
+        return cls(tool.name, func, tool.description or "", **kwargs)
+
+
+def tool(
+    func: Optional[Callable[..., Any]] = None,
+    *,
+    name: Optional[str] = None,
+    timeout: Optional[float] = None,
+    max_concurrency: Optional[int] = None,
+    blocking: Optional[bool] = None,
+    effect: ToolEffect = ToolEffect.SIDE_EFFECT,
+    cache_ttl: Optional[float] = None,
+) -> Union[ToolSpec, Callable[[Callable[..., Any]], ToolSpec]]:
+    """把函数声明为工具，名称默认为函数名，说明默认为 docstring"""
+
+    def wrap(f: Callable[..., Any]) -> ToolSpec:
+        return ToolSpec(
+            name or f.__name__,
+            f,
+            inspect.getdoc(f) or "",
+            timeout=timeout,
+            max_concurrency=max_concurrency,
+            blocking=blocking,
+            effect=effect,
+            cache_ttl=cache_ttl,
+        )
+
+    return wrap(func) if func is not None else wrap
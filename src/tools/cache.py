@@ -0,0 +1,194 @@
+"""
+工具结果缓存
+
+天气、搜索、只读数据库查询这类工具在几分钟内经常以相同参数被重复调用。
+ToolCache 按工具声明的副作用类别缓存结果：
+
+- SIDE_EFFECT：从不缓存，每次都执行
+- CACHEABLE：按 ToolSpec.cache_ttl 缓存，未声明时使用 RedisSettings.cache_ttl
+- PURE：结果只由参数决定，按 pure_ttl（默认 1 天）缓存；仍设置过期时间是为了
+  让 Redis 中不再使用的键自然淘汰
+
+缓存键为 "工具名:sha256(规范化参数)"，规范化参数是按键排序、紧凑分隔的 JSON，
+参数顺序和空白不同的调用命中同一条缓存。只缓存成功的结果。
+
+相同键的并发调用只执行一次：第一个未命中的调用执行工具，其余调用等待它的结果
+（计入 coalesced）；执行失败时等待者收到同样的异常，执行者被取消时等待者重新竞争执行。
+与缓存命中一样，执行者和每个等待者拿到的都是结果编码后重新解码的副本，修改返回值
+互不影响；无法 JSON 序列化的结果不缓存，此时执行者和等待者共享同一个对象。
+
+bypass 为 True（或 run 时传入 bypass_cache=True）时跳过缓存读写，用于调试。
+"""
+
+import asyncio
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple
+
+import orjson
+import redis.asyncio as aioredis
+
+from config.settings import RedisSettings, ToolSettings
+from src.storage import TwoTierCache
+from src.storage.cache import MEMORY, _dumps
+from .base import ToolEffect, ToolSpec
+
+
+def canonical_args(args: Mapping[str, Any]) -> str:
+    """规范化参数：按键排序、紧凑分隔的 JSON"""
+    return json.dumps(args, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _copy(data: Optional[bytes], value: Any) -> Any:
+    """解码出结果的独立副本，无法序列化（data 为 None）时返回原对象"""
+    return value if data is None else orjson.loads(data)
+
+
+@dataclass
+class ToolCacheStats:
+    """单个工具的缓存指标"""
+
+    memory_hits: int = 0
+    redis_hits: int = 0
+    coalesced: int = 0
+    misses: int = 0
+    bypassed: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """命中率（合并到进行中调用的请求也算命中）"""
+        hits = self.memory_hits + self.redis_hits + self.coalesced
+        total = hits + self.misses
+        return hits / total if total else 0.0
+
+
+class ToolCache:
+    """
+    工具结果缓存
+
+    Args:
+        cache: 两级缓存
+        pure_ttl: PURE 工具结果的缓存时间（秒）
+        bypass: 是否跳过缓存（调试用）
+    """
+
+    def __init__(self, cache: TwoTierCache, *, pure_ttl: float = 86400.0, bypass: bool = False):
+        self.cache = cache
+        self.pure_ttl = pure_ttl
+        self.bypass = bypass
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats: Dict[str, ToolCacheStats] = {}
+
+    @classmethod
+    def from_settings(
+        cls,
+        tool_settings: ToolSettings,
+        redis_settings: RedisSettings,
+        redis: Optional[aioredis.Redis] = None,
+    ) -> "ToolCache":
+        """根据 ToolSettings / RedisSettings 创建实例"""
+        cache = TwoTierCache.from_settings(
+            redis_settings, redis, max_entries=tool_settings.cache_max_entries, key_prefix="cache:tool:"
+        )
+        return cls(cache, pure_ttl=tool_settings.cache_pure_ttl, bypass=tool_settings.cache_bypass)
+
+    @staticmethod
+    def key(spec: ToolSpec, args: Mapping[str, Any]) -> str:
+        """缓存键：工具名 + 规范化参数的 sha256"""
+        digest = hashlib.sha256(canonical_args(args).encode("utf-8")).hexdigest()
+        return f"{spec.name}:{digest}"
+
+    def ttl(self, spec: ToolSpec) -> Optional[float]:
+        """结果的缓存时间（秒）"""
+        if spec.cache_ttl is not None:
+            return spec.cache_ttl
+        if spec.effect is ToolEffect.PURE:
+            return self.pure_ttl
+        return self.cache.default_ttl
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """按工具统计的缓存指标"""
+        return {
+            name: {**vars(stats), "hit_rate": round(stats.hit_rate, 4)}
+            for name, stats in self._stats.items()
+        }
+
+    def tool_stats(self, name: str) -> ToolCacheStats:
+        """单个工具的指标（不存在时创建），同一工具始终返回同一个对象"""
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = ToolCacheStats()
+        return stats
+
+    async def call(
+        self,
+        spec: ToolSpec,
+        args: Mapping[str, Any],
+        execute: Callable[[], Awaitable[Any]],
+        *,
+        bypass: bool = False,
+    ) -> Tuple[Any, bool]:
+        """
+        读取缓存，未命中时执行并写入
+
+        Args:
+            spec: 工具声明
+            args: 调用参数
+            execute: 实际执行工具的协程函数
+            bypass: 本次调用跳过缓存
+
+        Returns:
+            (工具结果, 是否来自缓存或合并的调用)
+        """
+        if spec.effect is ToolEffect.SIDE_EFFECT:
+            return await execute(), False
+        stats = self.tool_stats(spec.name)
+        if bypass or self.bypass:
+            stats.bypassed += 1
+            return await execute(), False
+
+        key = self.key(spec, args)
+        value, tier = await self.cache.get(key)
+        if tier is not None:
+            if tier == MEMORY:
+                stats.memory_hits += 1
+            else:
+                stats.redis_hits += 1
+            return value, True
+
+        while True:
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            try:
+                data, value = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # 执行者被取消（而不是自己被取消）时重新竞争执行
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                continue
+            stats.coalesced += 1
+            return _copy(data, value), True
+
+        stats.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await execute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # 没有等待者时不报 "exception was never retrieved"
+            raise
+        finally:
+            del self._inflight[key]
+        try:
+            data: Optional[bytes] = _dumps(value)
+        except TypeError:
+            data = None
+        future.set_result((data, value))
+        await self.cache.set(key, value, self.ttl(spec))
+        return _copy(data, value), False
@@ -0,0 +1,124 @@
+"""
+计算器工具
+
+evaluate 只解释数学表达式的安全子集（数字、四则运算、乘方、取模、比较和 math
+模块中的函数 / 常量），不使用 eval。大整数乘方、阶乘等计算可能持续数秒并持有 GIL，
+因此工具通过 ProcessSandbox 在子进程中执行，受 CPU 时间和内存限制约束。
+"""
+
+import ast
+import math
+import operator
+from typing import Any, Callable, Dict, Union
+
+from .base import ToolEffect, ToolSpec
+from .sandbox import ProcessSandbox
+
+Number = Union[int, float, complex]
+
+_BINARY_OPS: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPS: Dict[type, Callable[[Any], Any]] = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+_COMPARE_OPS: Dict[type, Callable[[Any, Any], bool]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+_FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    name: getattr(math, name)
+    for name in dir(math)
+    if not name.startswith("_") and callable(getattr(math, name))
+}
+_FUNCTIONS.update({"abs": abs, "round": round, "min": min, "max": max})
+_CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau, "inf": math.inf}
+
+
+def _eval(node: ast.AST) -> Any:
+    if isinstance(node, ast.Expression):
+        return _eval(node.body)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, complex)):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        return _BINARY_OPS[type(node.op)](_eval(node.left), _eval(node.right))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        return _UNARY_OPS[type(node.op)](_eval(node.operand))
+    if isinstance(node, ast.Compare):
+        left = _eval(node.left)
+        for op, comparator in zip(node.ops, node.comparators):
+            if type(op) not in _COMPARE_OPS:
+                raise ValueError(f"不支持的比较运算: {type(op).__name__}")
+            right = _eval(comparator)
+            if not _COMPARE_OPS[type(op)](left, right):
+                return False
+            left = right
+        return True
+    if isinstance(node, ast.Name) and node.id in _CONSTANTS:
+        return _CONSTANTS[node.id]
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in _FUNCTIONS
+        and not node.keywords
+    ):
+        return _FUNCTIONS[node.func.id](*(_eval(arg) for arg in node.args))
+    raise ValueError(f"不支持的表达式: {ast.dump(node)[:80]}")
+
+
+def evaluate(expression: str) -> Number:
+    """
+    计算数学表达式
+
+    Raises:
+        ValueError: 表达式包含不支持的语法
+        ArithmeticError: 除零、溢出等计算错误
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as exc:
+        raise ValueError(f"表达式语法错误: {exc.msg}") from None
+    return _eval(tree)
+
+
+def calculate(expression: str) -> str:
+    """计算表达式并格式化结果（在沙箱子进程中执行）"""
+    value = evaluate(expression)
+    try:
+        return str(value)
+    except ValueError:
+        # 超过 int 转字符串的位数上限
+        digits = int(value.bit_length() * math.log10(2)) + 1
+        return f"结果约有 {digits} 位数字，过大无法完整显示"
+
+
+def create_calculator_tool(sandbox: ProcessSandbox, **kwargs: Any) -> ToolSpec:
+    """
+    创建在沙箱中执行的计算器工具
+
+    Args:
+        sandbox: 进程池沙箱
+        **kwargs: 传给 ToolSpec 的其他参数（timeout、max_concurrency 等）
+    """
+
+    async def calculator(expression: str) -> str:
+        return await sandbox.run(calculate, expression)
+
+    kwargs.setdefault("effect", ToolEffect.PURE)
+    return ToolSpec(
+        "calculator",
+        calculator,
+        "计算数学表达式，支持 + - * / // % **、比较运算和 math 模块的函数（如 sqrt、factorial）",
+        **kwargs,
+    )
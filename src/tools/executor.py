@@ -0,0 +1,332 @@
+"""
+并发工具执行器
+
+TOOL_SELECTION 或 ReAct Agent 一次选出多个工具时，这些调用彼此独立，依次执行会让
+一轮对话的工具耗时变成所有工具耗时之和。ToolExecutor.run 并发执行一批工具调用：
+
+- 每个调用有自己的超时（ToolSpec.timeout，默认 default_timeout），只计算执行时间，
+  不包括等待并发名额的时间
+- 每个工具有并发上限（ToolSpec.max_concurrency，默认 max_concurrency_per_tool），
+  防止一个慢工具的大量调用压垮下游服务
+- 同步（阻塞）工具在专用线程池中执行；线程中的调用无法被中断，超时后结果被丢弃，
+  但并发名额要等线程真正结束才归还，避免卡住的调用占满线程池
+- 整批调用有截止时间（turn_timeout），到期后取消仍未完成的调用
+- 单个调用的失败、超时或取消不影响其他调用；结果按输入顺序返回，失败的调用可以用
+  error_prompts 生成 TOOL_ERROR_HANDLER 提示词，成功的结果照常进入 RESPONSE_GENERATION
+- 配置了 ToolCache 时，无副作用工具的结果先查缓存（见 cache.py），命中的调用不占用
+  并发名额
+"""
+
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import BaseTool
+
+from config.prompts import PromptBuilder, prompt_builder
+from config.settings import ToolSettings
+from src.utils import span
+from .base import ToolSpec, tool
+from .cache import ToolCache
+
+logger = logging.getLogger(__name__)
+
+SUCCESS = "success"
+ERROR = "error"
+TIMEOUT = "timeout"
+CANCELLED = "cancelled"
+
+
+@dataclass
+class ToolResult:
+    """
+    单个工具调用的结果
+
+    Args:
+        call_id: 工具调用 ID
+        name: 工具名称
+        args: 调用参数
+        status: success / error / timeout / cancelled
+        output: 工具返回值（成功时）
+        error: 错误信息（失败时）
+        duration: 耗时（秒），包括等待并发名额的时间
+        cached: 结果是否来自缓存（或合并到进行中的相同调用）
+    """
+
+    call_id: Optional[str]
+    name: str
+    args: Dict[str, Any]
+    status: str
+    output: Any = None
+    error: Optional[str] = None
+    duration: float = 0.0
+    cached: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.status == SUCCESS
+
+    @property
+    def content(self) -> str:
+        """写入 ToolMessage / 提示词的文本"""
+        if not self.ok:
+            return self.error or self.status
+        if isinstance(self.output, str):
+            return self.output
+        return json.dumps(self.output, ensure_ascii=False, default=str)
+
+    def to_message(self) -> ToolMessage:
+        """转换为 LangChain ToolMessage"""
+        return ToolMessage(
+            content=self.content,
+            tool_call_id=self.call_id or "",
+            name=self.name,
+            status="success" if self.ok else "error",
+        )
+
+
+class ToolExecutor:
+    """
+    并发工具执行器
+
+    Args:
+        tools: 工具列表（ToolSpec、LangChain BaseTool 或普通函数）
+        default_timeout: 工具未声明 timeout 时的单次调用超时（秒）
+        turn_timeout: run 的默认总截止时间（秒）
+        max_concurrency_per_tool: 工具未声明 max_concurrency 时的并发上限
+        thread_pool_size: 执行阻塞工具的线程数
+        cache: 工具结果缓存，None 表示不缓存
+    """
+
+    def __init__(
+        self,
+        tools: Iterable[Union[ToolSpec, BaseTool, Callable[..., Any]]] = (),
+        *,
+        default_timeout: float = 30.0,
+        turn_timeout: float = 60.0,
+        max_concurrency_per_tool: int = 4,
+        thread_pool_size: int = 8,
+        cache: Optional[ToolCache] = None,
+    ):
+        self.default_timeout = default_timeout
+        self.turn_timeout = turn_timeout
+        self.max_concurrency_per_tool = max_concurrency_per_tool
+        self.thread_pool_size = thread_pool_size
+        self.cache = cache
+        self._tools: Dict[str, ToolSpec] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        for item in tools:
+            self.register(item)
+
+    @classmethod
+    def from_settings(
+        cls,
+        tool_settings: ToolSettings,
+        tools: Iterable[Union[ToolSpec, BaseTool, Callable[..., Any]]] = (),
+        cache: Optional[ToolCache] = None,
+    ) -> "ToolExecutor":
+        """根据 ToolSettings 创建实例"""
+        return cls(
+            tools,
+            default_timeout=tool_settings.default_timeout,
+            turn_timeout=tool_settings.turn_timeout,
+            max_concurrency_per_tool=tool_settings.max_concurrency_per_tool,
+            thread_pool_size=tool_settings.thread_pool_size,
+            cache=cache,
+        )
+
+    @property
+    def tools(self) -> Dict[str, ToolSpec]:
+        return dict(self._tools)
+
+    def register(self, item: Union[ToolSpec, BaseTool, Callable[..., Any]]) -> ToolSpec:
+        """注册工具，同名工具会被替换"""
+        if isinstance(item, BaseTool):
+            spec = ToolSpec.from_langchain(item)
+        elif isinstance(item, ToolSpec):
+            spec = item
+        else:
+            spec = tool(item)
+        self._tools[spec.name] = spec
+        self._semaphores.pop(spec.name, None)
+        return spec
+
+    def close(self) -> None:
+        """关闭线程池（不等待仍在运行的阻塞调用）"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _semaphore(self, spec: ToolSpec) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(spec.name)
+        if semaphore is None:
+            semaphore = self._semaphores[spec.name] = asyncio.Semaphore(
+                spec.max_concurrency or self.max_concurrency_per_tool
+            )
+        return semaphore
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.thread_pool_size, thread_name_prefix="tool")
+        return self._pool
+
+    async def run(
+        self,
+        calls: Sequence[Mapping[str, Any]],
+        *,
+        timeout: Optional[float] = None,
+        bypass_cache: bool = False,
+    ) -> List[ToolResult]:
+        """
+        并发执行一批工具调用
+
+        Args:
+            calls: 工具调用（{"name", "args", "id"}，即 ToolCall）
+            timeout: 总截止时间（秒），None 表示使用 turn_timeout
+            bypass_cache: 本批调用跳过结果缓存（调试用）
+
+        Returns:
+            与 calls 顺序一致的结果；到截止时间仍未完成的调用状态为 cancelled
+        """
+        if not calls:
+            return []
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        tasks = [loop.create_task(self._call(call, bypass_cache)) for call in calls]
+        try:
+            _, pending = await asyncio.wait(
+                tasks, timeout=self.turn_timeout if timeout is None else timeout
+            )
+        finally:
+            # 截止时间已到，或者调用方（如断开的请求）被取消
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        elapsed = loop.time() - start
+        results = []
+        for call, task in zip(calls, tasks):
+            if task.cancelled():
+                results.append(
+                    ToolResult(
+                        call.get("id"),
+                        call["name"],
+                        dict(call.get("args") or {}),
+                        CANCELLED,
+                        error="超过本轮工具调用的截止时间，调用已取消",
+                        duration=elapsed,
+                    )
+                )
+            else:
+                results.append(task.result())
+        return results
+
+    async def _call(self, call: Mapping[str, Any], bypass_cache: bool = False) -> ToolResult:
+        with span(f"tool:{call['name']}"):
+            return await self._invoke(call, bypass_cache)
+
+    async def _invoke(self, call: Mapping[str, Any], bypass_cache: bool) -> ToolResult:
+        name = call["name"]
+        args = dict(call.get("args") or {})
+        call_id = call.get("id")
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        spec = self._tools.get(name)
+        if spec is None:
+            return ToolResult(call_id, name, args, ERROR, error=f"未知工具: {name}")
+        timeout = spec.timeout or self.default_timeout
+        cached = False
+        try:
+            if self.cache is None:
+                output = await self._execute(spec, args, timeout)
+            else:
+                output, cached = await self.cache.call(
+                    spec, args, lambda: self._execute(spec, args, timeout), bypass=bypass_cache
+                )
+        except TimeoutError:
+            logger.warning("工具调用超时: %s (%.1f 秒)", name, timeout)
+            return ToolResult(
+                call_id, name, args, TIMEOUT,
+                error=f"工具调用超时（{timeout:g} 秒）", duration=loop.time() - start,
+            )
+        except Exception as exc:
+            logger.warning("工具调用失败: %s", name, exc_info=True)
+            return ToolResult(
+                call_id, name, args, ERROR,
+                error=f"{type(exc).__name__}: {exc}", duration=loop.time() - start,
+            )
+        return ToolResult(
+            call_id, name, args, SUCCESS, output, duration=loop.time() - start, cached=cached
+        )
+
+    async def _execute(self, spec: ToolSpec, args: Dict[str, Any], timeout: float) -> Any:
+        if spec.blocking:
+            return await self._run_blocking(spec, args, timeout)
+        async with self._semaphore(spec):
+            async with asyncio.timeout(timeout):
+                return await spec.func(**args)
+
+    async def _run_blocking(self, spec: ToolSpec, args: Dict[str, Any], timeout: float) -> Any:
+        semaphore = self._semaphore(spec)
+        await semaphore.acquire()
+        loop = asyncio.get_running_loop()
+
+        def release(_) -> None:
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:
+                pass  # 事件循环已关闭
+
+        try:
+            # 复制上下文变量，线程中的日志 / 追踪与当前请求关联
+            context = contextvars.copy_context()
+            future = self._thread_pool().submit(
+                context.run, functools.partial(spec.func, **args)
+            )
+        except BaseException:
+            semaphore.release()
+            raise
+        future.add_done_callback(release)
+        async with asyncio.timeout(timeout):
+            return await asyncio.wrap_future(future)
+
+
+def error_prompts(
+    results: Iterable[ToolResult],
+    user_input: str,
+    builder: PromptBuilder = prompt_builder,
+) -> List[Tuple[ToolResult, str]]:
+    """
+    为失败的调用构建 TOOL_ERROR_HANDLER 提示词
+
+    Args:
+        results: ToolExecutor.run 的结果
+        user_input: 用户原始请求
+        builder: 提示词构建器
+
+    Returns:
+        (失败的结果, 提示词) 列表
+    """
+    return [
+        (
+            result,
+            builder.build(
+                "TOOL_ERROR_HANDLER",
+                tool_name=result.name,
+                error_message=result.content,
+                user_input=user_input,
+            ),
+        )
+        for result in results
+        if not result.ok
+    ]
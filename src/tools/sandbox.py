@@ -0,0 +1,515 @@
+"""
+进程池沙箱：在独立进程中执行 CPU 密集的工具
+
+计算器、数据分析这类工具的计算持有 GIL，放在线程池里同样会阻塞事件循环，拖慢同一
+worker 上所有会话。ProcessSandbox 维护一组预热的子进程：
+
+- 预热：子进程通过 forkserver 创建，启动时导入 preload 中的模块（如 numpy），
+  调用时不再付出导入开销；forkserver 本身是单线程的，不会从带线程的 API 进程 fork
+- 每次调用的限制：
+  - CPU 时间：ITIMER_PROF 计时器，超出后在子进程中抛出 CPUTimeExceeded
+  - 内存：把 RLIMIT_AS 的软限制设为当前虚拟内存 + memory_mb，超出时分配失败
+    （MemoryError），调用结束后恢复
+  - 墙钟超时：计算卡在不响应信号的 C 代码里时，主进程在 timeout 后杀掉子进程
+  限制只设置软限制，调用结束后恢复，子进程可以继续复用。沙箱用于隔离项目自己的
+  CPU 密集工具，不是执行任意不可信代码的安全边界
+- 大数组零拷贝：nbytes 不小于 shm_threshold 的 NumPy 数组参数放进共享内存，只传
+  名称、形状和类型，子进程直接映射为只读数组，不经过 pickle；用 shared_array
+  在共享内存中直接构造数组可以省掉唯一的一次拷贝
+- 返回值用 pickle 协议 5 传回，不小于 shm_threshold 的数组数据作为带外缓冲区
+  单独发送。事件循环在管道可读时每次只读一段，不等待整条消息；带外缓冲区直接
+  读入匿名 mmap，反序列化时数组直接使用这块内存，不再拷贝，返回大数组时事件循环
+  不会停顿
+- 崩溃隔离：子进程异常退出（段错误、被杀）时，只有正在它上面执行的调用失败
+  （SandboxCrashed），随后补一个新的子进程；其他调用不受影响
+
+工具函数必须是模块级函数（可以 pickle）。在等待结果时事件循环只监听管道，
+不占用线程。
+"""
+
+import asyncio
+import importlib
+import io
+import logging
+import mmap
+import multiprocessing
+import os
+import pickle
+import resource
+import signal
+import struct
+import traceback
+from multiprocessing.connection import Connection
+from multiprocessing.reduction import ForkingPickler
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config.settings import ToolSettings
+
+logger = logging.getLogger(__name__)
+
+
+class SandboxError(Exception):
+    """沙箱执行失败"""
+
+
+class CPUTimeExceeded(SandboxError):
+    """超过单次调用的 CPU 时间限制"""
+
+
+class MemoryLimitExceeded(SandboxError):
+    """超过单次调用的内存限制"""
+
+
+class SandboxCrashed(SandboxError):
+    """子进程异常退出"""
+
+
+class SandboxTimeout(SandboxError, TimeoutError):
+    """超过墙钟超时，子进程已被终止"""
+
+
+class SharedArray:
+    """
+    共享内存中的 NumPy 数组
+
+    在主进程中创建并填充 .array，作为 ProcessSandbox.run 的参数传入时子进程直接
+    映射，不拷贝。用完后调用 close（或用 with）释放共享内存。
+    """
+
+    def __init__(self, shape: Sequence[int], dtype: Any = np.float64):
+        dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(shape)) * dtype.itemsize)
+        self._shm = SharedMemory(create=True, size=size)
+        self.array = np.ndarray(tuple(shape), dtype, buffer=self._shm.buf)
+
+    @classmethod
+    def copy_of(cls, array: np.ndarray) -> "SharedArray":
+        shared = cls(array.shape, array.dtype)
+        shared.array[...] = array
+        return shared
+
+    @property
+    def descriptor(self) -> "_ArrayRef":
+        return _ArrayRef(self._shm.name, tuple(self.array.shape), self.array.dtype.str)
+
+    def close(self) -> None:
+        if self._shm is None:
+            return
+        self.array = None
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self) -> "SharedArray":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class _ArrayRef(NamedTuple):
+    """共享内存数组的描述，在子进程中替换为只读数组"""
+
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+# ==================== 子进程 ====================
+
+_armed = False
+
+
+def _on_cpu_limit(signum, frame) -> None:
+    if _armed:
+        raise CPUTimeExceeded("超过 CPU 时间限制")
+
+
+def _vm_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[0]) * resource.getpagesize()
+
+
+def _attach(value: Any, segments: List[SharedMemory]) -> Any:
+    if isinstance(value, _ArrayRef):
+        name, shape, dtype = value
+        shm = SharedMemory(name=name)
+        segments.append(shm)
+        array = np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+        array.flags.writeable = False
+        return array
+    return value
+
+
+def _execute(task: tuple) -> tuple:
+    global _armed
+    func, args, kwargs, cpu_time, memory_bytes, _ = task
+    segments: List[SharedMemory] = []
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    try:
+        args = [_attach(a, segments) for a in args]
+        kwargs = {k: _attach(v, segments) for k, v in kwargs.items()}
+        if memory_bytes:
+            limit = _vm_bytes() + memory_bytes
+            if hard != resource.RLIM_INFINITY:
+                limit = min(limit, hard)
+            resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+        if cpu_time:
+            _armed = True
+            signal.setitimer(signal.ITIMER_PROF, cpu_time)
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            _armed = False
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+        return ("ok", result)
+    except CPUTimeExceeded as exc:
+        return ("error", exc, "")
+    except MemoryError:
+        return ("error", MemoryLimitExceeded("超过内存限制"), "")
+    except Exception as exc:
+        return ("error", exc, traceback.format_exc())
+    finally:
+        del args, kwargs
+        for shm in segments:
+            try:
+                shm.close()
+            except BufferError:
+                pass  # 返回值仍引用共享内存，进程退出时释放
+
+
+def _send_reply(conn: Connection, reply: tuple, oob_threshold: int) -> None:
+    """
+    发送结果：第一条消息为带外缓冲区个数 + pickle 数据，随后每个缓冲区一条消息
+
+    不小于 oob_threshold 的缓冲区（连续的 NumPy 数组等）带外发送，不拷贝进 pickle 数据
+    """
+    buffers: List[pickle.PickleBuffer] = []
+
+    def out_of_band(buffer: pickle.PickleBuffer) -> bool:
+        if buffer.raw().nbytes < oob_threshold:
+            return True
+        buffers.append(buffer)
+        return False
+
+    data = io.BytesIO()
+    data.write(_COUNT.pack(0))
+    pickle.Pickler(data, protocol=5, buffer_callback=out_of_band).dump(reply)
+    view = data.getbuffer()
+    _COUNT.pack_into(view, 0, len(buffers))
+    conn.send_bytes(view)
+    del view
+    for buffer in buffers:
+        conn.send_bytes(buffer.raw())
+
+
+def _worker_main(conn: Connection, preload: Sequence[str]) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGPROF, _on_cpu_limit)
+    for module in preload:
+        importlib.import_module(module)
+    conn.send(os.getpid())
+    while True:
+        try:
+            data = conn.recv_bytes()
+        except EOFError:
+            return
+        try:
+            task = ForkingPickler.loads(data)
+        except Exception as exc:  # 例如函数所在模块在子进程中无法导入
+            _send_reply(conn, ("error", SandboxError(f"无法加载任务: {exc}"), ""), 0)
+            continue
+        if task is None:
+            return
+        reply = _execute(task)
+        try:
+            _send_reply(conn, reply, task[-1])
+        except Exception as exc:  # 返回值无法 pickle（此时还没有发送任何数据）
+            _send_reply(conn, ("error", SandboxError(f"返回值无法序列化: {exc}"), ""), 0)
+
+
+# ==================== 主进程 ====================
+
+# multiprocessing.connection 的消息格式：4 字节长度，超过 2GB 时为 -1 再跟 8 字节长度
+_HEADER = struct.Struct("!i")
+_LARGE_HEADER = struct.Struct("!Q")
+# 结果第一条消息开头的带外缓冲区个数
+_COUNT = struct.Struct("!I")
+# 不小于该大小的消息读入匿名 mmap：按页惰性分配，不像 bytearray 那样先整块清零
+_MMAP_THRESHOLD = 1 << 20
+
+
+class _MessageReader:
+    """在事件循环的可读回调中不阻塞地读取一条 Connection.send_bytes 发出的消息"""
+
+    __slots__ = ("fd", "header", "buffer", "view", "received")
+
+    def __init__(self, fd: int):
+        self.fd = fd
+        self.header = b""
+        self.buffer: Any = None
+        self.view: Optional[memoryview] = None
+        self.received = 0
+
+    def feed(self) -> bool:
+        """读取一次（管道可读时不会阻塞），消息完整时返回 True"""
+        if self.buffer is None:
+            need = _HEADER.size if len(self.header) < _HEADER.size else _HEADER.size + _LARGE_HEADER.size
+            chunk = os.read(self.fd, need - len(self.header))
+            if not chunk:
+                raise EOFError
+            self.header += chunk
+            if len(self.header) < _HEADER.size:
+                return False
+            (size,) = _HEADER.unpack_from(self.header)
+            if size == -1:
+                if len(self.header) < _HEADER.size + _LARGE_HEADER.size:
+                    return False
+                (size,) = _LARGE_HEADER.unpack_from(self.header, _HEADER.size)
+            self.buffer = mmap.mmap(-1, size) if size >= _MMAP_THRESHOLD else bytearray(size)
+            self.view = memoryview(self.buffer)
+            return size == 0
+        read = os.readv(self.fd, [self.view[self.received:]])
+        if not read:
+            raise EOFError
+        self.received += read
+        return self.received == len(self.buffer)
+
+
+class _Worker:
+    __slots__ = ("process", "conn")
+
+    def __init__(self, process: multiprocessing.Process, conn: Connection):
+        self.process = process
+        self.conn = conn
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class ProcessSandbox:
+    """
+    预热的进程池沙箱
+
+    Args:
+        workers: 子进程数
+        cpu_time: 单次调用的默认 CPU 时间限制（秒），None 表示不限制
+        memory_mb: 单次调用的默认内存增量限制（MB），None 表示不限制
+        timeout: 默认墙钟超时（秒），None 表示 cpu_time × 2 + 1（未限制 CPU 时不设超时）
+        shm_threshold: 通过共享内存传递的数组大小下限（字节）
+        preload: 子进程启动时导入的模块
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        *,
+        cpu_time: Optional[float] = 5.0,
+        memory_mb: Optional[int] = 512,
+        timeout: Optional[float] = None,
+        shm_threshold: int = 1 << 16,
+        preload: Sequence[str] = ("numpy",),
+    ):
+        self.workers = workers
+        self.cpu_time = cpu_time
+        self.memory_mb = memory_mb
+        self.timeout = timeout
+        self.shm_threshold = shm_threshold
+        self.preload = tuple(preload)
+        self._ctx = multiprocessing.get_context("forkserver")
+        self._ctx.set_forkserver_preload(["src.tools.sandbox", *self.preload])
+        self._idle: Optional[asyncio.Queue] = None
+        self._all: List[_Worker] = []
+        self._closed = False
+
+        # 指标
+        self.calls = 0
+        self.crashes = 0
+        self.restarts = 0
+        self.limit_errors: Dict[str, int] = {}
+
+    @classmethod
+    def from_settings(cls, tool_settings: ToolSettings) -> "ProcessSandbox":
+        """根据 ToolSettings 创建实例"""
+        return cls(
+            tool_settings.sandbox_workers,
+            cpu_time=tool_settings.sandbox_cpu_time,
+            memory_mb=tool_settings.sandbox_memory_mb,
+        )
+
+    def shared_array(self, shape: Sequence[int], dtype: Any = np.float64) -> SharedArray:
+        """在共享内存中创建数组（调用方负责 close）"""
+        return SharedArray(shape, dtype)
+
+    async def start(self) -> None:
+        """启动并预热所有子进程"""
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        workers = await asyncio.gather(*(self._spawn() for _ in range(self.workers)))
+        for worker in workers:
+            self._idle.put_nowait(worker)
+
+    async def close(self) -> None:
+        """停止所有子进程"""
+        self._closed = True
+        for worker in self._all:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        loop = asyncio.get_running_loop()
+        for worker in self._all:
+            await loop.run_in_executor(None, worker.process.join, 5)
+            worker.kill()
+        self._all.clear()
+
+    async def _spawn(self) -> _Worker:
+        parent, child = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main, args=(child, self.preload), name="tool-sandbox", daemon=True
+        )
+        process.start()
+        child.close()
+        worker = _Worker(process, parent)
+        self._all.append(worker)
+        # 等待子进程完成预热
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, parent.recv)
+        return worker
+
+    async def _replace(self, worker: _Worker) -> None:
+        worker.kill()
+        self._all.remove(worker)
+        if self._closed:
+            return
+        self.restarts += 1
+        self._idle.put_nowait(await self._spawn())
+
+    async def run(
+        self,
+        func: Callable[..., Any],
+        *args: Any,
+        cpu_time: Optional[float] = None,
+        memory_mb: Optional[int] = None,
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        在子进程中执行 func(*args, **kwargs)
+
+        Args:
+            func: 模块级函数
+            cpu_time: CPU 时间限制（秒），None 表示使用默认值
+            memory_mb: 内存增量限制（MB），None 表示使用默认值
+            timeout: 墙钟超时（秒），None 表示使用默认值
+
+        Raises:
+            CPUTimeExceeded / MemoryLimitExceeded: 超过资源限制
+            SandboxTimeout: 超过墙钟超时，子进程已被终止并替换
+            SandboxCrashed: 子进程异常退出
+            Exception: func 自身抛出的异常
+        """
+        if self._idle is None:
+            await self.start()
+        cpu_time = self.cpu_time if cpu_time is None else cpu_time
+        memory_mb = self.memory_mb if memory_mb is None else memory_mb
+        if timeout is None:
+            timeout = self.timeout
+        if timeout is None and cpu_time:
+            timeout = cpu_time * 2 + 1
+
+        temporary: List[SharedArray] = []
+        args = tuple(self._share(a, temporary) for a in args)
+        kwargs = {k: self._share(v, temporary) for k, v in kwargs.items()}
+        try:
+            # 先序列化，函数或参数无法 pickle 时不占用子进程
+            payload = ForkingPickler.dumps(
+                (
+                    func, args, kwargs, cpu_time,
+                    memory_mb * 1024 * 1024 if memory_mb else None,
+                    self.shm_threshold,
+                )
+            )
+        except BaseException:
+            for shared in temporary:
+                shared.close()
+            raise
+
+        worker = await self._idle.get()
+        self.calls += 1
+        healthy = False
+        try:
+            worker.conn.send_bytes(payload)
+            reply = await asyncio.wait_for(self._receive(worker), timeout)
+            healthy = True
+        except asyncio.TimeoutError:
+            self.limit_errors["SandboxTimeout"] = self.limit_errors.get("SandboxTimeout", 0) + 1
+            raise SandboxTimeout(f"沙箱调用超时（{timeout:g} 秒），子进程已终止") from None
+        except (EOFError, OSError):
+            self.crashes += 1
+            logger.error("沙箱子进程异常退出 (pid=%s, code=%s)", worker.process.pid, worker.process.exitcode)
+            raise SandboxCrashed(f"沙箱子进程异常退出 (code={worker.process.exitcode})") from None
+        finally:
+            for shared in temporary:
+                shared.close()
+            if healthy:
+                self._idle.put_nowait(worker)
+            else:
+                # 超时、崩溃或调用方取消：结果状态未知，换一个子进程
+                await asyncio.shield(self._replace(worker))
+
+        if reply[0] == "ok":
+            return reply[1]
+        _, exc, remote_traceback = reply
+        if isinstance(exc, SandboxError):
+            name = type(exc).__name__
+            self.limit_errors[name] = self.limit_errors.get(name, 0) + 1
+        elif remote_traceback:
+            exc.add_note(remote_traceback)
+        raise exc
+
+    def _share(self, value: Any, temporary: List[SharedArray]) -> Any:
+        if isinstance(value, SharedArray):
+            return value.descriptor
+        if isinstance(value, np.ndarray) and value.nbytes >= self.shm_threshold:
+            shared = SharedArray.copy_of(value)
+            temporary.append(shared)
+            return shared.descriptor
+        return value
+
+    async def _receive(self, worker: _Worker) -> tuple:
+        fd = worker.conn.fileno()
+        data = await self._read_message(fd)
+        (count,) = _COUNT.unpack_from(data)
+        buffers = [await self._read_message(fd) for _ in range(count)]
+        # 带外缓冲区不经过拷贝，数组直接使用读入的内存
+        return pickle.loads(memoryview(data)[_COUNT.size:], buffers=buffers)
+
+    @staticmethod
+    async def _read_message(fd: int) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        reader = _MessageReader(fd)
+
+        def on_readable() -> None:
+            if future.done():
+                return
+            try:
+                if reader.feed():
+                    future.set_result(reader.buffer)
+            except BaseException as exc:
+                future.set_exception(exc)
+
+        loop.add_reader(fd, on_readable)
+        try:
+            return await future
+        finally:
+            loop.remove_reader(fd)
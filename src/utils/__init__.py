@@ -0,0 +1,45 @@
+"""
+通用工具模块
+
+提供以下功能：
+- 非阻塞日志：按 LogSettings 配置根 logger，后台线程批量写文件 / 控制台，
+  支持按时间或大小轮转、保留策略和 JSON 行格式
+- 单轮追踪：基于 ContextVar 的 span、耗时瀑布图、Chrome trace 导出，
+  以及按请求或比例开启的 SIGPROF 调用栈采样
+"""
+
+# 日志
+from .logger import (
+    DroppingQueueHandler,
+    JsonFormatter,
+    LogPipeline,
+    RotatingFile,
+    get_pipeline,
+    parse_retention,
+    parse_rotation,
+    setup_logging,
+    shutdown_logging,
+)
+
+# 追踪
+from .tracing import Span, Trace, Tracer, current_trace, span, traced
+
+__all__ = [
+    # 日志
+    "DroppingQueueHandler",
+    "JsonFormatter",
+    "LogPipeline",
+    "RotatingFile",
+    "get_pipeline",
+    "parse_retention",
+    "parse_rotation",
+    "setup_logging",
+    "shutdown_logging",
+    # 追踪
+    "Span",
+    "Trace",
+    "Tracer",
+    "current_trace",
+    "span",
+    "traced",
+]
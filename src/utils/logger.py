@@ -0,0 +1,421 @@
+"""
+非阻塞日志
+
+logging 自带的 FileHandler / StreamHandler 在调用 logger.info 的线程里同步写文件，
+LOG_TO_FILE=true 时每条日志都在事件循环上做一次磁盘 I/O。setup_logging 按
+LogSettings 配置根 logger：
+
+- 热路径：QueueHandler 只渲染消息文本（msg % args，参数可能在之后被修改）放入
+  有界队列；队列满时丢弃并计数（dropped），不会阻塞调用方
+- 后台写线程：批量取出记录，格式化后对每个输出（控制台、文件）一次 write + flush；
+  丢弃计数增加时在日志中补一条警告
+- 文件轮转：rotation 为时间（"1 day"、"12 hours"，对齐到周期边界）或大小（"100 MB"）；
+  retention 为时间（"30 days"）或文件数（"10 files"），轮转后清理旧文件
+- 结构化模式（LOG_JSON_FORMAT=true）：每行一个 JSON 对象，包含 extra 传入的字段
+- 多进程：fork 前等待写线程写完当前批次，子进程丢弃从父进程继承的队列内容，重新
+  打开文件并启动自己的写线程。多个 worker 写同一文件时，谁先轮转都可以，其余进程
+  发现文件已被换掉后直接重新打开
+"""
+
+import atexit
+import glob
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import weakref
+from logging.handlers import QueueHandler
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+import orjson
+
+from config.settings import LogSettings
+
+_SIZE_UNITS = {"b": 1, "kb": 1024, "mb": 1024**2, "gb": 1024**3}
+_TIME_UNITS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400, "week": 604800}
+# LogRecord 自带的属性，其余属性视为 extra 字段
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+_STOP = object()
+
+
+def _parse(value: str) -> Tuple[float, str]:
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([A-Za-z]+)\s*", value)
+    if match is None:
+        raise ValueError(f"无法解析: {value!r}")
+    unit = match.group(2).lower()
+    if unit not in _SIZE_UNITS and unit.endswith("s"):
+        unit = unit[:-1]
+    return float(match.group(1)), unit
+
+
+def parse_rotation(value: str) -> Tuple[str, float]:
+    """解析轮转条件："1 day" -> ("time", 86400)，"100 MB" -> ("size", 104857600)"""
+    amount, unit = _parse(value)
+    if unit in _TIME_UNITS:
+        return "time", amount * _TIME_UNITS[unit]
+    if unit in _SIZE_UNITS:
+        return "size", amount * _SIZE_UNITS[unit]
+    raise ValueError(f"无法解析日志轮转条件: {value!r}")
+
+
+def parse_retention(value: str) -> Tuple[str, float]:
+    """解析保留策略："30 days" -> ("age", 2592000)，"10 files" -> ("count", 10)"""
+    amount, unit = _parse(value)
+    if unit in _TIME_UNITS:
+        return "age", amount * _TIME_UNITS[unit]
+    if unit == "file":
+        return "count", amount
+    raise ValueError(f"无法解析日志保留策略: {value!r}")
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录输出为一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode("utf-8")
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    非阻塞的 QueueHandler：队列满时丢弃记录并计数
+
+    只在调用线程渲染消息文本和异常堆栈，时间格式化、JSON 编码等留给写线程。
+    """
+
+    def __init__(self, log_queue: "queue.Queue[Any]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # 入队本身是线程安全的，不需要 Handler 的锁
+        rv = self.filter(record)
+        if rv:
+            self.emit(record)
+        return rv
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RotatingFile:
+    """
+    带轮转和保留策略的日志文件（只由写线程使用）
+
+    Args:
+        path: 日志文件路径
+        rotation: 轮转条件，见 parse_rotation
+        retention: 保留策略，见 parse_retention
+    """
+
+    def __init__(self, path: str, rotation: str, retention: str):
+        self.path = path
+        self.rotation = parse_rotation(rotation)
+        self.retention = parse_retention(retention)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.stream: Optional[TextIO] = None
+        self._open()
+
+    def _open(self) -> None:
+        self.stream = open(self.path, "a", encoding="utf-8")
+        kind, limit = self.rotation
+        self._rollover_at = None
+        if kind == "time":
+            # 按本地时间对齐到周期边界（"1 day" 即每天零点），重启和多个 worker 的轮转时间一致
+            offset = time.localtime().tm_gmtoff
+            period_start = (time.time() + offset) // limit * limit - offset
+            self._rollover_at = period_start + limit
+            if self.stream.tell() and os.fstat(self.stream.fileno()).st_mtime < period_start:
+                # 文件是上一个周期写的（服务在边界前后停止过）
+                self._rollover_at = period_start
+
+    def write(self, text: str) -> None:
+        self.stream.write(text)
+        self.stream.flush()
+        self.maybe_rotate()
+
+    def maybe_rotate(self) -> None:
+        """达到轮转条件时轮转"""
+        kind, limit = self.rotation
+        if kind == "size" and self.stream.tell() >= limit:
+            self.rotate()
+        elif kind == "time" and time.time() >= self._rollover_at:
+            self.rotate()
+
+    def rotate(self) -> None:
+        """轮转当前文件并清理过期文件"""
+        try:
+            current = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            current = None
+        if current == os.fstat(self.stream.fileno()).st_ino:
+            target = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}"
+            suffix = 1
+            while os.path.exists(target):
+                target = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}.{suffix}"
+                suffix += 1
+            os.rename(self.path, target)
+        # 否则其他进程已经轮转，直接打开新文件
+        self.stream.close()
+        self._open()
+        self.cleanup()
+
+    def cleanup(self) -> None:
+        """按保留策略删除轮转出的旧文件"""
+        rotated = []
+        for name in glob.glob(glob.escape(self.path) + ".*"):
+            try:
+                rotated.append((os.stat(name).st_mtime, name))
+            except FileNotFoundError:
+                continue
+        rotated.sort(reverse=True)
+        kind, limit = self.retention
+        if kind == "count":
+            expired = [name for _, name in rotated[int(limit):]]
+        else:
+            cutoff = time.time() - limit
+            expired = [name for mtime, name in rotated if mtime < cutoff]
+        for name in expired:
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+
+    def reopen(self) -> None:
+        """丢弃当前文件对象并重新打开（fork 后的子进程使用）"""
+        self._open()
+
+    def close(self) -> None:
+        if self.stream is not None:
+            self.stream.close()
+
+
+class LogPipeline:
+    """
+    后台日志写线程
+
+    Args:
+        formatter: 格式化器
+        stream: 控制台输出，None 表示不输出到控制台
+        file: 日志文件，None 表示不写文件
+        queue_size: 队列容量
+        batch_size: 每批最多写入的记录数
+        flush_interval: 空闲时检查轮转 / 丢弃计数的间隔（秒）
+    """
+
+    def __init__(
+        self,
+        formatter: logging.Formatter,
+        *,
+        stream: Optional[TextIO] = None,
+        file: Optional[RotatingFile] = None,
+        queue_size: int = 10000,
+        batch_size: int = 512,
+        flush_interval: float = 0.5,
+    ):
+        self.formatter = formatter
+        self.stream = stream
+        self.file = file
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: "queue.Queue[Any]" = queue.Queue(queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self._reported_drops = 0
+        self._io_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+
+    @property
+    def dropped(self) -> int:
+        return self.handler.dropped
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        _running.add(self)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """写完队列中的记录后停止写线程"""
+        if self._thread is None:
+            return
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+        _running.discard(self)
+        if self.file is not None:
+            self.file.close()
+
+    def _after_fork_in_child(self) -> None:
+        self._io_lock.release()
+        if self._thread is None:
+            return
+        # 队列中的记录由父进程写出；fork 时写线程可能持有队列的锁，直接换新队列。
+        # 文件对象的内部锁同理，重新打开
+        self.queue = queue.Queue(self.queue.maxsize)
+        self.handler.queue = self.queue
+        self.handler.dropped = self._reported_drops = 0
+        if self.file is not None:
+            self.file.reopen()
+        self.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(record is _STOP for record in batch)
+            with self._io_lock:
+                self._write([record for record in batch if record is not _STOP])
+            if stop:
+                return
+
+    def _write(self, records: List[logging.LogRecord]) -> None:
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.formatter.format(record))
+            except Exception as exc:
+                lines.append(f"日志格式化失败: {exc!r} ({record.msg!r})")
+        dropped = self.handler.dropped
+        if dropped > self._reported_drops:
+            lines.append(f"日志队列已满，已丢弃 {dropped - self._reported_drops} 条记录（累计 {dropped} 条）")
+            self._reported_drops = dropped
+        try:
+            if lines:
+                text = "\n".join(lines) + "\n"
+                if self.stream is not None:
+                    self.stream.write(text)
+                    self.stream.flush()
+                if self.file is not None:
+                    self.file.write(text)
+                self.written += len(records)
+            elif self.file is not None:
+                self.file.maybe_rotate()
+        except Exception:
+            # 磁盘满等错误不能让写线程退出
+            sys.stderr.write("写日志失败\n")
+
+
+# 正在运行的日志管道：fork 钩子只在模块加载时注册一次，fork 时作用于其中的每个管道
+_running: "weakref.WeakSet[LogPipeline]" = weakref.WeakSet()
+_forking: List[LogPipeline] = []
+
+
+def _before_fork() -> None:
+    _forking[:] = list(_running)
+    for pipeline in _forking:
+        pipeline._io_lock.acquire()
+
+
+def _after_fork_in_parent() -> None:
+    for pipeline in _forking:
+        pipeline._io_lock.release()
+    _forking.clear()
+
+
+def _after_fork_in_child() -> None:
+    for pipeline in _forking:
+        pipeline._after_fork_in_child()
+    _forking.clear()
+
+
+os.register_at_fork(
+    before=_before_fork,
+    after_in_parent=_after_fork_in_parent,
+    after_in_child=_after_fork_in_child,
+)
+
+_pipeline: Optional[LogPipeline] = None
+
+
+def get_pipeline() -> Optional[LogPipeline]:
+    """当前进程的日志管道，未调用 setup_logging 时为 None"""
+    return _pipeline
+
+
+def shutdown_logging(timeout: float = 5.0) -> None:
+    """写完队列中的日志并停止写线程（os._exit 之前调用，atexit 不会执行）"""
+    global _pipeline
+    if _pipeline is not None:
+        _pipeline.stop(timeout)
+        atexit.unregister(_pipeline.stop)
+        _pipeline = None
+
+
+def setup_logging(
+    log_settings: LogSettings, *, console: bool = True, stream: Optional[TextIO] = None
+) -> LogPipeline:
+    """
+    按 LogSettings 配置根 logger（替换已有的处理器）
+
+    Args:
+        log_settings: 日志配置
+        console: 是否输出到控制台（stderr）
+        stream: 控制台输出流，默认 sys.stderr
+
+    Returns:
+        日志管道（可读取 dropped / written 计数，进程退出时自动 stop）
+    """
+    global _pipeline
+    shutdown_logging()
+    if log_settings.json_format:
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(log_settings.format)
+    file = None
+    if log_settings.log_to_file:
+        file = RotatingFile(
+            os.path.join(log_settings.log_dir, log_settings.log_file_name),
+            log_settings.rotation,
+            log_settings.retention,
+        )
+    pipeline = LogPipeline(
+        formatter,
+        stream=(stream or sys.stderr) if console else None,
+        file=file,
+        queue_size=log_settings.queue_size,
+        flush_interval=log_settings.flush_interval_ms / 1000,
+    )
+    pipeline.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(pipeline.handler)
+    root.setLevel(log_settings.level)
+    atexit.register(pipeline.stop)
+    _pipeline = pipeline
+    return pipeline
@@ -0,0 +1,435 @@
+"""
+单轮对话的 span 追踪和采样分析
+
+一轮对话慢的时候，需要知道时间花在了提示词构建、检索、工具、检查点还是 LLM 上：
+
+- Tracer.turn() 开启一轮追踪（按 sample_rate 采样，或由请求强制开启），
+  span() / traced() 在图节点和 I/O 调用处记录耗时。当前追踪和父 span 保存在
+  ContextVar 中，asyncio 任务和 copy_context 的线程各自继承，并发的子任务互不干扰
+- 未开启追踪时 span() 只做一次 ContextVar.get 并返回共享的空上下文管理器
+- 一轮结束后日志输出耗时瀑布图，并导出 Chrome trace 格式文件
+  （chrome://tracing 或 https://ui.perfetto.dev 打开），每个 asyncio 任务 / 线程一行
+- 采样分析：开启 profile 的一轮期间用 ITIMER_PROF + SIGPROF 定时采样主线程调用栈
+  （不使用 sys.setprofile，不影响未采样的代码），只统计当前上下文属于该轮的样本，
+  同一进程中其他请求的 CPU 时间不会混进来。ITIMER_PROF 只在进程消耗 CPU 时计时，
+  事件循环空闲时没有样本；C 扩展中的长时间计算在返回 Python 代码后才记录
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import random
+import signal
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from types import CodeType, FrameType
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import orjson
+
+from config.settings import MonitoringSettings
+
+logger = logging.getLogger(__name__)
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """一段计时"""
+
+    __slots__ = ("name", "start", "end", "depth", "lane", "attrs")
+
+    def __init__(self, name: str, start: float, depth: int, lane: int, attrs: Dict[str, Any]):
+        self.name = name
+        self.start = start
+        self.end = start
+        self.depth = depth
+        self.lane = lane
+        self.attrs = attrs
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class Trace:
+    """
+    一轮对话的追踪记录
+
+    Args:
+        name: 名称（如 "chat"）
+        attrs: 附加信息（会话 ID 等）
+        profile: 是否采样调用栈
+    """
+
+    def __init__(self, name: str, attrs: Dict[str, Any], profile: bool = False):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.attrs = attrs
+        self.profile = profile
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.spans: List[Span] = []
+        # (时间, 通道, 调用栈（外层在前）)，调用栈元素为 (code, 行号)
+        self.samples: List[Tuple[float, int, Tuple[Tuple[CodeType, int], ...]]] = []
+        self._lanes: Dict[int, int] = {}
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def lane(self) -> int:
+        """当前 asyncio 任务或线程对应的通道号（Chrome trace 的 tid），开启追踪的任务为 0"""
+        # _get_running_loop 在没有事件循环的线程中返回 None，不像 current_task 那样抛异常
+        loop = asyncio._get_running_loop()
+        key = id(asyncio.current_task(loop)) if loop is not None else threading.get_ident()
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = len(self._lanes)
+        return lane
+
+    def hot_frames(self, limit: int = 10) -> List[Tuple[str, int]]:
+        """按样本数排序的最内层函数"""
+        counter: Counter = Counter(
+            _frame_name(*stack[-1]) for _, _, stack in self.samples if stack
+        )
+        return counter.most_common(limit)
+
+    def waterfall(self, width: int = 40) -> str:
+        """耗时瀑布图"""
+        total = max(self.duration, 1e-9)
+        attrs = " ".join(f"{key}={value}" for key, value in self.attrs.items())
+        lines = [f"{self.name} {total * 1000:.1f} ms trace={self.trace_id} {attrs}".rstrip()]
+        for span in sorted(self.spans, key=lambda s: s.start):
+            offset = span.start - self.start
+            left = int(offset / total * width)
+            length = max(1, round(span.duration / total * width))
+            bar = " " * left + "█" * min(length, width - left)
+            lines.append(
+                f"{offset * 1000:>8.1f} ms {span.duration * 1000:>8.1f} ms |{bar:<{width}}| "
+                f"{'  ' * span.depth}{span.name}"
+            )
+        if self.samples:
+            lines.append(f"采样 {len(self.samples)} 次，热点：")
+            for name, count in self.hot_frames(5):
+                lines.append(f"  {count / len(self.samples):>6.1%}  {name}")
+        return "\n".join(lines)
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """Chrome trace 格式（时间单位微秒）"""
+        pid = os.getpid()
+
+        def ts(value: float) -> float:
+            return round((value - self.start) * 1e6, 3)
+
+        events: List[Dict[str, Any]] = [
+            {"ph": "M", "pid": pid, "name": "process_name", "args": {"name": f"{self.name} {self.trace_id}"}},
+            {
+                "ph": "X", "pid": pid, "tid": 0, "name": self.name, "cat": "turn",
+                "ts": 0, "dur": ts(self.start + self.duration), "args": self.attrs,
+            },
+        ]
+        for lane in range(len(self._lanes) or 1):
+            events.append(
+                {"ph": "M", "pid": pid, "tid": lane, "name": "thread_name", "args": {"name": f"task {lane}"}}
+            )
+        for span in self.spans:
+            events.append(
+                {
+                    "ph": "X", "pid": pid, "tid": span.lane, "name": span.name, "cat": "span",
+                    "ts": ts(span.start), "dur": round(span.duration * 1e6, 3), "args": span.attrs,
+                }
+            )
+
+        # 调用栈样本：相同前缀的栈帧共用 stackFrames 中的节点
+        frames: Dict[str, Dict[str, Any]] = {}
+        frame_ids: Dict[Tuple[Optional[str], str], str] = {}
+        samples = []
+        for at, lane, stack in self.samples:
+            parent: Optional[str] = None
+            for code, lineno in stack:
+                name = _frame_name(code, lineno)
+                frame_id = frame_ids.get((parent, name))
+                if frame_id is None:
+                    frame_id = frame_ids[(parent, name)] = str(len(frame_ids))
+                    frames[frame_id] = {"name": name, "category": "python"}
+                    if parent is not None:
+                        frames[frame_id]["parent"] = parent
+                parent = frame_id
+            if parent is not None:
+                samples.append({"name": "cpu", "pid": pid, "tid": lane, "ts": ts(at), "sf": parent, "weight": 1})
+        return {"traceEvents": events, "stackFrames": frames, "samples": samples, "displayTimeUnit": "ms"}
+
+
+def _frame_name(code: CodeType, lineno: int) -> str:
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _SpanContext:
+    __slots__ = ("_trace", "_name", "_attrs", "_span", "_token")
+
+    def __init__(self, trace: Trace, name: str, attrs: Dict[str, Any]):
+        self._trace = trace
+        self._name = name
+        self._attrs = attrs
+
+    def __enter__(self) -> Span:
+        parent = _current_span.get()
+        trace = self._trace
+        self._span = Span(
+            self._name, time.perf_counter(), parent.depth + 1 if parent else 0, trace.lane(), self._attrs
+        )
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self._span.end = time.perf_counter()
+        if exc_type is not None:
+            self._span.attrs["error"] = exc_type.__name__
+        _current_span.reset(self._token)
+        self._trace.spans.append(self._span)
+
+
+class _NoopContext:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        return None
+
+
+_NOOP = _NoopContext()
+
+
+def span(name: str, **attrs: Any) -> Any:
+    """
+    记录一段耗时（同步和异步代码中都用 with）
+
+    未开启追踪时返回空上下文管理器，with 的目标为 None。
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP
+    return _SpanContext(trace, name, attrs)
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """把同步或异步函数的每次调用记录为 span，name 默认为函数的 qualname"""
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        label = name or func.__qualname__
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                trace = _current_trace.get()
+                if trace is None:
+                    return await func(*args, **kwargs)
+                with _SpanContext(trace, label, {}):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            trace = _current_trace.get()
+            if trace is None:
+                return func(*args, **kwargs)
+            with _SpanContext(trace, label, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def current_trace() -> Optional[Trace]:
+    """当前上下文所属的追踪，未开启时为 None"""
+    return _current_trace.get()
+
+
+class _Sampler:
+    """
+    进程内共享的 SIGPROF 采样器
+
+    有开启 profile 的轮次时才设置定时器，全部结束后恢复原来的信号处理器。
+    """
+
+    def __init__(self) -> None:
+        self._active = 0
+        self._interval = 0.0
+        self._previous: Any = None
+        self._lock = threading.Lock()
+        self.max_depth = 64
+
+    def acquire(self, interval: float) -> bool:
+        # 信号处理器只能在主线程中设置，也只在主线程中执行
+        if threading.current_thread() is not threading.main_thread() or not hasattr(signal, "setitimer"):
+            return False
+        with self._lock:
+            if self._active == 0:
+                self._previous = signal.signal(signal.SIGPROF, self._on_signal)
+                self._interval = interval
+                signal.setitimer(signal.ITIMER_PROF, interval, interval)
+            elif interval < self._interval:
+                self._interval = interval
+                signal.setitimer(signal.ITIMER_PROF, interval, interval)
+            self._active += 1
+        return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._active -= 1
+            if self._active == 0:
+                signal.setitimer(signal.ITIMER_PROF, 0, 0)
+                signal.signal(signal.SIGPROF, self._previous or signal.SIG_DFL)
+
+    def _on_signal(self, signum: int, frame: Optional[FrameType]) -> None:
+        trace = _current_trace.get()
+        if trace is None or not trace.profile:
+            return
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            stack.append((frame.f_code, frame.f_lineno))
+            frame = frame.f_back
+        stack.reverse()
+        trace.samples.append((time.perf_counter(), trace.lane(), tuple(stack)))
+
+
+_sampler = _Sampler()
+
+
+class _Turn:
+    """Tracer.turn() 返回的上下文管理器，支持 with 和 async with（后者在线程中写文件）"""
+
+    def __init__(self, tracer: "Tracer", name: str, enabled: bool, profile: bool, attrs: Dict[str, Any]):
+        self._tracer = tracer
+        self._name = name
+        self._enabled = enabled
+        self._profile = profile
+        self._attrs = attrs
+        self._trace: Optional[Trace] = None
+        self._token: Any = None
+        self._sampling = False
+
+    def __enter__(self) -> Optional[Trace]:
+        if not self._enabled or _current_trace.get() is not None:
+            return None
+        self._trace = Trace(self._name, self._attrs, self._profile)
+        self._token = _current_trace.set(self._trace)
+        self._trace.lane()
+        self._tracer.traced += 1
+        if self._profile:
+            self._sampling = _sampler.acquire(self._tracer.profile_interval)
+        return self._trace
+
+    def _finish(self) -> Optional[Trace]:
+        trace = self._trace
+        if trace is None:
+            return None
+        if self._sampling:
+            _sampler.release()
+        trace.end = time.perf_counter()
+        _current_trace.reset(self._token)
+        logger.info("本轮耗时：\n%s", trace.waterfall())
+        return trace
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        trace = self._finish()
+        if trace is not None:
+            self._tracer.export(trace)
+
+    async def __aenter__(self) -> Optional[Trace]:
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        trace = self._finish()
+        if trace is not None:
+            await asyncio.to_thread(self._tracer.export, trace)
+
+
+class Tracer:
+    """
+    按轮次采样的追踪器
+
+    Args:
+        output_dir: Chrome trace 文件的输出目录，None 表示不导出
+        sample_rate: 追踪的轮次比例
+        profile_rate: 追踪的轮次中同时采样调用栈的比例
+        profile_interval: 调用栈采样间隔（CPU 秒）
+    """
+
+    def __init__(
+        self,
+        output_dir: Optional[str] = None,
+        *,
+        sample_rate: float = 0.0,
+        profile_rate: float = 0.0,
+        profile_interval: float = 0.005,
+    ):
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.profile_rate = profile_rate
+        self.profile_interval = profile_interval
+
+        # 指标
+        self.traced = 0
+        self.exported = 0
+
+    @classmethod
+    def from_settings(cls, monitoring_settings: MonitoringSettings) -> "Tracer":
+        """根据 MonitoringSettings 创建实例"""
+        return cls(
+            monitoring_settings.trace_dir,
+            sample_rate=monitoring_settings.trace_sample_rate,
+            profile_rate=monitoring_settings.trace_profile_rate,
+            profile_interval=monitoring_settings.trace_profile_interval_ms / 1000,
+        )
+
+    def turn(
+        self,
+        name: str = "turn",
+        *,
+        trace: Optional[bool] = None,
+        profile: Optional[bool] = None,
+        **attrs: Any,
+    ) -> _Turn:
+        """
+        开启一轮追踪
+
+        Args:
+            name: 名称
+            trace: 是否追踪，None 表示按 sample_rate 采样
+            profile: 是否采样调用栈（开启时同时追踪），None 表示在追踪的轮次中按 profile_rate 采样
+            **attrs: 写入追踪的附加信息
+
+        用法：
+            async with tracer.turn("chat", profile=request.headers.get("x-profile") == "1",
+                                   session_id=session_id):
+                ...
+        """
+        if trace is None:
+            trace = bool(profile) or (self.sample_rate > 0 and random.random() < self.sample_rate)
+        if profile is None:
+            profile = trace and self.profile_rate > 0 and random.random() < self.profile_rate
+        return _Turn(self, name, bool(trace or profile), bool(profile), attrs)
+
+    def export(self, trace: Trace) -> Optional[str]:
+        """把追踪写成 Chrome trace 文件，返回文件路径"""
+        if self.output_dir is None:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(
+            self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{trace.name}-{trace.trace_id}.json"
+        )
+        with open(path, "wb") as file:
+            file.write(orjson.dumps(trace.to_chrome(), default=str))
+        self.exported += 1
+        return path
@@ -0,0 +1,241 @@
+"""
+测试 src/api/app.py 中的应用和多进程启动器
+"""
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import httpx
+from fastapi.testclient import TestClient
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from config.settings import (
+    CheckpointerSettings,
+    DatabaseSettings,
+    MonitoringSettings,
+    Settings,
+    VectorStoreSettings,
+)
+from src.api import app as app_module
+from src.api import create_app, load_resources
+from src.graph import create_checkpointer
+from src.memory import NumpyVectorStore, SummaryWorker
+from src.services import MetricsService
+from src.storage import TwoTierCache
+from src.tools import ToolCache, ToolEffect, ToolExecutor, ToolSpec
+from tests.test_checkpointer import write_history
+from tests.test_metrics import exposition
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_settings(tmp_path, **vector_store) -> Settings:
+    return Settings(
+        vector_store=VectorStoreSettings(**{"vector_store_type": "none", **vector_store}),
+        database=DatabaseSettings(db_type="sqlite", sqlite_path=str(tmp_path / "chatbot.db")),
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(tmp_path, port: int, **env) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        API_HOST="127.0.0.1",
+        API_PORT=str(port),
+        API_WORKERS="2",
+        VECTOR_VECTOR_STORE_TYPE="none",
+        DB_SQLITE_PATH=str(tmp_path / "chatbot.db"),
+        LOG_LOG_DIR=str(tmp_path / "logs"),
+        **env,
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "src.api"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+class TestLoadResources:
+    """测试共享资源加载"""
+
+    def test_loads_numpy_index_without_embedding(self, tmp_path):
+        """测试主进程只加载索引数据，不创建 Embedding"""
+        store = NumpyVectorStore(DeterministicFakeEmbedding(size=16), str(tmp_path / "vectors"))
+        store.add_texts([f"文档 {i}" for i in range(10)])
+        settings = make_settings(
+            tmp_path, vector_store_type="numpy", numpy_persist_dir=str(tmp_path / "vectors")
+        )
+        resources = load_resources(settings, graph_factory=lambda r: ("graph", len(r.vector_store)))
+        assert len(resources.vector_store) == 10
+        assert resources.vector_store.embedding is None
+        assert resources.graph == ("graph", 10)
+        assert resources.prompts.build("CONVERSATION_SUMMARY", conversation="对话")
+
+
+class TestCreateApp:
+    """测试应用和 worker lifespan"""
+
+    def test_lifespan_creates_worker_pools(self, tmp_path):
+        """测试未预加载时在 lifespan 中加载资源并创建连接池"""
+        app = create_app(make_settings(tmp_path))
+        with TestClient(app) as client:
+            assert app.state.resources is not None
+            assert app.state.repository is not None
+            response = client.get("/health")
+            assert response.json() == {"status": "ok", "pid": os.getpid()}
+
+    def test_tracks_component_metrics(self, tmp_path, monkeypatch):
+        """测试 graph_factory 构建的工具缓存、检查点 GC 和会话摘要注册为指标"""
+        service = MetricsService()
+        monkeypatch.setattr(app_module, "metrics", service)
+        settings = make_settings(tmp_path)
+        settings.monitoring = MonitoringSettings(enable_prometheus=True)
+        saver = create_checkpointer(
+            CheckpointerSettings(
+                sqlite_path=str(tmp_path / "cp.db"),
+                max_checkpoints=3,
+                gc_enabled=True,
+                gc_interval_seconds=0.01,
+            )
+        )
+        write_history(saver, "t1", 6)
+        cache = ToolCache(TwoTierCache(default_ttl=60))
+        tools = ToolExecutor([ToolSpec("lookup", lambda q: q, effect=ToolEffect.CACHEABLE)], cache=cache)
+        worker = SummaryWorker(None, None)
+        worker.tokens_saved = 150
+
+        def graph_factory(resources):
+            resources.tools = tools
+            resources.summary_worker = worker
+            return SimpleNamespace(checkpointer=saver)
+
+        app = create_app(settings, load_resources(settings, graph_factory))
+        with TestClient(app):
+            cache.tool_stats("lookup").memory_hits = 3
+            cache.tool_stats("lookup").misses = 1
+            deadline = time.monotonic() + 5
+            while saver.gc.rows_pruned < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            text = exposition(service)
+        saver.close()
+        assert 'chatbot_cache_requests_total{cache="tool:lookup",result="hit"} 3.0' in text
+        assert 'chatbot_cache_requests_total{cache="tool:lookup",result="miss"} 1.0' in text
+        assert 'chatbot_checkpoint_gc_total{item="rows_pruned"} 3.0' in text
+        assert 'chatbot_checkpoint_gc_total{item="runs"}' in text
+        assert "chatbot_summary_tokens_saved 150.0" in text
+
+    def test_summary_worker_shares_llm_scheduler(self, tmp_path):
+        """测试 graph_factory 拿到应用的 LLM 调度器，后台摘要和交互调用共用同一个"""
+        settings = make_settings(tmp_path)
+
+        def graph_factory(resources):
+            resources.summary_worker = SummaryWorker(None, None, scheduler=resources.llm_scheduler)
+            return SimpleNamespace()
+
+        app = create_app(settings, graph_factory=graph_factory)
+        with TestClient(app):
+            scheduler = app.state.llm_scheduler
+            assert scheduler is not None
+            assert app.state.resources.summary_worker.scheduler is scheduler
+            assert scheduler.max_concurrency == settings.llm.max_concurrency
+
+    def test_uses_preloaded_resources(self, tmp_path):
+        """测试传入的预加载资源不会被重新加载"""
+        settings = make_settings(tmp_path)
+        resources = load_resources(settings)
+        app = create_app(settings, resources)
+        with TestClient(app):
+            assert app.state.resources is resources
+
+    def test_forked_worker_builds_and_flushes_checkpointer(self, tmp_path):
+        """测试预加载不构建图，fork 出的 worker 自己构建检查点存储，退出时回写缓冲全部落盘"""
+        settings = make_settings(tmp_path)
+        path = tmp_path / "cp.db"
+
+        def graph_factory(resources):
+            saver = create_checkpointer(
+                CheckpointerSettings(sqlite_path=str(path), durability_mode="async")
+            )
+            return SimpleNamespace(checkpointer=saver, pid=os.getpid())
+
+        resources = load_resources(settings)
+        assert resources.graph is None
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                app = create_app(settings, resources, graph_factory=graph_factory)
+                with TestClient(app):
+                    graph = app.state.resources.graph
+                    assert graph.pid == os.getpid()
+                    write_history(graph.checkpointer, "t1", 3)
+                code = 0
+            finally:
+                os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert resources.graph is None
+        # async 模式会合并同一会话的连续写入，落盘的是最新检查点
+        saver = create_checkpointer(CheckpointerSettings(sqlite_path=str(path)))
+        latest = saver.get_tuple({"configurable": {"thread_id": "t1"}})
+        saver.close()
+        assert latest.checkpoint["channel_values"]["messages"] == ["msg-0", "msg-1", "msg-2"]
+
+
+class TestServe:
+    """测试多进程启动器"""
+
+    def test_prefork_workers_and_shutdown(self, tmp_path):
+        """测试主进程 fork 出多个 worker 共享监听套接字，SIGTERM 后全部退出"""
+        port = free_port()
+        proc = start_server(tmp_path, port)
+        try:
+            pids = set()
+            deadline = time.monotonic() + 30
+            while len(pids) < 2 and time.monotonic() < deadline:
+                try:
+                    response = httpx.get(f"http://127.0.0.1:{port}/health", headers={"Connection": "close"})
+                    pids.add(response.json()["pid"])
+                except httpx.TransportError:
+                    time.sleep(0.1)
+            assert len(pids) == 2
+            assert proc.pid not in pids
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            assert proc.wait(timeout=15) == 0
+
+    def test_prometheus_aggregates_workers(self, tmp_path):
+        """测试主进程的 /metrics 汇总各 worker 的快照"""
+        port, metrics_port = free_port(), free_port()
+        proc = start_server(
+            tmp_path,
+            port,
+            MONITORING_ENABLE_PROMETHEUS="true",
+            MONITORING_PROMETHEUS_PORT=str(metrics_port),
+            MONITORING_PROMETHEUS_FLUSH_INTERVAL="0.1",
+        )
+        try:
+            text = ""
+            deadline = time.monotonic() + 30
+            while 'queue="admission"' not in text and time.monotonic() < deadline:
+                try:
+                    text = httpx.get(f"http://127.0.0.1:{metrics_port}/metrics").text
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.2)
+            assert 'chatbot_queue_depth{queue="admission"} 0.0' in text
+            assert 'chatbot_pool_connections{pool="requests",state="in_use"} 0.0' in text
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            assert proc.wait(timeout=15) == 0
@@ -0,0 +1,131 @@
+"""
+测试 src/memory/bm25.py 中的 BM25 倒排索引
+"""
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+from config.settings import VectorStoreSettings
+from src.memory import BM25Index, tokenize
+
+DOCS = {
+    "a": "如何重置账户密码",
+    "b": "退货流程和退款时间说明",
+    "c": "型号 SKU-A12 的产品说明书",
+    "d": "忘记密码后通过邮箱找回",
+    "e": "发票开具与抬头修改",
+}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25"), flush_every=2, max_segments=3)
+    index.add(list(DOCS), list(DOCS.values()))
+    return index
+
+
+class TestTokenize:
+    """测试分词"""
+
+    def test_cjk_bigrams(self):
+        """测试中文切成二元组，单字保留"""
+        assert tokenize("重置密码") == ["重置", "置密", "密码"]
+        assert tokenize("和") == ["和"]
+
+    def test_ascii_codes(self):
+        """测试英文小写化，产品编号同时保留整体和各部分"""
+        assert tokenize("SKU-A12 Manual") == ["sku-a12", "sku", "a12", "manual"]
+
+
+class TestBM25Index:
+    """测试 BM25 检索和增量更新"""
+
+    def test_search(self, index):
+        """测试按 BM25 分数排序，只返回命中的文档"""
+        results = index.search("重置密码", k=5)
+        assert [doc_id for doc_id, _ in results] == ["a", "d"]
+        assert results[0][1] > results[1][1] > 0
+        assert [doc_id for doc_id, _ in index.search("a12")] == ["c"]
+        assert index.search("天气") == []
+
+    def test_update_and_delete(self, index):
+        """测试相同 ID 重新写入替换旧版本，删除后不再命中"""
+        index.add(["a"], ["发票邮寄地址"])
+        assert [doc_id for doc_id, _ in index.search("重置密码")] == ["d"]
+        assert {doc_id for doc_id, _ in index.search("发票")} == {"a", "e"}
+
+        assert index.delete(["e", "missing"]) == 1
+        assert [doc_id for doc_id, _ in index.search("发票")] == ["a"]
+        assert len(index) == 4
+
+    def test_persistence_and_merge(self, tmp_path, index):
+        """测试段数超过上限时合并，flush 后可以从磁盘重新打开"""
+        index.add(["f", "g", "h"], ["密码强度要求", "物流查询", "密码过期提醒"])
+        index.flush()
+        assert index.segment_count <= 3
+        expected = index.search("密码", k=10)
+
+        reopened = BM25Index(str(tmp_path / "bm25"))
+        assert len(reopened) == 8
+        assert reopened.search("密码", k=10) == pytest.approx(expected)
+
+    def test_tombstones_persist_and_optimize(self, tmp_path, index):
+        """测试删除标记写入 manifest，optimize 合并为一段并清除已删除文档"""
+        index.flush()
+        index.delete(["a"])
+        path = str(tmp_path / "bm25")
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            assert any(segment["deleted"] for segment in json.load(f)["segments"])
+        assert "a" not in {doc_id for doc_id, _ in BM25Index(path).search("密码")}
+
+        index.optimize()
+        assert index.segment_count == 1
+        assert len(BM25Index(path)) == 4
+        assert len([name for name in os.listdir(path) if name.endswith(".terms.npy")]) == 1
+
+    def test_search_during_writes(self):
+        """测试写入、删除和合并的同时检索，不抛异常且结果 ID 与文本对应"""
+        index = BM25Index(flush_every=8, max_segments=3)
+        errors = []
+        done = threading.Event()
+
+        def write():
+            for i in range(1500):
+                index.add([f"doc-{i}"], [f"密码 tag{i}"])
+                if i % 3 == 0:
+                    index.delete([f"doc-{i // 2}"])
+            done.set()
+
+        def search():
+            i = 0
+            try:
+                while not done.is_set():
+                    i = (i + 7) % 1500
+                    index.search("密码", k=5)
+                    for doc_id, _ in index.search(f"tag{i}", k=1):
+                        if doc_id != f"doc-{i}":
+                            errors.append((i, doc_id))
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=search) for _ in range(2)] + [threading.Thread(target=write)]
+        # 频繁切换线程，让检索更容易落在写入中途
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        assert errors == []
+
+    def test_from_settings(self, tmp_path):
+        """测试按配置读取目录和参数"""
+        settings = VectorStoreSettings(bm25_index_dir=str(tmp_path / "idx"), bm25_k1=1.5, bm25_b=0.5)
+        index = BM25Index.from_settings(settings)
+        assert (index.path, index.k1, index.b) == (str(tmp_path / "idx"), 1.5, 0.5)
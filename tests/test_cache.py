@@ -0,0 +1,78 @@
+"""
+测试 src/storage/cache.py 中的两级缓存
+"""
+import asyncio
+
+import pytest
+
+from config.settings import RedisSettings
+from src.storage import TwoTierCache
+
+
+def fake_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
+
+
+class TestTwoTierCache:
+    """测试进程内 LRU + Redis 两级缓存"""
+
+    @pytest.mark.asyncio
+    async def test_memory_roundtrip_returns_copy(self):
+        """测试命中返回新解码的对象，修改返回值不影响缓存"""
+        cache = TwoTierCache()
+        await cache.set("k", {"items": [1, 2]})
+        value, tier = await cache.get("k")
+        assert (value, tier) == ({"items": [1, 2]}, "memory")
+        value["items"].append(3)
+        assert (await cache.get("k"))[0] == {"items": [1, 2]}
+        assert await cache.get("missing") == (None, None)
+
+    @pytest.mark.asyncio
+    async def test_ttl_and_lru_eviction(self):
+        """测试过期和 LRU 淘汰"""
+        cache = TwoTierCache(max_entries=2)
+        await cache.set("short", 1, ttl=0.01)
+        await asyncio.sleep(0.02)
+        assert await cache.get("short") == (None, None)
+
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        await cache.get("a")
+        await cache.set("c", 3)
+        assert len(cache) == 2
+        assert (await cache.get("b"))[1] is None
+        assert (await cache.get("a"))[0] == 1
+
+    @pytest.mark.asyncio
+    async def test_redis_tier_shared_between_workers(self):
+        """测试 Redis 命中后回填进程内缓存，并保留剩余 TTL"""
+        redis = fake_redis()
+        first = TwoTierCache.from_settings(RedisSettings(cache_ttl=60), redis)
+        second = TwoTierCache(redis)
+        await first.set("k", "晴")
+        assert await redis.pttl("cache:k") > 59000
+
+        assert await second.get("k") == ("晴", "redis")
+        assert await second.get("k") == ("晴", "memory")
+
+        await second.delete("k")
+        assert await first.get("k") == ("晴", "memory")
+        assert await TwoTierCache(redis).get("k") == (None, None)
+
+    @pytest.mark.asyncio
+    async def test_redis_errors_fall_back_to_miss(self):
+        """测试 Redis 不可用时按未命中处理"""
+
+        class BrokenRedis:
+            def pipeline(self, transaction=False):
+                raise ConnectionError("connection refused")
+
+            async def set(self, *args, **kwargs):
+                raise ConnectionError("connection refused")
+
+        cache = TwoTierCache(BrokenRedis())
+        await cache.set("k", 1)
+        assert await cache.get("k") == (1, "memory")
+        assert await cache.get("other") == (None, None)
+        assert cache.redis_errors == 2
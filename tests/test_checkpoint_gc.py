@@ -0,0 +1,190 @@
+"""
+测试 src/graph/checkpoint_gc.py 中的后台检查点回收
+"""
+import threading
+import time
+
+from langgraph.checkpoint.base.id import uuid6
+
+from config.settings import CheckpointerSettings, RedisSettings
+from src.graph import CheckpointGC, DeltaSqliteSaver, create_checkpointer
+from src.graph.checkpoint_gc import checkpoint_timestamp
+from tests.test_checkpointer import make_checkpoint, write_history
+
+
+def count_rows(saver, table="checkpoints", thread_id=None):
+    sql = f"SELECT COUNT(*) FROM {table}"
+    if thread_id is None:
+        return saver.conn.execute(sql).fetchone()[0]
+    return saver.conn.execute(sql + " WHERE thread_id = ?", (thread_id,)).fetchone()[0]
+
+
+def make_saver(tmp_path, **kwargs):
+    kwargs.setdefault("base_interval", 4)
+    kwargs.setdefault("max_checkpoints", 5)
+    return DeltaSqliteSaver(str(tmp_path / "cp.db"), auto_compact=False, **kwargs)
+
+
+class TestCheckpointGC:
+    """测试后台检查点回收"""
+
+    def test_checkpoint_timestamp(self):
+        """测试从 uuid6 检查点 ID 解析时间"""
+        assert abs(checkpoint_timestamp(str(uuid6())) - time.time()) < 5
+        assert checkpoint_timestamp("not-a-uuid") is None
+
+    def test_prune_per_thread(self, tmp_path):
+        """测试按会话裁剪到 max_checkpoints，保留的历史仍可完整恢复"""
+        saver = make_saver(tmp_path)
+        for i in range(7):
+            write_history(saver, f"thread-{i}", 12)
+        gc = CheckpointGC(saver, batch_size=3, vacuum_pages=0)
+
+        assert gc.run_once() == 7 * 7
+        assert gc.rows_pruned == 49
+        for i in range(7):
+            assert count_rows(saver, thread_id=f"thread-{i}") == 5
+            latest = saver.get_tuple({"configurable": {"thread_id": f"thread-{i}"}})
+            assert latest.checkpoint["channel_values"]["messages"] == [f"msg-{s}" for s in range(12)]
+            history = list(saver.list({"configurable": {"thread_id": f"thread-{i}"}}))
+            assert history[-1].checkpoint["channel_values"]["step"] == 7
+        assert gc.run_once() == 0
+        saver.close()
+
+    def test_expire_idle_threads(self, tmp_path):
+        """测试闲置超过 TTL 的会话被整体删除，活跃会话只做裁剪"""
+        saver = make_saver(tmp_path)
+        config = write_history(saver, "idle", 30)
+        saver.put_writes(config, [("messages", "pending")], "task-1")
+        gc = CheckpointGC(saver, idle_ttl=60, batch_size=4, vacuum_pages=0)
+
+        # 尚未过期
+        gc.run_once()
+        assert count_rows(saver, thread_id="idle") == 5
+        assert gc.threads_expired == 0
+
+        gc.run_once(now=time.time() + 120)
+        assert count_rows(saver, thread_id="idle") == 0
+        assert count_rows(saver, "writes", thread_id="idle") == 0
+        assert gc.threads_expired == 1
+        assert saver.get_tuple({"configurable": {"thread_id": "idle"}}) is None
+
+        # 过期后继续对话：写入新的基线，不依赖已删除的父检查点
+        write_history(saver, "idle", 2)
+        latest = saver.get_tuple({"configurable": {"thread_id": "idle"}})
+        assert latest.checkpoint["channel_values"]["messages"] == ["msg-0", "msg-1"]
+        saver.close()
+
+    def test_expiring_thread_hidden_between_batches(self, tmp_path):
+        """测试分批过期期间读取看到空会话，期间的新写入不被删除"""
+        saver = make_saver(tmp_path, max_checkpoints=50)
+        config = write_history(saver, "idle", 30)
+        gc = CheckpointGC(saver, idle_ttl=60, batch_size=4, vacuum_pages=0)
+        seen = []
+
+        def between_batches(amount):
+            if not seen:
+                seen.append(saver.get_tuple({"configurable": {"thread_id": "idle"}}))
+                seen.append(list(saver.list({"configurable": {"thread_id": "idle"}})))
+                seen.append(saver.get_tuple(config))
+                # 客户端仍持有过期前的 config 继续对话：写入新的基线
+                saver.put(
+                    config,
+                    make_checkpoint({"messages": ["new"], "step": 0}, {"messages": 1, "step": 1}),
+                    {"source": "loop", "step": 0},
+                    {"messages": 1, "step": 1},
+                )
+
+        gc._budget.consume = between_batches
+        gc.run_once(now=time.time() + 120)
+
+        assert seen == [None, [], None]
+        assert gc.threads_expired == 1
+        assert count_rows(saver, thread_id="idle") == 1
+        latest = saver.get_tuple({"configurable": {"thread_id": "idle"}})
+        assert latest.checkpoint["channel_values"] == {"messages": ["new"], "step": 0}
+        assert saver._expiring == {}
+        saver.close()
+
+    def test_from_settings_idle_ttl(self, tmp_path):
+        """测试过期时间优先取 gc_idle_ttl_seconds，未设置时沿用 session_ttl"""
+        saver = make_saver(tmp_path)
+        settings = CheckpointerSettings(gc_idle_ttl_seconds=120)
+        assert CheckpointGC.from_settings(saver, settings).idle_ttl == 120
+        assert CheckpointGC.from_settings(saver, settings, RedisSettings(session_ttl=600)).idle_ttl == 120
+        assert CheckpointGC.from_settings(saver, CheckpointerSettings()).idle_ttl is None
+        assert (
+            CheckpointGC.from_settings(saver, CheckpointerSettings(), RedisSettings(session_ttl=600)).idle_ttl
+            == 600
+        )
+        saver.close()
+
+    def test_incremental_vacuum(self, tmp_path):
+        """测试 incremental_vacuum 归还空闲页并记录回收字节数"""
+        saver = make_saver(tmp_path, max_checkpoints=1)
+        for i in range(20):
+            write_history(saver, f"thread-{i}", 40)
+        pages_before = saver.conn.execute("PRAGMA page_count").fetchone()[0]
+        gc = CheckpointGC(saver, vacuum_pages=100_000)
+
+        gc.run_once()
+        assert gc.bytes_reclaimed > 0
+        assert saver.conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+        assert saver.conn.execute("PRAGMA page_count").fetchone()[0] < pages_before
+        saver.close()
+
+    def test_io_budget(self, tmp_path):
+        """测试 I/O 预算限制回收速率"""
+        saver = make_saver(tmp_path, max_checkpoints=1)
+        for i in range(4):
+            write_history(saver, f"thread-{i}", 21)
+        gc = CheckpointGC(saver, max_rows_per_second=100, vacuum_pages=0)
+
+        start = time.monotonic()
+        assert gc.run_once() == 80
+        # 桶容量 100 行：首轮不需要等待，第二轮透支约 80 行，需要等待约 0.8 秒
+        assert time.monotonic() - start < 0.5
+        write_history(saver, "thread-x", 101)
+        start = time.monotonic()
+        assert gc.run_once() == 100
+        assert time.monotonic() - start >= 0.5
+        saver.close()
+
+    def test_yields_to_foreground(self, tmp_path):
+        """测试前台持有存储锁时 GC 等待，不抢占写入"""
+        saver = make_saver(tmp_path)
+        write_history(saver, "thread-1", 12)
+        gc = CheckpointGC(saver, vacuum_pages=0)
+
+        saver.lock.acquire()
+        worker = threading.Thread(target=gc.run_once)
+        worker.start()
+        time.sleep(0.05)
+        assert count_rows(saver) == 12
+        saver.lock.release()
+        worker.join()
+        assert count_rows(saver) == 5
+        saver.close()
+
+    def test_background_thread(self, tmp_path):
+        """测试工厂启用 GC：关闭写入路径裁剪，后台线程按配置回收"""
+        saver = create_checkpointer(
+            CheckpointerSettings(
+                sqlite_path=str(tmp_path / "cp.db"),
+                max_checkpoints=3,
+                gc_enabled=True,
+                gc_interval_seconds=0.01,
+            ),
+            RedisSettings(session_ttl=600),
+        )
+        assert saver.auto_compact is False
+        assert isinstance(saver.gc, CheckpointGC)
+        assert saver.gc.idle_ttl == 600
+
+        write_history(saver, "thread-1", 10)
+        deadline = time.monotonic() + 5
+        while count_rows(saver) > 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert count_rows(saver) == 3
+        saver.close()
+        assert saver.gc.runs > 0
@@ -0,0 +1,526 @@
+"""
+测试 src/graph 中的检查点存储
+"""
+import operator
+import time
+from typing import Annotated, List, TypedDict
+
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.base.id import uuid6
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+
+from config.settings import CheckpointerSettings, RedisSettings
+from src.graph import (
+    CompactSerializer,
+    DeltaSqliteSaver,
+    RedisSaver,
+    WriteBehindSaver,
+    create_checkpointer,
+)
+
+
+def make_checkpoint(values, versions):
+    checkpoint = empty_checkpoint()
+    checkpoint["id"] = str(uuid6())
+    checkpoint["channel_values"] = values
+    checkpoint["channel_versions"] = versions
+    return checkpoint
+
+
+def write_history(saver, thread_id, steps):
+    """写入 steps 个检查点，messages 每步追加一条，返回最后的 config"""
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    messages = []
+    for step in range(steps):
+        messages = messages + [f"msg-{step}"]
+        checkpoint = make_checkpoint(
+            {"messages": messages, "step": step}, {"messages": step + 1, "step": step + 1}
+        )
+        config = saver.put(
+            config, checkpoint, {"source": "loop", "step": step}, {"messages": step + 1, "step": step + 1}
+        )
+    return config
+
+
+class ChatState(TypedDict):
+    messages: Annotated[List[str], operator.add]
+    turns: int
+
+
+def build_graph(checkpointer):
+    def reply(state: ChatState):
+        return {"messages": [f"echo: {state['messages'][-1]}"], "turns": state.get("turns", 0) + 1}
+
+    builder = StateGraph(ChatState)
+    builder.add_node("reply", reply)
+    builder.add_edge(START, "reply")
+    builder.add_edge("reply", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def make_redis_saver(**kwargs):
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    return RedisSaver(
+        fakeredis.FakeRedis(server=server),
+        fakeredis.FakeAsyncRedis(server=server),
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def saver():
+    saver = DeltaSqliteSaver(":memory:", base_interval=4, max_checkpoints=100)
+    yield saver
+    saver.close()
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def any_saver(request):
+    if request.param == "sqlite":
+        saver = DeltaSqliteSaver(":memory:", base_interval=4, max_checkpoints=100)
+        yield saver
+        saver.close()
+    else:
+        yield make_redis_saver(max_checkpoints=100, ttl=3600)
+
+
+class TestCheckpointSaverConformance:
+    """检查点存储通用行为测试（SQLite 和 Redis 实现共用）"""
+
+    def test_put_and_get_latest(self, any_saver):
+        """测试写入后读取最新检查点"""
+        config = write_history(any_saver, "t1", 10)
+        latest = any_saver.get_tuple({"configurable": {"thread_id": "t1"}})
+        assert latest.config == config
+        assert latest.checkpoint["channel_values"]["messages"] == [f"msg-{i}" for i in range(10)]
+        assert latest.checkpoint["channel_values"]["step"] == 9
+        assert latest.metadata["step"] == 9
+        assert latest.parent_config["configurable"]["checkpoint_id"] is not None
+
+    def test_get_specific_checkpoint(self, any_saver):
+        """测试按 checkpoint_id 读取历史检查点"""
+        write_history(any_saver, "t1", 10)
+        history = list(any_saver.list({"configurable": {"thread_id": "t1"}}))
+        assert len(history) == 10
+        third = any_saver.get_tuple(history[-3].config)
+        assert third.checkpoint["channel_values"]["messages"] == ["msg-0", "msg-1", "msg-2"]
+
+    def test_missing_thread(self, any_saver):
+        """测试不存在的会话返回 None"""
+        assert any_saver.get_tuple({"configurable": {"thread_id": "nope"}}) is None
+
+    def test_list_before_limit_filter(self, any_saver):
+        """测试 list 的 before、limit 和 filter"""
+        write_history(any_saver, "t1", 6)
+        history = list(any_saver.list({"configurable": {"thread_id": "t1"}}))
+        assert [h.metadata["step"] for h in history] == [5, 4, 3, 2, 1, 0]
+
+        limited = list(any_saver.list({"configurable": {"thread_id": "t1"}}, before=history[1].config, limit=2))
+        assert [h.metadata["step"] for h in limited] == [3, 2]
+
+        filtered = list(any_saver.list({"configurable": {"thread_id": "t1"}}, filter={"step": 4}))
+        assert [h.metadata["step"] for h in filtered] == [4]
+
+    def test_put_writes(self, any_saver):
+        """测试 pending writes 随检查点返回"""
+        config = write_history(any_saver, "t1", 2)
+        any_saver.put_writes(config, [("messages", "pending"), ("step", 99)], task_id="task-1")
+        latest = any_saver.get_tuple(config)
+        assert latest.pending_writes == [("task-1", "messages", "pending"), ("task-1", "step", 99)]
+
+    def test_delete_thread(self, any_saver):
+        """测试删除会话"""
+        write_history(any_saver, "t1", 3)
+        write_history(any_saver, "t2", 3)
+        any_saver.delete_thread("t1")
+        assert any_saver.get_tuple({"configurable": {"thread_id": "t1"}}) is None
+        assert any_saver.get_tuple({"configurable": {"thread_id": "t2"}}) is not None
+
+    def test_graph_roundtrip_matches_memory_saver(self, any_saver):
+        """测试真实 LangGraph 图多轮运行结果与 InMemorySaver 一致"""
+        expected_graph = build_graph(InMemorySaver())
+        graph = build_graph(any_saver)
+        config = {"configurable": {"thread_id": "chat"}}
+        for i in range(6):
+            expected = expected_graph.invoke({"messages": [f"hi {i}"]}, config)
+            actual = graph.invoke({"messages": [f"hi {i}"]}, config)
+            assert actual == expected
+        assert graph.get_state(config).values == expected_graph.get_state(config).values
+
+    @pytest.mark.asyncio
+    async def test_async_api(self, any_saver):
+        """测试异步接口"""
+        config = write_history(any_saver, "t1", 3)
+        latest = await any_saver.aget_tuple(config)
+        assert latest.checkpoint["channel_values"]["messages"] == ["msg-0", "msg-1", "msg-2"]
+        items = [item async for item in any_saver.alist({"configurable": {"thread_id": "t1"}}, limit=2)]
+        assert len(items) == 2
+
+
+class TestDeltaSqliteSaver:
+    """测试增量存储和压缩"""
+
+    def test_deltas_store_only_appended_messages(self, saver):
+        """测试增量只保存新追加的消息，并按 base_interval 写入基线"""
+        write_history(saver, "t1", 9)
+        rows = saver.conn.execute(
+            "SELECT kind, depth, length(checkpoint) FROM checkpoints ORDER BY checkpoint_id"
+        ).fetchall()
+        assert [r[0] for r in rows] == [0, 1, 1, 1, 0, 1, 1, 1, 0]
+        assert [r[1] for r in rows] == [0, 1, 2, 3, 0, 1, 2, 3, 0]
+        # 增量大小与历史长度无关，基线随历史增长
+        assert rows[7][2] == rows[3][2]
+        assert rows[8][2] > rows[4][2]
+
+    def test_restore_after_restart(self, tmp_path):
+        """测试重新打开数据库后从增量链恢复并继续写入增量"""
+        path = str(tmp_path / "cp.db")
+        saver = DeltaSqliteSaver(path, base_interval=50)
+        config = write_history(saver, "t1", 5)
+        saver.close()
+
+        saver = DeltaSqliteSaver(path, base_interval=50)
+        latest = saver.get_tuple(config)
+        assert latest.checkpoint["channel_values"]["messages"] == [f"msg-{i}" for i in range(5)]
+
+        messages = latest.checkpoint["channel_values"]["messages"] + ["msg-5"]
+        saver.put(config, make_checkpoint({"messages": messages, "step": 5}, {}), {}, {"messages": 6, "step": 6})
+        kinds = [r[0] for r in saver.conn.execute("SELECT kind FROM checkpoints ORDER BY checkpoint_id")]
+        assert kinds == [0, 1, 1, 1, 1, 1]
+        assert saver.get_tuple({"configurable": {"thread_id": "t1"}}).checkpoint["channel_values"]["messages"] == messages
+        saver.close()
+
+    def test_non_append_change_and_delete(self, saver):
+        """测试非追加修改和键删除"""
+        config = {"configurable": {"thread_id": "t1", "checkpoint_ns": ""}}
+        config = saver.put(config, make_checkpoint({"messages": ["a", "b"], "intent": "chat"}, {}), {}, {"messages": 1, "intent": 1})
+        config = saver.put(config, make_checkpoint({"messages": ["x"]}, {}), {}, {"messages": 2})
+        values = saver.get_tuple(config).checkpoint["channel_values"]
+        assert values == {"messages": ["x"]}
+
+    def test_compact_keeps_max_checkpoints(self):
+        """测试压缩保留最新 max_checkpoints 个检查点并折叠为新基线"""
+        saver = DeltaSqliteSaver(":memory:", base_interval=100, max_checkpoints=5, auto_compact=False)
+        write_history(saver, "t1", 12)
+        write_history(saver, "t2", 3)
+        assert saver.compact("t1") == 7
+
+        history = list(saver.list({"configurable": {"thread_id": "t1"}}))
+        assert [h.metadata["step"] for h in history] == [11, 10, 9, 8, 7]
+        assert history[-1].checkpoint["channel_values"]["messages"] == [f"msg-{i}" for i in range(8)]
+        assert history[0].checkpoint["channel_values"]["messages"] == [f"msg-{i}" for i in range(12)]
+        kinds = [r[0] for r in saver.conn.execute(
+            "SELECT kind FROM checkpoints WHERE thread_id = 't1' ORDER BY checkpoint_id")]
+        assert kinds == [0, 1, 1, 1, 1]
+        assert len(list(saver.list({"configurable": {"thread_id": "t2"}}))) == 3
+        saver.close()
+
+    def test_auto_compact_bounds_history(self):
+        """测试写入路径上的自动压缩让历史保持在 2 * max_checkpoints 以内"""
+        saver = DeltaSqliteSaver(":memory:", base_interval=100, max_checkpoints=4)
+        write_history(saver, "t1", 30)
+        count = saver.conn.execute("SELECT count(*) FROM checkpoints").fetchone()[0]
+        assert 4 <= count < 8
+        latest = saver.get_tuple({"configurable": {"thread_id": "t1"}})
+        assert latest.checkpoint["channel_values"]["messages"] == [f"msg-{i}" for i in range(30)]
+        saver.close()
+
+    def test_compact_counters_bounded(self):
+        """测试压缩计数在压缩后删除，且最多保留 cache_size 个会话"""
+        saver = DeltaSqliteSaver(":memory:", base_interval=100, max_checkpoints=4, cache_size=3)
+        write_history(saver, "t1", 4)
+        assert ("t1", "") not in saver._puts_since_compact
+        for i in range(10):
+            write_history(saver, f"other-{i}", 1)
+        assert list(saver._puts_since_compact) == [(f"other-{i}", "") for i in range(7, 10)]
+        saver.close()
+
+
+class TestRedisSaver:
+    """测试 Redis 检查点存储的服务端裁剪、TTL 和往返次数"""
+
+    def test_trim_to_max_checkpoints(self):
+        """测试 Lua 脚本在服务端裁剪旧检查点及其 writes"""
+        saver = make_redis_saver(max_checkpoints=3)
+        config = write_history(saver, "t1", 2)
+        saver.put_writes(config, [("messages", "old")], task_id="task-1")
+        write_history(saver, "t1", 6)
+        history = list(saver.list({"configurable": {"thread_id": "t1"}}))
+        assert len(history) == 3
+        assert saver.client.zcard(saver._index_key("t1", "")) == 3
+        assert not saver.client.exists(saver._writes_prefix("t1", "") + config["configurable"]["checkpoint_id"])
+        assert len(saver.client.keys(saver._cp_prefix("t1", "") + "*")) == 3
+
+    def test_thread_keys_share_slot(self):
+        """测试同一会话的全部键落在同一集群 slot，指定 ID 读取时键均在 KEYS 中声明"""
+        from redis.crc import key_slot
+
+        saver = make_redis_saver(max_checkpoints=3)
+        config = write_history(saver, "t1", 5)
+        saver.put_writes(config, [("messages", "x")], task_id="task-1")
+        keys = saver.client.keys("checkpoint:*")
+        assert len(keys) > 3
+        assert len({key_slot(key) for key in keys}) == 1
+
+        script_keys, args = saver._get_script_args(config)
+        assert args == [config["configurable"]["checkpoint_id"]]
+        assert {key_slot(key.encode()) for key in script_keys} == {key_slot(keys[0])}
+        item = saver.get_tuple(config)
+        assert item.pending_writes == [("task-1", "messages", "x")]
+
+        with pytest.raises(ValueError):
+            make_redis_saver(key_prefix="cp:{app}")
+
+    def test_ttl_applied(self):
+        """测试键按 ttl 设置过期时间"""
+        saver = make_redis_saver(ttl=120)
+        config = write_history(saver, "t1", 1)
+        saver.put_writes(config, [("messages", "x")], task_id="task-1")
+        for key in saver.client.keys("checkpoint:*"):
+            assert 0 < saver.client.ttl(key) <= 120
+
+    def test_put_is_single_round_trip(self, monkeypatch):
+        """测试每次 put 只执行一次 pipeline"""
+        saver = make_redis_saver(max_checkpoints=5)
+        write_history(saver, "t1", 1)
+        calls = []
+        original = type(saver.client.pipeline()).execute
+
+        def counting_execute(pipe, *args, **kwargs):
+            calls.append(len(pipe.command_stack))
+            return original(pipe, *args, **kwargs)
+
+        monkeypatch.setattr(type(saver.client.pipeline()), "execute", counting_execute)
+        write_history(saver, "t2", 3)
+        assert len(calls) == 3
+
+    def test_recovers_from_script_flush(self):
+        """测试服务端脚本缓存被清空后自动重新加载"""
+        saver = make_redis_saver(max_checkpoints=2)
+        write_history(saver, "t1", 2)
+        saver.client.script_flush()
+        write_history(saver, "t1", 3)
+        assert len(list(saver.list({"configurable": {"thread_id": "t1"}}))) == 2
+
+    @pytest.mark.asyncio
+    async def test_async_put_and_delete(self):
+        """测试异步写入、裁剪和删除"""
+        saver = make_redis_saver(max_checkpoints=2)
+        config = {"configurable": {"thread_id": "t1", "checkpoint_ns": ""}}
+        for step in range(4):
+            checkpoint = make_checkpoint({"messages": [f"m{step}"]}, {"messages": step + 1})
+            config = await saver.aput(config, checkpoint, {"step": step}, {"messages": step + 1})
+        await saver.aput_writes(config, [("messages", "w")], task_id="task-1")
+        latest = await saver.aget_tuple({"configurable": {"thread_id": "t1"}})
+        assert latest.metadata["step"] == 3
+        assert latest.pending_writes == [("task-1", "messages", "w")]
+        assert len([i async for i in saver.alist({"configurable": {"thread_id": "t1"}})]) == 2
+        await saver.adelete_thread("t1")
+        assert await saver.aget_tuple({"configurable": {"thread_id": "t1"}}) is None
+        assert await saver.aclient.keys("*") == []
+
+
+class SlowSaver(DeltaSqliteSaver):
+    """每次 put 人为增加延迟并计数的存储"""
+
+    def __init__(self, delay=0.05, **kwargs):
+        super().__init__(":memory:", **kwargs)
+        self.delay = delay
+        self.put_calls = 0
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        time.sleep(self.delay)
+        self.put_calls += 1
+        return super().put(config, checkpoint, metadata, new_versions)
+
+
+class TestWriteBehindSaver:
+    """测试异步回写检查点存储"""
+
+    def test_async_put_acks_immediately_and_reads_own_writes(self):
+        """测试 put 立即返回，且同进程读取能看到尚未落盘的状态"""
+        inner = SlowSaver(delay=0.2)
+        saver = WriteBehindSaver(inner, durability="async", linger=0)
+        start = time.perf_counter()
+        config = write_history(saver, "t1", 3)
+        assert time.perf_counter() - start < 0.2
+        latest = saver.get_tuple({"configurable": {"thread_id": "t1"}})
+        assert latest.config == config
+        assert latest.checkpoint["channel_values"]["messages"] == ["msg-0", "msg-1", "msg-2"]
+        saver.close()
+        assert inner.get_tuple({"configurable": {"thread_id": "t1"}}).config == config
+
+    def test_coalesces_steps_of_same_thread(self):
+        """测试同一会话的多步在刷写前合并为最新状态"""
+        inner = SlowSaver(delay=0.01)
+        saver = WriteBehindSaver(inner, durability="async", linger=0.5)
+        write_history(saver, "t1", 10)
+        saver.flush()
+        assert inner.put_calls == 1
+        assert saver.coalesced == 9
+        latest = inner.get_tuple({"configurable": {"thread_id": "t1"}})
+        assert latest.checkpoint["channel_values"]["messages"] == [f"msg-{i}" for i in range(10)]
+        saver.close()
+
+    def test_parent_points_to_last_persisted_checkpoint(self):
+        """测试合并后父指针指向上一次真正落盘的检查点"""
+        inner = SlowSaver(delay=0)
+        saver = WriteBehindSaver(inner, durability="async", linger=0)
+        first = write_history(saver, "t1", 1)
+        saver.flush()
+        config = first
+        for step in range(1, 4):
+            checkpoint = make_checkpoint({"messages": [f"msg-{i}" for i in range(step + 1)]}, {})
+            config = saver.put(config, checkpoint, {"step": step}, {"messages": step + 1})
+        saver.flush()
+        history = list(inner.list({"configurable": {"thread_id": "t1"}}))
+        assert history[0].parent_config["configurable"]["checkpoint_id"] == first["configurable"]["checkpoint_id"]
+        saver.close()
+
+    def test_fork_keeps_own_parent(self):
+        """测试从旧检查点 fork（update_state）后父指针仍指向被 fork 的检查点"""
+
+        def fork_and_resume(checkpointer, flush):
+            graph = build_graph(checkpointer)
+            config = {"configurable": {"thread_id": "chat"}}
+            for i in range(3):
+                graph.invoke({"messages": [f"hi {i}"]}, config)
+                flush()
+            first_turn = next(
+                s
+                for s in graph.get_state_history(config)
+                if s.metadata["source"] == "loop" and s.values["messages"] == ["hi 0", "echo: hi 0"]
+            )
+            forked = graph.update_state(first_turn.config, {"messages": ["forked"]})
+            flush()
+            return first_turn.config, forked, graph.invoke({"messages": ["again"]}, forked)["messages"]
+
+        saver = WriteBehindSaver(SlowSaver(delay=0), durability="async", linger=0.05)
+        first_turn, forked, messages = fork_and_resume(saver, saver.flush)
+        _, _, expected = fork_and_resume(InMemorySaver(), lambda: None)
+        assert messages == expected == ["hi 0", "echo: hi 0", "forked", "again", "echo: again"]
+        stored = saver.inner.get_tuple(forked)
+        assert stored.parent_config["configurable"]["checkpoint_id"] == first_turn["configurable"]["checkpoint_id"]
+        # 会话全部落盘后不再保留代数记录
+        saver.flush()
+        assert saver._generation == {} and saver._flushed_generation == {}
+        saver.close()
+
+    def test_first_flush_skips_coalesced_parent(self):
+        """测试首次刷写时父检查点已被合并掉，父指针改为它的父检查点（这里为空）"""
+        inner = SlowSaver(delay=0)
+        saver = WriteBehindSaver(inner, durability="async", linger=10)
+        write_history(saver, "t1", 3)
+        saver.flush()
+        assert inner.get_tuple({"configurable": {"thread_id": "t1"}}).parent_config is None
+        saver.close()
+
+    def test_interval_mode_syncs_every_n_steps(self):
+        """测试 interval 模式每 N 步同步落盘一次"""
+        inner = SlowSaver(delay=0)
+        saver = WriteBehindSaver(inner, durability="interval", sync_every=3, linger=10)
+        config = write_history(saver, "t1", 3)
+        assert inner.get_tuple({"configurable": {"thread_id": "t1"}}).config == config
+        write_history(saver, "t1", 1)
+        saver.close()
+
+    def test_sync_mode_passthrough(self):
+        """测试 sync 模式直接写入底层存储"""
+        inner = SlowSaver(delay=0)
+        saver = WriteBehindSaver(inner, durability="sync")
+        config = write_history(saver, "t1", 2)
+        assert inner.put_calls == 2
+        assert inner.get_tuple({"configurable": {"thread_id": "t1"}}).config == config
+
+    def test_pending_writes_visible_and_flushed(self):
+        """测试 pending writes 的读己之写和落盘"""
+        inner = SlowSaver(delay=0)
+        saver = WriteBehindSaver(inner, durability="async", linger=10)
+        config = write_history(saver, "t1", 1)
+        saver.put_writes(config, [("messages", "w")], task_id="task-1")
+        assert saver.get_tuple(config).pending_writes == [("task-1", "messages", "w")]
+        saver.close()
+        assert inner.get_tuple(config).pending_writes == [("task-1", "messages", "w")]
+
+    def test_backpressure_when_buffer_full(self):
+        """测试缓冲满时 put 等待刷写而不是无限增长"""
+        inner = SlowSaver(delay=0.01)
+        saver = WriteBehindSaver(inner, durability="async", max_pending=2, linger=0)
+        for i in range(6):
+            write_history(saver, f"t{i}", 1)
+        saver.close()
+        for i in range(6):
+            assert inner.get_tuple({"configurable": {"thread_id": f"t{i}"}}) is not None
+
+    def test_graph_roundtrip(self):
+        """测试真实 LangGraph 图在异步回写下多轮运行结果正确"""
+        expected_graph = build_graph(InMemorySaver())
+        saver = WriteBehindSaver(SlowSaver(delay=0.001), durability="async", linger=0.01)
+        graph = build_graph(saver)
+        config = {"configurable": {"thread_id": "chat"}}
+        for i in range(5):
+            assert graph.invoke({"messages": [f"hi {i}"]}, config) == expected_graph.invoke(
+                {"messages": [f"hi {i}"]}, config
+            )
+        saver.close()
+        assert saver.inner.get_tuple(config).checkpoint["channel_values"]["turns"] == 5
+
+    @pytest.mark.asyncio
+    async def test_async_api(self):
+        """测试异步接口"""
+        saver = WriteBehindSaver(SlowSaver(delay=0.2), durability="async", linger=0)
+        config = {"configurable": {"thread_id": "t1", "checkpoint_ns": ""}}
+        start = time.perf_counter()
+        config = await saver.aput(config, make_checkpoint({"messages": ["a"]}, {}), {}, {"messages": 1})
+        assert time.perf_counter() - start < 0.1
+        assert (await saver.aget_tuple(config)).checkpoint["channel_values"] == {"messages": ["a"]}
+        await saver.aflush()
+        assert saver.inner.get_tuple(config) is not None
+        saver.close()
+
+
+class TestCreateCheckpointer:
+    """测试检查点工厂"""
+
+    def test_create_by_type(self, tmp_path):
+        """测试按类型创建"""
+        assert isinstance(create_checkpointer(CheckpointerSettings(checkpointer_type="memory")), InMemorySaver)
+        saver = create_checkpointer(
+            CheckpointerSettings(sqlite_path=str(tmp_path / "cp.db"), base_interval=3, max_checkpoints=7)
+        )
+        assert isinstance(saver, DeltaSqliteSaver)
+        assert isinstance(saver.serde, CompactSerializer)
+        assert saver.base_interval == 3
+        assert saver.max_checkpoints == 7
+        saver.close()
+
+    def test_wraps_write_behind(self, tmp_path):
+        """测试非 sync 持久化模式外层包装 WriteBehindSaver，interval 步长取 save_interval"""
+        saver = create_checkpointer(
+            CheckpointerSettings(
+                sqlite_path=str(tmp_path / "cp.db"), durability_mode="interval", save_interval=4
+            )
+        )
+        assert isinstance(saver, WriteBehindSaver)
+        assert isinstance(saver.inner, DeltaSqliteSaver)
+        assert saver.sync_every == 4
+        saver.close()
+
+    def test_create_redis(self):
+        """测试 redis 类型复用 RedisSettings 的连接池和 TTL"""
+        saver = create_checkpointer(
+            CheckpointerSettings(checkpointer_type="redis", max_checkpoints=4),
+            RedisSettings(max_connections=7, session_ttl=600),
+        )
+        assert isinstance(saver, RedisSaver)
+        assert saver.max_checkpoints == 4
+        assert saver.ttl == 600
+        assert saver.client.connection_pool.max_connections == 7
+
+    def test_redis_requires_settings(self):
+        """测试 redis 类型缺少 RedisSettings 时报错"""
+        with pytest.raises(ValueError):
+            create_checkpointer(CheckpointerSettings(checkpointer_type="redis"))
@@ -0,0 +1,80 @@
+"""
+测试 src/memory/context_packer.py 中的上下文打包
+"""
+import numpy as np
+from langchain_core.documents import Document
+
+from config.settings import LLMSettings, VectorStoreSettings
+from src.memory import ContextPacker, NumpyVectorStore, estimate_tokens
+from tests.test_vector_store import KeywordEmbeddings
+
+
+def chunk(text, source, index, doc_id=None):
+    return Document(page_content=text, metadata={"source": source, "chunk": index}, id=doc_id)
+
+
+class TestEstimateTokens:
+    """测试 token 估算"""
+
+    def test_mixed_text(self):
+        """测试汉字按 1 个、其他字符约 4 个 1 个计数"""
+        assert estimate_tokens("退货流程") == 4
+        assert estimate_tokens("abcdefgh") == 2
+        assert estimate_tokens("退货 policy，") == 2 + 2 + 1
+        assert estimate_tokens("") == 0
+
+
+class TestContextPacker:
+    """测试 MMR 选择与打包"""
+
+    def test_budget(self):
+        """测试总 token 数不超过预算，放不下的高分分块被跳过，继续选择更短的分块"""
+        packer = ContextPacker(10)
+        selected = packer.select([6, 8, 3, 2], [0.9, 0.8, 0.7, 0.1])
+        assert selected == [0, 2]
+        assert ContextPacker(0).select([1], [1.0]) == []
+
+    def test_mmr_penalizes_redundancy(self):
+        """测试与已选分块高度相似的分块被降权，近似重复直接跳过"""
+        vectors = np.array([[1.0, 0.0], [0.99, 0.14], [0.6, 0.8], [1.0, 0.0]])
+        packer = ContextPacker(100, mmr_lambda=0.5, duplicate_threshold=0.999)
+        # 第 1 个与第 0 个相似度约 0.99：相关度高但被惩罚；第 3 个与第 0 个完全相同被跳过
+        assert packer.select([1, 1, 1, 1], [1.0, 0.95, 0.7, 0.9], vectors) == [0, 2, 1]
+        assert ContextPacker(100, mmr_lambda=1.0, duplicate_threshold=1.0).select([1, 1, 1], [0.5, 0.9, 0.7], vectors[:3]) == [1, 2, 0]
+
+    def test_merge_adjacent_chunks(self):
+        """测试同一文档相邻分块合并并去掉重叠，引用记录来源和分块号"""
+        documents = [
+            chunk("第二段内容。第三段开头。", "a.md", 1),
+            chunk("其他文档的内容。", "b.md", 0),
+            chunk("第一段内容。第二段内容。", "a.md", 0),
+            chunk("第五段内容。", "a.md", 4),
+        ]
+        packed = ContextPacker(1000).pack(documents, [0.9, 0.8, 0.7, 0.6])
+
+        assert [(c.index, c.source, c.chunks) for c in packed.citations] == [
+            (1, "a.md", [0, 1]),
+            (2, "b.md", [0]),
+            (3, "a.md", [4]),
+        ]
+        assert packed.text.startswith("[1] 来源：a.md\n第一段内容。第二段内容。第三段开头。\n\n[2] 来源：b.md")
+        assert packed.tokens == estimate_tokens(packed.text)
+        assert packed.dropped == 0
+
+    def test_pack_with_store_vectors(self):
+        """测试使用向量存储中的向量去重，重复内容只保留一份"""
+        store = NumpyVectorStore(KeywordEmbeddings())
+        texts = ["北京天气晴", "北京天气晴朗", "股票大涨", "足球比赛"]
+        ids = store.add_texts(texts, [{"source": f"doc{i}.txt"} for i in range(4)])
+        documents = store.get_by_ids(ids)
+        packed = ContextPacker(1000).pack(documents, [0.9, 0.85, 0.8, 0.7], store.get_vectors(ids))
+        assert [c.source for c in packed.citations] == ["doc0.txt", "doc2.txt", "doc3.txt"]
+        assert packed.dropped == 1
+
+    def test_from_settings(self):
+        """测试预算由 max_tokens 和 context_budget_ratio 决定"""
+        packer = ContextPacker.from_settings(
+            VectorStoreSettings(context_budget_ratio=0.25, mmr_lambda=0.6, duplicate_threshold=0.9),
+            LLMSettings(max_tokens=2000),
+        )
+        assert (packer.token_budget, packer.mmr_lambda, packer.duplicate_threshold) == (500, 0.6, 0.9)
@@ -0,0 +1,143 @@
+"""
+测试 src/memory/embedding_cache.py 中的 Embedding 缓存服务
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from config.settings import VectorStoreSettings
+from src.memory import CachedEmbeddings
+
+
+class FakeEmbeddings(Embeddings):
+    """本地假 Embedding：记录每次调用的批次，可模拟延迟和失败"""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self.lock:
+            self.calls.append(list(texts))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("provider unavailable")
+        return [[float(len(text)), float(sum(map(ord, text)) % 97), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    @property
+    def embedded(self):
+        return [text for call in self.calls for text in call]
+
+
+@pytest.fixture
+def fake():
+    return FakeEmbeddings()
+
+
+class TestCachedEmbeddings:
+    """测试内容哈希缓存和批量合并"""
+
+    def test_dedupe_and_hit_rate(self, fake):
+        """测试同一文本只计算一次，命中率统计"""
+        cached = CachedEmbeddings(fake, "fake-model", batch_wait=0)
+        first = cached.embed_documents(["a", "bb", "a"])
+        assert first == fake.embed_documents(["a", "bb", "a"])
+        fake.calls.clear()
+
+        assert cached.embed_documents(["bb", "ccc"])[0] == first[1]
+        assert fake.embedded == ["ccc"]
+        assert cached.embed_query("a") == first[0]
+        assert (cached.hits, cached.misses) == (2, 3)
+        assert cached.hit_rate == pytest.approx(2 / 5)
+        cached.close()
+
+    def test_model_in_key(self, fake):
+        """测试模型名参与缓存键"""
+        a = CachedEmbeddings(fake, "model-a", batch_wait=0)
+        b = CachedEmbeddings(fake, "model-b", batch_wait=0)
+        a.embed_query("hello")
+        b.embed_query("hello")
+        assert fake.embedded == ["hello", "hello"]
+        a.close()
+        b.close()
+
+    def test_persistent_cache(self, fake, tmp_path):
+        """测试 SQLite 持久化缓存在重启后命中"""
+        path = str(tmp_path / "cache.db")
+        cached = CachedEmbeddings(fake, "fake-model", path, batch_wait=0)
+        vectors = cached.embed_documents(["x", "y"])
+        cached.close()
+
+        fake.calls.clear()
+        reopened = CachedEmbeddings(fake, "fake-model", path, cache_size=1, batch_wait=0)
+        assert reopened.embed_documents(["x", "y"]) == vectors
+        assert fake.calls == []
+        assert reopened.disk_hits == 2
+        assert len(reopened._lru) == 1
+        reopened.close()
+
+    def test_coalesce_concurrent_misses(self):
+        """测试并发调用方的未命中合并为不超过 batch_size 的批次，重复文本只计算一次"""
+        fake = FakeEmbeddings(delay=0.01)
+        cached = CachedEmbeddings(fake, "fake-model", batch_size=8, batch_wait=0.05)
+        results = {}
+
+        def worker(i):
+            results[i] = cached.embed_documents([f"doc-{i}", "shared"])
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(12)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert sorted(fake.embedded) == sorted([f"doc-{i}" for i in range(12)] + ["shared"])
+        assert all(len(call) <= 8 for call in fake.calls)
+        assert len(fake.calls) == 2
+        assert results[3][1] == results[7][1]
+        cached.close()
+
+    def test_async_callers(self, fake):
+        """测试异步调用方同样参与合并"""
+        cached = CachedEmbeddings(fake, "fake-model", batch_wait=0.05)
+
+        async def main():
+            return await asyncio.gather(*(cached.aembed_query(f"q-{i}") for i in range(20)))
+
+        vectors = asyncio.run(main())
+        assert len(fake.calls) == 1
+        assert vectors[5] == fake.embed_query("q-5")
+        cached.close()
+
+    def test_provider_error(self):
+        """测试提供商报错传递给等待的调用方，失败的文本不进入缓存"""
+        fake = FakeEmbeddings(fail=True)
+        cached = CachedEmbeddings(fake, "fake-model", batch_wait=0)
+        with pytest.raises(RuntimeError):
+            cached.embed_query("boom")
+        fake.fail = False
+        assert cached.embed_query("boom") == fake.embed_query("boom")
+        cached.close()
+
+    def test_from_settings(self, fake, tmp_path):
+        """测试按配置创建，缓存键包含提供商和模型名"""
+        settings = VectorStoreSettings(
+            embedding_cache_path=str(tmp_path / "cache.db"),
+            embedding_cache_size=5,
+            embedding_batch_size=16,
+            embedding_batch_wait_ms=2,
+        )
+        cached = CachedEmbeddings.from_settings(settings, fake)
+        assert cached.model == "openai:text-embedding-3-small"
+        assert cached.cache_size == 5
+        assert cached.batch_size == 16
+        assert cached.batch_wait == pytest.approx(0.002)
+        cached.close()
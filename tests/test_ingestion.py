@@ -0,0 +1,141 @@
+"""
+测试 src/memory/ingestion.py 中的流式文档导入
+"""
+import json
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from config.settings import VectorStoreSettings
+from src.memory import BM25Index, IngestionPipeline, NumpyVectorStore, split_text
+
+
+TOPICS = ["退货", "发票", "物流", "密码", "会员", "优惠"]
+
+
+def write_corpus(root, sentences=40):
+    (root / "sub").mkdir(parents=True)
+    for i, topic in enumerate(TOPICS):
+        folder = root / "sub" if i % 2 else root
+        text = "".join(f"{topic}相关的第{j}条说明。" for j in range(sentences))
+        (folder / f"doc{i}.txt").write_text(text, encoding="utf-8")
+    # 与 doc0 内容完全相同，分块全部重复
+    (root / "copy.md").write_text((root / "doc0.txt").read_text(encoding="utf-8"), encoding="utf-8")
+    (root / "ignored.bin").write_text("不匹配的文件", encoding="utf-8")
+
+
+class FlakyEmbeddings(DeterministicFakeEmbedding):
+    """第 fail_at 次调用时抛出异常（模拟导入中途崩溃）"""
+
+    calls: int = 0
+    fail_at: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.calls == self.fail_at:
+            raise RuntimeError("embedding 服务不可用")
+        return super().embed_documents(texts)
+
+
+class TestSplitText:
+    """测试按句子切分"""
+
+    def test_chunk_size_and_overlap(self):
+        """测试分块不超过 chunk_size，相邻分块以完整句子重叠"""
+        text = "".join(f"第{i}句内容。" for i in range(100))
+        chunks = split_text(text, chunk_size=50, chunk_overlap=12)
+        assert all(len(chunk) <= 50 for chunk in chunks)
+        for previous, current in zip(chunks, chunks[1:]):
+            first_sentence = current.split("。")[0] + "。"
+            assert first_sentence in previous[-12:]
+        assert "".join(chunks).count("第99句内容。") >= 1
+
+    def test_long_sentence_hard_split(self):
+        """测试超长句子按字符硬切"""
+        chunks = split_text("字" * 250, chunk_size=100, chunk_overlap=0)
+        assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+        assert split_text("  \n ") == []
+
+
+class TestIngestionPipeline:
+    """测试导入流水线"""
+
+    @pytest.fixture
+    def corpus(self, tmp_path):
+        write_corpus(tmp_path / "kb")
+        return str(tmp_path / "kb")
+
+    def test_ingest_with_dedup_and_bm25(self, tmp_path, corpus):
+        """测试全部分块写入向量存储和 BM25，重复内容只写一次"""
+        store = NumpyVectorStore(DeterministicFakeEmbedding(size=16), str(tmp_path / "vectors"))
+        bm25 = BM25Index(str(tmp_path / "bm25"))
+        pipeline = IngestionPipeline(store, bm25=bm25, workers=0, chunk_size=120, chunk_overlap=20, batch_size=7)
+        stats = pipeline.run([corpus])
+
+        assert stats.files == 7
+        assert stats.duplicates == stats.chunks // 7
+        assert stats.upserted == len(store) == stats.chunks - stats.duplicates
+        assert len(bm25) == len(store)
+        doc_id, _ = bm25.search("发票说明")[0]
+        document = store.get_by_ids([doc_id])[0]
+        assert "发票相关" in document.page_content
+        assert document.metadata["source"].endswith("doc1.txt")
+        assert stats.chunks_per_second > 0 and stats.peak_rss_mb > 0
+
+    def test_resume_after_failure(self, tmp_path, corpus):
+        """测试中途失败后已完成的文件被记录，重新运行只导入剩余部分且不重复写入"""
+        progress = str(tmp_path / "progress.jsonl")
+        embedding = FlakyEmbeddings(size=16, fail_at=4)
+        store = NumpyVectorStore(embedding, str(tmp_path / "vectors"))
+        pipeline = IngestionPipeline(
+            store, progress_path=progress, workers=0, embed_workers=1, chunk_size=120, chunk_overlap=20, batch_size=8
+        )
+        with pytest.raises(RuntimeError):
+            pipeline.run([corpus])
+        with open(progress, encoding="utf-8") as f:
+            completed = [json.loads(line)["path"] for line in f]
+        assert 0 < len(completed) < 7
+
+        stats = pipeline.run([corpus])
+        assert stats.skipped_files == len(completed)
+        full = IngestionPipeline(
+            NumpyVectorStore(DeterministicFakeEmbedding(size=16)), workers=0, chunk_size=120, chunk_overlap=20
+        ).run([corpus])
+        assert len(store) == full.upserted
+        assert len({doc_id for doc_id, _, _ in store._docs}) == len(store)
+
+        # 全部完成后再运行不做任何事
+        assert pipeline.run([corpus]).skipped_files == 7
+
+    def test_reimport_without_progress_is_idempotent(self, tmp_path, corpus):
+        """测试没有进度文件时重复导入同一目录，已有分块不再计算 Embedding 或写入"""
+        embedding = FlakyEmbeddings(size=16)
+        store = NumpyVectorStore(embedding, str(tmp_path / "vectors"))
+        bm25 = BM25Index(str(tmp_path / "bm25"))
+        first = IngestionPipeline(store, bm25=bm25, workers=0, chunk_size=120, chunk_overlap=20).run([corpus])
+        calls = embedding.calls
+
+        reopened = NumpyVectorStore(embedding, str(tmp_path / "vectors"))
+        bm25 = BM25Index(str(tmp_path / "bm25"))
+        second = IngestionPipeline(reopened, bm25=bm25, workers=0, chunk_size=120, chunk_overlap=20).run([corpus])
+        assert second.upserted == 0
+        assert embedding.calls == calls
+        assert len(reopened) == reopened._count == first.upserted
+        assert len(bm25) == first.upserted and bm25.segment_count == 1
+
+    def test_process_pool(self, tmp_path, corpus):
+        """测试进程池切分与读取线程内切分结果一致"""
+        results = []
+        for workers in (0, 2):
+            store = NumpyVectorStore(DeterministicFakeEmbedding(size=16))
+            IngestionPipeline(store, workers=workers, chunk_size=120, chunk_overlap=20).run([corpus])
+            results.append(sorted(doc_id for doc_id, _, _ in store._docs))
+        assert results[0] == results[1]
+
+    def test_from_settings(self):
+        """测试按配置读取切分参数"""
+        settings = VectorStoreSettings(chunk_size=500, chunk_overlap=50, ingest_workers=0, ingest_queue_size=3)
+        pipeline = IngestionPipeline.from_settings(settings, NumpyVectorStore(DeterministicFakeEmbedding(size=4)))
+        assert (pipeline.chunk_size, pipeline.chunk_overlap, pipeline.workers, pipeline.queue_size) == (500, 50, 0, 3)
+        with pytest.raises(ValueError):
+            IngestionPipeline(NumpyVectorStore(DeterministicFakeEmbedding(size=4)), chunk_size=10, chunk_overlap=10)
@@ -0,0 +1,232 @@
+"""
+测试 src/utils/logger.py 中的非阻塞日志
+"""
+import io
+import logging
+import os
+import time
+
+import orjson
+import pytest
+
+from config.settings import LogSettings
+from src.utils import (
+    JsonFormatter,
+    LogPipeline,
+    RotatingFile,
+    get_pipeline,
+    parse_retention,
+    parse_rotation,
+    setup_logging,
+    shutdown_logging,
+)
+from src.utils import logger as logger_module
+
+
+def make_logger(pipeline, name="test.logger"):
+    logger = logging.getLogger(name)
+    logger.handlers = [pipeline.handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return logger
+
+
+class TestParse:
+    """测试轮转和保留策略的解析"""
+
+    def test_rotation(self):
+        """测试时间和大小两种轮转条件"""
+        assert parse_rotation("1 day") == ("time", 86400)
+        assert parse_rotation("12 hours") == ("time", 43200)
+        assert parse_rotation("100 MB") == ("size", 100 * 1024**2)
+        assert parse_rotation("512kb") == ("size", 512 * 1024)
+        with pytest.raises(ValueError):
+            parse_rotation("sometimes")
+
+    def test_retention(self):
+        """测试时间和文件数两种保留策略"""
+        assert parse_retention("30 days") == ("age", 30 * 86400)
+        assert parse_retention("10 files") == ("count", 10)
+        with pytest.raises(ValueError):
+            parse_retention("10 MB")
+
+
+class TestLogPipeline:
+    """测试队列 + 后台写线程"""
+
+    def test_writes_in_background(self):
+        """测试记录经写线程输出，消息参数在调用时渲染"""
+        stream = io.StringIO()
+        pipeline = LogPipeline(logging.Formatter("%(levelname)s %(message)s"), stream=stream)
+        pipeline.start()
+        logger = make_logger(pipeline)
+        items = [1]
+        logger.info("items=%s", items)
+        items.append(2)
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError:
+            logger.exception("失败")
+        pipeline.stop()
+        output = stream.getvalue()
+        assert "INFO items=[1]\n" in output
+        assert "ERROR 失败" in output and "RuntimeError: boom" in output
+        assert pipeline.written == 2
+
+    def test_drops_when_queue_full(self):
+        """测试队列满时丢弃而不阻塞，写线程补一条丢弃警告"""
+        stream = io.StringIO()
+        pipeline = LogPipeline(logging.Formatter("%(message)s"), stream=stream, queue_size=5)
+        logger = make_logger(pipeline)
+        start = time.perf_counter()
+        for i in range(20):
+            logger.info("msg %d", i)
+        assert time.perf_counter() - start < 0.5
+        assert pipeline.dropped == 15
+        pipeline.start()
+        pipeline.stop()
+        lines = stream.getvalue().splitlines()
+        assert lines[:5] == [f"msg {i}" for i in range(5)]
+        assert "丢弃 15 条" in lines[5]
+
+    def test_slow_sink_does_not_block_caller(self):
+        """测试输出很慢时调用方不被阻塞"""
+
+        class SlowStream(io.StringIO):
+            def write(self, text):
+                time.sleep(0.05)
+                return super().write(text)
+
+        stream = SlowStream()
+        pipeline = LogPipeline(logging.Formatter("%(message)s"), stream=stream)
+        pipeline.start()
+        logger = make_logger(pipeline)
+        start = time.perf_counter()
+        for i in range(100):
+            logger.info("msg %d", i)
+        assert time.perf_counter() - start < 0.05
+        pipeline.stop()
+        assert len(stream.getvalue().splitlines()) == 100
+
+    def test_json_format_includes_extra(self):
+        """测试 JSON 行格式包含 extra 字段"""
+        stream = io.StringIO()
+        pipeline = LogPipeline(JsonFormatter(), stream=stream)
+        pipeline.start()
+        logger = make_logger(pipeline)
+        logger.warning("请求 %s 完成", "abc", extra={"session_id": "s1", "duration_ms": 12.5})
+        pipeline.stop()
+        entry = orjson.loads(stream.getvalue())
+        assert entry["level"] == "WARNING"
+        assert entry["message"] == "请求 abc 完成"
+        assert entry["session_id"] == "s1"
+        assert entry["duration_ms"] == 12.5
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="需要 fork")
+    def test_restarts_writer_after_fork(self, tmp_path):
+        """测试 fork 出的子进程有自己的写线程，父进程的记录不会重复写出"""
+        path = tmp_path / "app.log"
+        pipeline = LogPipeline(
+            logging.Formatter("%(process)d %(message)s"),
+            file=RotatingFile(str(path), "100 MB", "10 files"),
+        )
+        pipeline.start()
+        logger = make_logger(pipeline, "test.fork")
+        logger.info("before fork")
+        pid = os.fork()
+        if pid == 0:
+            try:
+                logger.info("from child")
+                pipeline.stop()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        logger.info("from parent")
+        pipeline.stop()
+        lines = path.read_text(encoding="utf-8").splitlines()
+        assert sorted(line.split(" ", 1)[1] for line in lines) == [
+            "before fork",
+            "from child",
+            "from parent",
+        ]
+        assert f"{pid} from child" in lines
+
+    def test_fork_hooks_track_running_pipelines(self):
+        """测试 fork 钩子只作用于正在运行的管道，停止或回收的管道不再被引用"""
+        pipelines = [LogPipeline(logging.Formatter("%(message)s"), stream=io.StringIO()) for _ in range(3)]
+        for pipeline in pipelines:
+            pipeline.start()
+        assert all(pipeline in logger_module._running for pipeline in pipelines)
+        for pipeline in pipelines:
+            pipeline.stop()
+        assert not any(pipeline in logger_module._running for pipeline in pipelines)
+
+
+class TestRotatingFile:
+    """测试日志文件轮转和保留"""
+
+    def test_size_rotation_and_count_retention(self, tmp_path):
+        """测试按大小轮转，只保留最近 N 个轮转文件"""
+        path = tmp_path / "app.log"
+        file = RotatingFile(str(path), "1 KB", "2 files")
+        for i in range(5):
+            file.write("x" * 1100 + "\n")
+            time.sleep(0.01)
+        file.close()
+        rotated = [name for name in os.listdir(tmp_path) if name != "app.log"]
+        assert len(rotated) == 2
+        assert path.read_text() == ""
+
+    def test_time_rotation(self, tmp_path):
+        """测试到达周期边界时轮转，按时间清理过期文件"""
+        path = tmp_path / "app.log"
+        old = tmp_path / "app.log.20000101-000000"
+        old.write_text("old\n")
+        os.utime(old, (0, 0))
+        file = RotatingFile(str(path), "1 hour", "1 day")
+        file.write("first\n")
+        file._rollover_at = time.time() - 1
+        file.write("second\n")
+        file.close()
+        rotated = [name for name in os.listdir(tmp_path) if name != "app.log"]
+        assert len(rotated) == 1 and rotated[0] != old.name
+        assert (tmp_path / rotated[0]).read_text() == "first\nsecond\n"
+
+    def test_reopens_when_rotated_by_other_process(self, tmp_path):
+        """测试文件已被其他进程轮转时只重新打开，不覆盖对方的轮转结果"""
+        path = tmp_path / "app.log"
+        first = RotatingFile(str(path), "1 MB", "10 files")
+        second = RotatingFile(str(path), "1 MB", "10 files")
+        first.write("a\n")
+        first.rotate()
+        second.rotate()
+        second.write("b\n")
+        first.close()
+        second.close()
+        assert path.read_text() == "b\n"
+        assert len(os.listdir(tmp_path)) == 2
+
+
+class TestSetupLogging:
+    """测试按 LogSettings 配置根 logger"""
+
+    def test_configures_root_logger(self, tmp_path):
+        """测试替换根 logger 的处理器并写入日志文件"""
+        root = logging.getLogger()
+        handlers, level = root.handlers[:], root.level
+        settings = LogSettings(
+            level="WARNING", log_dir=str(tmp_path), log_file_name="chat.log", json_format=True
+        )
+        try:
+            pipeline = setup_logging(settings, console=False)
+            assert root.handlers == [pipeline.handler]
+            logging.getLogger("test.setup").info("ignored")
+            logging.getLogger("test.setup").warning("kept")
+            assert get_pipeline() is pipeline
+        finally:
+            shutdown_logging()
+            root.handlers = handlers
+            root.setLevel(level)
+        assert get_pipeline() is None
+        entries = [orjson.loads(line) for line in (tmp_path / "chat.log").read_text().splitlines()]
+        assert [entry["message"] for entry in entries] == ["kept"]
@@ -0,0 +1,168 @@
+"""
+测试 src/services/metrics_service.py 中的监控指标
+"""
+import os
+import subprocess
+import sys
+import urllib.request
+from uuid import uuid4
+
+import orjson
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from prometheus_client import CollectorRegistry, generate_latest
+
+from src.services import MetricsService, token_usage
+
+
+def exposition(service):
+    registry = CollectorRegistry(auto_describe=False)
+    registry.register(service)
+    return generate_latest(registry).decode()
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+class TestMetrics:
+    """测试指标定义、观测和导出"""
+
+    def test_histogram_buckets_and_exposition(self):
+        """测试直方图按 le 分桶，导出为累计计数"""
+        service = MetricsService()
+        child = service.node("retrieve")
+        for value in (0.003, 0.005, 0.2, 100.0):
+            child.observe(value)
+        text = exposition(service)
+        assert 'chatbot_graph_node_duration_seconds_bucket{le="0.005",node="retrieve"} 2.0' in text
+        assert 'chatbot_graph_node_duration_seconds_bucket{le="0.25",node="retrieve"} 3.0' in text
+        assert 'chatbot_graph_node_duration_seconds_bucket{le="+Inf",node="retrieve"} 4.0' in text
+        assert 'chatbot_graph_node_duration_seconds_count{node="retrieve"} 4.0' in text
+
+    def test_labels_are_prebound(self):
+        """测试同一组标签返回同一个子指标，标签数不对时报错"""
+        service = MetricsService()
+        assert service.llm_tokens.labels("openai", "input") is service.llm_tokens.labels("openai", "input")
+        with pytest.raises(ValueError):
+            service.llm_tokens.labels("openai")
+        with pytest.raises(ValueError):
+            service.counter("llm_tokens_total", "重复")
+
+    def test_tracked_functions_read_at_collect_time(self):
+        """测试 set_function 的指标在采集时读取"""
+        service = MetricsService()
+        state = {"hits": 0, "misses": 0, "queued": 0}
+        service.track_cache("embedding", lambda: state["hits"], lambda: state["misses"])
+        service.track_queue("admission", lambda: state["queued"])
+        state.update(hits=7, misses=3, queued=2)
+        text = exposition(service)
+        assert 'chatbot_cache_requests_total{cache="embedding",result="hit"} 7.0' in text
+        assert 'chatbot_cache_requests_total{cache="embedding",result="miss"} 3.0' in text
+        assert 'chatbot_queue_depth{queue="admission"} 2.0' in text
+
+    @pytest.mark.asyncio
+    async def test_time_node(self):
+        """测试节点装饰器记录同步和异步函数（包括抛出异常）的耗时"""
+        service = MetricsService()
+
+        @service.time_node("classify")
+        async def classify(state):
+            return {"intent": "chat"}
+
+        @service.time_node("build_prompt")
+        def build_prompt(state):
+            raise RuntimeError("boom")
+
+        assert await classify({}) == {"intent": "chat"}
+        with pytest.raises(RuntimeError):
+            build_prompt({})
+        assert classify.__name__ == "classify"
+        assert sum(service.node("classify").counts) == 1
+        assert sum(service.node("build_prompt").counts) == 1
+
+
+class TestLLMMetrics:
+    """测试 LLM 耗时和 token 用量"""
+
+    def test_token_usage(self):
+        """测试从 usage_metadata 和 llm_output 读取 token 用量"""
+        message = AIMessage(
+            "你好", usage_metadata={"input_tokens": 12, "output_tokens": 5, "total_tokens": 17}
+        )
+        assert token_usage(LLMResult(generations=[[ChatGeneration(message=message)]])) == (12, 5)
+        legacy = LLMResult(
+            generations=[[ChatGeneration(message=AIMessage("你好"))]],
+            llm_output={"token_usage": {"prompt_tokens": 8, "completion_tokens": 3}},
+        )
+        assert token_usage(legacy) == (8, 3)
+
+    def test_callback_handler(self):
+        """测试回调记录调用耗时和 token 数"""
+        service = MetricsService()
+        handler = service.llm_callback("openai")
+        run_id = uuid4()
+        handler.on_chat_model_start({}, [[]], run_id=run_id)
+        message = AIMessage("好", usage_metadata={"input_tokens": 10, "output_tokens": 2, "total_tokens": 12})
+        handler.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id)
+        handler.on_llm_start({}, ["x"], run_id=uuid4())
+        assert sum(service.llm_latency.labels("openai").counts) == 1
+        assert service.llm_tokens.labels("openai", "input").get() == 10
+        assert service.llm_tokens.labels("openai", "output").get() == 2
+
+
+class TestMultiprocess:
+    """测试多 worker 快照汇总"""
+
+    def test_aggregates_worker_snapshots(self, tmp_path):
+        """测试 Counter / Histogram 累加所有快照，Gauge 只累加存活的 worker"""
+        worker = MetricsService(multiprocess_dir=str(tmp_path))
+        worker.llm("openai").observe(0.5, 100, 20)
+        worker.queue_depth.labels("admission").set(3)
+        worker.write_snapshot()
+
+        exited = MetricsService()
+        exited.llm("openai").observe(2.0, 50, 10)
+        exited.queue_depth.labels("admission").set(9)
+        (tmp_path / f"{dead_pid()}.json").write_bytes(orjson.dumps(exited.snapshot()))
+
+        master = MetricsService(multiprocess_dir=str(tmp_path))
+        text = exposition(master)
+        assert 'chatbot_llm_tokens_total{direction="input",provider="openai"} 150.0' in text
+        assert 'chatbot_llm_request_duration_seconds_count{provider="openai"} 2.0' in text
+        assert 'chatbot_llm_request_duration_seconds_sum{provider="openai"} 2.5' in text
+        assert 'chatbot_queue_depth{queue="admission"} 3.0' in text
+
+    def test_reused_pid_keeps_counters(self, tmp_path):
+        """测试 pid 被复用时不覆盖已退出 worker 的快照，Counter 不回退；回收后的 Gauge 不再计入"""
+        first = MetricsService(multiprocess_dir=str(tmp_path))
+        first.llm("openai").observe(0.5, 100, 20)
+        first.queue_depth.labels("admission").set(9)
+        first.write_snapshot()
+        first.retire_worker(os.getpid())
+
+        # 同一 pid 上的新 worker
+        second = MetricsService(multiprocess_dir=str(tmp_path))
+        second.llm("openai").observe(0.5, 30, 5)
+        second.queue_depth.labels("admission").set(2)
+        second.write_snapshot()
+
+        master = MetricsService(multiprocess_dir=str(tmp_path))
+        text = exposition(master)
+        assert 'chatbot_llm_tokens_total{direction="input",provider="openai"} 130.0' in text
+        assert 'chatbot_queue_depth{queue="admission"} 2.0' in text
+
+    def test_http_server(self):
+        """测试 /metrics 导出"""
+        service = MetricsService()
+        service.cache_requests.labels("tool", "hit").inc(3)
+        server, thread = service.start_server(0, "127.0.0.1")
+        try:
+            url = f"http://127.0.0.1:{server.server_port}/metrics"
+            text = urllib.request.urlopen(url, timeout=5).read().decode()
+        finally:
+            server.shutdown()
+        assert 'chatbot_cache_requests_total{cache="tool",result="hit"} 3.0' in text
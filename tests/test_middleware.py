@@ -0,0 +1,169 @@
+"""
+测试 src/api/middleware.py 中的准入控制和请求体大小限制
+"""
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from src.api import AdmissionControlMiddleware, AdmissionController, Rejected, RequestPriority
+
+
+def deadline(seconds):
+    return asyncio.get_running_loop().time() + seconds
+
+
+def make_app(controller, *, request_timeout=10, max_request_size=None, delay=0.2):
+    app = FastAPI()
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        controller=controller,
+        request_timeout=request_timeout,
+        max_request_size=max_request_size,
+    )
+
+    @app.get("/api/chat")
+    async def chat():
+        await asyncio.sleep(delay)
+        return {"ok": True}
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+        return {"size": size}
+
+    return app
+
+
+def client_for(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+class TestAdmissionController:
+    """测试准入控制器"""
+
+    @pytest.mark.asyncio
+    async def test_priority_order(self):
+        """测试名额释放时交互请求先于先到的批处理请求"""
+        controller = AdmissionController(1, 10)
+        await controller.acquire(RequestPriority.INTERACTIVE, deadline(10))
+        order = []
+
+        async def request(priority):
+            await controller.acquire(priority, deadline(10))
+            order.append(priority)
+            controller.release()
+
+        batch = asyncio.create_task(request(RequestPriority.BATCH))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(request(RequestPriority.INTERACTIVE))
+        await asyncio.sleep(0)
+        assert controller.queued == 2
+        controller.release()
+        await asyncio.gather(batch, interactive)
+        assert order == [RequestPriority.INTERACTIVE, RequestPriority.BATCH]
+        assert controller.active == 0
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_deadline_cannot_be_met(self):
+        """测试预计排队加处理时间超过截止时间时立即拒绝"""
+        controller = AdmissionController(1, 10, initial_service_time=1.0)
+        await controller.acquire(RequestPriority.INTERACTIVE, deadline(10))
+        with pytest.raises(Rejected) as exc_info:
+            await controller.acquire(RequestPriority.INTERACTIVE, deadline(1.5))
+        assert exc_info.value.reason == "deadline"
+        assert exc_info.value.retry_after >= 1.0
+
+    @pytest.mark.asyncio
+    async def test_queued_request_expires(self):
+        """测试排队中的请求在剩余时间不足时被拒绝并移出队列"""
+        controller = AdmissionController(1, 10, initial_service_time=0.05)
+        await controller.acquire(RequestPriority.INTERACTIVE, deadline(10))
+        with pytest.raises(Rejected) as exc_info:
+            await controller.acquire(RequestPriority.INTERACTIVE, deadline(0.2))
+        assert exc_info.value.reason == "deadline"
+        assert controller.queued == 0
+        assert controller.stats()["rejected"] == {"deadline": 1}
+
+    @pytest.mark.asyncio
+    async def test_full_queue_sheds_lower_priority(self):
+        """测试队列已满时挤掉低优先级请求，同级请求被拒绝"""
+        controller = AdmissionController(1, 1)
+        await controller.acquire(RequestPriority.INTERACTIVE, deadline(10))
+        batch = asyncio.create_task(controller.acquire(RequestPriority.BATCH, deadline(10)))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(controller.acquire(RequestPriority.INTERACTIVE, deadline(10)))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as exc_info:
+            await batch
+        assert exc_info.value.reason == "shed"
+        with pytest.raises(Rejected) as exc_info:
+            await controller.acquire(RequestPriority.INTERACTIVE, deadline(10))
+        assert exc_info.value.reason == "queue_full"
+        controller.release()
+        await interactive
+        assert controller.active == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        """测试取消等待中的请求不占用名额"""
+        controller = AdmissionController(1, 10)
+        await controller.acquire(RequestPriority.INTERACTIVE, deadline(10))
+        waiter = asyncio.create_task(controller.acquire(RequestPriority.INTERACTIVE, deadline(10)))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        controller.release()
+        assert (controller.active, controller.queued) == (0, 0)
+
+
+class TestAdmissionControlMiddleware:
+    """测试中间件"""
+
+    @pytest.mark.asyncio
+    async def test_overload_returns_503_with_retry_after(self):
+        """测试名额和队列都满时返回 503 和 Retry-After"""
+        controller = AdmissionController(1, 0)
+        async with client_for(make_app(controller)) as client:
+            first, second = await asyncio.gather(
+                client.get("/api/chat"), client.get("/api/chat")
+            )
+        statuses = sorted([first.status_code, second.status_code])
+        assert statuses == [200, 503]
+        rejected = first if first.status_code == 503 else second
+        assert int(rejected.headers["Retry-After"]) >= 1
+        assert rejected.json()["reason"] == "queue_full"
+        assert controller.completed == 1
+
+    def test_classify(self):
+        """测试按路径前缀确定优先级"""
+        middleware = AdmissionControlMiddleware(None, None, request_timeout=10)
+        assert middleware.classify("/api/chat") == RequestPriority.INTERACTIVE
+        assert middleware.classify("/api/batch/jobs") == RequestPriority.BATCH
+        assert middleware.classify("/admin") == RequestPriority.ADMIN
+        assert middleware.classify("/administrator") == RequestPriority.INTERACTIVE
+
+    @pytest.mark.asyncio
+    async def test_content_length_over_limit(self):
+        """测试 Content-Length 超限时不读取请求体直接返回 413"""
+        async with client_for(make_app(None, max_request_size=100)) as client:
+            response = await client.post("/upload", content=b"x" * 101)
+            assert response.status_code == 413
+            response = await client.post("/upload", content=b"x" * 100)
+            assert response.json() == {"size": 100}
+
+    @pytest.mark.asyncio
+    async def test_streamed_body_over_limit(self):
+        """测试分块上传在读取过程中超限返回 413"""
+
+        async def chunks():
+            for _ in range(10):
+                yield b"x" * 40
+
+        async with client_for(make_app(None, max_request_size=100)) as client:
+            response = await client.post("/upload", content=chunks())
+        assert response.status_code == 413
@@ -2,6 +2,7 @@
 测试 prompts.py 中的提示词模板和构建器
 """
 import pytest
+from string import Formatter
 from config.prompts import PromptTemplates, PromptBuilder, prompt_builder
 
 
@@ -211,6 +212,29 @@ class TestPromptBuilder:
                 assert param_value in result
 
 
+class TestCompiledPromptBuilder:
+    """测试预解析模板"""
+
+    def test_compiled_output_matches_format(self):
+        """测试预解析后的构建结果与 str.format 一致"""
+        builder = PromptBuilder()
+        assert builder.compile() > 0
+        for name in dir(PromptTemplates):
+            template = getattr(PromptTemplates, name)
+            if not name.isupper():
+                continue
+            fields = {field: f"<{field}>" for _, field, _, _ in Formatter().parse(template) if field}
+            assert builder.build(name, **fields) == template.format(**fields)
+
+    def test_compiled_missing_variable(self):
+        """测试预解析后缺少变量仍抛出 ValueError"""
+        builder = PromptBuilder()
+        builder.compile()
+        with pytest.raises(ValueError) as exc_info:
+            builder.build("INTENT_CLASSIFICATION")
+        assert "缺少必要的变量" in str(exc_info.value)
+
+
 class TestGlobalPromptBuilder:
     """测试全局提示词构建器实例"""
 
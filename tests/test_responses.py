@@ -0,0 +1,144 @@
+"""
+测试 src/api/responses.py 中的 JSON 响应与 SSE 编码
+"""
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from src.api import JSONResponse, coalesce_tokens, sse_event, stream_tokens, token_event
+
+
+class Item(BaseModel):
+    name: str
+    score: float
+
+
+async def token_stream(tokens, delay=0.0, error=None):
+    for token in tokens:
+        if delay:
+            await asyncio.sleep(delay)
+        yield token
+    if error is not None:
+        raise error
+
+
+async def collect(stream):
+    return [item async for item in stream]
+
+
+def parse_events(body: bytes):
+    events = []
+    for frame in body.decode("utf-8").split("\n\n"):
+        if not frame:
+            continue
+        event = {"event": "message"}
+        for line in frame.split("\n"):
+            key, _, value = line.partition(": ")
+            event[key] = value
+        events.append(event)
+    return events
+
+
+class TestJSONResponse:
+    """测试 orjson 响应"""
+
+    def test_render(self):
+        """测试 datetime、pydantic 模型、NumPy 数组、非字符串键和中文"""
+        content = {
+            "time": datetime(2024, 1, 1, tzinfo=timezone.utc),
+            "item": Item(name="北京", score=0.5),
+            "vector": np.arange(3, dtype=np.float32),
+            1: "一",
+        }
+        body = JSONResponse(content).body
+        assert "北京".encode("utf-8") in body
+        assert json.loads(body) == {
+            "time": "2024-01-01T00:00:00+00:00",
+            "item": {"name": "北京", "score": 0.5},
+            "vector": [0.0, 1.0, 2.0],
+            "1": "一",
+        }
+
+
+class TestSSE:
+    """测试 SSE 帧编码"""
+
+    def test_sse_event(self):
+        """测试事件类型、ID 和数据的编码"""
+        assert sse_event({"a": 1}, event="done", id="7") == b'event: done\nid: 7\ndata: {"a":1}\n\n'
+        assert sse_event("ping") == b"data: ping\n\n"
+
+    def test_token_event_matches_json(self):
+        """测试预编码的 token 事件与逐个 json 编码结果一致，换行被转义"""
+        text = '第一行\n"引号"'
+        frame = token_event(text)
+        assert frame.count(b"\n") == 2
+        assert json.loads(frame[len(b"data: "):]) == {"type": "token", "content": text}
+
+
+class TestCoalesceTokens:
+    """测试 token 合并"""
+
+    @pytest.mark.asyncio
+    async def test_merges_within_window(self):
+        """测试窗口内到达的 token 合并为一个事件"""
+        tokens = [f"t{i}" for i in range(10)]
+        chunks = await collect(coalesce_tokens(token_stream(tokens), window=0.05))
+        assert chunks == ["".join(tokens)]
+
+    @pytest.mark.asyncio
+    async def test_flushes_at_max_chars(self):
+        """测试累计达到 max_chars 时不等窗口结束就发送"""
+        tokens = [f"t{i}" for i in range(6)]
+        start = asyncio.get_running_loop().time()
+        chunks = await collect(coalesce_tokens(token_stream(tokens, delay=0.005), window=1.0, max_chars=4))
+        assert asyncio.get_running_loop().time() - start < 0.5
+        assert "".join(chunks) == "".join(tokens)
+        assert all(len(chunk) <= 4 for chunk in chunks)
+
+    @pytest.mark.asyncio
+    async def test_slow_tokens_not_merged(self):
+        """测试间隔超过窗口的 token 各自成为一个事件"""
+        chunks = await collect(coalesce_tokens(token_stream(["a", "b", "c"], delay=0.03), window=0.005))
+        assert chunks == ["a", "b", "c"]
+
+    @pytest.mark.asyncio
+    async def test_zero_window_passthrough(self):
+        """测试窗口为 0 时逐 token 输出"""
+        assert await collect(coalesce_tokens(token_stream(["a", "b"]), window=0)) == ["a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_propagates_producer_error(self):
+        """测试 token 流的异常传给调用方"""
+        with pytest.raises(RuntimeError):
+            await collect(coalesce_tokens(token_stream(["a"], error=RuntimeError("LLM 失败"))))
+
+
+class TestStreamTokens:
+    """测试 SSE 响应"""
+
+    @pytest.mark.asyncio
+    async def test_stream_response(self):
+        """测试流式响应的事件序列和响应头"""
+        app = FastAPI()
+        tokens = ["你", "好", "，", "世界"]
+
+        @app.get("/stream")
+        async def stream():
+            return stream_tokens(token_stream(tokens), window=0.01, done={"tokens": len(tokens)})
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/stream")
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert response.headers["cache-control"] == "no-cache"
+        events = parse_events(response.content)
+        assert events[-1] == {"event": "done", "data": '{"tokens":4}'}
+        text = "".join(json.loads(e["data"])["content"] for e in events[:-1])
+        assert text == "你好，世界"
@@ -0,0 +1,198 @@
+"""
+测试 src/memory/retriever.py 中的多查询融合检索
+"""
+import asyncio
+
+import pytest
+from langchain_core.vectorstores import VectorStore
+
+from config.settings import VectorStoreSettings
+from src.memory import (
+    BM25Index,
+    FusionRetriever,
+    HybridRetriever,
+    NumpyVectorStore,
+    parse_queries,
+    reciprocal_rank_fusion,
+)
+from tests.test_vector_store import TEXTS, KeywordEmbeddings
+
+
+class CountingEmbeddings(KeywordEmbeddings):
+    """记录 embed_documents 调用次数"""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return super().embed_documents(texts)
+
+
+class ListVectorStore(VectorStore):
+    """只实现按向量检索接口的通用向量存储（测试线程池路径）"""
+
+    def __init__(self, store):
+        self.store = store
+
+    @property
+    def embeddings(self):
+        return self.store.embeddings
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        return self.store.add_texts(texts, metadatas, **kwargs)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return self.store.similarity_search(query, k)
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, **kwargs):
+        return self.store.similarity_search_by_vector_with_score(embedding, k, -1.0)
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError
+
+
+class DistanceVectorStore(ListVectorStore):
+    """和 Chroma 一样返回余弦距离（越小越相关）的向量存储"""
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, **kwargs):
+        hits = super().similarity_search_by_vector_with_relevance_scores(embedding, k)
+        return [(doc, 1.0 - score) for doc, score in hits]
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+
+
+@pytest.fixture
+def store():
+    embedding = CountingEmbeddings()
+    store = NumpyVectorStore(embedding)
+    store.add_texts(TEXTS, ids=[f"doc-{i}" for i in range(len(TEXTS))])
+    embedding.calls.clear()
+    return store
+
+
+class TestParseQueries:
+    """测试查询生成结果解析"""
+
+    def test_json_array(self):
+        """测试解析 JSON 数组（允许前后有说明文字），去重并限制数量"""
+        text = '好的：\n["北京天气", "北京温度", "北京天气", "穿衣建议", "多余"]'
+        assert parse_queries(text) == ["北京天气", "北京温度", "穿衣建议"]
+
+    def test_fallback_lines(self):
+        """测试非 JSON 输出按行拆分"""
+        assert parse_queries("1. 北京天气\n2. 北京温度\n") == ["北京天气", "北京温度"]
+        assert parse_queries("  ") == [""]
+
+
+class TestReciprocalRankFusion:
+    """测试倒数排名融合"""
+
+    def test_fusion(self):
+        """测试多个查询都命中的文档排名靠前，保留最高相似度"""
+        fused = reciprocal_rank_fusion(
+            [[("a", 0.9), ("b", 0.8)], [("b", 0.95), ("c", 0.7)]], rrf_k=60
+        )
+        assert [key for key, *_ in fused] == ["b", "a", "c"]
+        key, score, similarity, queries = fused[0]
+        assert score == pytest.approx(1 / 62 + 1 / 61)
+        assert similarity == 0.95
+        assert queries == [0, 1]
+
+    def test_rankings_without_similarity(self):
+        """测试不带相似度的排名列表（BM25）参与融合，最高相似度只取向量结果"""
+        fused = reciprocal_rank_fusion([[("a", 0.9)], [("b", None), ("a", None)]], rrf_k=60)
+        assert [(key, similarity) for key, _, similarity, _ in fused] == [("a", 0.9), ("b", None)]
+
+
+class TestFusionRetriever:
+    """测试并发多查询检索"""
+
+    def test_batch_embed_and_fuse(self, store):
+        """测试全部查询一次批量 Embedding，结果去重并按 top_k 截取"""
+        retriever = FusionRetriever(store, top_k=3, fetch_k=2)
+        result = retriever.retrieve(["天气 温度", "温度", "足球"])
+
+        assert store.embeddings.calls == [["天气 温度", "温度", "足球"]]
+        ids = [doc.id for doc in result.documents]
+        assert len(ids) == len(set(ids)) == 3
+        # 同时命中 "天气" 和 "温度" 两个查询的文档排第一
+        assert ids[0] == "doc-0"
+        assert result.hits[0].queries == [0, 1]
+        assert set(result.timings) == {"embed", "search", "fuse", "total"}
+        retriever.close()
+
+    def test_score_threshold(self, store):
+        """测试按最高相似度过滤"""
+        retriever = FusionRetriever(store, top_k=5, score_threshold=0.9)
+        hits = retriever.retrieve(["足球", "股票"]).hits
+        assert {hit.document.id for hit in hits} == {"doc-3"}
+        retriever.close()
+
+    def test_generic_store_and_async(self, store):
+        """测试通用向量存储走线程池并发检索，异步接口结果一致"""
+        retriever = FusionRetriever(ListVectorStore(store), top_k=3)
+        sync_ids = [doc.id for doc in retriever.retrieve(["天气 温度", "温度", "足球"]).documents]
+        async_result = asyncio.run(retriever.aretrieve(["天气 温度", "温度", "足球"]))
+        assert [doc.id for doc in async_result.documents] == sync_ids
+        assert sync_ids[0] == "doc-0"
+        retriever.close()
+
+    def test_distance_scores_normalized(self, store):
+        """测试返回距离的存储先换算为相关度再过滤：保留最相关的结果，而不是最不相关的"""
+        retriever = FusionRetriever(DistanceVectorStore(store), top_k=5, score_threshold=0.9)
+        hits = retriever.retrieve(["足球", "股票"]).hits
+        assert {hit.document.id for hit in hits} == {"doc-3"}
+        assert hits[0].similarity == pytest.approx(1.0, abs=0.1)
+        retriever.close()
+
+    def test_from_settings(self, store):
+        """测试按配置读取 top_k 和 score_threshold"""
+        retriever = FusionRetriever.from_settings(
+            VectorStoreSettings(top_k=7, score_threshold=0.3), store
+        )
+        assert (retriever.top_k, retriever.score_threshold, retriever.fetch_k) == (7, 0.3, 14)
+        retriever.close()
+
+
+class TestHybridRetriever:
+    """测试 BM25 + 向量混合检索"""
+
+    @pytest.fixture
+    def bm25(self, store):
+        index = BM25Index()
+        index.add([f"doc-{i}" for i in range(len(TEXTS))], TEXTS)
+        return index
+
+    def test_keyword_hits_fused(self, store, bm25):
+        """测试 BM25 命中的文档不受相似度阈值过滤"""
+        retriever = HybridRetriever(store, bm25, top_k=3, score_threshold=0.9)
+        result = retriever.retrieve(["上海多云"])
+
+        # KeywordEmbeddings 不认识 "上海"，向量检索的相似度都为 0，只剩 BM25 命中的文档
+        assert [hit.document.id for hit in result.hits] == ["doc-1"]
+        assert result.hits[0].queries == [0]
+        assert set(result.timings) == {"embed", "search", "bm25", "fuse", "total"}
+        retriever.close()
+
+    def test_keyword_only_documents_loaded(self, store, bm25):
+        """测试向量候选之外、只被 BM25 命中的文档从向量存储取回，没有相似度"""
+        retriever = HybridRetriever(store, bm25, top_k=5, fetch_k=1, bm25_k=5)
+        hits = retriever.retrieve(["上海天气"]).hits
+        keyword_only = [hit for hit in hits if hit.similarity is None]
+        assert keyword_only and keyword_only[0].document.page_content in TEXTS
+        retriever.close()
+
+    def test_both_signals_rank_first_and_async(self, store, bm25):
+        """测试同时被向量和 BM25 命中的文档排第一，异步接口结果一致"""
+        retriever = HybridRetriever(store, bm25, top_k=3)
+        sync_ids = [doc.id for doc in retriever.retrieve(["足球比赛", "篮球"]).documents]
+        async_ids = [doc.id for doc in asyncio.run(retriever.aretrieve(["足球比赛", "篮球"])).documents]
+        assert sync_ids == async_ids
+        assert sync_ids[:2] == ["doc-3", "doc-4"] or sync_ids[:2] == ["doc-4", "doc-3"]
+        retriever.close()
@@ -0,0 +1,165 @@
+"""
+测试 src/tools/sandbox.py 中的进程池沙箱和计算器工具
+"""
+import asyncio
+import math
+import os
+import time
+
+import numpy as np
+import pytest
+import pytest_asyncio
+
+from src.tools import (
+    CPUTimeExceeded,
+    MemoryLimitExceeded,
+    ProcessSandbox,
+    SandboxCrashed,
+    SandboxTimeout,
+    ToolExecutor,
+    create_calculator_tool,
+    evaluate,
+)
+
+
+def spin(n):
+    total = 0
+    for i in range(n):
+        total += i
+    return total
+
+
+def allocate(mb):
+    return len(bytearray(mb * 1024 * 1024))
+
+
+def describe(values):
+    return float(values.sum()), values.flags.writeable, os.getpid()
+
+
+def filled(mb):
+    return np.full(mb * 1024 * 1024, 7, dtype=np.uint8)
+
+
+def crash():
+    os._exit(7)
+
+
+def fail():
+    raise KeyError("missing")
+
+
+@pytest_asyncio.fixture
+async def sandbox():
+    sandbox = ProcessSandbox(1, cpu_time=0.5, memory_mb=64, shm_threshold=1024)
+    await sandbox.start()
+    yield sandbox
+    await sandbox.close()
+
+
+class TestProcessSandbox:
+    """测试进程池沙箱"""
+
+    @pytest.mark.asyncio
+    async def test_runs_in_child_process(self, sandbox):
+        """测试在子进程中执行并返回结果，函数的异常原样抛出"""
+        assert await sandbox.run(spin, 1000) == 499500
+        with pytest.raises(KeyError):
+            await sandbox.run(fail)
+
+    @pytest.mark.asyncio
+    async def test_limits(self, sandbox):
+        """测试 CPU 时间和内存限制，超限后子进程仍可复用"""
+        with pytest.raises(CPUTimeExceeded):
+            await sandbox.run(spin, 10**10)
+        with pytest.raises(MemoryLimitExceeded):
+            await sandbox.run(allocate, 256)
+        assert await sandbox.run(allocate, 16) == 16 * 1024 * 1024
+        assert sandbox.restarts == 0
+        assert sandbox.limit_errors == {"CPUTimeExceeded": 1, "MemoryLimitExceeded": 1}
+
+    @pytest.mark.asyncio
+    async def test_wall_clock_timeout(self, sandbox):
+        """测试墙钟超时终止并替换子进程"""
+        with pytest.raises(SandboxTimeout):
+            await sandbox.run(time.sleep, 5, timeout=0.2)
+        assert sandbox.restarts == 1
+        assert await sandbox.run(spin, 10) == 45
+
+    @pytest.mark.asyncio
+    async def test_crash_isolated(self, sandbox):
+        """测试子进程崩溃只影响当前调用，之后自动补充子进程"""
+        with pytest.raises(SandboxCrashed):
+            await sandbox.run(crash)
+        assert sandbox.crashes == 1
+        assert await sandbox.run(spin, 10) == 45
+
+    @pytest.mark.asyncio
+    async def test_shared_memory_arrays(self, sandbox):
+        """测试大数组通过共享内存传入，子进程中为只读视图"""
+        values = np.arange(10000, dtype=np.float64)
+        total, writeable, pid = await sandbox.run(describe, values)
+        assert total == values.sum()
+        assert writeable is False
+        assert pid != os.getpid()
+
+        with sandbox.shared_array((100,), np.float32) as shared:
+            shared.array[:] = 2
+            total, writeable, _ = await sandbox.run(describe, shared)
+        assert total == 200.0
+
+    @pytest.mark.asyncio
+    async def test_large_result_does_not_block_loop(self, sandbox):
+        """测试返回大数组时事件循环不会停顿到整条消息读完"""
+        gaps = []
+
+        async def ticker():
+            last = time.perf_counter()
+            while True:
+                await asyncio.sleep(0.001)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0.01)
+        try:
+            result = await sandbox.run(filled, 200, memory_mb=0)
+        finally:
+            task.cancel()
+        assert result.shape == (200 * 1024 * 1024,) and result[-1] == 7
+        assert max(gaps) < 0.05
+
+
+class TestCalculatorTool:
+    """测试计算器工具"""
+
+    def test_evaluate(self):
+        """测试支持的表达式"""
+        assert evaluate("1 + 2 * 3") == 7
+        assert evaluate("2 ** 10 // 3 % 7") == 341 % 7
+        assert evaluate("sqrt(16) + factorial(5)") == 124
+        assert evaluate("round(pi, 2)") == 3.14
+        assert evaluate("1 < 2 <= 2") is True
+
+    @pytest.mark.parametrize(
+        "expression", ["__import__('os')", "open('x')", "(1).real", "[1, 2]", "x + 1", "1 +"]
+    )
+    def test_rejects_unsupported(self, expression):
+        """测试拒绝属性访问、未知名称等表达式"""
+        with pytest.raises(ValueError):
+            evaluate(expression)
+
+    @pytest.mark.asyncio
+    async def test_tool_runs_in_sandbox(self, sandbox):
+        """测试工具在沙箱中执行，超限的计算作为失败结果返回"""
+        executor = ToolExecutor([create_calculator_tool(sandbox)])
+        results = await executor.run(
+            [
+                {"name": "calculator", "args": {"expression": "factorial(20)"}, "id": "1"},
+                {"name": "calculator", "args": {"expression": "9 ** 9 ** 9"}, "id": "2"},
+            ]
+        )
+        assert results[0].output == str(math.factorial(20))
+        assert results[1].status == "error"
+        assert "CPUTimeExceeded" in results[1].error or "MemoryLimitExceeded" in results[1].error
@@ -0,0 +1,116 @@
+"""
+测试 src/graph/serde.py 中的紧凑检查点序列化器
+"""
+import struct
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from config.settings import CheckpointerSettings
+from src.graph import CompactSerializer, DeltaSqliteSaver, create_serializer, train_dictionary
+from tests.test_checkpointer import make_redis_saver, write_history
+
+
+def sample_state(turn: int):
+    return {
+        "messages": [
+            HumanMessage(content=f"第 {i} 轮：请帮我查询明天北京的天气，并推荐穿衣。")
+            if i % 2 == 0
+            else AIMessage(content=f"第 {i} 轮：明天北京多云转晴，气温 18 到 25 度，建议穿薄外套。")
+            for i in range(turn)
+        ],
+        "intent": "query",
+        "turn": turn,
+    }
+
+
+@pytest.fixture(scope="module")
+def dictionary():
+    inner = JsonPlusSerializer()
+    samples = [inner.dumps_typed(sample_state(turn))[1] for turn in range(1, 200)]
+    return train_dictionary(samples, dict_size=8 * 1024)
+
+
+class TestCompactSerializer:
+    """测试 msgpack + zstd 序列化器"""
+
+    def test_roundtrip(self):
+        """测试序列化往返和类型标记"""
+        serde = CompactSerializer()
+        state = sample_state(10)
+        type_, data = serde.dumps_typed(state)
+        assert type_ == "msgpack+zstd"
+        magic, version, dict_id = struct.unpack_from(">2sBI", data)
+        assert (magic, version, dict_id) == (b"CZ", 1, 0)
+        assert serde.loads_typed((type_, data)) == state
+
+    def test_compresses_repetitive_messages(self):
+        """测试重复消息文本的压缩比"""
+        state = sample_state(50)
+        raw = JsonPlusSerializer().dumps_typed(state)[1]
+        compact = CompactSerializer().dumps_typed(state)[1]
+        assert len(raw) / len(compact) > 3
+
+    def test_small_payload_not_compressed(self):
+        """测试小数据不压缩"""
+        serde = CompactSerializer()
+        assert serde.dumps_typed({"a": 1}) == JsonPlusSerializer().dumps_typed({"a": 1})
+        assert serde.dumps_typed(None) == ("null", b"")
+
+    def test_reads_legacy_blobs(self):
+        """测试可读取旧的未压缩数据"""
+        state = sample_state(3)
+        legacy = JsonPlusSerializer().dumps_typed(state)
+        assert CompactSerializer().loads_typed(legacy) == state
+
+    def test_rejects_unknown_version(self):
+        """测试未知版本头报错"""
+        serde = CompactSerializer()
+        type_, data = serde.dumps_typed(sample_state(10))
+        corrupted = struct.pack(">2sBI", b"CZ", 99, 0) + data[7:]
+        with pytest.raises(ValueError):
+            serde.loads_typed((type_, corrupted))
+
+    def test_dictionary_improves_small_objects(self, dictionary):
+        """测试共享字典提升小对象压缩率"""
+        state = sample_state(4)
+        plain = CompactSerializer(min_size=0).dumps_typed(state)[1]
+        with_dict = CompactSerializer(dictionary=dictionary, min_size=0)
+        type_, data = with_dict.dumps_typed(state)
+        assert len(data) < len(plain)
+        assert with_dict.loads_typed((type_, data)) == state
+
+    def test_dictionary_rotation(self, dictionary):
+        """测试更换字典后旧数据仍可通过历史字典解码"""
+        state = sample_state(6)
+        old_blob = CompactSerializer(dictionary=dictionary).dumps_typed(state)
+
+        rotated = CompactSerializer(extra_dictionaries=[dictionary])
+        assert rotated.loads_typed(old_blob) == state
+        with pytest.raises(ValueError):
+            CompactSerializer().loads_typed(old_blob)
+
+    def test_from_settings_loads_dictionaries(self, tmp_path, dictionary):
+        """测试从字典目录加载字典"""
+        (tmp_path / "0001.zdict").write_bytes(dictionary)
+        serde = create_serializer(
+            CheckpointerSettings(zstd_dictionary_dir=str(tmp_path), compression_level=9)
+        )
+        assert isinstance(serde, CompactSerializer)
+        assert serde.level == 9
+        type_, data = serde.dumps_typed(sample_state(5))
+        assert struct.unpack_from(">2sBI", data)[2] != 0
+        assert create_serializer(CheckpointerSettings(serializer="jsonplus")) is None
+
+    @pytest.mark.parametrize("backend", ["sqlite", "redis"])
+    def test_plugs_into_savers(self, backend):
+        """测试接入 SQLite 和 Redis 检查点存储"""
+        serde = CompactSerializer(min_size=0)
+        if backend == "sqlite":
+            saver = DeltaSqliteSaver(":memory:", serde=serde)
+        else:
+            saver = make_redis_saver(serde=serde)
+        write_history(saver, "t1", 5)
+        latest = saver.get_tuple({"configurable": {"thread_id": "t1"}})
+        assert latest.checkpoint["channel_values"]["messages"] == [f"msg-{i}" for i in range(5)]
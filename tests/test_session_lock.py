@@ -0,0 +1,133 @@
+"""
+测试 src/storage/session_lock.py 中的会话锁
+"""
+import asyncio
+import time
+
+import pytest
+
+from src.storage import LockTimeout, SessionLockManager
+
+
+async def increment(locks, counters, session_id, use_lock=True):
+    """读取 - 让出 - 写回，不加锁时并发会丢失更新"""
+
+    async def update():
+        value = counters.get(session_id, 0)
+        await asyncio.sleep(0)
+        counters[session_id] = value + 1
+
+    if use_lock:
+        async with locks.lock(session_id):
+            await update()
+    else:
+        await update()
+
+
+def redis_pair():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    return fakeredis.FakeAsyncRedis(server=server), fakeredis.FakeAsyncRedis(server=server)
+
+
+class TestSessionLockManager:
+    """测试进程内会话锁"""
+
+    @pytest.mark.asyncio
+    async def test_same_session_runs_in_order(self):
+        """测试同一会话的请求按到达顺序串行执行"""
+        locks = SessionLockManager()
+        order, active = [], []
+
+        async def request(i):
+            async with locks.lock("s1"):
+                active.append(i)
+                assert len(active) == 1
+                order.append(i)
+                await asyncio.sleep(0.001)
+                active.remove(i)
+
+        await asyncio.gather(*(request(i) for i in range(20)))
+        assert order == list(range(20))
+        assert locks.contended == 19
+
+    @pytest.mark.asyncio
+    async def test_sessions_run_in_parallel(self):
+        """测试不同会话并行执行"""
+        locks = SessionLockManager()
+
+        async def request(session_id):
+            async with locks.lock(session_id):
+                await asyncio.sleep(0.05)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(request(f"s{i}") for i in range(50)))
+        assert time.perf_counter() - start < 0.5
+
+    @pytest.mark.asyncio
+    async def test_no_lost_updates(self):
+        """测试并发读改写不丢失更新，且空闲锁项被清理"""
+        locks = SessionLockManager()
+        unlocked, locked = {}, {}
+        jobs = [f"s{i % 20}" for i in range(1000)]
+        await asyncio.gather(*(increment(locks, unlocked, s, use_lock=False) for s in jobs))
+        await asyncio.gather(*(increment(locks, locked, s) for s in jobs))
+        assert sum(unlocked.values()) < 1000
+        assert locked == {f"s{i}": 50 for i in range(20)}
+        assert len(locks) == 0
+
+    @pytest.mark.asyncio
+    async def test_timeout(self):
+        """测试等待超时抛出 LockTimeout，之后的等待者仍能获得锁"""
+        locks = SessionLockManager()
+        release = asyncio.Event()
+
+        async def holder():
+            async with locks.lock("s1"):
+                await release.wait()
+
+        async def waiter():
+            async with locks.lock("s1", timeout=1.0):
+                return locks.locked("s1")
+
+        task = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(waiter())
+        with pytest.raises(LockTimeout):
+            async with locks.lock("s1", timeout=0.05):
+                pass
+        assert locks.timeouts == 1
+        release.set()
+        await task
+        assert await queued is True
+        assert len(locks) == 0
+
+
+class TestRedisSessionLock:
+    """测试跨 worker 的 Redis 租约锁"""
+
+    @pytest.mark.asyncio
+    async def test_no_lost_updates_across_workers(self):
+        """测试两个 worker（共享同一 Redis）并发更新同一批会话不丢失更新"""
+        first, second = redis_pair()
+        workers = [SessionLockManager(first, poll_interval=0.001), SessionLockManager(second, poll_interval=0.001)]
+        counters = {}
+        jobs = [(workers[i % 2], f"s{i % 5}") for i in range(200)]
+        await asyncio.gather(*(increment(locks, counters, s) for locks, s in jobs))
+        assert counters == {f"s{i}": 40 for i in range(5)}
+        assert await first.keys("lock:session:*") == []
+
+    @pytest.mark.asyncio
+    async def test_lease_is_renewed(self):
+        """测试持有时间超过租约有效期时租约被续约，其他 worker 拿不到锁"""
+        first, second = redis_pair()
+        holder = SessionLockManager(first, lease_ttl=0.3)
+        other = SessionLockManager(second, lease_ttl=0.3, poll_interval=0.01)
+        async with holder.lock("s1"):
+            await asyncio.sleep(0.5)
+            with pytest.raises(LockTimeout):
+                async with other.lock("s1", timeout=0.1):
+                    pass
+        assert holder.lost_leases == 0
+        async with other.lock("s1", timeout=0.1):
+            pass
@@ -8,6 +8,8 @@ from config.settings import (
     DatabaseSettings,
     CheckpointerSettings,
     VectorStoreSettings,
+    SummarySettings,
+    ToolSettings,
     APISettings,
     LogSettings,
     MonitoringSettings,
@@ -29,6 +31,8 @@ class TestLLMSettings:
         assert settings.max_tokens == 4096
         assert settings.timeout == 60
         assert settings.max_retries == 3
+        assert settings.max_concurrency == 8
+        assert settings.background_concurrency == 1
 
     def test_custom_values(self):
         """测试自定义值"""
@@ -175,6 +179,25 @@ class TestCheckpointerSettings:
         assert settings.sqlite_path == "data/checkpoints/checkpoints.db"
         assert settings.save_interval == 1
         assert settings.max_checkpoints == 10
+        assert settings.base_interval == 20
+        assert settings.durability_mode == "sync"
+        assert settings.write_behind_max_pending == 1000
+        assert settings.write_behind_linger_ms == 50
+        assert settings.gc_enabled is False
+        assert settings.gc_interval_seconds == 60
+        assert settings.gc_batch_size == 100
+        assert settings.gc_max_rows_per_second == 5000
+        assert settings.gc_vacuum_pages == 256
+        assert settings.gc_idle_ttl_seconds is None
+        assert settings.serializer == "compact"
+        assert settings.compression_level == 3
+        assert settings.zstd_dictionary_dir is None
+
+    def test_base_interval_validation(self):
+        """测试增量链长度验证"""
+        assert CheckpointerSettings(base_interval=1).base_interval == 1
+        with pytest.raises(Exception):
+            CheckpointerSettings(base_interval=0)
 
     def test_custom_values(self):
         """测试自定义值"""
@@ -196,8 +219,27 @@ class TestVectorStoreSettings:
         settings = VectorStoreSettings()
         assert settings.vector_store_type == "chroma"
         assert settings.chroma_persist_dir == "data/chroma"
+        assert settings.numpy_persist_dir == "data/vectors"
+        assert settings.quantization == "none"
+        assert settings.rerank_factor == 4
         assert settings.embedding_provider == "openai"
         assert settings.embedding_model == "text-embedding-3-small"
+        assert settings.embedding_cache_enabled is True
+        assert settings.embedding_cache_path == "data/embeddings/cache.db"
+        assert settings.embedding_cache_size == 10000
+        assert settings.embedding_batch_size == 256
+        assert settings.embedding_batch_wait_ms == 5
+        assert settings.chunk_size == 800
+        assert settings.chunk_overlap == 100
+        assert settings.ingest_workers == 4
+        assert settings.ingest_queue_size == 8
+        assert settings.hybrid_search is False
+        assert settings.bm25_index_dir == "data/bm25"
+        assert settings.bm25_k1 == 1.2
+        assert settings.bm25_b == 0.75
+        assert settings.context_budget_ratio == 0.5
+        assert settings.mmr_lambda == 0.7
+        assert settings.duplicate_threshold == 0.95
         assert settings.top_k == 5
         assert settings.score_threshold == 0.7
 
@@ -218,6 +260,46 @@ class TestVectorStoreSettings:
             VectorStoreSettings(score_threshold=1.1)
 
 
+class TestSummarySettings:
+    """测试会话摘要配置"""
+
+    def test_default_values(self):
+        """测试默认值"""
+        settings = SummarySettings()
+        assert settings.enabled is True
+        assert settings.token_threshold == 3000
+        assert settings.keep_recent_tokens == 1000
+        assert settings.queue_size == 1000
+
+    def test_env_prefix(self, monkeypatch):
+        """测试环境变量前缀"""
+        monkeypatch.setenv("SUMMARY_TOKEN_THRESHOLD", "500")
+        assert SummarySettings().token_threshold == 500
+
+
+class TestToolSettings:
+    """测试工具调用配置"""
+
+    def test_default_values(self):
+        """测试默认值"""
+        settings = ToolSettings()
+        assert settings.default_timeout == 30.0
+        assert settings.turn_timeout == 60.0
+        assert settings.max_concurrency_per_tool == 4
+        assert settings.thread_pool_size == 8
+        assert settings.cache_max_entries == 10000
+        assert settings.cache_pure_ttl == 86400
+        assert settings.cache_bypass is False
+        assert settings.sandbox_workers == 2
+        assert settings.sandbox_cpu_time == 5.0
+        assert settings.sandbox_memory_mb == 512
+
+    def test_env_prefix(self, monkeypatch):
+        """测试环境变量前缀"""
+        monkeypatch.setenv("TOOL_DEFAULT_TIMEOUT", "5")
+        assert ToolSettings().default_timeout == 5.0
+
+
 class TestAPISettings:
     """测试 API 配置"""
 
@@ -227,11 +309,20 @@ class TestAPISettings:
         assert settings.host == "0.0.0.0"
         assert settings.port == 8000
         assert settings.workers == 1
+        assert settings.preload is True
+        assert settings.backlog == 2048
         assert settings.algorithm == "HS256"
         assert settings.access_token_expire_minutes == 30
         assert settings.cors_origins == ["*"]
         assert settings.max_request_size == 10 * 1024 * 1024
         assert settings.request_timeout == 300
+        assert settings.admission_control is True
+        assert settings.max_concurrent_requests == 64
+        assert settings.max_queued_requests == 256
+        assert settings.session_lock_redis is False
+        assert settings.session_lock_ttl == 30.0
+        assert settings.sse_coalesce_ms == 10.0
+        assert settings.sse_max_chunk_chars == 256
 
     def test_port_validation(self):
         """测试端口号验证"""
@@ -257,6 +348,9 @@ class TestLogSettings:
         assert settings.log_file_name == "chatbot.log"
         assert settings.rotation == "1 day"
         assert settings.retention == "30 days"
+        assert settings.json_format is False
+        assert settings.queue_size == 10000
+        assert settings.flush_interval_ms == 500
 
     def test_custom_log_level(self):
         """测试自定义日志级别"""
@@ -276,6 +370,11 @@ class TestMonitoringSettings:
         assert settings.langsmith_project == "langgraph-chatbot"
         assert settings.enable_prometheus is False
         assert settings.prometheus_port == 9090
+        assert settings.prometheus_flush_interval == 1.0
+        assert settings.trace_sample_rate == 0.0
+        assert settings.trace_profile_rate == 0.0
+        assert settings.trace_profile_interval_ms == 5.0
+        assert settings.trace_dir == "data/traces"
 
     def test_custom_values(self):
         """测试自定义值"""
@@ -312,6 +411,8 @@ class TestSettings:
         assert isinstance(settings.database, DatabaseSettings)
         assert isinstance(settings.checkpointer, CheckpointerSettings)
         assert isinstance(settings.vector_store, VectorStoreSettings)
+        assert isinstance(settings.summary, SummarySettings)
+        assert isinstance(settings.tool, ToolSettings)
         assert isinstance(settings.api, APISettings)
         assert isinstance(settings.log, LogSettings)
         assert isinstance(settings.monitoring, MonitoringSettings)
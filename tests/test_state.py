@@ -0,0 +1,90 @@
+"""
+测试 src/graph/state.py 中的紧凑消息表示
+"""
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from src.graph import (
+    CompactMessage,
+    CompactSerializer,
+    Role,
+    add_compact_messages,
+    from_langchain_messages,
+    to_langchain_messages,
+)
+
+
+def sample_messages():
+    return [
+        SystemMessage(content="你是一个助手"),
+        HumanMessage(content="北京明天天气怎么样？", id="m1"),
+        AIMessage(
+            content="",
+            id="m2",
+            tool_calls=[{"name": "weather", "args": {"city": "北京"}, "id": "call-1"}],
+        ),
+        ToolMessage(content="多云，18-25 度", tool_call_id="call-1", name="weather", id="m3"),
+        AIMessage(content="明天北京多云，18 到 25 度。", id="m4"),
+    ]
+
+
+class TestCompactMessage:
+    """测试与 LangChain 消息的互转"""
+
+    def test_roundtrip(self):
+        """测试转换往返保持角色、内容、ID 和工具调用"""
+        original = sample_messages()
+        compact = from_langchain_messages(original)
+        assert [m.role for m in compact] == [Role.SYSTEM, Role.HUMAN, Role.AI, Role.TOOL, Role.AI]
+        assert [m.type for m in compact] == [m.type for m in original]
+        assert compact[3].tool_call_id == "call-1"
+        assert compact[2].tool_calls == [{"name": "weather", "args": {"city": "北京"}, "id": "call-1"}]
+        assert to_langchain_messages(compact) == original
+
+    def test_role_parse(self):
+        """测试角色解析"""
+        assert Role.parse("user") is Role.HUMAN
+        assert Role.parse("assistant") is Role.AI
+        assert Role.parse(3) is Role.TOOL
+        with pytest.raises(ValueError):
+            Role.parse("moderator")
+
+    def test_compact_fields(self):
+        """测试紧凑表示没有实例字典，空字段为 None"""
+        message = CompactMessage.from_langchain(HumanMessage(content="你好"))
+        assert not hasattr(message, "__dict__")
+        assert message == CompactMessage(int(Role.HUMAN), "你好")
+        assert type(message.role) is int
+
+
+class TestAddCompactMessages:
+    """测试消息 reducer"""
+
+    def test_append_and_replace(self):
+        """测试追加新消息，id 相同时原位替换"""
+        messages = add_compact_messages([], sample_messages()[:2])
+        messages = add_compact_messages(messages, HumanMessage(content="上海呢？", id="m5"))
+        messages = add_compact_messages(messages, [CompactMessage(int(Role.HUMAN), "改成天津", "m1")])
+        assert [m.id for m in messages] == [None, "m1", "m5"]
+        assert messages[1].content == "改成天津"
+
+    def test_messages_without_id_are_appended(self):
+        """测试无 id 的消息总是追加"""
+        message = CompactMessage(int(Role.HUMAN), "你好")
+        assert add_compact_messages([message], [message]) == [message, message]
+
+
+class TestCompactMessageSerialization:
+    """测试检查点序列化"""
+
+    @pytest.mark.parametrize("serde", [JsonPlusSerializer(), CompactSerializer()])
+    def test_checkpoint_roundtrip(self, serde):
+        """测试状态经检查点序列化往返后不变，且比 LangChain 消息更小"""
+        original = sample_messages()
+        state = {"messages": from_langchain_messages(original), "intent": "query"}
+        restored = serde.loads_typed(serde.dumps_typed(state))
+        assert restored == state
+        assert all(isinstance(m, CompactMessage) for m in restored["messages"])
+        baseline = serde.dumps_typed({"messages": original, "intent": "query"})[1]
+        assert len(serde.dumps_typed(state)[1]) < len(baseline)
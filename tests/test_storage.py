@@ -0,0 +1,113 @@
+"""
+测试 src/storage 中的消息模型和键集分页查询
+"""
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+
+from config.settings import DatabaseSettings
+from src.storage import (
+    MessageRepository,
+    create_db_engine,
+    create_session_factory,
+    init_db,
+)
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    db_settings = DatabaseSettings(db_type="sqlite", sqlite_path=str(tmp_path / "chat.db"))
+    engine = create_db_engine(db_settings)
+    await init_db(engine)
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def repo(engine):
+    repo = MessageRepository(create_session_factory(engine))
+    await repo.create_session("s1", user_id="u1")
+    await repo.create_session("s2", user_id="u1")
+    await repo.append_messages(
+        "s1",
+        [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"m{i}", "token_count": 10}
+            for i in range(1, 26)
+        ],
+    )
+    await repo.append_messages("s2", [{"role": "user", "content": "other"}])
+    return repo
+
+
+class TestMessageSchema:
+    """测试消息表结构"""
+
+    @pytest.mark.asyncio
+    async def test_composite_index_used(self, engine, repo):
+        """测试最近消息查询走 (session_id, seq) 索引且无需额外排序"""
+        async with engine.connect() as conn:
+            plan = (
+                await conn.execute(
+                    text(
+                        "EXPLAIN QUERY PLAN SELECT * FROM messages "
+                        "WHERE session_id = 's1' AND seq < 10 ORDER BY seq DESC LIMIT 5"
+                    )
+                )
+            ).fetchall()
+        detail = " ".join(row[-1] for row in plan)
+        assert "USING INDEX" in detail or "USING PRIMARY KEY" in detail
+        assert "TEMP B-TREE" not in detail
+
+
+class TestMessageRepository:
+    """测试消息仓储"""
+
+    @pytest.mark.asyncio
+    async def test_append_assigns_sequential_seq(self, repo):
+        """测试追加消息分配连续序号"""
+        assert await repo.last_seq("s1") == 25
+        seqs = await repo.append_messages("s1", [{"role": "user", "content": "a"}] * 2)
+        assert seqs == [26, 27]
+        assert await repo.last_seq("missing") == 0
+
+    @pytest.mark.asyncio
+    async def test_get_recent(self, repo):
+        """测试获取最近 N 条消息"""
+        recent = await repo.get_recent("s1", 3)
+        assert [m.seq for m in recent] == [23, 24, 25]
+        assert all(m.session_id == "s1" for m in recent)
+
+    @pytest.mark.asyncio
+    async def test_page_before_walks_full_history(self, repo):
+        """测试向前翻页覆盖全部历史且不重复"""
+        seen = []
+        cursor = None
+        while True:
+            page = await repo.page_before("s1", cursor, 10)
+            seen = [m.seq for m in page.items] + seen
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+        assert seen == list(range(1, 26))
+
+    @pytest.mark.asyncio
+    async def test_page_after(self, repo):
+        """测试向后翻页"""
+        page = await repo.page_after("s1", 20, 3)
+        assert [m.seq for m in page.items] == [21, 22, 23]
+        assert page.next_cursor == 23
+        page = await repo.page_after("s1", 23, 3)
+        assert [m.seq for m in page.items] == [24, 25]
+        assert page.next_cursor is None
+
+    @pytest.mark.asyncio
+    async def test_active_window(self, repo):
+        """测试活动窗口受条数、token 预算和起始序号约束"""
+        window = await repo.get_active_window("s1", max_messages=8)
+        assert [m.seq for m in window] == list(range(18, 26))
+
+        window = await repo.get_active_window("s1", max_messages=8, max_tokens=35)
+        assert [m.seq for m in window] == [23, 24, 25]
+
+        window = await repo.get_active_window("s1", max_messages=8, after_seq=22)
+        assert [m.seq for m in window] == [23, 24, 25]
@@ -0,0 +1,141 @@
+"""
+测试 src/memory/summarizer.py 中的后台会话摘要
+"""
+import asyncio
+
+import pytest
+import pytest_asyncio
+from langchain_core.messages import AIMessage
+
+from config.settings import DatabaseSettings, LLMSettings, SummarySettings
+from src.memory import LLMScheduler, SummaryWorker
+from src.storage import MessageRepository, create_db_engine, create_session_factory, init_db
+
+
+class FakeLLM:
+    """记录提示词并返回固定摘要"""
+
+    def __init__(self, delay=0.0):
+        self.prompts = []
+        self.delay = delay
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.delay)
+        return AIMessage(content=f"摘要{len(self.prompts)}")
+
+
+@pytest_asyncio.fixture
+async def repo(tmp_path):
+    engine = create_db_engine(DatabaseSettings(db_type="sqlite", sqlite_path=str(tmp_path / "chat.db")))
+    await init_db(engine)
+    repo = MessageRepository(create_session_factory(engine))
+    await repo.create_session("s1")
+    yield repo
+    await engine.dispose()
+
+
+async def add_turns(repo, count, tokens=100, start=0):
+    await repo.append_messages(
+        "s1",
+        [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"消息{i}", "token_count": tokens}
+            for i in range(start, start + count)
+        ],
+    )
+
+
+class TestLLMScheduler:
+    """测试 LLM 并发优先级"""
+
+    @pytest.mark.asyncio
+    async def test_background_yields_to_interactive(self):
+        """测试有交互请求排队时后台请求等待，后台占用受上限约束"""
+        scheduler = LLMScheduler(max_concurrency=1, background_concurrency=1)
+        order = []
+
+        async def call(name, background, hold=0.01):
+            async with scheduler.slot(background=background):
+                order.append(name)
+                await asyncio.sleep(hold)
+
+        first = asyncio.create_task(call("interactive-1", False, 0.05))
+        await asyncio.sleep(0.01)
+        background = asyncio.create_task(call("background", True))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(call("interactive-2", False))
+        await asyncio.gather(first, background, second)
+        assert order == ["interactive-1", "interactive-2", "background"]
+        assert scheduler.active == 0
+
+    def test_from_settings(self):
+        """测试按配置读取并发数"""
+        scheduler = LLMScheduler.from_settings(LLMSettings(max_concurrency=4, background_concurrency=2))
+        assert (scheduler.max_concurrency, scheduler.background_concurrency) == (4, 2)
+
+
+class TestSummaryWorker:
+    """测试滚动摘要"""
+
+    @pytest.mark.asyncio
+    async def test_threshold_and_rolling_summary(self, repo):
+        """测试超过阈值才压缩，保留最近消息，第二次压缩基于已有摘要"""
+        llm = FakeLLM()
+        worker = SummaryWorker(repo, llm, token_threshold=1000, keep_recent_tokens=300)
+        await add_turns(repo, 10)
+        assert await worker.summarize("s1") is False
+        assert llm.prompts == []
+
+        await add_turns(repo, 2, start=10)
+        assert await worker.summarize("s1") is True
+        summary = await repo.get_summary("s1")
+        assert (summary.summary, summary.covered_seq, summary.source_tokens) == ("摘要1", 9, 900)
+        assert "消息0" in llm.prompts[0] and "消息8" in llm.prompts[0] and "消息9" not in llm.prompts[0]
+        assert worker.tokens_saved == 900 - summary.token_count
+
+        await add_turns(repo, 8, start=12)
+        assert await worker.summarize("s1") is True
+        assert "已有摘要：\n摘要1" in llm.prompts[1] and "消息0" not in llm.prompts[1]
+        summary = await repo.get_summary("s1")
+        assert summary.covered_seq == 17
+        assert worker.tokens_saved == 1700 - summary.token_count
+
+    @pytest.mark.asyncio
+    async def test_load_context_uses_summary(self, repo):
+        """测试下一轮上下文为摘要 + 摘要之后的消息"""
+        worker = SummaryWorker(repo, FakeLLM(), token_threshold=500, keep_recent_tokens=200)
+        await add_turns(repo, 8)
+        context = await worker.load_context("s1", max_messages=50)
+        assert context.summary is None and len(context.messages) == 8
+
+        await worker.summarize("s1")
+        context = await worker.load_context("s1", max_messages=50)
+        assert context.summary == "摘要1"
+        assert [m.content for m in context.messages] == ["消息6", "消息7"]
+
+    @pytest.mark.asyncio
+    async def test_stale_summary_rejected(self, repo):
+        """测试覆盖位置更早的摘要不会替换已有摘要"""
+        assert await repo.save_summary("s1", "新", 10) is True
+        assert await repo.save_summary("s1", "旧", 5) is False
+        assert await repo.save_summary("s1", "更新", 12) is True
+        assert (await repo.get_summary("s1")).summary == "更新"
+
+    @pytest.mark.asyncio
+    async def test_background_worker(self, repo):
+        """测试 notify 非阻塞入队、同一会话合并，后台任务完成压缩"""
+        llm = FakeLLM(delay=0.01)
+        worker = SummaryWorker.from_settings(
+            SummarySettings(token_threshold=500, keep_recent_tokens=100), repo, llm
+        )
+        assert worker.notify("s1") is False  # 未启动
+        worker.start()
+        await add_turns(repo, 10)
+        assert worker.notify("s1") and worker.notify("s1")
+        for _ in range(100):
+            if worker.summaries:
+                break
+            await asyncio.sleep(0.01)
+        await worker.stop()
+        assert worker.summaries == 1 and len(llm.prompts) == 1
+        assert worker.tokens_saved > 0
@@ -0,0 +1,294 @@
+"""
+测试 src/tools 中的工具声明和并发执行器
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_core.tools import StructuredTool
+
+from src.storage import TwoTierCache
+from src.tools import (
+    ToolCache,
+    ToolEffect,
+    ToolExecutor,
+    ToolResult,
+    ToolSpec,
+    canonical_args,
+    error_prompts,
+    tool,
+)
+
+
+@tool
+async def echo(text: str) -> str:
+    """原样返回"""
+    return text
+
+
+@tool
+async def slow(seconds: float) -> float:
+    """异步等待"""
+    await asyncio.sleep(seconds)
+    return seconds
+
+
+@tool
+def blocking_sleep(seconds: float) -> float:
+    """阻塞等待"""
+    time.sleep(seconds)
+    return seconds
+
+
+@tool
+async def broken() -> None:
+    """总是失败"""
+    raise ValueError("服务不可用")
+
+
+def call(name, call_id, **args):
+    return {"name": name, "args": args, "id": call_id}
+
+
+class TestToolSpec:
+    """测试工具声明"""
+
+    def test_decorator_infers_blocking(self):
+        """测试普通函数视为阻塞，协程函数不阻塞"""
+        assert echo.name == "echo"
+        assert echo.description == "原样返回"
+        assert echo.blocking is False
+        assert blocking_sleep.blocking is True
+
+    @pytest.mark.asyncio
+    async def test_from_langchain(self):
+        """测试 LangChain 工具的同步 / 异步实现"""
+        sync_tool = StructuredTool.from_function(lambda x: x * 2, name="double", description="乘 2")
+        spec = ToolSpec.from_langchain(sync_tool, timeout=5)
+        assert spec.blocking is True
+        assert spec.func(x=3) == 6
+
+        async def triple(x: int) -> int:
+            return x * 3
+
+        async_tool = StructuredTool.from_function(coroutine=triple, name="triple", description="乘 3")
+        spec = ToolSpec.from_langchain(async_tool)
+        assert spec.blocking is False
+        assert await spec.func(x=3) == 9
+
+
+class TestToolExecutor:
+    """测试并发工具执行器"""
+
+    @pytest.mark.asyncio
+    async def test_runs_concurrently_in_order(self):
+        """测试同时执行，结果按调用顺序返回"""
+        executor = ToolExecutor([slow, blocking_sleep, echo])
+        start = time.perf_counter()
+        results = await executor.run(
+            [call("slow", "1", seconds=0.2), call("blocking_sleep", "2", seconds=0.2), call("echo", "3", text="你好")]
+        )
+        executor.close()
+        assert time.perf_counter() - start < 0.35
+        assert [r.call_id for r in results] == ["1", "2", "3"]
+        assert all(r.ok for r in results)
+        assert results[2].output == "你好"
+
+    @pytest.mark.asyncio
+    async def test_failures_are_isolated(self):
+        """测试失败、超时和未知工具不影响其他调用"""
+        executor = ToolExecutor([echo, broken, ToolSpec("stuck", slow.func, timeout=0.05)])
+        results = await executor.run(
+            [call("echo", "1", text="ok"), call("broken", "2"), call("stuck", "3", seconds=1), call("missing", "4")]
+        )
+        assert [r.status for r in results] == ["success", "error", "timeout", "error"]
+        assert "服务不可用" in results[1].error
+        assert "未知工具" in results[3].error
+
+        message = results[1].to_message()
+        assert message.status == "error"
+        assert message.tool_call_id == "2"
+
+    @pytest.mark.asyncio
+    async def test_turn_deadline_cancels_siblings(self):
+        """测试总截止时间到期时取消未完成的调用，保留已完成的结果"""
+        executor = ToolExecutor([slow, echo], default_timeout=10)
+        start = time.perf_counter()
+        results = await executor.run([call("echo", "1", text="a"), call("slow", "2", seconds=5)], timeout=0.1)
+        assert time.perf_counter() - start < 1
+        assert [r.status for r in results] == ["success", "cancelled"]
+
+    @pytest.mark.asyncio
+    async def test_per_tool_concurrency(self):
+        """测试同一工具的并发上限"""
+        active, peak = [0], [0]
+
+        async def limited() -> None:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.01)
+            active[0] -= 1
+
+        executor = ToolExecutor([ToolSpec("limited", limited, max_concurrency=2)])
+        results = await executor.run([call("limited", str(i)) for i in range(8)])
+        assert all(r.ok for r in results)
+        assert peak[0] == 2
+
+    @pytest.mark.asyncio
+    async def test_blocking_slot_held_until_thread_finishes(self):
+        """测试阻塞工具超时后，名额在线程结束前不会归还"""
+        release = threading.Event()
+        started = []
+
+        def hang(i: int) -> int:
+            started.append(i)
+            release.wait(2)
+            return i
+
+        executor = ToolExecutor([ToolSpec("hang", hang, timeout=0.05, max_concurrency=1)])
+        results = await executor.run([call("hang", "1", i=1)])
+        assert results[0].status == "timeout"
+
+        second = asyncio.create_task(executor.run([call("hang", "2", i=2)], timeout=0.1))
+        await asyncio.sleep(0.05)
+        assert started == [1]
+        release.set()
+        await second
+        executor.close()
+
+    def test_error_prompts(self):
+        """测试失败的调用生成 TOOL_ERROR_HANDLER 提示词"""
+        results = [
+            ToolResult("1", "echo", {}, "success", "ok"),
+            ToolResult("2", "weather_tool", {}, "timeout", error="工具调用超时（5 秒）"),
+        ]
+        prompts = error_prompts(results, "北京天气怎么样")
+        assert len(prompts) == 1
+        assert prompts[0][0] is results[1]
+        assert "weather_tool" in prompts[0][1]
+        assert "工具调用超时" in prompts[0][1]
+        assert "北京天气怎么样" in prompts[0][1]
+
+
+class CountingTool:
+    """记录执行次数的异步工具"""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.calls = 0
+        self.delay = delay
+        self.fail = fail
+
+    async def __call__(self, **args):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("下游服务不可用")
+        return {"args": args, "n": self.calls}
+
+
+def cached_executor(func, effect, **kwargs):
+    cache = ToolCache(TwoTierCache(default_ttl=60), **kwargs)
+    spec = ToolSpec("lookup", func, blocking=False, effect=effect)
+    return ToolExecutor([spec], cache=cache), cache
+
+
+class TestToolCache:
+    """测试工具结果缓存"""
+
+    def test_canonical_args(self):
+        """测试参数顺序不影响缓存键"""
+        assert canonical_args({"b": 1, "a": "北京"}) == canonical_args({"a": "北京", "b": 1})
+        spec = ToolSpec("lookup", echo.func)
+        assert ToolCache.key(spec, {"b": 1, "a": 2}) == ToolCache.key(spec, {"a": 2, "b": 1})
+        assert ToolCache.key(spec, {"a": 1}) != ToolCache.key(spec, {"a": 2})
+
+    @pytest.mark.asyncio
+    async def test_cacheable_results_reused(self):
+        """测试相同参数的调用命中缓存，并统计命中率"""
+        func = CountingTool()
+        executor, cache = cached_executor(func, ToolEffect.CACHEABLE)
+        first = await executor.run([call("lookup", "1", city="北京")])
+        second = await executor.run([call("lookup", "2", city="北京")])
+        other = await executor.run([call("lookup", "3", city="上海")])
+        assert func.calls == 2
+        assert (first[0].cached, second[0].cached, other[0].cached) == (False, True, False)
+        assert second[0].output == first[0].output
+        stats = cache.stats()["lookup"]
+        assert (stats["memory_hits"], stats["misses"]) == (1, 2)
+        assert stats["hit_rate"] == pytest.approx(1 / 3, abs=1e-3)
+
+    @pytest.mark.asyncio
+    async def test_side_effect_never_cached(self):
+        """测试有副作用的工具每次都执行"""
+        func = CountingTool()
+        executor, cache = cached_executor(func, ToolEffect.SIDE_EFFECT)
+        for i in range(3):
+            await executor.run([call("lookup", str(i), id=1)])
+        assert func.calls == 3
+        assert cache.stats() == {}
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_calls_coalesced(self):
+        """测试并发的相同调用只执行一次"""
+        func = CountingTool(delay=0.05)
+        executor, cache = cached_executor(func, ToolEffect.PURE)
+        results = await executor.run([call("lookup", str(i), q="x") for i in range(5)])
+        assert func.calls == 1
+        assert all(r.ok for r in results)
+        assert cache.stats()["lookup"]["coalesced"] == 4
+
+    @pytest.mark.asyncio
+    async def test_results_are_independent_copies(self):
+        """测试执行者、合并的等待者和缓存命中拿到各自的副本，修改互不影响"""
+        cache = ToolCache(TwoTierCache(default_ttl=60))
+        spec = ToolSpec("lookup", echo.func, effect=ToolEffect.CACHEABLE)
+        original = {"items": [1, 2]}
+
+        async def execute():
+            await asyncio.sleep(0.01)
+            return original
+
+        (first, _), (second, coalesced) = await asyncio.gather(
+            cache.call(spec, {"q": "x"}, execute), cache.call(spec, {"q": "x"}, execute)
+        )
+        assert coalesced is True
+        assert first is not original and second is not original and first is not second
+        first["items"].append(3)
+        second["items"].clear()
+        original["items"].append(4)
+        hit, cached = await cache.call(spec, {"q": "x"}, execute)
+        assert cached is True and hit == {"items": [1, 2]}
+
+    @pytest.mark.asyncio
+    async def test_failures_not_cached(self):
+        """测试失败传给所有合并的调用，且不写入缓存"""
+        func = CountingTool(delay=0.01, fail=True)
+        executor, _ = cached_executor(func, ToolEffect.CACHEABLE)
+        results = await executor.run([call("lookup", str(i), q="x") for i in range(3)])
+        assert [r.status for r in results] == ["error"] * 3
+        await executor.run([call("lookup", "4", q="x")])
+        assert func.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_bypass(self):
+        """测试调试开关跳过缓存"""
+        func = CountingTool()
+        executor, cache = cached_executor(func, ToolEffect.CACHEABLE)
+        await executor.run([call("lookup", "1", q="x")])
+        result = await executor.run([call("lookup", "2", q="x")], bypass_cache=True)
+        assert result[0].cached is False
+        assert func.calls == 2
+
+        executor, cache = cached_executor(func, ToolEffect.CACHEABLE, bypass=True)
+        await executor.run([call("lookup", "3", q="x")])
+        await executor.run([call("lookup", "4", q="x")])
+        assert func.calls == 4
+        assert cache.stats()["lookup"]["bypassed"] == 2
+
+    def test_ttl(self):
+        """测试缓存时间：工具声明 > PURE 的 pure_ttl > RedisSettings.cache_ttl"""
+        cache = ToolCache(TwoTierCache(default_ttl=300), pure_ttl=86400)
+        assert cache.ttl(ToolSpec("a", echo.func, effect=ToolEffect.CACHEABLE)) == 300
+        assert cache.ttl(ToolSpec("b", echo.func, effect=ToolEffect.PURE)) == 86400
+        assert cache.ttl(ToolSpec("c", echo.func, effect=ToolEffect.CACHEABLE, cache_ttl=5)) == 5
@@ -0,0 +1,185 @@
+"""
+测试 src/utils/tracing.py 中的单轮追踪和采样分析
+"""
+import asyncio
+import signal
+import time
+
+import orjson
+import pytest
+
+from config.settings import MonitoringSettings
+from src.utils import Tracer, current_trace, span, traced
+
+
+def busy(seconds):
+    deadline = time.process_time() + seconds
+    total = 0
+    while time.process_time() < deadline:
+        total += sum(range(200))
+    return total
+
+
+def other_busy(seconds):
+    return busy(seconds)
+
+
+class TestSpans:
+    """测试 span 记录"""
+
+    def test_disabled_is_noop(self):
+        """测试未开启追踪时 span 不记录任何内容"""
+        assert current_trace() is None
+        with span("retrieve") as recorded:
+            assert recorded is None
+        tracer = Tracer()
+        with tracer.turn("chat") as trace:
+            assert trace is None
+            with span("retrieve") as recorded:
+                assert recorded is None
+
+    def test_nested_spans_and_waterfall(self):
+        """测试嵌套 span 的层级、异常标记和瀑布图"""
+        tracer = Tracer()
+        with tracer.turn("chat", trace=True, session_id="s1") as trace:
+            with span("build_prompt"):
+                with span("load_history", rows=3):
+                    time.sleep(0.002)
+            with pytest.raises(ValueError):
+                with span("classify"):
+                    raise ValueError("boom")
+        assert current_trace() is None
+        spans = {s.name: s for s in trace.spans}
+        assert spans["build_prompt"].depth == 0
+        assert spans["load_history"].depth == 1
+        assert spans["load_history"].attrs == {"rows": 3}
+        assert spans["classify"].attrs == {"error": "ValueError"}
+        assert spans["build_prompt"].duration >= spans["load_history"].duration >= 0.002
+        waterfall = trace.waterfall()
+        assert waterfall.startswith("chat ") and "session_id=s1" in waterfall
+        assert waterfall.splitlines()[2].endswith("|   load_history")
+
+    @pytest.mark.asyncio
+    async def test_concurrent_tasks_and_threads_get_own_lanes(self):
+        """测试并发任务和线程中的 span 继承追踪并记录在各自的通道上"""
+
+        @traced("tool")
+        async def tool(delay):
+            await asyncio.sleep(delay)
+
+        @traced()
+        def search():
+            time.sleep(0.005)
+
+        tracer = Tracer()
+        async with tracer.turn("chat", trace=True) as trace:
+            with span("tools"):
+                await asyncio.gather(tool(0.01), tool(0.01), asyncio.to_thread(search))
+        tools = [s for s in trace.spans if s.name == "tool"]
+        searches = [s for s in trace.spans if s.name.endswith("search")]
+        assert len(tools) == 2 and len(searches) == 1
+        assert all(s.depth == 1 for s in tools + searches)
+        lanes = {s.lane for s in tools + searches}
+        assert len(lanes) == 3 and 0 not in lanes
+        assert next(s for s in trace.spans if s.name == "tools").lane == 0
+
+    def test_sample_rate(self):
+        """测试按比例采样，请求可以强制开启或关闭"""
+        with Tracer(sample_rate=1.0).turn("chat") as trace:
+            assert trace is not None
+        with Tracer(sample_rate=1.0).turn("chat", trace=False) as trace:
+            assert trace is None
+        with Tracer(sample_rate=0.0).turn("chat", trace=True) as trace:
+            assert trace is not None
+        with Tracer(sample_rate=0.0).turn("chat") as trace:
+            assert trace is None
+
+    def test_profile_rate_applies_to_traced_turns(self):
+        """测试 profile_rate 只在追踪的轮次中采样，未追踪的轮次不会被分析"""
+        tracer = Tracer(sample_rate=0.0, profile_rate=1.0)
+        with tracer.turn("chat") as trace:
+            assert trace is None
+        with tracer.turn("chat", trace=True) as trace:
+            assert trace.profile is True
+        with Tracer(sample_rate=1.0, profile_rate=0.0).turn("chat") as trace:
+            assert trace.profile is False
+
+    def test_nested_turn_not_counted(self):
+        """测试嵌套的轮次不开启新追踪，也不计入 traced"""
+        tracer = Tracer()
+        with tracer.turn("outer", trace=True) as outer:
+            with tracer.turn("inner", trace=True) as inner:
+                assert inner is None
+        assert outer is not None
+        assert tracer.traced == 1
+
+
+class TestExport:
+    """测试 Chrome trace 导出"""
+
+    @pytest.mark.asyncio
+    async def test_async_turn_exports_chrome_trace(self, tmp_path):
+        """测试 async with 结束后写出 Chrome trace 文件"""
+        tracer = Tracer(str(tmp_path))
+        async with tracer.turn("chat", trace=True, session_id="s1") as trace:
+            with span("llm", provider="openai"):
+                await asyncio.sleep(0.001)
+        files = list(tmp_path.iterdir())
+        assert len(files) == 1 and trace.trace_id in files[0].name
+        data = orjson.loads(files[0].read_bytes())
+        complete = {e["name"]: e for e in data["traceEvents"] if e["ph"] == "X"}
+        assert complete["chat"]["args"] == {"session_id": "s1"}
+        assert complete["llm"]["args"] == {"provider": "openai"}
+        assert complete["llm"]["dur"] >= 1000
+        assert tracer.exported == 1
+
+    def test_from_settings(self, tmp_path):
+        """测试根据 MonitoringSettings 创建"""
+        tracer = Tracer.from_settings(
+            MonitoringSettings(trace_dir=str(tmp_path), trace_sample_rate=0.5, trace_profile_interval_ms=2)
+        )
+        assert tracer.output_dir == str(tmp_path)
+        assert tracer.sample_rate == 0.5
+        assert tracer.profile_interval == 0.002
+
+
+class TestProfiler:
+    """测试 SIGPROF 调用栈采样"""
+
+    def test_samples_profiled_turn(self):
+        """测试采样到的热点和 Chrome trace 中的样本，结束后恢复信号处理器"""
+        previous = signal.getsignal(signal.SIGPROF)
+        tracer = Tracer(profile_interval=0.001)
+        with tracer.turn("chat", profile=True) as trace:
+            busy(0.1)
+        assert signal.getsignal(signal.SIGPROF) == previous
+        assert signal.getitimer(signal.ITIMER_PROF) == (0.0, 0.0)
+        assert len(trace.samples) > 10
+        assert "busy" in trace.hot_frames(1)[0][0]
+        data = trace.to_chrome()
+        assert len(data["samples"]) == len(trace.samples)
+        leaf = data["stackFrames"][data["samples"][0]["sf"]]
+        assert "parent" in leaf
+
+    @pytest.mark.asyncio
+    async def test_samples_only_attributed_to_own_turn(self):
+        """测试同一进程中未开启分析的请求不会计入样本"""
+        tracer = Tracer(profile_interval=0.001)
+
+        async def profiled():
+            async with tracer.turn("profiled", profile=True) as trace:
+                for _ in range(10):
+                    busy(0.005)
+                    await asyncio.sleep(0)
+            return trace
+
+        async def unprofiled():
+            for _ in range(10):
+                other_busy(0.005)
+                await asyncio.sleep(0)
+
+        trace, _ = await asyncio.gather(profiled(), unprofiled())
+        names = [name for name, _ in trace.hot_frames(20)]
+        assert any("busy" in name for name in names)
+        stacks = [" ".join(code.co_name for code, _ in stack) for _, _, stack in trace.samples]
+        assert stacks and not any("other_busy" in stack for stack in stacks)
@@ -0,0 +1,290 @@
+"""
+测试 src/memory/vector_store.py 中的向量存储
+"""
+import fcntl
+import json
+import multiprocessing
+import os
+import threading
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from config.settings import VectorStoreSettings
+from src.memory import NumpyVectorStore, create_vector_store
+from src.memory.vector_store import top_k_indices
+
+
+class KeywordEmbeddings(Embeddings):
+    """按关键词出现次数生成向量的确定性 Embedding（测试用）"""
+
+    KEYWORDS = ["天气", "温度", "股票", "基金", "足球", "篮球"]
+
+    def embed_query(self, text):
+        return [float(text.count(word)) for word in self.KEYWORDS]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+TEXTS = [
+    "北京明天天气晴，温度 25 度",
+    "上海天气多云",
+    "今天股票大涨，基金净值上升",
+    "足球比赛今晚开始",
+    "篮球和足球哪个更受欢迎",
+]
+
+
+def append_rows(path, worker):
+    """在子进程中逐条追加 10 行（并发写入测试用）"""
+    store = NumpyVectorStore(KeywordEmbeddings(), path)
+    for i in range(10):
+        store.add_texts([KeywordEmbeddings.KEYWORDS[worker]], ids=[f"{worker}-{i}"])
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = NumpyVectorStore(KeywordEmbeddings(), str(tmp_path / "vectors"), top_k=2)
+    store.add_texts(TEXTS, [{"source": i} for i in range(len(TEXTS))])
+    return store
+
+
+class TestNumpyVectorStore:
+    """测试 NumPy 内存映射向量存储"""
+
+    def test_top_k_indices(self):
+        """测试 argpartition top-k 按分数降序返回"""
+        scores = np.array([0.1, 0.9, 0.3, 0.7, 0.5], dtype=np.float32)
+        assert top_k_indices(scores, 3).tolist() == [1, 3, 4]
+        assert top_k_indices(scores, 10).tolist() == [1, 3, 4, 2, 0]
+        assert top_k_indices(scores, 0).tolist() == []
+
+    def test_search(self, store):
+        """测试余弦检索、top_k 和元数据"""
+        results = store.similarity_search_with_score("天气怎么样")
+        assert len(results) == 2
+        assert {doc.page_content for doc, _ in results} == {TEXTS[0], TEXTS[1]}
+        assert results[0][1] >= results[1][1]
+        assert results[0][0].metadata["source"] in (0, 1)
+
+        docs = store.similarity_search("足球", k=1)
+        assert docs[0].page_content == TEXTS[3]
+
+    def test_score_threshold(self, store):
+        """测试相似度阈值过滤"""
+        results = store.similarity_search_with_score("天气 温度", k=5, score_threshold=0.9)
+        assert [doc.page_content for doc, _ in results] == [TEXTS[0]]
+        assert results[0][1] == pytest.approx(1.0, abs=1e-6)
+
+    def test_vectors_normalized_and_memory_mapped(self, store):
+        """测试写入时归一化，并以 float32 内存映射加载"""
+        assert isinstance(store._vectors, np.memmap)
+        assert store._vectors.dtype == np.float32
+        norms = np.linalg.norm(store._vectors, axis=1)
+        assert np.allclose(norms, 1.0, atol=1e-6)
+
+    def test_reopen_and_append(self, store, tmp_path):
+        """测试重新打开和追加，已有数据不重写"""
+        path = str(tmp_path / "vectors")
+        reopened = NumpyVectorStore(KeywordEmbeddings(), path, top_k=2)
+        assert len(reopened) == 5
+        assert reopened.similarity_search("股票", k=1)[0].page_content == TEXTS[2]
+
+        head = open(os.path.join(path, "vectors.f32"), "rb").read()
+        store.add_texts(["基金定投"], ids=["doc-new"])
+        data = open(os.path.join(path, "vectors.f32"), "rb").read()
+        assert data[: len(head)] == head
+        assert len(data) == 6 * 6 * 4
+
+        # 其他进程（实例）通过 refresh 看到追加的数据
+        assert reopened.refresh() is True
+        assert len(reopened) == 6
+        assert reopened.similarity_search("基金", k=1)[0].id == "doc-new"
+        assert reopened.refresh() is False
+
+    def test_search_sees_other_instance_appends(self, store, tmp_path):
+        """测试检索前检查 manifest，无需手动 refresh 即可检索到其他实例追加的行"""
+        reopened = NumpyVectorStore(KeywordEmbeddings(), str(tmp_path / "vectors"), top_k=2)
+        store.add_texts(["基金定投"], ids=["doc-new"])
+        assert reopened.similarity_search("基金", k=1)[0].id == "doc-new"
+        assert len(reopened) == 6
+
+    def test_truncates_uncommitted_tail(self, store, tmp_path):
+        """测试崩溃残留的未提交数据在下次追加时被覆盖"""
+        path = str(tmp_path / "vectors")
+        with open(os.path.join(path, "vectors.f32"), "ab") as f:
+            f.write(b"\x00" * 10)
+        with open(os.path.join(path, "docs.jsonl"), "ab") as f:
+            f.write(b'{"id": "broken"')
+
+        reopened = NumpyVectorStore(KeywordEmbeddings(), path)
+        assert len(reopened) == 5
+        reopened.add_texts(["篮球"])
+        assert os.path.getsize(os.path.join(path, "vectors.f32")) == 6 * 6 * 4
+        lines = open(os.path.join(path, "docs.jsonl"), encoding="utf-8").read().splitlines()
+        assert [json.loads(line)["text"] for line in lines][-1] == "篮球"
+
+    def test_stale_instance_does_not_overwrite(self, store, tmp_path):
+        """测试视图过期的实例追加时先读取其他实例提交的行，不会截断覆盖"""
+        path = str(tmp_path / "vectors")
+        other = NumpyVectorStore(KeywordEmbeddings(), path)
+        other.add_texts(["股票"], ids=["a"])
+        store.add_texts(["足球"], ids=["b"])
+        reopened = NumpyVectorStore(KeywordEmbeddings(), path)
+        assert len(reopened) == 7
+        assert [doc.page_content for doc in reopened.get_by_ids(["a", "b"])] == ["股票", "足球"]
+
+    def test_concurrent_processes_append(self, store, tmp_path):
+        """测试多个进程同时追加同一目录，所有行都被保留且文本与向量对齐"""
+        path = str(tmp_path / "vectors")
+        context = multiprocessing.get_context("fork")
+        processes = [context.Process(target=append_rows, args=(path, worker)) for worker in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            assert process.exitcode == 0
+        reopened = NumpyVectorStore(KeywordEmbeddings(), path)
+        assert len(reopened) == 5 + 4 * 10
+        for worker in range(4):
+            ids = [f"{worker}-{i}" for i in range(10)]
+            assert {doc.page_content for doc in reopened.get_by_ids(ids)} == {KeywordEmbeddings.KEYWORDS[worker]}
+            assert (reopened.get_vectors(ids).argmax(axis=1) == worker).all()
+
+    @pytest.mark.parametrize("quantization", ["none", "int8"])
+    def test_same_id_overwrites(self, tmp_path, quantization):
+        """测试相同 ID 再次写入时覆盖旧行，检索不再返回旧内容"""
+        path = str(tmp_path / "vectors")
+        store = NumpyVectorStore(KeywordEmbeddings(), path, top_k=5, quantization=quantization)
+        store.add_texts(TEXTS, ids=[str(i) for i in range(len(TEXTS))])
+        store.add_texts(["篮球"], ids=["0"])
+        for current in (store, NumpyVectorStore(KeywordEmbeddings(), path, top_k=5, quantization=quantization)):
+            assert len(current) == 5
+            assert TEXTS[0] not in [doc.page_content for doc in current.similarity_search("天气 温度")]
+            assert [doc.page_content for doc in current.similarity_search("篮球", k=2)] == ["篮球", TEXTS[4]]
+            assert current.get_by_ids(["0"])[0].page_content == "篮球"
+
+    def test_dimension_mismatch(self, store):
+        """测试向量维度不一致时报错"""
+        with pytest.raises(ValueError):
+            store.add_embeddings(["x"], [[1.0, 0.0]])
+
+    def test_in_memory(self):
+        """测试不指定持久化目录时只保存在内存中"""
+        store = NumpyVectorStore.from_texts(TEXTS, KeywordEmbeddings())
+        assert len(store) == 5
+        assert store.similarity_search("篮球", k=1)[0].page_content == TEXTS[4]
+        assert store.search_vectors(np.eye(6)[:2], k=1)[1][0][0] == 0
+
+    def test_get_by_ids(self):
+        """测试按 ID 取文档，重复 ID 取最后写入的一条，未知 ID 被忽略"""
+        store = NumpyVectorStore(KeywordEmbeddings())
+        store.add_texts(TEXTS[:2], ids=["x", "y"])
+        assert [doc.page_content for doc in store.get_by_ids(["y", "missing", "x"])] == TEXTS[1::-1]
+        store.add_texts([TEXTS[4]], ids=["x"])
+        assert store.get_by_ids(["x"])[0].page_content == TEXTS[4]
+
+    def test_create_vector_store(self, tmp_path):
+        """测试按配置创建 numpy 向量存储"""
+        settings = VectorStoreSettings(
+            vector_store_type="numpy",
+            numpy_persist_dir=str(tmp_path / "vectors"),
+            top_k=3,
+            score_threshold=0.5,
+        )
+        store = create_vector_store(settings, KeywordEmbeddings())
+        assert isinstance(store, NumpyVectorStore)
+        assert store.top_k == 3
+        assert store.score_threshold == 0.5
+        assert create_vector_store(VectorStoreSettings(vector_store_type="none")) is None
+
+
+def random_corpus(rows=2000, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((rows, dim)).astype(np.float32)
+
+
+class TestQuantization:
+    """测试量化存储和 float32 精确重排"""
+
+    @pytest.mark.parametrize("quantization, ratio", [("float16", 2), ("int8", 4)])
+    def test_recall_and_memory(self, tmp_path, quantization, ratio):
+        """测试量化扫描的内存占用和召回率，返回分数为精确余弦相似度"""
+        corpus = random_corpus()
+        texts = [str(i) for i in range(len(corpus))]
+        exact = NumpyVectorStore(KeywordEmbeddings(), str(tmp_path / "exact"), top_k=10)
+        exact.add_embeddings(texts, corpus)
+        store = NumpyVectorStore(
+            KeywordEmbeddings(), str(tmp_path / quantization), top_k=10, quantization=quantization
+        )
+        store.add_embeddings(texts, corpus)
+
+        assert isinstance(store._codes, np.memmap)
+        # int8 额外保存每行一个 float32 缩放系数
+        assert store.scan_bytes <= exact.scan_bytes / ratio + len(corpus) * 4
+
+        queries = random_corpus(50, seed=1)
+        hits = 0
+        for expected, actual in zip(exact.search_vectors(queries), store.search_vectors(queries)):
+            hits += len({i for i, _ in expected} & {i for i, _ in actual})
+        assert hits / (50 * 10) >= 0.95
+
+    def test_exact_scores_after_rerank(self):
+        """测试重排后的分数与 float32 计算结果一致"""
+        corpus = random_corpus(500)
+        store = NumpyVectorStore(KeywordEmbeddings(), quantization="int8", top_k=5)
+        store.add_embeddings([str(i) for i in range(500)], corpus)
+        query = corpus[42]
+        hits = store.search_vectors(query)[0]
+        assert hits[0][0] == 42
+        assert hits[0][1] == pytest.approx(1.0, abs=1e-5)
+        for i, score in hits:
+            assert score == pytest.approx(float(store._vectors[i] @ (query / np.linalg.norm(query))), abs=1e-5)
+
+    def test_enable_on_existing_index(self, tmp_path):
+        """测试已有索引首次启用量化时从 float32 文件补齐量化副本，之后追加同步写入"""
+        path = str(tmp_path / "vectors")
+        corpus = random_corpus(300)
+        NumpyVectorStore(KeywordEmbeddings(), path).add_embeddings(
+            [str(i) for i in range(300)], corpus
+        )
+        store = NumpyVectorStore(KeywordEmbeddings(), path, quantization="int8")
+        assert os.path.getsize(os.path.join(path, "vectors.i8")) == 300 * 64
+        assert os.path.getsize(os.path.join(path, "scales.f32")) == 300 * 4
+
+        store.add_embeddings(["new"], corpus[:1] * -1)
+        assert os.path.getsize(os.path.join(path, "vectors.i8")) == 301 * 64
+        assert store.search_vectors(-corpus[0], k=1)[0][0][0] == 300
+
+    def test_overwritten_rows_do_not_crowd_out_rerank(self):
+        """测试被覆盖的旧行进入候选时不参与重排，仍返回 k 个存活结果"""
+        corpus = random_corpus(10)
+        store = NumpyVectorStore(KeywordEmbeddings(), quantization="int8", top_k=5, rerank_factor=4)
+        store.add_embeddings([str(i) for i in range(10)], corpus, ids=[str(i) for i in range(10)])
+        store.add_embeddings(["new"] * 3, -corpus[:3], ids=["0", "1", "2"])
+        hits = store.search_vectors(corpus[0])[0]
+        assert len(hits) == 5
+        assert all(store.get_document(i).page_content != "0" for i, _ in hits)
+
+    def test_sync_codes_waits_for_write_lock(self, tmp_path):
+        """测试补齐量化副本在 write.lock 内进行，不会与持锁的追加交错写入"""
+        path = str(tmp_path / "vectors")
+        NumpyVectorStore(KeywordEmbeddings(), path).add_embeddings(
+            [str(i) for i in range(100)], random_corpus(100)
+        )
+        opened = []
+        with open(os.path.join(path, "write.lock"), "a") as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            thread = threading.Thread(
+                target=lambda: opened.append(NumpyVectorStore(KeywordEmbeddings(), path, quantization="int8"))
+            )
+            thread.start()
+            thread.join(0.2)
+            assert thread.is_alive()
+            assert not os.path.exists(os.path.join(path, "vectors.i8"))
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+        thread.join(5)
+        assert os.path.getsize(os.path.join(path, "vectors.i8")) == 100 * 64
+        assert len(opened[0].search_vectors(random_corpus(1, seed=2), k=3)[0]) == 3